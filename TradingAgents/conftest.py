@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The agent graph modules import the `tradingagents` package from this directory, as the run scripts arrange
+TRADING_AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TRADING_AGENTS_DIR not in sys.path: sys.path.insert(0, TRADING_AGENTS_DIR)
+
+collect_ignore = []
+try:
+    import tradingagents.graph # noqa: F401
+except ImportError as e: # langgraph / LLM client packages not installed: the graph package cannot even be collected
+    print(f"conftest: skipping the agent graph tests ({type(e).__name__}: {e})")
+    collect_ignore.append(os.path.join("tradingagents", "graph"))
@@ -0,0 +1,270 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.vectorized import run_vectorized_backtest
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore, as_bar_store
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType
+from TradingAgents.run_backtest import DummyStrategyForTesting, generate_dummy_market_data
+
+# Benchmarks of the backtest hot loop on synthetic data. Results are written as JSON (one record per benchmark, plus
+# the git commit and machine info) so runs from different commits can be diffed; --compare prints the ratio against
+# a previous results file.
+#   python -m TradingAgents.run_benchmarks --bars 2000 --output bench.json --compare bench_baseline.json
+
+MAIN_SYMBOL = "EURUSD"
+START_TS = int(datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+POSITION_COUNTS = (1, 10, 100)
+STOP_OUT_POSITIONS = 2000 # Open positions when a price shock forces a stop-out liquidation
+# SimulatedBroker methods called once per bar by BacktestingEngine.run (place_order only when the strategy trades)
+BROKER_PER_BAR_METHODS = ("update_current_time", "update_market_data", "process_pending_orders", "check_for_sl_tp_triggers",
+                          "check_for_margin_call", "get_account_info", "get_current_price", "place_order")
+
+
+class HoldStrategy:
+    """Never trades: isolates the engine/broker cost of the positions already open."""
+    def invoke(self, state: Dict) -> Dict: state["forex_final_decision"] = None; return state
+
+
+class SignalArrayStrategy:
+    """Trades precomputed entry signals with fixed SL/TP through the engine: the event-driven twin of run_vectorized_backtest."""
+    def __init__(self, broker: SimulatedBroker, long_entries: np.ndarray, short_entries: np.ndarray, sl_pips: float, tp_pips: float):
+        self.long_entries = long_entries; self.short_entries = short_entries; self.sl_pips = sl_pips; self.tp_pips = tp_pips; self.i = -1
+        spec = broker.symbol_registry[MAIN_SYMBOL]; self.pip = spec.pip_definition; self.precision = spec.price_precision
+
+    def invoke(self, state: Dict) -> Dict:
+        self.i += 1; bar = state["current_bar_candlestick"]; state["forex_final_decision"] = None
+        if self.long_entries[self.i] or self.short_entries[self.i]:
+            sign = 1 if self.long_entries[self.i] else -1; quote = bar["ask_close"] if sign == 1 else bar["bid_close"]
+            state["forex_final_decision"] = {"currency_pair": MAIN_SYMBOL, "action": "EXECUTE_BUY" if sign == 1 else "EXECUTE_SELL", "position_size": 0.1,
+                                             "stop_loss": round(quote - sign * self.sl_pips * self.pip, self.precision),
+                                             "take_profit": round(quote + sign * self.tp_pips * self.pip, self.precision)}
+        return state
+
+
+def _quiet():
+    # The engine and broker print per order and per progress step; keep that out of the timings and the console.
+    stack = contextlib.ExitStack()
+    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+    return stack
+
+
+def make_market_data(num_bars: int, seed: int) -> Dict[str, List[Dict]]:
+    random.seed(seed)
+    with _quiet():
+        return {MAIN_SYMBOL: generate_dummy_market_data(MAIN_SYMBOL, START_TS, num_bars, initial_price=1.0800),
+                "USDJPY": generate_dummy_market_data("USDJPY", START_TS, num_bars, initial_price=140.00)}
+
+
+def make_broker(market_data: Dict[str, List[Dict]], bar_store: BarStore, num_positions: int = 0, num_pending: int = 0) -> SimulatedBroker:
+    """Broker loaded with the data and holding ``num_positions`` open positions / ``num_pending`` pending orders that never trigger."""
+    with _quiet():
+        broker = SimulatedBroker(initial_capital=1_000_000.0)
+        for symbol, bars in market_data.items(): broker.load_test_data(symbol, bars)
+        broker.update_current_time(float(bar_store[MAIN_SYMBOL].timestamp[0]))
+        broker.update_market_data({symbol: bars.bar(0) for symbol, bars in bar_store.items()})
+        price = float(bar_store[MAIN_SYMBOL].close[0])
+        for k in range(num_positions):
+            side = OrderSide.BUY if k % 2 == 0 else OrderSide.SELL
+            sl, tp = (price * 0.5, price * 2.0) if side == OrderSide.BUY else (price * 2.0, price * 0.5)
+            response = broker.place_order(MAIN_SYMBOL, OrderType.MARKET, side, 0.01, stop_loss=sl, take_profit=tp)
+            if response["status"] != "FILLED": raise RuntimeError(f"Benchmark setup: could not open position {k}: {response.get('error_message')}")
+        for k in range(num_pending):
+            side = OrderSide.BUY if k % 2 == 0 else OrderSide.SELL
+            broker.place_order(MAIN_SYMBOL, OrderType.LIMIT, side, 0.01, price=price * (0.5 if side == OrderSide.BUY else 2.0))
+    return broker
+
+
+def _timed(run_once: Callable[[], float], repeat: int) -> Dict[str, float]:
+    """run_once returns the seconds it measured; the best of ``repeat`` is the headline number."""
+    seconds = [run_once() for _ in range(repeat)]
+    return {"seconds_best": min(seconds), "seconds_median": statistics.median(seconds)}
+
+
+def bench_engine(name: str, market_data: Dict[str, List[Dict]], bar_store: BarStore, strategy_factory: Callable[[SimulatedBroker], Any],
+                 repeat: int, seed: int, num_positions: int = 0) -> Dict[str, Any]:
+    num_bars = len(bar_store[MAIN_SYMBOL])
+
+    def run_once() -> float:
+        random.seed(seed)
+        broker = make_broker(market_data, bar_store, num_positions=num_positions)
+        with _quiet():
+            engine = BacktestingEngine(strategy_factory(broker), broker, bar_store, MAIN_SYMBOL)
+            start = time.perf_counter(); engine.run(); elapsed = time.perf_counter() - start
+        return elapsed
+
+    timing = _timed(run_once, repeat)
+    return {"name": name, "kind": "engine", "bars": num_bars, "open_positions": num_positions, **timing, "bars_per_second": num_bars / timing["seconds_best"]}
+
+
+def bench_broker_method(method: str, market_data: Dict[str, List[Dict]], bar_store: BarStore, num_positions: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """Times one broker method per bar, replaying the bars the way the engine does (only the method call is timed)."""
+    main_bars = bar_store[MAIN_SYMBOL]; num_bars = len(main_bars)
+    symbols = list(bar_store.keys())
+
+    def run_once() -> float:
+        random.seed(seed)
+        broker = make_broker(market_data, bar_store, num_positions=num_positions, num_pending=num_positions)
+        elapsed = 0.0
+        with _quiet():
+            for i in range(num_bars):
+                ts = float(main_bars.timestamp[i]); snapshot = {symbol: bar_store[symbol].bar(i) for symbol in symbols}
+                if method == "update_current_time":
+                    start = time.perf_counter(); broker.update_current_time(ts); elapsed += time.perf_counter() - start; continue
+                broker.update_current_time(ts)
+                if method == "update_market_data":
+                    start = time.perf_counter(); broker.update_market_data(snapshot); elapsed += time.perf_counter() - start; continue
+                broker.update_market_data(snapshot)
+                if method == "get_current_price": call = lambda: broker.get_current_price(MAIN_SYMBOL)
+                elif method == "place_order": # Open and immediately close, so the position count stays constant
+                    call = lambda: broker.close_order(broker.place_order(MAIN_SYMBOL, OrderType.MARKET, OrderSide.BUY, 0.01)["position_id"])
+                else: call = getattr(broker, method)
+                start = time.perf_counter(); call(); elapsed += time.perf_counter() - start
+        return elapsed
+
+    timing = _timed(run_once, repeat)
+    return {"name": f"broker.{method}[positions={num_positions}]", "kind": "broker", "method": method, "bars": num_bars, "open_positions": num_positions,
+            **timing, "calls_per_second": num_bars / timing["seconds_best"], "microseconds_per_call": timing["seconds_best"] / num_bars * 1e6}
+
+
+def bench_stop_out(num_positions: int, liquidation_mode: str, repeat: int, seed: int) -> Dict[str, Any]:
+    """Times the check_for_margin_call that liquidates part of ``num_positions`` mostly long positions after a ~3% drop."""
+    def flat_bar(ts: float, price: float) -> Dict[str, Any]:
+        return {"timestamp": ts, "open": price, "high": price, "low": price, "close": price, "volume": 100.0, "bid_close": None, "ask_close": None}
+
+    def run_once() -> float:
+        random.seed(seed); rng = random.Random(seed)
+        with _quiet():
+            broker = SimulatedBroker(initial_capital=num_positions * 55.0); broker.liquidation_mode = liquidation_mode
+            for k in range(num_positions):
+                price = 1.1 + rng.uniform(-0.005, 0.005); broker.update_current_time(START_TS + k); broker.update_market_data({MAIN_SYMBOL: flat_bar(START_TS + k, price)})
+                broker.place_order(MAIN_SYMBOL, OrderType.MARKET, OrderSide.BUY if rng.random() < 0.8 else OrderSide.SELL, rng.choice([0.01, 0.02, 0.05]))
+            broker.update_current_time(START_TS + num_positions); broker.update_market_data({MAIN_SYMBOL: flat_bar(START_TS + num_positions, 1.07)})
+            start = time.perf_counter(); broker.check_for_margin_call(); elapsed = time.perf_counter() - start
+        return elapsed
+
+    timing = _timed(run_once, repeat)
+    return {"name": f"broker.stop_out[{liquidation_mode}, positions={num_positions}]", "kind": "broker", "method": "check_for_margin_call", "open_positions": num_positions,
+            **timing, "calls_per_second": 1.0 / timing["seconds_best"], "microseconds_per_call": timing["seconds_best"] * 1e6}
+
+
+def bench_vectorized(market_data: Dict[str, List[Dict]], bar_store: BarStore, repeat: int, seed: int) -> List[Dict[str, Any]]:
+    """The same signal arrays through BacktestingEngine and through run_vectorized_backtest; the second record carries the speed-up."""
+    num_bars = len(bar_store[MAIN_SYMBOL]); rng = np.random.default_rng(seed)
+    long_entries = rng.random(num_bars) < 0.05; short_entries = (rng.random(num_bars) < 0.05) & ~long_entries
+    engine_result = bench_engine("engine.run[SignalArrayStrategy]", market_data, bar_store,
+                                 lambda broker: SignalArrayStrategy(broker, long_entries, short_entries, 20, 40), repeat, seed)
+
+    def run_once() -> float:
+        with _quiet():
+            broker = SimulatedBroker(initial_capital=1_000_000.0)
+            start = time.perf_counter()
+            run_vectorized_backtest(bar_store, MAIN_SYMBOL, long_entries=long_entries, short_entries=short_entries, stop_loss_pips=20, take_profit_pips=40, volume=0.1, broker=broker)
+            return time.perf_counter() - start
+
+    timing = _timed(run_once, repeat)
+    vectorized_result = {"name": "vectorized[SignalArrayStrategy signals]", "kind": "vectorized", "bars": num_bars, **timing, "bars_per_second": num_bars / timing["seconds_best"],
+                         "speedup_vs_engine": engine_result["seconds_best"] / timing["seconds_best"]}
+    return [engine_result, vectorized_result]
+
+
+def _graph_strategy_factory() -> Tuple[Optional[Callable[[SimulatedBroker], Any]], Optional[str]]:
+    """(factory, None), or (None, reason) when ForexTradingGraph cannot be imported."""
+    trading_agents_dir = os.path.dirname(os.path.abspath(__file__)) # The graph modules import `tradingagents.` from TradingAgents/
+    if trading_agents_dir not in sys.path: sys.path.insert(0, trading_agents_dir)
+    try:
+        from tradingagents.graph.forex_trading_graph import ForexTradingGraph
+    except Exception as e: # Optional dependencies (langgraph, LLM clients) may be missing
+        return None, f"{type(e).__name__}: {e}"
+    return (lambda broker: ForexTradingGraph(broker=broker)), None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception: return None
+
+
+def run_benchmarks(num_bars: int = 2000, repeat: int = 3, seed: int = 42, include_graph: bool = True, graph_bars: int = 50) -> Dict[str, Any]:
+    market_data = make_market_data(num_bars, seed); bar_store = as_bar_store(market_data)
+    results: List[Dict[str, Any]] = []
+
+    def record(result: Dict[str, Any]):
+        rate = result.get("bars_per_second") or result.get("calls_per_second")
+        print(f"{result['name']:<55} {rate:>14,.0f} /s   (best {result['seconds_best']:.4f}s, median {result['seconds_median']:.4f}s)")
+        results.append(result)
+
+    record(bench_engine("engine.run[DummyStrategyForTesting]", market_data, bar_store, lambda broker: DummyStrategyForTesting(broker_for_info=broker, main_symbol=MAIN_SYMBOL), repeat, seed))
+    for result in bench_vectorized(market_data, bar_store, repeat, seed): record(result)
+    print(f"{'  vectorized speed-up over engine.run':<55} x{results[-1]['speedup_vs_engine']:,.0f}")
+    for num_positions in POSITION_COUNTS:
+        record(bench_engine(f"engine.run[HoldStrategy, positions={num_positions}]", market_data, bar_store, lambda broker: HoldStrategy(), repeat, seed, num_positions=num_positions))
+    if include_graph:
+        graph_factory, reason = _graph_strategy_factory()
+        if graph_factory is None:
+            print(f"{'engine.run[ForexTradingGraph]':<55} {'SKIPPED':>14}      ({reason})")
+            results.append({"name": "engine.run[ForexTradingGraph]", "kind": "engine", "skipped": f"ForexTradingGraph could not be imported: {reason}"})
+        else:
+            graph_data = make_market_data(graph_bars, seed) # The agent graph is orders of magnitude slower per bar
+            record(bench_engine("engine.run[ForexTradingGraph]", graph_data, as_bar_store(graph_data), graph_factory, 1, seed))
+    for num_positions in POSITION_COUNTS:
+        for method in BROKER_PER_BAR_METHODS: record(bench_broker_method(method, market_data, bar_store, num_positions, repeat, seed))
+    for liquidation_mode in ("sequential", "batch"): record(bench_stop_out(STOP_OUT_POSITIONS, liquidation_mode, repeat, seed))
+
+    return {"meta": {"git_commit": _git_commit(), "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(), "python": platform.python_version(),
+                     "platform": platform.platform(), "processor": platform.processor(), "num_bars": num_bars, "repeat": repeat, "seed": seed,
+                     "skipped": [r["name"] for r in results if r.get("skipped")]},
+            "results": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Prints current / baseline throughput per benchmark (>1 is faster)."""
+    def rates(report): return {r["name"]: r.get("bars_per_second") or r.get("calls_per_second") for r in report["results"] if not r.get("skipped")}
+    current_rates, baseline_rates = rates(current), rates(baseline)
+    print(f"\n--- Compared with {baseline['meta'].get('git_commit')} ---")
+    for name, rate in current_rates.items():
+        if name in baseline_rates: print(f"{name:<55} x{rate / baseline_rates[name]:.2f}")
+    for result in current["results"]:
+        if result.get("skipped"): print(f"{result['name']:<55} SKIPPED")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the backtest hot loop (BacktestingEngine.run and SimulatedBroker per-bar methods).")
+    parser.add_argument("--bars", type=int, default=2000, help="Synthetic H1 bars per benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file.")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against.")
+    parser.add_argument("--no-graph", action="store_true", help="Skip the ForexTradingGraph benchmark.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare: # Read first: the baseline may be the file about to be overwritten
+        with open(args.compare) as f: baseline = json.load(f)
+    print(f"--- Running benchmarks ({args.bars} bars, best of {args.repeat}) ---")
+    report = run_benchmarks(num_bars=args.bars, repeat=args.repeat, seed=args.seed, include_graph=not args.no_graph)
+    with open(args.output, "w") as f: json.dump(report, f, indent=2)
+    print(f"Benchmark results written to {args.output}")
+    if baseline is not None: compare(report, baseline)
+    if report["meta"]["skipped"]: # Results are written, but the run did not cover everything that was asked for
+        print(f"INCOMPLETE: skipped {', '.join(report['meta']['skipped'])} (pass --no-graph to benchmark without the agent graph).")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    project_root_path = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')) # Assuming script is in TradingAgents/
+    if project_root_path not in sys.path: sys.path.insert(0, project_root_path)
+    main()
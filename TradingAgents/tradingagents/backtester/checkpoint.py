@@ -0,0 +1,85 @@
+import os
+import pickle
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Append-only logs: each checkpoint appends one pickle frame with the entries added since the previous one, so the
+# cost of a checkpoint is proportional to the bars since the last one, not to the length of the run.
+_STATE_FILE = "state.pkl"
+
+
+class CheckpointManager:
+    """
+    Periodic, incremental checkpoints of a BacktestingEngine run in ``directory``.
+
+    ``state.pkl`` (replaced atomically) holds the small mutable state: engine bar index, broker balances, open
+    positions, pending orders, RNG state and the strategy's own state (when it implements
+    get_checkpoint_state/restore_checkpoint_state). The growing lists are appended to ``<name>.log`` files and
+    ``state.pkl`` records how much of each log it covers, so a crash between the two writes is harmless.
+    """
+
+    def __init__(self, directory: str, every_n_bars: Optional[int] = 500, every_seconds: Optional[float] = None):
+        self.directory = directory
+        self.every_n_bars = every_n_bars
+        self.every_seconds = every_seconds
+        self._saved_counts: Dict[str, int] = {}
+        self._saved_sizes: Dict[str, int] = {}
+        self._last_save_bar: Optional[int] = None
+        self._last_save_time = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str: return os.path.join(self.directory, name)
+
+    def exists(self) -> bool: return os.path.exists(self._path(_STATE_FILE))
+
+    def start(self, start_bar_index: int) -> None:
+        """Counts every_n_bars / every_seconds from the first bar of a fresh run (load() does so for a resumed one)."""
+        self._last_save_bar = start_bar_index; self._last_save_time = time.monotonic()
+
+    def due(self, next_bar_index: int) -> bool:
+        if self._last_save_bar is None: self.start(0) # Run start not announced: count from bar 0
+        if self.every_n_bars and next_bar_index - self._last_save_bar >= self.every_n_bars: return True
+        return bool(self.every_seconds) and time.monotonic() - self._last_save_time >= self.every_seconds
+
+    def save(self, next_bar_index: int, logs: Dict[str, Sequence], state: Dict[str, Any]) -> None:
+        """Appends the new tail of each log (any sliceable sequence), then atomically replaces the state snapshot."""
+        for name, entries in logs.items():
+            saved_count, saved_size = self._saved_counts.setdefault(name, 0), self._saved_sizes.setdefault(name, 0)
+            if len(entries) < saved_count: raise ValueError(f"CheckpointManager: log '{name}' shrank since the last checkpoint.")
+            new_entries = entries[saved_count:]
+            if len(new_entries):
+                with open(self._path(f"{name}.log"), "ab") as f:
+                    f.truncate(saved_size) # Drop a frame left by a save that never committed its state
+                    f.seek(saved_size)
+                    pickle.dump(list(new_entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+                    f.flush(); os.fsync(f.fileno())
+                    self._saved_sizes[name] = f.tell()
+                self._saved_counts[name] = len(entries)
+        snapshot = {"next_bar_index": next_bar_index, "log_counts": dict(self._saved_counts), "log_sizes": dict(self._saved_sizes), "state": state, "saved_at": time.time()}
+        tmp_path = self._path(_STATE_FILE + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(_STATE_FILE))
+        self._last_save_bar = next_bar_index; self._last_save_time = time.monotonic()
+        print(f"CheckpointManager: Saved checkpoint at bar {next_bar_index} to {self.directory}.")
+
+    def load(self) -> Tuple[int, Dict[str, List[Any]], Dict[str, Any]]:
+        """Returns (next_bar_index, logs, state) of the last committed checkpoint and continues appending after it."""
+        with open(self._path(_STATE_FILE), "rb") as f: snapshot = pickle.load(f)
+        logs: Dict[str, List[Any]] = {}
+        for name in snapshot["log_counts"]:
+            entries: List[Any] = []; size = snapshot["log_sizes"][name]
+            if size:
+                with open(self._path(f"{name}.log"), "rb") as f:
+                    while f.tell() < size: entries.extend(pickle.load(f))
+            logs[name] = entries[:snapshot["log_counts"][name]]
+        self._saved_counts = dict(snapshot["log_counts"]); self._saved_sizes = dict(snapshot["log_sizes"])
+        self._last_save_bar = snapshot["next_bar_index"]; self._last_save_time = time.monotonic()
+        print(f"CheckpointManager: Loaded checkpoint from {self.directory} (resuming at bar {snapshot['next_bar_index']}).")
+        return snapshot["next_bar_index"], logs, snapshot["state"]
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name == _STATE_FILE or name.endswith(".log"): os.remove(self._path(name))
+        self._saved_counts = {}; self._saved_sizes = {}; self._last_save_bar = None
@@ -1,13 +1,18 @@
 import datetime
 import time # For simulating delays if needed
-import random # For dummy data generation in __main__ (will be removed, but import kept for now if other parts need it)
+import random # Global RNG (broker slippage draws); its state is saved in checkpoints
 from typing import List, Dict, Any, Optional, Union
 
+import numpy as np
 import pandas as pd
-import quantstats # Ensure this is installed
 
+from TradingAgents.tradingagents.backtester.checkpoint import CheckpointManager
+from TradingAgents.tradingagents.backtester.metrics import StreamingMetrics
+from TradingAgents.tradingagents.backtester.recorder import AccountSnapshotsView, EquityCurveView, EquityRecorder, RecordRowsView
 from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
-from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick, AccountInfo, ForexFinalDecision, OrderType, OrderSide
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick, ForexFinalDecision, OrderType, OrderSide
+from TradingAgents.tradingagents.forex_utils.bar_store import AlignedTimeline, BarStore, CandlestickView, as_bar_store
+from TradingAgents.tradingagents.forex_utils.tick_store import TickStore
 
 # Placeholder for the actual strategy type
 # from TradingAgents.tradingagents.graph.forex_trading_graph import ForexTradingGraph
@@ -16,64 +21,128 @@ class BacktestingEngine:
     def __init__(self,
                  trading_strategy: Any, # Replace Any with actual strategy type e.g., ForexTradingGraph
                  broker: SimulatedBroker,
-                 historical_data_source: Dict[str, List[Candlestick]], # Symbol -> List of Candlesticks
+                 historical_data_source: Optional[Union[BarStore, Dict[str, List[Candlestick]]]], # BarStore, or legacy Symbol -> List of Candlesticks
                  main_symbol_to_trade: str,
-                 initial_graph_state_overrides: Optional[Dict] = None):
+                 initial_graph_state_overrides: Optional[Dict] = None,
+                 max_asof_staleness_seconds: Optional[float] = None, # Drop secondary bars older than this; None keeps the latest bar regardless of age
+                 tick_replay: bool = False, # Replay the broker's tick data (SimulatedBroker.load_tick_data) between bar closes
+                 tick_bar_seconds: int = 60, # Bar size built from the ticks when historical_data_source is None
+                 bar_timestamps: Optional[str] = None, # "open" or "close" stamping of the bars; None: "close" for bars built from ticks, else "open"
+                 equity_resolution: Union[str, int] = "bar", # EquityRecorder resolution: "bar", every N bars, or "change"
+                 metrics_periods_per_year: Optional[float] = None, # Annualization of Sharpe/Sortino; None infers it from the bar timestamps
+                 metrics_summary_path: Optional[str] = None): # JSON performance summary written when run() ends
         self.trading_strategy = trading_strategy
         self.broker = broker
-        self.historical_data_source = historical_data_source
+        self.tick_replay = tick_replay
+        self.tick_bar_seconds = tick_bar_seconds
+        self.bar_timestamps = bar_timestamps or ("close" if historical_data_source is None else "open")
+        if bar_timestamps not in (None, "open", "close"): raise ValueError(f"bar_timestamps must be 'open' or 'close', got {bar_timestamps!r}.")
+        if historical_data_source is None:
+            if not tick_replay: raise ValueError("historical_data_source is required unless tick_replay is enabled.")
+            if bar_timestamps == "open": raise ValueError("Bars built from ticks are stamped at close; bar_timestamps='open' needs a historical_data_source.")
+            # Agents see bars aggregated from the ticks, stamped at bar close; the broker gets them as its bar history.
+            historical_data_source = TickStore(self.broker.tick_data_store).to_bar_store(tick_bar_seconds)
+            for symbol, bars in historical_data_source.items():
+                if symbol not in self.broker.test_data_store: self.broker.load_test_data(symbol, bars)
+        # Bars are held column-wise and handed out as CandlestickView rows, so no per-bar dicts are built.
+        self.historical_data_source: BarStore = as_bar_store(historical_data_source)
         self.main_symbol_to_trade = main_symbol_to_trade.upper()
         self.initial_graph_state_overrides = initial_graph_state_overrides if initial_graph_state_overrides else {}
+        self.max_asof_staleness_seconds = max_asof_staleness_seconds
 
-        self.equity_curve: List[Dict[str, Any]] = []
-        self.account_snapshots: List[Optional[AccountInfo]] = []
+        # Account history lives in preallocated arrays; equity_curve / account_snapshots are list-like views over it.
+        self.recorder = EquityRecorder(capacity=1, resolution=equity_resolution)
+        # Performance metrics are accumulated bar by bar; performance_summary is set when run() ends.
+        self.metrics_periods_per_year = metrics_periods_per_year
+        self.metrics_summary_path = metrics_summary_path
+        self.metrics = StreamingMetrics(periods_per_year=metrics_periods_per_year)
+        self.performance_summary: Optional[Dict[str, Any]] = None
 
         if self.main_symbol_to_trade not in self.historical_data_source:
             raise ValueError(f"Main symbol {self.main_symbol_to_trade} not found in historical_data_source keys.")
-        if not self.historical_data_source[self.main_symbol_to_trade]:
+        if len(self.historical_data_source[self.main_symbol_to_trade]) == 0:
             raise ValueError(f"No historical data provided for main symbol {self.main_symbol_to_trade}.")
 
+        # Secondary symbols (e.g. cross rates for conversions) are aligned to the main symbol's bars "as of" each timestamp.
+        self.timeline = AlignedTimeline(self.historical_data_source)
+
         print(f"BacktestingEngine initialized for {self.main_symbol_to_trade}.")
         print(f"Data for {self.main_symbol_to_trade}: {len(self.historical_data_source[self.main_symbol_to_trade])} bars.")
 
-    def run(self):
+    def _bar_close_times(self, bars: Any) -> np.ndarray:
+        """Close time of each bar: its timestamp for close-stamped bars, else timestamp + the bar size (smallest gap between bars)."""
+        timestamps = np.asarray(bars.timestamp, dtype=np.float64)
+        if self.bar_timestamps == "close": return timestamps
+        gaps = np.diff(timestamps); gaps = gaps[gaps > 0]
+        return timestamps + (float(gaps.min()) if len(gaps) else float(self.tick_bar_seconds))
+
+    def run(self, start_bar_index: int = 0, end_bar_index: Optional[int] = None, checkpoint_manager: Optional[CheckpointManager] = None, resume: bool = False):
+        # start/end_bar_index restrict the run to main-symbol bars [start, end). Earlier bars stay available to the
+        # strategy through the broker's history (indicator warm-up) but are not traded.
+        # checkpoint_manager saves the run periodically at bar boundaries; resume=True continues from its last checkpoint
+        # (the engine, broker and strategy must be constructed the same way as for the original run).
         print(f"--- Starting Backtesting Run for {self.main_symbol_to_trade} ---")
-
-        data_sequence_for_main_symbol = self.historical_data_source[self.main_symbol_to_trade]
+        resumed = False
+        self.metrics = StreamingMetrics(periods_per_year=self.metrics_periods_per_year)
+        if checkpoint_manager is not None:
+            if resume and checkpoint_manager.exists():
+                start_bar_index = self._restore_checkpoint(checkpoint_manager); resumed = True
+            else: checkpoint_manager.clear(); checkpoint_manager.start(start_bar_index)
+
+        main_bars = self.historical_data_source[self.main_symbol_to_trade]
+        num_main_bars = len(main_bars)
+        end_bar_index = num_main_bars if end_bar_index is None else min(end_bar_index, num_main_bars)
+        main_bar_steps = self.timeline.symbol_steps[self.main_symbol_to_trade]
+        secondary_bars = [(sym, bars, self.timeline.asof_index[sym]) for sym, bars in self.historical_data_source.items() if sym != self.main_symbol_to_trade]
+        # Tick replay: the ticks of main bar i are those after bar i-1's close and before bar i's, so the strategy deciding
+        # on bar i has seen no tick beyond that bar's close.
+        bar_close_times = self._bar_close_times(main_bars) if self.tick_replay else None
+        tick_bounds = {sym: np.searchsorted(ticks.timestamp, bar_close_times, side="left") for sym, ticks in self.broker.tick_data_store.items()} if self.tick_replay else {}
 
         initial_account_info = self.broker.get_account_info()
-        if initial_account_info:
+        if initial_account_info: # A resumed broker reports the checkpointed account, so its rows keep their account id
+            self.recorder.account_id = initial_account_info['account_id']; self.recorder.currency = initial_account_info['currency']
+        if initial_account_info and not resumed:
             print(f"Initial Account: Balance: {initial_account_info['balance']:.2f}, Equity: {initial_account_info['equity']:.2f}")
-            self.account_snapshots.append(initial_account_info)
-            first_bar_ts = data_sequence_for_main_symbol[0]['timestamp'] if data_sequence_for_main_symbol else time.time()
-            self.equity_curve.append({'timestamp': first_bar_ts -1, 'equity': initial_account_info['equity']})
+            first_bar_ts = float(main_bars.timestamp[start_bar_index]) if start_bar_index < num_main_bars else time.time()
+            self.recorder.record_account(first_bar_ts - 1, initial_account_info, initial_account_info['equity'], force=True)
+            self.metrics.update(first_bar_ts - 1, initial_account_info['equity'])
+        self.recorder.reserve(len(self.recorder) + self.recorder.expected_rows(max(0, end_bar_index - start_bar_index)))
 
 
-        for i, bar_data in enumerate(data_sequence_for_main_symbol):
-            current_bar_candlestick = Candlestick(**bar_data)
-            bar_timestamp_unix = current_bar_candlestick['timestamp']
+        for i in range(start_bar_index, end_bar_index):
+            current_bar_candlestick: CandlestickView = main_bars.bar(i)
+            bar_timestamp_unix = float(main_bars.timestamp[i])
             bar_datetime_obj = datetime.datetime.fromtimestamp(bar_timestamp_unix, tz=datetime.timezone.utc)
 
             if (i + 1) % 200 == 0: # Print progress every 200 bars
-                 print(f"Processing Bar {i+1}/{len(data_sequence_for_main_symbol)} | Time: {bar_datetime_obj.isoformat()} | {self.main_symbol_to_trade} C: {current_bar_candlestick['close']}")
-
-            # 1. Update broker time and market data
+                 print(f"Processing Bar {i+1}/{num_main_bars} | Time: {bar_datetime_obj.isoformat()} | {self.main_symbol_to_trade} C: {current_bar_candlestick['close']}")
+
+            # 1. Replay ticks up to the bar close (fills and SL/TP on actual bid/ask), then update broker time and market data
+            if self.tick_replay:
+                windows = {}
+                for sym, bounds in tick_bounds.items():
+                    ticks = self.broker.tick_data_store[sym]; start = bounds[i - 1] if i > 0 else 0; end = bounds[i]
+                    if end > start: windows[sym] = (ticks.timestamp[start:end], ticks.bid[start:end], ticks.ask[start:end])
+                self.broker.replay_ticks(windows)
             self.broker.update_current_time(bar_timestamp_unix)
 
-            current_market_snapshot: Dict[str, Candlestick] = {}
+            current_market_snapshot: Dict[str, CandlestickView] = {}
             current_market_snapshot[self.main_symbol_to_trade] = current_bar_candlestick
 
-            for sym, data_list in self.historical_data_source.items():
-                if sym != self.main_symbol_to_trade and len(data_list) > i:
-                    sym_bar_data = data_list[i]
-                    if sym_bar_data['timestamp'] == bar_timestamp_unix:
-                         current_market_snapshot[sym.upper()] = Candlestick(**sym_bar_data)
+            step = main_bar_steps[i]
+            for sym, bars, asof_index in secondary_bars:
+                j = asof_index[step]
+                if j < 0: continue # No bar for this symbol yet
+                if self.max_asof_staleness_seconds is not None and bar_timestamp_unix - bars.timestamp[j] > self.max_asof_staleness_seconds: continue
+                current_market_snapshot[sym] = bars.bar(j)
 
             self.broker.update_market_data(current_market_snapshot)
 
-            # 2. Process broker events (SL/TP, pending orders)
-            self.broker.process_pending_orders()
-            self.broker.check_for_sl_tp_triggers()
+            # 2. Process broker events (SL/TP, pending orders); with tick replay they already fired tick by tick
+            if not self.tick_replay:
+                self.broker.process_pending_orders()
+                self.broker.check_for_sl_tp_triggers()
 
             # 3. Invoke trading strategy
             current_iteration_state = {
@@ -127,18 +196,18 @@ class BacktestingEngine:
 
             # 5. Record equity and account snapshot
             current_account_info = self.broker.get_account_info()
-            if current_account_info:
-                self.equity_curve.append({
-                    'timestamp': bar_timestamp_unix,
-                    'equity': current_account_info['equity']
-                })
-                self.account_snapshots.append(current_account_info)
-            else:
-                if self.equity_curve: last_equity = self.equity_curve[-1]['equity']
-                elif initial_account_info: last_equity = initial_account_info['equity']
-                else: last_equity = self.broker.initial_capital
-                self.equity_curve.append({'timestamp': bar_timestamp_unix, 'equity': last_equity})
-                self.account_snapshots.append(None)
+            if current_account_info: last_equity = current_account_info['equity']
+            elif len(self.recorder): last_equity = float(self.recorder.column('equity')[-1])
+            elif initial_account_info: last_equity = initial_account_info['equity']
+            else: last_equity = self.broker.initial_capital
+            self.recorder.record_account(bar_timestamp_unix, current_account_info, last_equity, force=(i == end_bar_index - 1))
+            self.metrics.update(bar_timestamp_unix, last_equity, in_market=bool(current_account_info and current_account_info['margin'] > 0)) # Open positions hold margin
+            self.metrics.update_trades(self.broker.trade_history)
+
+            # 6. Periodic checkpoint (bar i is complete)
+            if checkpoint_manager is not None and checkpoint_manager.due(i + 1): self._save_checkpoint(checkpoint_manager, i + 1)
+
+        if checkpoint_manager is not None: self._save_checkpoint(checkpoint_manager, end_bar_index)
 
         print(f"--- Backtesting Run Finished for {self.main_symbol_to_trade} ---")
         final_account_details = self.broker.get_account_info()
@@ -149,14 +218,49 @@ class BacktestingEngine:
         print(f"Total equity curve points recorded: {len(self.equity_curve)}")
         print(f"Total trade history events in broker: {len(self.broker.trade_history)}")
 
+        self.performance_summary = self.metrics.to_json(self.metrics_summary_path) if self.metrics_summary_path else self.metrics.summary()
+        print(f"Performance: Return {self.performance_summary['total_return_pct']}% | Max DD {self.performance_summary['max_drawdown_pct']}% | "
+              f"Sharpe {self.performance_summary['sharpe_ratio']} | Win rate {self.performance_summary['win_rate_pct']}% over {self.performance_summary['num_closed_trades']} trade(s)")
+        return self.performance_summary
+
+    @property
+    def equity_curve(self) -> EquityCurveView: return EquityCurveView(self.recorder)
+
+    @equity_curve.setter
+    def equity_curve(self, points: List[Dict[str, Any]]):
+        # Replaces the recorded history with plain {'timestamp', 'equity'} points (no balance/margin: snapshots read as None).
+        self.recorder.clear()
+        for point in points: self.recorder.record(point['timestamp'], np.nan, point['equity'], np.nan, force=True)
+
+    @property
+    def account_snapshots(self) -> AccountSnapshotsView: return AccountSnapshotsView(self.recorder)
+
+    def _save_checkpoint(self, checkpoint_manager: CheckpointManager, next_bar_index: int):
+        state = {"broker": self.broker.get_checkpoint_state(), "random_state": random.getstate(),
+                 "strategy": self.trading_strategy.get_checkpoint_state() if hasattr(self.trading_strategy, 'get_checkpoint_state') else None}
+        state["recorder_num_offered"] = self.recorder.num_offered
+        state["metrics"] = self.metrics.get_checkpoint_state()
+        logs = {"trade_history": self.broker.trade_history, "account_records": RecordRowsView(self.recorder)}
+        checkpoint_manager.save(next_bar_index, logs, state)
+
+    def _restore_checkpoint(self, checkpoint_manager: CheckpointManager) -> int:
+        next_bar_index, logs, state = checkpoint_manager.load()
+        self.broker.restore_checkpoint_state(state["broker"], logs["trade_history"])
+        self.recorder.clear(); self.recorder.extend_rows(logs["account_records"]); self.recorder.num_offered = state["recorder_num_offered"]
+        self.metrics.restore_checkpoint_state(state["metrics"])
+        random.setstate(state["random_state"]) # Slippage draws continue exactly as in an uninterrupted run
+        if state["strategy"] is not None and hasattr(self.trading_strategy, 'restore_checkpoint_state'): self.trading_strategy.restore_checkpoint_state(state["strategy"])
+        return next_bar_index
+
     def calculate_performance(self, report_filename_prefix: str = "backtest_report"):
+        # Optional QuantStats HTML tearsheet; the metrics themselves are in performance_summary after run().
         print("\n--- Calculating Performance Metrics ---")
         if not self.equity_curve:
             print("No equity curve data to calculate performance.")
             return
 
         # Prepare returns series for QuantStats
-        equity_df = pd.DataFrame(self.equity_curve)
+        equity_df = pd.DataFrame({'timestamp': self.recorder.column('timestamp'), 'equity': self.recorder.column('equity')})
         equity_df['timestamp'] = pd.to_datetime(equity_df['timestamp'], unit='s', utc=True)
         equity_df = equity_df.set_index('timestamp')
 
@@ -180,6 +284,12 @@ class BacktestingEngine:
             print("Original (Sub-Daily) Returns Series Describe:\n", returns_series.describe())
             return
 
+        try:
+            import quantstats # Optional, heavy import: only needed for the HTML report
+        except ImportError:
+            print("QuantStats is not installed; skipping the HTML report (pip install quantstats). See engine.performance_summary for the metrics.")
+            return
+
         output_filename = f"{report_filename_prefix}_{self.main_symbol_to_trade}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
 
         try:
@@ -0,0 +1,147 @@
+import json
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from TradingAgents.tradingagents.broker_interface.event_log import TradeEventLog
+
+_SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+
+class StreamingMetrics:
+    """
+    Online performance metrics, updated once per bar in O(1) so a summary is available the moment a run ends.
+
+    Per-bar returns feed Welford's running mean/variance (Sharpe) and a running downside sum of squares (Sortino);
+    drawdown tracks the running equity peak. Trade statistics come from the broker's POSITION_CLOSED events, scanned
+    incrementally from the last offset seen. Ratios are annualized with ``periods_per_year`` when given, otherwise
+    with the bar frequency observed over the run. The whole object is plain data, so it is checkpointed as-is.
+    """
+
+    def __init__(self, periods_per_year: Optional[float] = None, risk_free_rate: float = 0.0):
+        self.periods_per_year = periods_per_year
+        self.risk_free_rate = risk_free_rate # Annual rate; converted to a per-bar rate on summary()
+        self.initial_equity: Optional[float] = None
+        self.last_equity: Optional[float] = None
+        self.first_timestamp: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        # Returns: Welford mean/M2 and downside sum of squares
+        self.num_returns = 0
+        self.mean_return = 0.0
+        self.m2_return = 0.0
+        self.downside_sum_sq = 0.0
+        # Drawdown
+        self.peak_equity = float('-inf')
+        self.max_drawdown_pct = 0.0
+        self.max_drawdown_duration_seconds = 0.0
+        self.peak_timestamp: Optional[float] = None
+        # Exposure
+        self.num_bars = 0
+        self.bars_in_market = 0
+        # Trades
+        self.trade_history_offset = 0
+        self.num_closed_trades = 0
+        self.num_winning_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+
+    def update(self, timestamp: float, equity: float, in_market: bool = False) -> None:
+        """Adds one bar's closing equity. The first call only sets the starting point (no return, no exposure)."""
+        if self.last_equity is None:
+            self.initial_equity = equity; self.first_timestamp = timestamp
+        else:
+            ret = equity / self.last_equity - 1.0 if self.last_equity else 0.0
+            self.num_returns += 1
+            delta = ret - self.mean_return
+            self.mean_return += delta / self.num_returns
+            self.m2_return += delta * (ret - self.mean_return)
+            if ret < 0: self.downside_sum_sq += ret * ret
+            self.num_bars += 1
+            if in_market: self.bars_in_market += 1
+        self.last_equity = equity; self.last_timestamp = timestamp
+
+        if equity >= self.peak_equity: self.peak_equity = equity; self.peak_timestamp = timestamp
+        elif self.peak_equity > 0:
+            self.max_drawdown_pct = max(self.max_drawdown_pct, (self.peak_equity - equity) / self.peak_equity * 100)
+            self.max_drawdown_duration_seconds = max(self.max_drawdown_duration_seconds, timestamp - self.peak_timestamp)
+
+    def update_trades(self, trade_history: List[Dict[str, Any]]) -> None:
+        """Consumes the trade-history events added since the last call."""
+        if len(trade_history) <= self.trade_history_offset: return
+        for event in trade_history[self.trade_history_offset:]:
+            if event.get("event_type") != "POSITION_CLOSED": continue
+            pnl = event.get("realized_pnl", 0.0) or 0.0
+            self.num_closed_trades += 1
+            if pnl > 0: self.num_winning_trades += 1; self.gross_profit += pnl
+            elif pnl < 0: self.gross_loss -= pnl
+        self.trade_history_offset = len(trade_history)
+
+    def _periods_per_year(self) -> Optional[float]:
+        if self.periods_per_year: return self.periods_per_year
+        if self.num_returns and self.last_timestamp is not None and self.last_timestamp > self.first_timestamp:
+            return self.num_returns / ((self.last_timestamp - self.first_timestamp) / _SECONDS_PER_YEAR)
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        ppy = self._periods_per_year()
+        rf = (1 + self.risk_free_rate) ** (1 / ppy) - 1 if ppy and self.risk_free_rate else 0.0
+        excess_mean = self.mean_return - rf
+        std = math.sqrt(self.m2_return / (self.num_returns - 1)) if self.num_returns > 1 else 0.0
+        downside_dev = math.sqrt(self.downside_sum_sq / self.num_returns) if self.num_returns else 0.0
+        scale = math.sqrt(ppy) if ppy else 1.0
+        initial, final = self.initial_equity, self.last_equity
+        total_return = final / initial - 1 if initial and final is not None else 0.0
+        years = (self.last_timestamp - self.first_timestamp) / _SECONDS_PER_YEAR if self.num_returns and self.last_timestamp > self.first_timestamp else 0.0
+        cagr = (1 + total_return) ** (1 / years) - 1 if years and total_return > -1 else None
+        return {
+            "initial_equity": round(initial, 2) if initial is not None else None,
+            "final_equity": round(final, 2) if final is not None else None,
+            "total_return_pct": round(total_return * 100, 4),
+            "cagr_pct": round(cagr * 100, 4) if cagr is not None else None,
+            "sharpe_ratio": round(excess_mean / std * scale, 4) if std > 0 else None,
+            "sortino_ratio": round(excess_mean / downside_dev * scale, 4) if downside_dev > 0 else None,
+            "volatility_pct": round(std * scale * 100, 4),
+            "max_drawdown_pct": round(self.max_drawdown_pct, 4),
+            "max_drawdown_duration_seconds": self.max_drawdown_duration_seconds,
+            "exposure_pct": round(self.bars_in_market / self.num_bars * 100, 2) if self.num_bars else 0.0,
+            "num_bars": self.num_bars,
+            "periods_per_year": round(ppy, 4) if ppy else None,
+            "num_closed_trades": self.num_closed_trades,
+            "win_rate_pct": round(self.num_winning_trades / self.num_closed_trades * 100, 2) if self.num_closed_trades else 0.0,
+            "gross_profit": round(self.gross_profit, 2),
+            "gross_loss": round(self.gross_loss, 2),
+            "profit_factor": round(self.gross_profit / self.gross_loss, 4) if self.gross_loss > 0 else None, # None: no losing trades
+            "start_timestamp": self.first_timestamp,
+            "end_timestamp": self.last_timestamp,
+        }
+
+    def to_json(self, path: str) -> Dict[str, Any]:
+        summary = self.summary()
+        with open(path, "w") as f: json.dump(summary, f, indent=2)
+        print(f"StreamingMetrics: Wrote performance summary to {path}.")
+        return summary
+
+    def get_checkpoint_state(self) -> Dict[str, Any]: return dict(vars(self))
+
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None: vars(self).update(state)
+
+
+def summarize_equity_curve(equity_curve: List[Dict[str, Any]], trade_history: List[Dict], initial_capital: float) -> Dict[str, Any]:
+    """Summary metrics for one run, computed from the engine's equity curve and the broker's trade history."""
+    equities = [point['equity'] for point in equity_curve]
+    final_equity = equities[-1] if equities else initial_capital
+    peak = float('-inf'); max_drawdown_pct = 0.0
+    for equity in equities:
+        peak = max(peak, equity)
+        if peak > 0: max_drawdown_pct = max(max_drawdown_pct, (peak - equity) / peak * 100)
+    if isinstance(trade_history, TradeEventLog): realized = np.nan_to_num(trade_history.column("POSITION_CLOSED", "realized_pnl")).tolist() # No list scan
+    else: realized = [event.get("realized_pnl", 0.0) for event in trade_history if event.get("event_type") == "POSITION_CLOSED"]
+    return {
+        "final_equity": round(final_equity, 2),
+        "total_return_pct": round((final_equity / initial_capital - 1) * 100, 4) if initial_capital else 0.0,
+        "max_drawdown_pct": round(max_drawdown_pct, 4),
+        "num_closed_trades": len(realized),
+        "win_rate_pct": round(sum(1 for pnl in realized if pnl > 0) / len(realized) * 100, 2) if realized else 0.0,
+        "total_realized_pnl": round(sum(realized), 2),
+    }
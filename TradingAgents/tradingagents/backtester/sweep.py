@@ -0,0 +1,155 @@
+import contextlib
+import itertools
+import os
+import shutil
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.metrics import summarize_equity_curve
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore, as_bar_store
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick
+
+# strategy_factory(broker, main_symbol, params) -> object with invoke() (or graph.invoke()), as used by BacktestingEngine.
+# Both factories are sent to worker processes, so they must be picklable (i.e. module-level functions or classes).
+StrategyFactory = Callable[[SimulatedBroker, str, Dict[str, Any]], Any]
+BrokerFactory = Callable[[], SimulatedBroker]
+
+
+def expand_param_grid(param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Turns {"ema_short_period": [5, 8], "stop_loss_pips": [5, 10]} into the list of all combinations."""
+    if isinstance(param_grid, list): return [dict(params) for params in param_grid]
+    names = list(param_grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+# (load_start_ts, trade_start_ts, end_ts): bars from load_start_ts are given to the broker (warm-up history for the
+# strategy's indicators), trading starts at trade_start_ts and stops before end_ts (None = end of data).
+BacktestWindow = Tuple[float, float, Optional[float]]
+
+
+def run_single_backtest(bar_store: BarStore, main_symbol: str, params: Dict[str, Any], strategy_factory: StrategyFactory,
+                        broker_factory: Optional[BrokerFactory] = None, initial_capital: float = 10000.0,
+                        window: Optional[BacktestWindow] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Runs one backtest for one parameter combination. Returns (summary metrics, equity curve)."""
+    start_bar_index = 0
+    if window is not None:
+        load_start_ts, trade_start_ts, end_ts = window
+        bar_store = bar_store.time_slice(load_start_ts, end_ts) # Zero-copy views into the shared store
+        start_bar_index = int(np.searchsorted(bar_store[main_symbol].timestamp, trade_start_ts, side="left"))
+    broker = broker_factory() if broker_factory else SimulatedBroker(initial_capital=initial_capital)
+    for symbol, bars in bar_store.items(): broker.load_test_data(symbol, bars)
+    strategy = strategy_factory(broker, main_symbol, params)
+    engine = BacktestingEngine(trading_strategy=strategy, broker=broker, historical_data_source=bar_store, main_symbol_to_trade=main_symbol)
+    engine.run(start_bar_index=start_bar_index)
+    return summarize_equity_curve(engine.equity_curve, broker.trade_history, broker.initial_capital), engine.equity_curve
+
+
+def _run_job(bar_store: BarStore, main_symbol: str, params: Dict[str, Any], strategy_factory: StrategyFactory, broker_factory: Optional[BrokerFactory],
+             initial_capital: float, window: Optional[BacktestWindow]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    # A failing combination is recorded in its summary ("error", "traceback") instead of aborting the sweep
+    try:
+        summary, equity_curve = run_single_backtest(bar_store, main_symbol, params, strategy_factory, broker_factory, initial_capital, window)
+        summary["error"] = None
+    except Exception as e:
+        summary, equity_curve = {"error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()}, []
+    return summary, equity_curve
+
+
+# --- Worker-process side. Each worker opens the shared BarStore memory-mapped once, in the pool initializer. ---
+_WORKER_CONTEXT: Dict[str, Any] = {}
+
+def _init_sweep_worker(data_dir: str, main_symbol: str, strategy_factory: StrategyFactory, broker_factory: Optional[BrokerFactory], initial_capital: float, quiet: bool):
+    _WORKER_CONTEXT.update(bar_store=BarStore.load(data_dir, mmap=True), main_symbol=main_symbol, strategy_factory=strategy_factory,
+                           broker_factory=broker_factory, initial_capital=initial_capital, quiet=quiet)
+
+def _run_sweep_job(job: Tuple[int, Dict[str, Any], Optional[BacktestWindow]]) -> Tuple[int, Dict[str, Any], List[Dict[str, Any]]]:
+    run_id, params, window = job
+    ctx = _WORKER_CONTEXT
+    with contextlib.ExitStack() as stack:
+        if ctx["quiet"]: stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        summary, equity_curve = _run_job(ctx["bar_store"], ctx["main_symbol"], params, ctx["strategy_factory"], ctx["broker_factory"], ctx["initial_capital"], window)
+    return run_id, summary, equity_curve
+
+
+class SweepResults:
+    def __init__(self, table: pd.DataFrame, equity_curves: Dict[int, List[Dict[str, Any]]]):
+        self.table = table # One row per parameter combination (run_id index): parameter columns + summary metrics
+        self.equity_curves = equity_curves # run_id -> equity curve of that run
+
+    def best(self, metric: str = "total_return_pct", ascending: bool = False) -> pd.Series:
+        valid = self.table[self.table["error"].isna()] if "error" in self.table.columns else self.table
+        if valid.empty: raise ValueError("SweepResults.best: no successful runs.")
+        return valid.sort_values(metric, ascending=ascending).iloc[0]
+
+
+class ParameterSweepRunner:
+    """
+    Grid-searches strategy parameters by running one BacktestingEngine per combination over a process pool.
+
+    Price data is written once as a BarStore directory and every worker opens it memory-mapped, so the OS page cache
+    is shared between workers and the bars are never pickled per job.
+    """
+
+    def __init__(self,
+                 strategy_factory: StrategyFactory,
+                 historical_data_source: Union[BarStore, Dict[str, List[Candlestick]]],
+                 main_symbol_to_trade: str,
+                 broker_factory: Optional[BrokerFactory] = None,
+                 initial_capital: float = 10000.0,
+                 max_workers: Optional[int] = None,
+                 use_processes: bool = True, # False runs the combinations serially in this process (debugging)
+                 shared_data_dir: Optional[str] = None, # Reuse/keep a BarStore directory; a temporary one is used otherwise
+                 quiet_workers: bool = True):
+        self.strategy_factory = strategy_factory
+        self.bar_store = as_bar_store(historical_data_source)
+        self.main_symbol_to_trade = main_symbol_to_trade.upper()
+        self.broker_factory = broker_factory
+        self.initial_capital = initial_capital
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.shared_data_dir = shared_data_dir
+        self.quiet_workers = quiet_workers
+        if self.main_symbol_to_trade not in self.bar_store:
+            raise ValueError(f"Main symbol {self.main_symbol_to_trade} not found in historical_data_source keys.")
+
+    def run_jobs(self, jobs: List[Tuple[Dict[str, Any], Optional[BacktestWindow]]]) -> Dict[int, Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Runs arbitrary (params, window) jobs; returns job index -> (summary, equity curve)."""
+        results: Dict[int, Tuple[Dict[str, Any], List[Dict[str, Any]]]] = {}
+        if not self.use_processes:
+            for run_id, (params, window) in enumerate(jobs):
+                summary, equity_curve = _run_job(self.bar_store, self.main_symbol_to_trade, params, self.strategy_factory, self.broker_factory, self.initial_capital, window)
+                if summary.get("error"): print(f"ParameterSweepRunner: Run {run_id} {params} failed: {summary['error']}")
+                results[run_id] = (summary, equity_curve)
+            return results
+
+        data_dir = self.shared_data_dir or tempfile.mkdtemp(prefix="sweep_bars_")
+        try:
+            if not os.path.exists(os.path.join(data_dir, "manifest.json")): self.bar_store.save(data_dir)
+            initargs = (data_dir, self.main_symbol_to_trade, self.strategy_factory, self.broker_factory, self.initial_capital, self.quiet_workers)
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_sweep_worker, initargs=initargs) as pool:
+                for run_id, summary, equity_curve in pool.map(_run_sweep_job, [(run_id, params, window) for run_id, (params, window) in enumerate(jobs)]):
+                    if summary.get("error"): print(f"ParameterSweepRunner: Run {run_id} {jobs[run_id][0]} failed: {summary['error']}")
+                    results[run_id] = (summary, equity_curve)
+        finally:
+            if self.shared_data_dir is None: shutil.rmtree(data_dir, ignore_errors=True)
+        return results
+
+    def run(self, param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]], window: Optional[BacktestWindow] = None) -> SweepResults:
+        combinations = expand_param_grid(param_grid)
+        print(f"ParameterSweepRunner: Running {len(combinations)} combination(s) for {self.main_symbol_to_trade} ({'process pool' if self.use_processes else 'serial'}).")
+        results = self.run_jobs([(params, window) for params in combinations])
+
+        rows = []
+        for run_id, params in enumerate(combinations):
+            summary = {k: v for k, v in results[run_id][0].items() if k != "traceback"}
+            rows.append({"run_id": run_id, **params, **summary})
+        table = pd.DataFrame(rows).set_index("run_id")
+        print(f"ParameterSweepRunner: Finished {len(combinations)} combination(s).")
+        return SweepResults(table, {run_id: curve for run_id, (_, curve) in results.items()})
@@ -1,13 +1,20 @@
 import unittest
+import importlib.util
+import sys
 from unittest.mock import MagicMock, patch, call
 import time
 import datetime
+import contextlib
+import io
+import numpy as np
 from typing import List, Dict, Any, Optional # Added Optional
 import pandas as pd # Ensure pandas is available for test involving DataFrame creation
 
 from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
 from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker # For type hinting
 from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick, AccountInfo, ForexFinalDecision, OrderSide, OrderType
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore
+from TradingAgents.tradingagents.forex_utils.tick_store import SymbolTicks
 
 # Helper to create a basic Candlestick dictionary for these tests
 def create_test_candlestick(timestamp: float, o: float, h: float, l: float, c: float, vol: Optional[float] = 100) -> Candlestick:
@@ -101,6 +108,41 @@ class TestBacktestingEngine(unittest.TestCase):
         self.assertEqual(len(engine.equity_curve), num_bars + 1)
         self.assertEqual(self.mock_broker.get_account_info.call_count, num_bars + 2) # Initial, each bar, final
 
+    def test_run_loop_with_bar_store(self):
+        engine = BacktestingEngine(
+            trading_strategy=self.mock_strategy,
+            broker=self.mock_broker,
+            historical_data_source=BarStore.from_candlesticks(self.historical_data),
+            main_symbol_to_trade=self.main_symbol
+        )
+        engine.run()
+        self.assertEqual(len(self.mock_strategy.invoke_calls), len(self.eurusd_data))
+        # Strategies still see a dict-like Candlestick for the current bar
+        self.assertEqual(self.mock_strategy.invoke_calls[3]["current_bar_candlestick"], self.eurusd_data[3])
+        self.assertEqual(self.mock_strategy.invoke_calls[3]["current_bar_candlestick"]["close"], self.eurusd_data[3]["close"])
+
+    def test_run_loop_secondary_symbol_asof_alignment(self):
+        # USDJPY misses bars 1-3: the latest earlier bar is used instead of dropping the symbol
+        usdjpy_data = [create_test_candlestick(bar['timestamp'], 150.0+i, 150.5+i, 149.5+i, 150.2+i) for i, bar in enumerate(self.eurusd_data) if i not in (1, 2, 3)]
+        engine = BacktestingEngine(
+            trading_strategy=self.mock_strategy,
+            broker=self.mock_broker,
+            historical_data_source={"EURUSD": self.eurusd_data, "USDJPY": usdjpy_data},
+            main_symbol_to_trade=self.main_symbol
+        )
+        engine.run()
+        snapshots = [c.args[0] for c in self.mock_broker.update_market_data.call_args_list]
+        self.assertEqual(len(snapshots), len(self.eurusd_data))
+        self.assertEqual(snapshots[2]["USDJPY"], usdjpy_data[0])
+        self.assertEqual(snapshots[4]["USDJPY"], usdjpy_data[1])
+
+        self.mock_broker.update_market_data.reset_mock()
+        engine.max_asof_staleness_seconds = 3600 # At most one bar old
+        engine.run()
+        snapshots = [c.args[0] for c in self.mock_broker.update_market_data.call_args_list]
+        self.assertIn("USDJPY", snapshots[1])
+        self.assertNotIn("USDJPY", snapshots[2])
+
     def test_run_loop_strategy_buy_decision(self):
         self.mock_broker.place_order = MagicMock(return_value={"status": "FILLED", "order_id": "test_order"})
 
@@ -143,6 +185,7 @@ class TestBacktestingEngine(unittest.TestCase):
         # and correlate with broker calls, which is more involved.
         # This basic check ensures the mechanism works.
 
+    @unittest.skipUnless(importlib.util.find_spec("quantstats"), "QuantStats is not installed")
     @patch('quantstats.reports.html') # Mock the actual report generation
     def test_calculate_performance_valid_equity_curve(self, mock_qs_html):
         engine = BacktestingEngine(
@@ -163,6 +206,7 @@ class TestBacktestingEngine(unittest.TestCase):
         self.assertEqual(mock_qs_html.call_args[1]['title'], f"{self.main_symbol} Backtest Report")
 
 
+    @unittest.skipUnless(importlib.util.find_spec("quantstats"), "QuantStats is not installed")
     @patch('quantstats.reports.html')
     def test_calculate_performance_empty_equity_curve(self, mock_qs_html):
         engine = BacktestingEngine(
@@ -173,6 +217,7 @@ class TestBacktestingEngine(unittest.TestCase):
         engine.calculate_performance("test_report")
         mock_qs_html.assert_not_called()
 
+    @unittest.skipUnless(importlib.util.find_spec("quantstats"), "QuantStats is not installed")
     @patch('quantstats.reports.html')
     def test_calculate_performance_all_zero_returns(self, mock_qs_html):
         engine = BacktestingEngine(
@@ -189,5 +234,69 @@ class TestBacktestingEngine(unittest.TestCase):
         mock_qs_html.assert_not_called()
         # (The method now prints a message and returns early for all-zero returns)
 
+    def test_calculate_performance_without_quantstats(self):
+        engine = BacktestingEngine(
+            trading_strategy=self.mock_strategy, broker=self.mock_broker,
+            historical_data_source=self.historical_data, main_symbol_to_trade=self.main_symbol
+        )
+        engine.equity_curve = [
+            {'timestamp': self.start_time - 1, 'equity': 10000.0},
+            {'timestamp': self.start_time + 86400, 'equity': 10050.0},
+            {'timestamp': self.start_time + 2 * 86400, 'equity': 10020.0}
+        ]
+        output = io.StringIO()
+        with patch.dict(sys.modules, {"quantstats": None}), contextlib.redirect_stdout(output): # None makes the import raise ImportError
+            self.assertIsNone(engine.calculate_performance("test_report"))
+        self.assertIn("QuantStats is not installed; skipping the HTML report", output.getvalue())
+
+class TestBacktestingEngineTickReplay(unittest.TestCase):
+
+    def test_agents_invoked_on_bar_close_and_sl_fires_mid_bar(self):
+        t0 = 1_700_000_040.0 # Minute-aligned
+        # 3 minutes of ticks, one per second; price falls 10 pips during the second minute
+        ts = t0 + np.arange(180, dtype=np.float64)
+        mid = np.where(ts < t0 + 60, 1.1000, np.where(ts < t0 + 120, 1.1000 - (ts - t0 - 60) * 0.0001 / 6, 1.0990))
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=10000.0)
+            broker.load_tick_data("EURUSD", SymbolTicks.from_arrays("EURUSD", ts, np.round(mid - 0.00001, 5), np.round(mid + 0.00001, 5)))
+            strategy = MockStrategy()
+            strategy.set_decision_to_return({"currency_pair": "EURUSD", "action": "EXECUTE_BUY", "position_size": 0.1, "stop_loss": 1.09950, "take_profit": None})
+            engine = BacktestingEngine(strategy, broker, None, "EURUSD", tick_replay=True, tick_bar_seconds=60)
+            engine.run()
+
+        self.assertEqual(len(strategy.invoke_calls), 3) # Once per bar close, not per tick
+        self.assertEqual([state["current_bar_candlestick"]["timestamp"] for state in strategy.invoke_calls], [t0 + 60, t0 + 120, t0 + 180])
+        self.assertEqual(len(broker.test_data_store["EURUSD"]), 3) # Tick bars also serve get_historical_data
+        closes = [e for e in broker.trade_history if e["event_type"] == "POSITION_CLOSED"]
+        first_hit = int(np.argmax(np.round(mid - 0.00001, 5) <= 1.09950))
+        # Bar-1 entry is stopped inside bar 2; the bar-2 entry (SL above the market) on the first tick of bar 3; the bar-3 entry stays open
+        self.assertEqual([(e["timestamp"], e["reason_for_close"]) for e in closes], [(ts[first_hit], "STOP_LOSS_HIT"), (ts[120], "STOP_LOSS_HIT")])
+        self.assertEqual(len(broker.open_positions), 1)
+
+    def test_open_stamped_bars_replay_the_ticks_up_to_each_bar_close(self):
+        t0 = 1_700_000_040.0
+        ts = t0 + np.arange(180, dtype=np.float64)
+        mid = np.where(ts < t0 + 60, 1.1000, np.where(ts < t0 + 120, 1.1000 - (ts - t0 - 60) * 0.0001 / 6, 1.0990))
+        # M1 bars stamped at open, as generate_dummy_market_data and the broker's bar history stamp them
+        bars = [create_test_candlestick(t0 + k * 60, mid[k * 60], mid[k * 60:(k + 1) * 60].max(), mid[k * 60:(k + 1) * 60].min(), mid[(k + 1) * 60 - 1]) for k in range(3)]
+        positions_seen = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=10000.0)
+            broker.load_tick_data("EURUSD", SymbolTicks.from_arrays("EURUSD", ts, np.round(mid - 0.00001, 5), np.round(mid + 0.00001, 5)))
+            strategy = MockStrategy()
+            strategy.set_decision_to_return({"currency_pair": "EURUSD", "action": "EXECUTE_BUY", "position_size": 0.1, "stop_loss": 1.09950, "take_profit": None})
+            invoke = strategy.invoke
+            strategy.invoke = lambda state: (positions_seen.append(len(broker.open_positions)), invoke(state))[1]
+            engine = BacktestingEngine(strategy, broker, {"EURUSD": bars}, "EURUSD", tick_replay=True)
+            engine.run()
+
+        self.assertEqual(engine.bar_timestamps, "open")
+        # The bar-0 entry is stopped inside bar 1, before the strategy sees bar 1's close (not one bar later)
+        self.assertEqual(positions_seen[:2], [0, 0])
+        closes = [e for e in broker.trade_history if e["event_type"] == "POSITION_CLOSED"]
+        self.assertEqual(closes[0]["timestamp"], ts[int(np.argmax(np.round(mid - 0.00001, 5) <= 1.09950))])
+        with self.assertRaises(ValueError): BacktestingEngine(strategy, broker, {"EURUSD": bars}, "EURUSD", tick_replay=True, bar_timestamps="middle")
+        with self.assertRaises(ValueError): BacktestingEngine(strategy, broker, None, "EURUSD", tick_replay=True, bar_timestamps="open")
+
 if __name__ == '__main__':
     unittest.main()
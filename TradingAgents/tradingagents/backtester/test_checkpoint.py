@@ -0,0 +1,99 @@
+import unittest
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+from typing import Any, Dict
+
+from TradingAgents.tradingagents.backtester.checkpoint import CheckpointManager
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.testing_utils import create_test_series
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+
+class CrashAt(Exception): pass
+
+class StatefulStrategy:
+    """Alternates buys and sells every `period` bars; its counter is part of the checkpoint."""
+    def __init__(self, crash_at_bar: int = -1):
+        self.bar_count = 0; self.crash_at_bar = crash_at_bar
+
+    def get_checkpoint_state(self) -> Dict[str, Any]: return {"bar_count": self.bar_count}
+    def restore_checkpoint_state(self, state: Dict[str, Any]): self.bar_count = state["bar_count"]
+
+    def invoke(self, state: Dict) -> Dict:
+        if self.bar_count == self.crash_at_bar: raise CrashAt()
+        self.bar_count += 1
+        state["forex_final_decision"] = None
+        if self.bar_count % 7 == 0:
+            close = state["current_bar_candlestick"]["close"]; buy = (self.bar_count // 7) % 2 == 1
+            state["forex_final_decision"] = {"currency_pair": "EURUSD", "action": "EXECUTE_BUY" if buy else "EXECUTE_SELL", "position_size": 0.1,
+                                             "stop_loss": close - 0.0010 if buy else close + 0.0010, "take_profit": close + 0.0015 if buy else close - 0.0015}
+        return state
+
+class TestCheckpointResume(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"EURUSD": create_test_series(1_700_000_000, 150, seed=5)}
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _engine(self, strategy: StatefulStrategy, account_currency: str = "USD") -> BacktestingEngine:
+        broker = SimulatedBroker(initial_capital=10000.0); broker.account_currency = account_currency
+        broker.load_test_data("EURUSD", self.data["EURUSD"])
+        return BacktestingEngine(strategy, broker, self.data, "EURUSD")
+
+    def test_resumed_run_matches_uninterrupted_run(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            random.seed(42)
+            reference = self._engine(StatefulStrategy(), "EUR"); reference.run()
+
+            random.seed(42)
+            crashed = self._engine(StatefulStrategy(crash_at_bar=95), "EUR")
+            with self.assertRaises(CrashAt):
+                crashed.run(checkpoint_manager=CheckpointManager(self.tmp_dir, every_n_bars=20))
+
+            random.seed(1234) # Must not matter: the RNG state comes from the checkpoint
+            resumed = self._engine(StatefulStrategy(), "EUR")
+            resumed.run(checkpoint_manager=CheckpointManager(self.tmp_dir, every_n_bars=20), resume=True)
+
+        def strip_ids(events): return [{k: v for k, v in e.items() if k not in ("order_id", "position_id")} for e in events]
+        self.assertEqual(resumed.equity_curve, reference.equity_curve)
+        self.assertEqual(strip_ids(resumed.broker.trade_history), strip_ids(reference.broker.trade_history))
+        # Each broker generates its own account id; the resumed run continues the crashed run's account
+        self.assertEqual({snapshot["account_id"] for snapshot in resumed.account_snapshots}, {crashed.broker.account_id})
+        self.assertEqual([{**snapshot, "account_id": None} for snapshot in resumed.account_snapshots],
+                         [{**snapshot, "account_id": None} for snapshot in reference.account_snapshots])
+        self.assertEqual(resumed.account_snapshots[-1]["currency"], "EUR")
+        self.assertAlmostEqual(resumed.broker.balance, reference.broker.balance)
+        self.assertEqual(resumed.performance_summary, reference.performance_summary)
+
+    def test_checkpoints_append_only_new_entries(self):
+        manager = CheckpointManager(self.tmp_dir, every_n_bars=None)
+        history = [{"event_type": "A"}]; curve = [{"timestamp": 0, "equity": 1.0}]
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.save(1, {"trade_history": history, "equity_curve": curve, "account_snapshots": []}, {"x": 1})
+            size_after_first = os.path.getsize(os.path.join(self.tmp_dir, "equity_curve.log"))
+            curve.append({"timestamp": 1, "equity": 2.0})
+            manager.save(2, {"trade_history": history, "equity_curve": curve, "account_snapshots": []}, {"x": 2})
+            # A frame appended by a save that crashed before replacing state.pkl is ignored on load
+            with open(os.path.join(self.tmp_dir, "equity_curve.log"), "ab") as f: f.write(b"partial frame")
+            next_bar, logs, state = CheckpointManager(self.tmp_dir).load()
+
+        self.assertGreater(os.path.getsize(os.path.join(self.tmp_dir, "equity_curve.log")), size_after_first)
+        self.assertEqual(next_bar, 2); self.assertEqual(state, {"x": 2})
+        self.assertEqual(logs["equity_curve"], curve); self.assertEqual(logs["trade_history"], history)
+
+    def test_checkpoints_are_counted_from_the_run_start_bar(self):
+        saved_at = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine = self._engine(StatefulStrategy()); manager = CheckpointManager(self.tmp_dir, every_n_bars=20)
+            save = manager.save; manager.save = lambda next_bar_index, logs, state: (saved_at.append(next_bar_index), save(next_bar_index, logs, state))[1]
+            engine.run(start_bar_index=30, end_bar_index=100, checkpoint_manager=manager)
+        self.assertEqual(saved_at, [50, 70, 90, 100]) # every_n_bars after bar 30, then the final checkpoint
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict
+
+import numpy as np
+
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.metrics import StreamingMetrics, summarize_equity_curve
+from TradingAgents.tradingagents.backtester.testing_utils import create_test_series
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+
+class EveryNBarsStrategy:
+    """Buys (odd signals) or sells (even signals) every `period` bars with a tight SL/TP."""
+    def __init__(self, period: int = 5):
+        self.period = period; self.bar_count = 0
+
+    def invoke(self, state: Dict) -> Dict:
+        self.bar_count += 1; state["forex_final_decision"] = None
+        if self.bar_count % self.period == 0:
+            close = state["current_bar_candlestick"]["close"]; buy = (self.bar_count // self.period) % 2 == 1
+            state["forex_final_decision"] = {"currency_pair": "EURUSD", "action": "EXECUTE_BUY" if buy else "EXECUTE_SELL", "position_size": 0.1,
+                                             "stop_loss": close - 0.0008 if buy else close + 0.0008, "take_profit": close + 0.0012 if buy else close - 0.0012}
+        return state
+
+class TestStreamingMetrics(unittest.TestCase):
+
+    def test_matches_batch_computation(self):
+        rng = np.random.default_rng(7)
+        equity = 10000 * np.cumprod(1 + rng.normal(0.0002, 0.003, 500)); timestamps = np.arange(500) * 3600.0
+        metrics = StreamingMetrics(periods_per_year=252)
+        for ts, value in zip(timestamps, equity): metrics.update(ts, value, in_market=True)
+        summary = metrics.summary()
+
+        returns = equity[1:] / equity[:-1] - 1
+        peak = np.maximum.accumulate(equity)
+        self.assertAlmostEqual(summary["sharpe_ratio"], round(returns.mean() / returns.std(ddof=1) * np.sqrt(252), 4), places=3)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2))
+        self.assertAlmostEqual(summary["sortino_ratio"], round(returns.mean() / downside * np.sqrt(252), 4), places=3)
+        self.assertAlmostEqual(summary["max_drawdown_pct"], round(((peak - equity) / peak).max() * 100, 4), places=3)
+        self.assertAlmostEqual(summary["total_return_pct"], round((equity[-1] / equity[0] - 1) * 100, 4), places=3)
+        self.assertEqual(summary["num_bars"], 499)
+        self.assertEqual(summary["exposure_pct"], 100.0)
+
+    def test_trade_stats_are_consumed_incrementally(self):
+        metrics = StreamingMetrics()
+        history = [{"event_type": "ORDER_PLACED"}, {"event_type": "POSITION_CLOSED", "realized_pnl": 30.0}]
+        metrics.update_trades(history)
+        history += [{"event_type": "POSITION_CLOSED", "realized_pnl": -10.0}, {"event_type": "POSITION_CLOSED", "realized_pnl": 20.0}]
+        metrics.update_trades(history); metrics.update_trades(history) # Second call sees nothing new
+        summary = metrics.summary()
+        self.assertEqual(summary["num_closed_trades"], 3)
+        self.assertAlmostEqual(summary["win_rate_pct"], 66.67)
+        self.assertAlmostEqual(summary["profit_factor"], 5.0)
+
+    def test_no_losing_trades_has_no_profit_factor(self):
+        metrics = StreamingMetrics()
+        metrics.update_trades([{"event_type": "POSITION_CLOSED", "realized_pnl": 5.0}])
+        self.assertIsNone(metrics.summary()["profit_factor"])
+
+class TestSummarizeEquityCurve(unittest.TestCase):
+
+    def test_summarize_equity_curve(self):
+        curve = [{"timestamp": 0, "equity": 100.0}, {"timestamp": 1, "equity": 120.0}, {"timestamp": 2, "equity": 90.0}, {"timestamp": 3, "equity": 110.0}]
+        history = [{"event_type": "POSITION_CLOSED", "realized_pnl": 5.0}, {"event_type": "POSITION_CLOSED", "realized_pnl": -3.0}, {"event_type": "MARKET_ORDER_FILLED"}]
+        summary = summarize_equity_curve(curve, history, 100.0)
+        self.assertAlmostEqual(summary["total_return_pct"], 10.0)
+        self.assertAlmostEqual(summary["max_drawdown_pct"], 25.0)
+        self.assertEqual(summary["num_closed_trades"], 2)
+        self.assertAlmostEqual(summary["win_rate_pct"], 50.0)
+
+class TestEngineStreamingMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"EURUSD": create_test_series(1_700_000_000, 200, seed=3)}
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_run_writes_summary_consistent_with_recorded_history(self):
+        broker = SimulatedBroker(initial_capital=10000.0)
+        broker.load_test_data("EURUSD", self.data["EURUSD"])
+        path = os.path.join(self.tmp_dir, "summary.json")
+        engine = BacktestingEngine(EveryNBarsStrategy(), broker, self.data, "EURUSD", metrics_summary_path=path)
+        with contextlib.redirect_stdout(io.StringIO()): engine.run()
+
+        with open(path) as f: summary = json.load(f)
+        self.assertEqual(summary, engine.performance_summary)
+        closes = [e for e in broker.trade_history if e["event_type"] == "POSITION_CLOSED"]
+        self.assertGreater(len(closes), 0)
+        self.assertEqual(summary["num_closed_trades"], len(closes))
+        self.assertAlmostEqual(summary["win_rate_pct"], round(sum(e["realized_pnl"] > 0 for e in closes) / len(closes) * 100, 2))
+        equity = np.asarray(engine.recorder.column("equity"))
+        peak = np.maximum.accumulate(equity)
+        self.assertAlmostEqual(summary["max_drawdown_pct"], round(((peak - equity) / peak).max() * 100, 4), places=3)
+        self.assertAlmostEqual(summary["final_equity"], round(equity[-1], 2))
+        self.assertTrue(0 < summary["exposure_pct"] < 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.recorder import EquityRecorder, EquityCurveView, AccountSnapshotsView
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+
+try:
+    import pyarrow # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+class HoldStrategy:
+    def invoke(self, state):
+        state["forex_final_decision"] = None
+        return state
+
+class TestEquityRecorder(unittest.TestCase):
+
+    def test_every_n_bars_keeps_sampled_and_forced_points(self):
+        recorder = EquityRecorder(capacity=2, resolution=3)
+        for i in range(10): recorder.record(float(i), 100.0, 100.0 + i, 0.0, force=(i == 9))
+        self.assertEqual(recorder.column("timestamp").tolist(), [0.0, 3.0, 6.0, 9.0])
+        self.assertEqual(recorder.expected_rows(10), 5)
+
+    def test_change_resolution_skips_unchanged_rows(self):
+        recorder = EquityRecorder(resolution="change")
+        for i, equity in enumerate([100.0, 100.0, 101.0, 101.0, 101.0, 99.0]): recorder.record(float(i), 100.0, equity, 0.0)
+        self.assertEqual(recorder.column("timestamp").tolist(), [0.0, 2.0, 5.0])
+
+    def test_views_read_like_lists(self):
+        recorder = EquityRecorder(account_id="acc1")
+        recorder.record(1.0, 100.0, 105.0, 20.0); recorder.record(2.0, np.nan, 104.0, np.nan)
+        curve, snapshots = EquityCurveView(recorder), AccountSnapshotsView(recorder)
+        self.assertEqual(curve, [{'timestamp': 1.0, 'equity': 105.0}, {'timestamp': 2.0, 'equity': 104.0}])
+        self.assertEqual(curve[-1]['equity'], 104.0)
+        self.assertEqual(snapshots[0]['free_margin'], 85.0); self.assertEqual(snapshots[0]['margin_level'], 525.0)
+        self.assertEqual(snapshots[0]['account_id'], "acc1")
+        self.assertIsNone(snapshots[1])
+        with self.assertRaises(IndexError): curve[2]
+
+    def test_invalid_resolution_rejected(self):
+        with self.assertRaises(ValueError): EquityRecorder(resolution=0)
+
+    def test_csv_export_round_trip(self):
+        recorder = EquityRecorder()
+        for i in range(5): recorder.record(1_700_000_000.0 + i, 100.0, 100.0 + i, 10.0)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()): path = recorder.export(os.path.join(tmp_dir, "equity.csv"))
+            frame = pd.read_csv(path)
+            self.assertEqual(list(frame.columns), ["timestamp", "balance", "equity", "margin", "free_margin", "margin_level"])
+            self.assertEqual(frame["equity"].tolist(), [100.0, 101.0, 102.0, 103.0, 104.0])
+            with self.assertRaises(ValueError): recorder.export(os.path.join(tmp_dir, "equity.txt"))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    @unittest.skipUnless(PYARROW_AVAILABLE, "pyarrow not installed")
+    def test_parquet_export_round_trip(self):
+        recorder = EquityRecorder()
+        recorder.record(1.0, 100.0, 101.0, 0.0)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()): path = recorder.export(os.path.join(tmp_dir, "equity.parquet"))
+            self.assertEqual(pd.read_parquet(path)["equity"].tolist(), [101.0])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_engine_records_at_configured_resolution(self):
+        bars = [{"timestamp": 1_700_000_000.0 + i * 60, "open": 1.1, "high": 1.1005, "low": 1.0995, "close": 1.1, "volume": 1.0, "bid_close": 1.09995, "ask_close": 1.10005} for i in range(25)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=10000.0)
+            engine = BacktestingEngine(HoldStrategy(), broker, {"EURUSD": bars}, "EURUSD", equity_resolution=10)
+            engine.run()
+        # Initial point, bars 0/10/20 of the sampling, and the forced last bar
+        self.assertEqual([p['timestamp'] for p in engine.equity_curve], [bars[0]["timestamp"] - 1, bars[0]["timestamp"], bars[10]["timestamp"], bars[20]["timestamp"], bars[24]["timestamp"]])
+        self.assertEqual({s['account_id'] for s in engine.account_snapshots}, {broker.get_account_info()['account_id']})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import contextlib
+import io
+from typing import Dict, Any
+
+from TradingAgents.tradingagents.backtester.sweep import ParameterSweepRunner, expand_param_grid, run_single_backtest
+from TradingAgents.tradingagents.backtester.walk_forward import WalkForwardOptimizer
+from TradingAgents.tradingagents.backtester.testing_utils import create_test_series
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+
+# Module-level (picklable) factories for the worker processes.
+class PeriodicBuyStrategy:
+    def __init__(self, broker: SimulatedBroker, main_symbol: str, params: Dict[str, Any]):
+        self.broker = broker; self.main_symbol = main_symbol; self.params = params; self.bar_count = 0
+
+    def invoke(self, state: Dict) -> Dict:
+        self.bar_count += 1
+        state["forex_final_decision"] = None
+        if self.bar_count % self.params["period"] == 0:
+            close = state["current_bar_candlestick"]["close"]; pip = 0.0001
+            state["forex_final_decision"] = {"currency_pair": self.main_symbol, "action": "EXECUTE_BUY", "position_size": 0.1,
+                                             "stop_loss": close - self.params["sl_pips"] * pip, "take_profit": close + self.params["sl_pips"] * 2 * pip}
+        return state
+
+def make_strategy(broker: SimulatedBroker, main_symbol: str, params: Dict[str, Any]) -> PeriodicBuyStrategy:
+    return PeriodicBuyStrategy(broker, main_symbol, params)
+
+def make_frictionless_broker() -> SimulatedBroker:
+    broker = SimulatedBroker(initial_capital=10000.0)
+    broker.base_slippage_pips = 0.0; broker.volume_slippage_factor_pips_per_million = 0.0
+    return broker
+
+class TestParameterSweepRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"EURUSD": create_test_series(1_700_000_000, 120, seed=7)}
+        self.grid = {"period": [5, 10], "sl_pips": [10, 20]}
+
+    def test_expand_param_grid(self):
+        combos = expand_param_grid(self.grid)
+        self.assertEqual(len(combos), 4)
+        self.assertIn({"period": 10, "sl_pips": 20}, combos)
+        self.assertEqual(expand_param_grid([{"a": 1}]), [{"a": 1}])
+
+    def test_process_pool_matches_serial_run(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pooled = ParameterSweepRunner(make_strategy, self.data, "EURUSD", broker_factory=make_frictionless_broker, max_workers=2).run(self.grid)
+            serial = ParameterSweepRunner(make_strategy, self.data, "EURUSD", broker_factory=make_frictionless_broker, use_processes=False).run(self.grid)
+
+        self.assertEqual(len(pooled.table), 4)
+        self.assertTrue(pooled.table["error"].isna().all())
+        self.assertEqual(list(pooled.table.columns[:2]), ["period", "sl_pips"])
+        self.assertEqual(pooled.table["final_equity"].tolist(), serial.table["final_equity"].tolist())
+        self.assertEqual(len(pooled.equity_curves[0]), 121) # Initial point + one per bar
+        best = pooled.best("final_equity")
+        self.assertEqual(best["final_equity"], pooled.table["final_equity"].max())
+
+    def test_worker_errors_are_reported_per_run(self):
+        grid = [{"period": 5}, {"period": 5, "sl_pips": 10}] # The first lacks 'sl_pips'
+        with contextlib.redirect_stdout(io.StringIO()):
+            pooled = ParameterSweepRunner(make_strategy, self.data, "EURUSD", broker_factory=make_frictionless_broker, max_workers=1).run(grid)
+            serial = ParameterSweepRunner(make_strategy, self.data, "EURUSD", broker_factory=make_frictionless_broker, use_processes=False).run(grid)
+        for results in (pooled, serial):
+            self.assertIn("KeyError", results.table.loc[0, "error"])
+            self.assertEqual(results.best()["sl_pips"], 10) # The other run still completed
+        self.assertEqual(pooled.table.fillna(-1).to_dict(), serial.table.fillna(-1).to_dict())
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = ParameterSweepRunner(make_strategy, self.data, "EURUSD", use_processes=False).run([{"period": 5}])
+        with self.assertRaises(ValueError):
+            results.best()
+
+class TestWalkForwardOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {"EURUSD": create_test_series(1_700_000_000, 130, seed=7)}
+        self.grid = {"period": [3, 7], "sl_pips": [10]}
+
+    def test_windows_roll_by_step(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            wfo = WalkForwardOptimizer(make_strategy, self.data, "EURUSD", self.grid, in_sample_bars=50, out_of_sample_bars=30, use_processes=False)
+        self.assertEqual(wfo.windows(), [{"is_start": 0, "is_end": 50, "oos_start": 50, "oos_end": 80},
+                                         {"is_start": 30, "is_end": 80, "oos_start": 80, "oos_end": 110},
+                                         {"is_start": 60, "is_end": 110, "oos_start": 110, "oos_end": 130}])
+
+    def test_step_bars_wider_than_oos_leaves_gaps_and_narrower_is_rejected(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            wfo = WalkForwardOptimizer(make_strategy, self.data, "EURUSD", self.grid, in_sample_bars=50, out_of_sample_bars=20, step_bars=40,
+                                       broker_factory=make_frictionless_broker, use_processes=False)
+            self.assertEqual(wfo.windows(), [{"is_start": 0, "is_end": 50, "oos_start": 50, "oos_end": 70},
+                                             {"is_start": 40, "is_end": 90, "oos_start": 90, "oos_end": 110}])
+            results = wfo.run()
+        self.assertEqual(len(results.equity_curve), 1 + 20 + 20) # Bars 70..89 and 110..129 are never traded out of sample
+        timestamps = [point["timestamp"] for point in results.equity_curve]
+        self.assertEqual(timestamps, sorted(set(timestamps)))
+        with self.assertRaises(ValueError):
+            WalkForwardOptimizer(make_strategy, self.data, "EURUSD", self.grid, in_sample_bars=50, out_of_sample_bars=30, step_bars=15, use_processes=False)
+
+    def test_windowed_backtest_trades_only_its_window(self):
+        store = BarStore.from_candlesticks(self.data); ts = store["EURUSD"].timestamp
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, curve = run_single_backtest(store, "EURUSD", {"period": 5, "sl_pips": 10}, make_strategy, make_frictionless_broker, window=(ts[40], ts[50], ts[80]))
+        self.assertEqual(len(curve), 31) # Initial point + bars 50..79; bars 40..49 are warm-up only
+        self.assertEqual(curve[1]["timestamp"], ts[50])
+
+    def test_pool_run_matches_serial_and_stitches_oos_curve(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pooled = WalkForwardOptimizer(make_strategy, self.data, "EURUSD", self.grid, in_sample_bars=50, out_of_sample_bars=30, warmup_bars=10,
+                                          broker_factory=make_frictionless_broker, max_workers=2).run()
+            serial = WalkForwardOptimizer(make_strategy, self.data, "EURUSD", self.grid, in_sample_bars=50, out_of_sample_bars=30, warmup_bars=10,
+                                          broker_factory=make_frictionless_broker, use_processes=False).run()
+
+        self.assertEqual(len(pooled.windows), 3)
+        self.assertTrue(pooled.windows["error"].isna().all())
+        self.assertEqual(pooled.windows["best_params"].tolist(), serial.windows["best_params"].tolist())
+        self.assertEqual(len(pooled.equity_curve), 1 + 80) # One initial point, then every OOS bar 50..129
+        timestamps = [point["timestamp"] for point in pooled.equity_curve]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertAlmostEqual(pooled.summary["final_equity"], serial.summary["final_equity"])
+        # Stitched return compounds the per-window OOS returns
+        compounded = 1.0
+        for ret in pooled.windows["oos_total_return_pct"]: compounded *= 1 + ret / 100
+        self.assertAlmostEqual(pooled.summary["total_return_pct"], (compounded - 1) * 100, places=2)
+
+if __name__ == '__main__':
+    unittest.main()
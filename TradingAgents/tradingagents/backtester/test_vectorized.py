@@ -0,0 +1,89 @@
+import unittest
+import contextlib
+import io
+from typing import Dict
+from unittest.mock import patch
+
+import numpy as np
+
+from TradingAgents.tradingagents.backtester.engine import BacktestingEngine
+from TradingAgents.tradingagents.backtester.vectorized import run_vectorized_backtest, _first_index_where_at_or_below
+from TradingAgents.tradingagents.backtester.testing_utils import create_test_series
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide
+
+class SignalArrayStrategy:
+    """Event-driven twin of the vectorized path: trades the same signal arrays through BacktestingEngine."""
+    def __init__(self, broker: SimulatedBroker, symbol: str, signals: Dict[str, np.ndarray], sl_pips: float, tp_pips: float, volume: float):
+        self.broker = broker; self.symbol = symbol; self.signals = signals; self.sl_pips = sl_pips; self.tp_pips = tp_pips; self.volume = volume; self.i = -1
+
+    def invoke(self, state: Dict) -> Dict:
+        self.i += 1; i = self.i; bar = state["current_bar_candlestick"]
+        spec = self.broker.symbol_registry[self.symbol]; pip = spec.pip_definition; precision = spec.price_precision
+        for side, exits in ((OrderSide.BUY, "long_exits"), (OrderSide.SELL, "short_exits")):
+            if self.signals[exits][i]:
+                for pos in [p for p in self.broker.get_open_positions(self.symbol) if p["side"] == side]: self.broker.close_order(pos["position_id"])
+        state["forex_final_decision"] = None
+        if self.signals["long_entries"][i]:
+            quote = bar["ask_close"]
+            state["forex_final_decision"] = {"currency_pair": self.symbol, "action": "EXECUTE_BUY", "position_size": self.volume,
+                                             "stop_loss": round(quote - self.sl_pips * pip, precision), "take_profit": round(quote + self.tp_pips * pip, precision)}
+        elif self.signals["short_entries"][i]:
+            quote = bar["bid_close"]
+            state["forex_final_decision"] = {"currency_pair": self.symbol, "action": "EXECUTE_SELL", "position_size": self.volume,
+                                             "stop_loss": round(quote + self.sl_pips * pip, precision), "take_profit": round(quote - self.tp_pips * pip, precision)}
+        return state
+
+class TestVectorizedBacktest(unittest.TestCase):
+
+    def _signals(self, n: int, seed: int) -> Dict[str, np.ndarray]:
+        rng = np.random.default_rng(seed)
+        long_entries = rng.random(n) < 0.08
+        short_entries = (rng.random(n) < 0.08) & ~long_entries
+        return {"long_entries": long_entries, "short_entries": short_entries, "long_exits": rng.random(n) < 0.05, "short_exits": rng.random(n) < 0.05}
+
+    def _cross_check(self, symbol: str, base_price: float, pip: float):
+        data = {symbol: create_test_series(1_700_000_000, 400, 11, base_price, pip, spread_pips=0.8, max_wick_pips=5)}
+        signals = self._signals(400, seed=3)
+        with contextlib.redirect_stdout(io.StringIO()), patch('random.uniform', return_value=1.0):
+            broker = SimulatedBroker(initial_capital=10000.0)
+            broker.load_test_data(symbol, data[symbol])
+            engine = BacktestingEngine(SignalArrayStrategy(broker, symbol, signals, 15, 25, 0.1), broker, data, symbol)
+            engine.run()
+            result = run_vectorized_backtest(BarStore.from_candlesticks(data), symbol, stop_loss_pips=15, take_profit_pips=25, volume=0.1, broker=SimulatedBroker(initial_capital=10000.0), **signals)
+
+        event_closes = [e for e in broker.trade_history if e["event_type"] == "POSITION_CLOSED"]
+        closed = result.trades["exit_index"] >= 0
+        self.assertGreater(len(event_closes), 5)
+        self.assertEqual(result.num_trades, sum(1 for e in broker.trade_history if e["event_type"] == "MARKET_ORDER_FILLED"))
+        self.assertEqual(int(closed.sum()), len(event_closes))
+        self.assertEqual(sorted(e["reason_for_close"] for e in event_closes), sorted(result.trades["exit_reason"][closed].tolist()))
+        np.testing.assert_allclose(sorted(e["realized_pnl"] for e in event_closes), np.sort(result.trades["realized_pnl"][closed]), atol=1e-6)
+        engine_equity = np.array([point["equity"] for point in engine.equity_curve])
+        vector_equity = np.array([point["equity"] for point in result.equity_curve()])
+        np.testing.assert_allclose(vector_equity, engine_equity, atol=0.006) # Engine equity is rounded to cents
+
+    def test_matches_event_driven_engine_usd_quoted(self):
+        self._cross_check("EURUSD", 1.1000, 0.0001)
+
+    def test_matches_event_driven_engine_usd_base(self):
+        self._cross_check("USDJPY", 150.00, 0.01) # P/L converted at 1 / USDJPY close, as the broker does
+
+    def test_same_bar_stop_loss_wins_over_take_profit(self):
+        bars = [create_test_series(0, 1, 11)[0] for _ in range(3)]
+        for i, bar in enumerate(bars): bar.update(timestamp=float(i), close=1.1, bid_close=1.09996, ask_close=1.10004, high=1.1001, low=1.0999)
+        bars[2].update(high=1.1100, low=1.0900) # Touches both levels
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_vectorized_backtest(BarStore.from_candlesticks({"EURUSD": bars}), "EURUSD", long_entries=np.array([True, False, False]), stop_loss_pips=20, take_profit_pips=20)
+        self.assertEqual(result.trades["exit_reason"].tolist(), ["STOP_LOSS_HIT"])
+        self.assertEqual(result.trades["exit_index"].tolist(), [2])
+
+    def test_first_index_where_at_or_below(self):
+        values = np.array([5.0, 4.0, 6.0, 1.0, 7.0, 3.0, 8.0])
+        starts = np.array([0, 0, 2, 4, 6, 0])
+        thresholds = np.array([4.5, 0.5, 3.0, 3.0, 3.0, 5.0])
+        self.assertEqual(_first_index_where_at_or_below(values, starts, thresholds).tolist(), [1, 7, 3, 5, 7, 0])
+
+if __name__ == '__main__':
+    unittest.main()
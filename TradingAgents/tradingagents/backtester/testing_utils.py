@@ -0,0 +1,21 @@
+import random
+from typing import List, Optional
+
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick
+
+# Shared by the backtester tests; not named test_* so the runners do not collect it.
+
+def create_test_series(start_ts: int, num_bars: int, seed: int, base_price: float = 1.1000, pip: float = 0.0001,
+                       spread_pips: float = 1.0, max_wick_pips: Optional[float] = None) -> List[Candlestick]:
+    """
+    Seeded random walk of hourly bars: each close moves up to 8 pips from the previous one, and bid/ask are
+    ``spread_pips`` apart around it. Wicks are 3 pips, or random up to ``max_wick_pips`` when given.
+    """
+    rng = random.Random(seed); price = base_price; bars = []
+    for i in range(num_bars):
+        close = price + rng.uniform(-8, 8) * pip
+        upper_wick, lower_wick = (3.0, 3.0) if max_wick_pips is None else (rng.uniform(0, max_wick_pips), rng.uniform(0, max_wick_pips))
+        bars.append({"timestamp": float(start_ts + i * 3600), "open": price, "high": max(price, close) + upper_wick * pip, "low": min(price, close) - lower_wick * pip,
+                     "close": close, "volume": 100.0, "bid_close": close - spread_pips / 2 * pip, "ask_close": close + spread_pips / 2 * pip})
+        price = close
+    return bars
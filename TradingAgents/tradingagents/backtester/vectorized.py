@@ -0,0 +1,190 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from TradingAgents.tradingagents.backtester.metrics import summarize_equity_curve
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore, SymbolBars
+
+# Exit reasons use the same strings as SimulatedBroker's POSITION_CLOSED events.
+EXIT_REASON_NONE, EXIT_REASON_STOP_LOSS, EXIT_REASON_TAKE_PROFIT, EXIT_REASON_SIGNAL = "", "STOP_LOSS_HIT", "TAKE_PROFIT_HIT", "CLOSED_BY_REQUEST"
+
+ArrayLike = Union[float, np.ndarray, List[float]]
+
+
+def _first_index_where_at_or_below(values: np.ndarray, starts: np.ndarray, thresholds: np.ndarray, min_table: Optional[List[np.ndarray]] = None) -> np.ndarray:
+    """
+    For each query k, the first index j >= starts[k] with values[j] <= thresholds[k] (len(values) if none).
+
+    Uses a sparse table of range minima and binary lifting, so all queries are answered together in O(log n) NumPy passes.
+    """
+    n = len(values)
+    table = min_table if min_table is not None else _build_min_table(values)
+    pos = starts.astype(np.int64).copy()
+    for level in range(len(table) - 1, -1, -1):
+        step = 1 << level
+        can_jump = pos + step <= n
+        block_min = table[level][np.minimum(pos, n - step)]
+        pos = np.where(can_jump & (block_min > thresholds), pos + step, pos) # Whole block is above the threshold: skip it
+    return pos
+
+
+def _build_min_table(values: np.ndarray) -> List[np.ndarray]:
+    # table[k][j] = min(values[j : j + 2**k])
+    table = [np.asarray(values, dtype=np.float64)]
+    while (1 << len(table)) <= len(values):
+        half = 1 << (len(table) - 1); prev = table[-1]
+        table.append(np.minimum(prev[:-half], prev[half:]))
+    return table
+
+
+def _per_bar(value: Optional[ArrayLike], n: int, name: str) -> Optional[np.ndarray]:
+    if value is None: return None
+    arr = np.asarray(value, dtype=np.float64)
+    if arr.ndim == 0: return np.full(n, float(arr))
+    if len(arr) != n: raise ValueError(f"run_vectorized_backtest: {name} has length {len(arr)}, expected {n}.")
+    return arr
+
+
+class VectorizedBacktestResult:
+    def __init__(self, symbol: str, timestamps: np.ndarray, balance: np.ndarray, equity: np.ndarray, trades: Dict[str, np.ndarray], initial_capital: float):
+        self.symbol = symbol
+        self.timestamps = timestamps
+        self.balance = balance # Balance after each bar
+        self.equity = equity # Equity after each bar (balance + unrealized P/L at the bar's valuation price)
+        self.trades = trades # Column arrays, one row per entry; exit_index == -1 / NaN prices for trades still open at the end
+        self.initial_capital = initial_capital
+
+    @property
+    def num_trades(self) -> int: return len(self.trades["entry_index"])
+
+    def equity_curve(self) -> List[Dict[str, Any]]:
+        """Same shape as BacktestingEngine.equity_curve: an initial point one second before the first bar, then one per bar."""
+        if len(self.timestamps) == 0: return []
+        curve = [{'timestamp': float(self.timestamps[0]) - 1, 'equity': self.initial_capital}]
+        curve.extend({'timestamp': float(ts), 'equity': float(eq)} for ts, eq in zip(self.timestamps, self.equity))
+        return curve
+
+    def summary(self) -> Dict[str, Any]:
+        closed = self.trades["exit_index"] >= 0
+        history = [{"event_type": "POSITION_CLOSED", "realized_pnl": float(pnl)} for pnl in self.trades["realized_pnl"][closed]]
+        return summarize_equity_curve(self.equity_curve(), history, self.initial_capital)
+
+
+def run_vectorized_backtest(bars: Union[SymbolBars, BarStore],
+                            symbol: Optional[str] = None,
+                            long_entries: Optional[np.ndarray] = None,
+                            short_entries: Optional[np.ndarray] = None,
+                            long_exits: Optional[np.ndarray] = None,
+                            short_exits: Optional[np.ndarray] = None,
+                            stop_loss_pips: Optional[ArrayLike] = None,
+                            take_profit_pips: Optional[ArrayLike] = None,
+                            volume: ArrayLike = 0.01,
+                            broker: Optional[SimulatedBroker] = None,
+                            quote_to_account_rate: Optional[np.ndarray] = None,
+                            slippage_multiplier: float = 1.0) -> VectorizedBacktestResult:
+    """
+    Screening backtest for strategies expressed as boolean signal arrays over the whole history of one symbol.
+
+    Mirrors the bar loop of BacktestingEngine + SimulatedBroker: a signal on bar i is filled at bar i's ask/bid close
+    (close +/- half the spread when missing) plus slippage, SL/TP are checked from bar i+1 on against the bar's
+    low/high (stop loss first), exit signals close at the bar's valuation price after SL/TP, and equity is marked at
+    close -/+ half the spread. Spread, slippage, commission, contract size and precision all come from ``broker``
+    (a default SimulatedBroker if None), so both paths price trades the same way.
+
+    SL/TP are given in pips from the quoted entry price (ask for buys, bid for sells), as the agents compute them.
+    ``slippage_multiplier`` replaces the broker's random.uniform(0.8, 1.2) draw (1.0 = expected slippage).
+    Margin checks and stop-outs are not simulated; confirm screened candidates with the event-driven engine.
+    """
+    if isinstance(bars, BarStore):
+        if symbol is None: raise ValueError("run_vectorized_backtest: symbol is required when passing a BarStore.")
+        bars = bars[symbol]
+    symbol = (symbol or bars.symbol).upper()
+    broker = broker or SimulatedBroker()
+    spec = broker.symbol_registry.get(symbol)
+    if spec is None: raise ValueError(f"run_vectorized_backtest: no symbol spec for {symbol}.")
+    pip, precision, contract_size = spec.pip_definition, spec.price_precision, spec.contract_size_units
+
+    n = len(bars)
+    close = np.asarray(bars.close, dtype=np.float64); high = np.asarray(bars.high, dtype=np.float64); low = np.asarray(bars.low, dtype=np.float64)
+    bid = np.asarray(bars.bid_close, dtype=np.float64); ask = np.asarray(bars.ask_close, dtype=np.float64)
+
+    # Quote -> account currency rate per bar (SimulatedBroker._get_exchange_rate for the symbol itself).
+    if spec.quote_currency == broker.account_currency: rate = np.ones(n)
+    elif spec.base_currency == broker.account_currency: rate = 1.0 / close
+    elif quote_to_account_rate is not None: rate = _per_bar(quote_to_account_rate, n, "quote_to_account_rate")
+    else: raise ValueError(f"run_vectorized_backtest: {symbol} needs quote_to_account_rate ({spec.quote_currency} -> {broker.account_currency}).")
+
+    # Spread, quotes and valuation prices (SimulatedBroker._get_spread_in_price_terms / place_order / _update_equity_and_margin).
+    default_spread = broker.default_spread_pips.get(symbol, broker.default_spread_pips.get("default", 1.0)) * pip
+    has_quotes = ~np.isnan(bid) & ~np.isnan(ask) & (ask > bid)
+    spread = np.where(has_quotes, ask - bid, default_spread)
+    buy_quote = np.where(~np.isnan(ask) & (ask > 0), ask, close + spread / 2.0)
+    sell_quote = np.where(~np.isnan(bid) & (bid > 0), bid, close - spread / 2.0)
+    long_valuation = np.round(close - spread / 2, precision); short_valuation = np.round(close + spread / 2, precision)
+
+    long_entries = np.zeros(n, dtype=bool) if long_entries is None else np.asarray(long_entries, dtype=bool)
+    short_entries = np.zeros(n, dtype=bool) if short_entries is None else np.asarray(short_entries, dtype=bool)
+    if len(long_entries) != n or len(short_entries) != n: raise ValueError(f"run_vectorized_backtest: entry signals must have length {n}.")
+    if np.any(long_entries & short_entries): raise ValueError("run_vectorized_backtest: long and short entry on the same bar.")
+
+    # --- Trades: one per entry signal ---
+    entry_index = np.flatnonzero(long_entries | short_entries)
+    side = np.where(long_entries[entry_index], 1, -1).astype(np.int8)
+    is_long = side == 1
+    volumes = _per_bar(volume, n, "volume")[entry_index]
+    slippage_pips = np.maximum(0.0, (broker.base_slippage_pips + volumes * contract_size / 1_000_000.0 * broker.volume_slippage_factor_pips_per_million) * slippage_multiplier)
+    quote = np.where(is_long, buy_quote[entry_index], sell_quote[entry_index])
+    entry_price = np.round(quote + side * slippage_pips * pip, precision)
+    commission = broker.commission_per_lot.get(symbol, broker.commission_per_lot.get("default", 7.0)) * volumes
+
+    sl_pips = _per_bar(stop_loss_pips, n, "stop_loss_pips"); tp_pips = _per_bar(take_profit_pips, n, "take_profit_pips")
+    stop_loss = np.round(quote - side * sl_pips[entry_index] * pip, precision) if sl_pips is not None else np.full(len(entry_index), np.nan)
+    take_profit = np.round(quote + side * tp_pips[entry_index] * pip, precision) if tp_pips is not None else np.full(len(entry_index), np.nan)
+
+    # First bar after entry at which each level is touched (n = never). NaN levels never trigger.
+    starts = entry_index + 1
+    first_hit = lambda values, levels, table: np.where(np.isnan(levels), n, _first_index_where_at_or_below(values, starts, np.nan_to_num(levels, nan=-np.inf), table))
+    low_table = _build_min_table(low) if len(entry_index) else None
+    neg_high_table = _build_min_table(-high) if len(entry_index) else None
+    # Longs: SL when low <= SL, TP when high >= TP. Shorts: SL when high >= SL, TP when low <= TP.
+    sl_hit = np.where(is_long, first_hit(low, np.where(is_long, stop_loss, np.nan), low_table), first_hit(-high, np.where(is_long, np.nan, -stop_loss), neg_high_table)) if len(entry_index) else entry_index
+    tp_hit = np.where(is_long, first_hit(-high, np.where(is_long, -take_profit, np.nan), neg_high_table), first_hit(low, np.where(is_long, np.nan, take_profit), low_table)) if len(entry_index) else entry_index
+
+    def next_signal(exits: Optional[np.ndarray]) -> np.ndarray:
+        if exits is None: return np.full(len(entry_index), n)
+        exit_bars = np.flatnonzero(np.asarray(exits, dtype=bool))
+        k = np.searchsorted(exit_bars, starts, side="left")
+        return np.where(k < len(exit_bars), exit_bars[np.minimum(k, len(exit_bars) - 1)], n) if len(exit_bars) else np.full(len(entry_index), n)
+    signal_exit = np.where(is_long, next_signal(long_exits), next_signal(short_exits))
+
+    # Same-bar priority as the broker: stop loss, then take profit, then the strategy's exit signal.
+    exit_bar = np.minimum(np.minimum(sl_hit, tp_hit), signal_exit)
+    reason = np.where(exit_bar == sl_hit, EXIT_REASON_STOP_LOSS, np.where(exit_bar == tp_hit, EXIT_REASON_TAKE_PROFIT, EXIT_REASON_SIGNAL))
+    closed = exit_bar < n
+    reason = np.where(closed, reason, EXIT_REASON_NONE)
+    exit_bar_clipped = np.minimum(exit_bar, n - 1)
+    signal_price = np.where(is_long, long_valuation[exit_bar_clipped], short_valuation[exit_bar_clipped])
+    exit_price = np.where(reason == EXIT_REASON_STOP_LOSS, stop_loss, np.where(reason == EXIT_REASON_TAKE_PROFIT, take_profit, signal_price))
+    exit_price = np.where(closed, exit_price, np.nan)
+    units = volumes * contract_size
+    realized_pnl = np.where(closed, side * (exit_price - entry_price) * units * rate[exit_bar_clipped], np.nan)
+
+    # --- Account: balance from cumulated commissions/realized P/L, equity from per-side open volume aggregates ---
+    balance_delta = np.zeros(n + 1)
+    np.add.at(balance_delta, entry_index, -commission)
+    np.add.at(balance_delta, exit_bar[closed], realized_pnl[closed])
+    balance = broker.initial_capital + np.cumsum(balance_delta[:n])
+
+    def open_sum(weights: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        delta = np.zeros(n + 1)
+        np.add.at(delta, entry_index[mask], weights[mask]); np.add.at(delta, exit_bar[mask], -weights[mask])
+        return np.cumsum(delta[:n])
+    long_units, long_cost = open_sum(units, is_long), open_sum(units * entry_price, is_long)
+    short_units, short_cost = open_sum(units, ~is_long), open_sum(units * entry_price, ~is_long)
+    unrealized = rate * ((long_valuation * long_units - long_cost) + (short_cost - short_valuation * short_units))
+    equity = balance + unrealized
+
+    trades = {"entry_index": entry_index, "exit_index": np.where(closed, exit_bar, -1), "side": side, "volume": volumes, "entry_price": entry_price,
+              "stop_loss": stop_loss, "take_profit": take_profit, "exit_price": exit_price, "realized_pnl": realized_pnl, "commission": commission, "exit_reason": reason}
+    return VectorizedBacktestResult(symbol, np.asarray(bars.timestamp, dtype=np.float64), balance, equity, trades, broker.initial_capital)
@@ -0,0 +1,114 @@
+import datetime
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from TradingAgents.tradingagents.backtester.metrics import summarize_equity_curve
+from TradingAgents.tradingagents.backtester.sweep import ParameterSweepRunner, expand_param_grid
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick
+
+
+class WalkForwardResults:
+    def __init__(self, windows: pd.DataFrame, equity_curve: List[Dict[str, Any]], summary: Dict[str, Any]):
+        self.windows = windows # One row per window: date ranges, chosen parameters, in-sample score, out-of-sample metrics
+        self.equity_curve = equity_curve # Out-of-sample segments stitched into one continuous curve
+        self.summary = summary # Metrics of the stitched out-of-sample curve
+
+
+class WalkForwardOptimizer:
+    """
+    Rolling walk-forward optimization: for each window, grid-search the parameters on the in-sample bars, then trade
+    the following out-of-sample bars with the winning parameters, and stitch the out-of-sample equity together.
+
+    All in-sample jobs of all windows go to one process pool (see ParameterSweepRunner). Each job trades only its own
+    window, with ``warmup_bars`` earlier bars handed to the broker as indicator history; windows are zero-copy slices
+    of the shared memory-mapped BarStore, so the warm-up bars are shared, not re-loaded or copied per window. The
+    strategy's indicator state is not: it depends on each job's parameters and lives inside the strategy the factory
+    builds, so every job warms up from those bars (the streaming indicators make that O(warmup_bars)).
+    """
+
+    def __init__(self,
+                 strategy_factory: Any, # strategy_factory(broker, main_symbol, params), see backtester.sweep
+                 historical_data_source: Union[BarStore, Dict[str, List[Candlestick]]],
+                 main_symbol_to_trade: str,
+                 param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]],
+                 in_sample_bars: int,
+                 out_of_sample_bars: int,
+                 step_bars: Optional[int] = None, # Defaults to out_of_sample_bars; never less, so OOS segments cannot overlap
+                 warmup_bars: int = 0,
+                 objective: str = "total_return_pct",
+                 maximize_objective: bool = True,
+                 broker_factory: Optional[Any] = None,
+                 initial_capital: float = 10000.0,
+                 max_workers: Optional[int] = None,
+                 use_processes: bool = True):
+        if in_sample_bars <= 0 or out_of_sample_bars <= 0: raise ValueError("in_sample_bars and out_of_sample_bars must be positive.")
+        if step_bars is not None and step_bars < out_of_sample_bars:
+            # Overlapping OOS segments would stitch the same bars twice and compound their returns more than once.
+            raise ValueError(f"step_bars ({step_bars}) must be at least out_of_sample_bars ({out_of_sample_bars}).")
+        self.runner = ParameterSweepRunner(strategy_factory, historical_data_source, main_symbol_to_trade, broker_factory=broker_factory,
+                                           initial_capital=initial_capital, max_workers=max_workers, use_processes=use_processes)
+        self.main_symbol_to_trade = self.runner.main_symbol_to_trade
+        self.combinations = expand_param_grid(param_grid)
+        self.in_sample_bars = in_sample_bars
+        self.out_of_sample_bars = out_of_sample_bars
+        self.step_bars = step_bars or out_of_sample_bars
+        self.warmup_bars = warmup_bars
+        self.objective = objective
+        self.maximize_objective = maximize_objective
+        self.initial_capital = initial_capital
+
+    def windows(self) -> List[Dict[str, int]]:
+        """Main-symbol bar index ranges of each window; the last out-of-sample segment may be shorter."""
+        num_bars = len(self.runner.bar_store[self.main_symbol_to_trade])
+        windows = []; is_start = 0
+        while is_start + self.in_sample_bars < num_bars:
+            is_end = is_start + self.in_sample_bars
+            windows.append({"is_start": is_start, "is_end": is_end, "oos_start": is_end, "oos_end": min(is_end + self.out_of_sample_bars, num_bars)})
+            is_start += self.step_bars
+        return windows
+
+    def _window(self, start: int, end: int):
+        ts = self.runner.bar_store[self.main_symbol_to_trade].timestamp
+        return (float(ts[max(0, start - self.warmup_bars)]), float(ts[start]), float(ts[end]) if end < len(ts) else None)
+
+    def run(self) -> WalkForwardResults:
+        windows = self.windows()
+        if not windows: raise ValueError(f"WalkForwardOptimizer: not enough bars for one window of {self.in_sample_bars} in-sample bars.")
+        print(f"WalkForwardOptimizer: {len(windows)} window(s) x {len(self.combinations)} combination(s) for {self.main_symbol_to_trade}.")
+
+        # Phase 1: every in-sample job of every window, in one pool.
+        is_jobs = [(params, self._window(w["is_start"], w["is_end"])) for w in windows for params in self.combinations]
+        is_results = self.runner.run_jobs(is_jobs)
+
+        # Phase 2: each window's out-of-sample segment with that window's best parameters.
+        best: List[Optional[Dict[str, Any]]] = []
+        for k in range(len(windows)):
+            scored = [(is_results[k * len(self.combinations) + c][0], params) for c, params in enumerate(self.combinations)]
+            scored = [(summary[self.objective], params) for summary, params in scored if not summary.get("error")]
+            if not scored: best.append(None); continue
+            best.append((max if self.maximize_objective else min)(scored, key=lambda item: item[0]))
+        oos_windows = [k for k in range(len(windows)) if best[k] is not None]
+        oos_results = self.runner.run_jobs([(best[k][1], self._window(windows[k]["oos_start"], windows[k]["oos_end"])) for k in oos_windows])
+
+        ts = self.runner.bar_store[self.main_symbol_to_trade].timestamp
+        to_iso = lambda i: datetime.datetime.fromtimestamp(float(ts[i]), tz=datetime.timezone.utc).isoformat()
+        rows = []; stitched: List[Dict[str, Any]] = []; num_closed_trades = 0
+        for k, w in enumerate(windows):
+            row = {"window": k, "is_start": to_iso(w["is_start"]), "is_end": to_iso(w["is_end"] - 1), "oos_start": to_iso(w["oos_start"]), "oos_end": to_iso(w["oos_end"] - 1)}
+            if best[k] is None:
+                rows.append({**row, "best_params": None, "is_score": None, "error": "All in-sample runs failed."}); continue
+            summary, curve = oos_results[oos_windows.index(k)]
+            rows.append({**row, "best_params": best[k][1], "is_score": best[k][0], **{f"oos_{key}": value for key, value in summary.items() if key not in ("error", "traceback")}, "error": summary.get("error")})
+            if summary.get("error") or not curve: continue
+            num_closed_trades += summary["num_closed_trades"]
+            # Each segment starts from initial_capital; rescale it to continue from the previous segment's final equity.
+            scale = (stitched[-1]["equity"] / curve[0]["equity"]) if stitched and curve[0]["equity"] else 1.0
+            stitched.extend({"timestamp": point["timestamp"], "equity": point["equity"] * scale} for point in (curve[1:] if stitched else curve))
+
+        summary = summarize_equity_curve(stitched, [], self.initial_capital)
+        summary = {"num_windows": len(windows), "final_equity": summary["final_equity"], "total_return_pct": summary["total_return_pct"],
+                   "max_drawdown_pct": summary["max_drawdown_pct"], "num_closed_trades": num_closed_trades}
+        print(f"WalkForwardOptimizer: Out-of-sample return {summary['total_return_pct']}% over {len(windows)} window(s).")
+        return WalkForwardResults(pd.DataFrame(rows).set_index("window"), stitched, summary)
@@ -1,2 +1,3 @@
 from .base import BrokerInterface
 from .mt5_broker import MT5Broker
+from .caching_broker import CachingBroker
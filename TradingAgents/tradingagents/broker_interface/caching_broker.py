@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .base import BrokerInterface
+
+
+class _BarWindow:
+    """One fetched window of bars and the time range it is known to cover completely."""
+    __slots__ = ("bars", "timestamps", "start", "end")
+
+    def __init__(self, bars: Sequence[Dict], timestamps: np.ndarray, start: float, end: float):
+        self.bars = bars; self.timestamps = timestamps
+        self.start = start; self.end = end # -inf / inf when unbounded
+
+    def covers(self, start: float, end: float) -> bool: return self.start <= start and end <= self.end
+
+    def slice(self, start: float, end: float, count: Optional[int]) -> Sequence[Dict]:
+        """Same selection as BarSequence.window: start <= timestamp <= end, at most the last ``count``."""
+        first = int(np.searchsorted(self.timestamps, start, side="left")); stop = int(np.searchsorted(self.timestamps, end, side="right"))
+        if count is not None: first = max(first, stop - count)
+        return self.bars[first:stop]
+
+
+def _timestamps(bars: Sequence[Dict]) -> Optional[np.ndarray]:
+    """Bar open times as a sorted float array, or None when the bars carry no unix 'timestamp' (e.g. MT5Broker's 'time')."""
+    table = getattr(bars, "bars", None) # BarSequence: the column itself, no per-row views
+    if table is not None and hasattr(table, "timestamp"): return np.asarray(table.timestamp, dtype=float)
+    try: timestamps = np.fromiter((bar['timestamp'] for bar in bars), dtype=float, count=len(bars))
+    except (KeyError, TypeError, ValueError): return None
+    return timestamps if len(timestamps) < 2 or bool(np.all(timestamps[1:] >= timestamps[:-1])) else None
+
+
+class CachingBroker(BrokerInterface):
+    """
+    Wraps any BrokerInterface and memoizes market data for the current decision step.
+
+    Ticks (``get_current_price``) and historical windows (``get_historical_data``) are cached until the step changes:
+    when the wrapped broker has a simulated clock (``current_simulated_time_unix``, e.g. SimulatedBroker) a new
+    timestamp starts a new step; otherwise call ``invalidate()`` per step (e.g. per ForexTradingGraph invocation) or
+    set ``max_age_seconds``. Everything else, orders and account queries included, goes straight to the wrapped broker.
+
+    Window requests for the same (symbol, timeframe) are served from one cached superset: a request inside the cached
+    time range is a slice of it; a miss fetches the union of the request, the cached range and the widest lookback
+    seen so far for that key, so from the second step on the agents with different lookbacks share a single fetch.
+    """
+
+    def __init__(self, broker: BrokerInterface, max_age_seconds: Optional[float] = None):
+        self.broker = broker
+        self.max_age_seconds = max_age_seconds
+        self.stats: Dict[str, int] = {"tick_hits": 0, "tick_misses": 0, "bar_hits": 0, "bar_misses": 0}
+        self._ticks: Dict[str, Optional[Dict]] = {}
+        self._windows: Dict[Tuple[str, str], _BarWindow] = {}
+        self._exact: Dict[Tuple, Sequence[Dict]] = {} # Bars without unix timestamps: memoized per exact request only
+        self._lookbacks: Dict[Tuple[str, str], float] = {} # Widest start..end span requested per key, kept across steps
+        self._step: Any = None; self._step_started = time.monotonic(); self._generation = 0
+        self._lock = threading.Lock(); self._key_locks: Dict[Tuple, threading.Lock] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes CachingBroker does not define: modify_order, close_order, load_test_data, ...
+        if name == "broker": raise AttributeError(name)
+        return getattr(self.broker, name)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Picklable and deep-copyable: locks are recreated, cached data is kept
+        return {name: value for name, value in self.__dict__.items() if name not in ("_lock", "_key_locks")}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state); self._lock = threading.Lock(); self._key_locks = {}
+
+    def invalidate(self):
+        """Drops the cached ticks and windows; the next request of each fetches again."""
+        with self._lock: self._generation += 1; self._clear()
+
+    def _clear(self):
+        self._ticks.clear(); self._windows.clear(); self._exact.clear(); self._step_started = time.monotonic()
+
+    def _key_lock(self, key: Tuple) -> threading.Lock:
+        """Starts a new step if the clock moved, and returns the lock that serializes fetches of ``key``."""
+        clock = getattr(self.broker, "current_simulated_time_unix", None)
+        with self._lock:
+            step = (self._generation, clock)
+            expired = self.max_age_seconds is not None and time.monotonic() - self._step_started > self.max_age_seconds
+            if step != self._step or expired: self._step = step; self._clear()
+            lock = self._key_locks.get(key)
+            if lock is None: lock = self._key_locks[key] = threading.Lock()
+        return lock
+
+    def _count(self, stat: str):
+        # Fetches of different keys run concurrently under their own locks; the shared counters need the broker lock
+        with self._lock: self.stats[stat] += 1
+
+    def connect(self, credentials: Dict[str, Any]) -> bool: self.invalidate(); return self.broker.connect(credentials)
+    def disconnect(self) -> None: self.invalidate(); self.broker.disconnect()
+    def is_connected(self) -> bool: return self.broker.is_connected()
+    def get_account_info(self) -> Optional[Dict]: return self.broker.get_account_info()
+    def place_order(self, *args: Any, **kwargs: Any) -> Dict: return self.broker.place_order(*args, **kwargs)
+
+    def get_current_price(self, symbol: str) -> Optional[Dict]:
+        key = symbol.upper()
+        with self._key_lock(("tick", key)):
+            if key in self._ticks:
+                self._count("tick_hits"); tick = self._ticks[key]
+            else:
+                self._count("tick_misses"); tick = self._ticks[key] = self.broker.get_current_price(symbol)
+        return dict(tick) if tick is not None else None # Callers get their own copy of the cached tick
+
+    def get_historical_data(self, symbol: str, timeframe_str: str, start_time_unix: Optional[float],
+                            end_time_unix: Optional[float] = None, count: Optional[int] = None) -> Sequence[Dict]:
+        key = (symbol.upper(), timeframe_str.upper())
+        with self._key_lock(("bars",) + key):
+            clock = getattr(self.broker, "current_simulated_time_unix", None)
+            if clock is not None: end_time_unix = clock if end_time_unix is None else min(end_time_unix, clock) # As the broker caps it
+            start = -np.inf if start_time_unix is None else start_time_unix; end = np.inf if end_time_unix is None else end_time_unix
+            exact_key = key + (start_time_unix, end_time_unix, count)
+            if exact_key in self._exact:
+                self._count("bar_hits"); return self._exact[exact_key]
+            window = self._windows.get(key)
+            if window is not None and window.covers(start, end):
+                self._count("bar_hits"); return window.slice(start, end, count)
+            if window is not None and start_time_unix is None and count is not None and end <= window.end:
+                bars = window.slice(start, end, count) # A tail request is covered when the cached window holds enough bars
+                if len(bars) == count: self._count("bar_hits"); return bars
+            self._count("bar_misses")
+            return self._fetch(symbol, timeframe_str, key, exact_key, window, start_time_unix, end_time_unix, count)
+
+    def _fetch(self, symbol: str, timeframe_str: str, key: Tuple[str, str], exact_key: Tuple, window: Optional[_BarWindow],
+               start_time_unix: Optional[float], end_time_unix: Optional[float], count: Optional[int]) -> Sequence[Dict]:
+        fetch_start, fetch_end, fetch_count = start_time_unix, end_time_unix, count
+        if start_time_unix is not None and count is None and end_time_unix is not None:
+            # Superset: the cached range, this request and the widest lookback asked for this key
+            lookback = max(self._lookbacks.get(key, 0.0), end_time_unix - start_time_unix); self._lookbacks[key] = lookback
+            fetch_start = min(start_time_unix, end_time_unix - lookback)
+            if window is not None and window.end >= fetch_start and window.start <= end_time_unix:
+                fetch_start = min(fetch_start, window.start); fetch_end = max(end_time_unix, window.end)
+            if not np.isfinite(fetch_start): fetch_start = None
+            if not np.isfinite(fetch_end): fetch_end = None
+        bars = self.broker.get_historical_data(symbol, timeframe_str, fetch_start, fetch_end, fetch_count)
+        if bars is None: return bars
+        timestamps = _timestamps(bars)
+        if timestamps is None:
+            self._exact[exact_key] = bars; return bars
+        covered_start = -np.inf if fetch_start is None else fetch_start
+        if fetch_count is not None and len(bars) >= fetch_count: covered_start = timestamps[0] if len(timestamps) else np.inf # Truncated by count
+        new_window = _BarWindow(bars, timestamps, covered_start, np.inf if fetch_end is None else fetch_end)
+        if window is None or not window.covers(new_window.start, new_window.end): self._windows[key] = new_window
+        return new_window.slice(-np.inf if start_time_unix is None else start_time_unix, new_window.end if end_time_unix is None else end_time_unix, count)
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock: return {**self.stats, "cached_ticks": len(self._ticks), "cached_windows": len(self._windows) + len(self._exact)}
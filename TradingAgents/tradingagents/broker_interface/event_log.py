@@ -0,0 +1,283 @@
+import os
+import pickle
+import tempfile
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Column kinds: "float" (float64, None <-> NaN), "int" (int64, None <-> INT_NULL), "category" (int32 codes into the
+# log's shared string table, None <-> -1) and "object" (a Python list: ids, comments, free text).
+INT_NULL = np.iinfo(np.int64).min
+_ORDER_FIELDS = (("timestamp", "float"), ("order_id", "object"), ("symbol", "category"), ("side", "category"), ("type", "category"), ("volume", "float"), ("price", "float"))
+_MARGIN_FIELDS = (("timestamp", "float"), ("equity", "float"), ("margin_used", "float"), ("margin_level_pct", "float"))
+
+# Fixed schema of every SimulatedBroker event type (field order is the order of the event dicts the broker logs).
+EVENT_SCHEMAS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "MARKET_ORDER_FILLED": (("timestamp", "float"), ("order_id", "object"), ("position_id", "object"), ("symbol", "category"), ("side", "category"), ("volume", "float"),
+                            ("fill_price", "float"), ("sl", "float"), ("tp", "float"), ("commission", "float"), ("comment", "object")),
+    "PENDING_ORDER_PLACED": _ORDER_FIELDS[:6] + (("price", "float"), ("sl", "float"), ("tp", "float"), ("comment", "object"), ("time_in_force", "category"), ("expiry_time", "float")),
+    "PENDING_ORDER_CANCELLED": _ORDER_FIELDS + (("reason", "object"),),
+    "PENDING_ORDER_EXPIRED": _ORDER_FIELDS + (("expiry_time", "float"),),
+    "PENDING_ORDER_FAIL_MARGIN": _ORDER_FIELDS[:4] + (("volume", "float"), ("trigger_price", "float"), ("reason", "category")),
+    "PENDING_ORDER_FILLED": (("timestamp", "float"), ("original_order_id", "object"), ("position_id", "object"), ("symbol", "category"), ("side", "category"), ("type", "category"),
+                             ("volume", "float"), ("requested_price", "float"), ("fill_price", "float"), ("sl", "float"), ("tp", "float"), ("commission", "float"), ("comment", "object")),
+    "POSITION_CLOSED": (("timestamp", "float"), ("position_id", "object"), ("symbol", "category"), ("side", "category"), ("volume", "float"), ("entry_price", "float"),
+                        ("open_time", "float"), ("close_price", "float"), ("realized_pnl", "float"), ("reason_for_close", "category"), ("magic_number", "int"), ("comment", "object")),
+    "MARGIN_CALL_STOP_OUT_TRIGGERED": _MARGIN_FIELDS,
+    "MARGIN_WARNING_TRIGGERED": _MARGIN_FIELDS,
+    "MARGIN_CALL_LIQUIDATION_ERROR": (("timestamp", "float"), ("position_id", "object"), ("reason", "category")),
+    "MARGIN_CALL_RESOLVED": (("timestamp", "float"), ("final_margin_level_pct", "float")),
+}
+EVENT_TYPES = tuple(EVENT_SCHEMAS)
+_FIELDS = {event_type: tuple(name for name, _ in schema) for event_type, schema in EVENT_SCHEMAS.items()}
+_KINDS = {event_type: tuple(kind for _, kind in schema) for event_type, schema in EVENT_SCHEMAS.items()}
+_TYPE_IDS = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+_OTHER = len(EVENT_TYPES) # Type code of events outside the schemas, kept as plain dicts
+
+
+def _freeze_column(kind: str, values: List[Any]) -> Any:
+    if kind == "float": return np.array(values, dtype=np.float64) # None -> NaN
+    if kind == "int": return np.array([INT_NULL if value is None else value for value in values], dtype=np.int64)
+    if kind == "category": return np.array(values, dtype=np.int32)
+    return values
+
+
+class _EventTable:
+    """One event type's rows in fixed-size chunks. The open (last) chunk holds Python lists; full chunks are frozen into
+    NumPy arrays and may be spilled to a pickle file, replaced in ``chunks`` by its path."""
+    __slots__ = ("event_type", "fields", "kinds", "chunk_size", "chunks", "size", "_cached")
+
+    def __init__(self, event_type: str, chunk_size: int):
+        self.event_type = event_type
+        self.fields = _FIELDS[event_type]
+        self.kinds = _KINDS[event_type]
+        self.chunk_size = chunk_size
+        self.chunks: List[Any] = []
+        self.size = 0
+        self._cached: Tuple[int, Optional[Dict[str, Any]]] = (-1, None) # Last spilled chunk read back
+
+    def append(self, values: List[Any]) -> int:
+        if self.size % self.chunk_size == 0: self.chunks.append([[] for _ in self.fields])
+        for column, value in zip(self.chunks[-1], values): column.append(value)
+        row = self.size; self.size += 1
+        if self.size % self.chunk_size == 0: self.chunks[-1] = self._freeze(self.chunks[-1])
+        return row
+
+    def _freeze(self, columns: List[List[Any]]) -> Dict[str, Any]:
+        return {name: _freeze_column(kind, values) for name, kind, values in zip(self.fields, self.kinds, columns)}
+
+    def chunk(self, index: int) -> Any:
+        chunk = self.chunks[index]
+        if isinstance(chunk, str):
+            if self._cached[0] != index:
+                with open(chunk, "rb") as f: self._cached = (index, pickle.load(f))
+            return self._cached[1]
+        return chunk
+
+    def row(self, row: int) -> List[Any]:
+        index, offset = divmod(row, self.chunk_size); chunk = self.chunk(index)
+        if isinstance(chunk, list): return [column[offset] for column in chunk]
+        values = []
+        for name, kind in zip(self.fields, self.kinds):
+            value = chunk[name][offset]
+            if kind == "float": value = None if value != value else float(value)
+            elif kind == "int": value = None if value == INT_NULL else int(value)
+            elif kind == "category": value = int(value)
+            values.append(value)
+        return values
+
+    def column(self, name: str) -> np.ndarray:
+        """Raw column (float/int64/int32 codes/object) across all chunks, spilled ones included."""
+        position = self.fields.index(name); kind = self.kinds[position]
+        parts = []
+        for index in range(len(self.chunks)):
+            chunk = self.chunk(index)
+            values = _freeze_column(kind, chunk[position]) if isinstance(chunk, list) else chunk[name]
+            parts.append(np.asarray(values, dtype=object) if kind == "object" else values)
+        if not parts: return _freeze_column(kind, []) if kind != "object" else np.empty(0, dtype=object)
+        return np.concatenate(parts)
+
+    def spill(self, directory: str) -> int:
+        """Writes every frozen in-memory chunk to ``directory``; returns how many rows left memory."""
+        spilled = 0
+        for index, chunk in enumerate(self.chunks):
+            if not isinstance(chunk, dict): continue
+            path = os.path.join(directory, f"{self.event_type}_{index}.pkl")
+            with open(path, "wb") as f: pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.chunks[index] = path; spilled += self.chunk_size
+        return spilled
+
+
+class TradeEventLog(Sequence):
+    """
+    Append-only, columnar log of broker events, a drop-in for SimulatedBroker's former ``trade_history`` list.
+
+    Each event type of EVENT_SCHEMAS has its own table with a fixed schema: floats and magic numbers in NumPy columns,
+    low-cardinality strings (symbol, side, order type, close reason) as int32 category codes, ids and comments in
+    lists. Rows are appended into chunks of ``chunk_size``; once more than ``spill_threshold`` rows are held in memory,
+    the full chunks are pickled to ``spill_directory`` (a temporary directory by default; one directory per log) and
+    read back on access. Events whose keys or value types do not match their schema are kept as plain dicts.
+
+    ``log[i]`` and slices materialize the same dicts the broker appended (as copies), so iteration, ``len`` and
+    ``[offset:]`` work as before. ``column``, ``closes_by_reason`` and ``pnl_by_magic_number`` answer queries with
+    vectorized NumPy operations; ``to_frame``/``export`` write one event type or the whole log to Parquet, Arrow or CSV.
+    """
+
+    def __init__(self, events: Iterable[Dict[str, Any]] = (), chunk_size: int = 4096, spill_threshold: Optional[int] = None, spill_directory: Optional[str] = None):
+        self.chunk_size = max(int(chunk_size), 1)
+        self.spill_threshold = spill_threshold
+        self.spill_directory = spill_directory
+        self._temp_directory: Optional[tempfile.TemporaryDirectory] = None
+        self._tables = [_EventTable(event_type, self.chunk_size) for event_type in EVENT_TYPES]
+        self._other: List[Dict[str, Any]] = []
+        self._categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._codes = np.empty(1024, dtype=np.int8) # Log order: type code and row within its table
+        self._rows = np.empty(1024, dtype=np.int64)
+        self._size = 0
+        self._resident_rows = 0
+        self.extend(events)
+
+    def __len__(self) -> int: return self._size
+
+    def _category(self, value: Any) -> int:
+        if value is None: return -1
+        if not isinstance(value, str): raise TypeError(f"category value must be a str, got {type(value).__name__}")
+        code = self._category_codes.get(value)
+        if code is None: code = self._category_codes[value] = len(self._categories); self._categories.append(value)
+        return code
+
+    def _typed_values(self, table: _EventTable, event: Dict[str, Any]) -> List[Any]:
+        values = []
+        for name, kind in zip(table.fields, table.kinds):
+            value = event[name]
+            if kind == "float": value = None if value is None else float(value)
+            elif kind == "int":
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, np.integer))): raise TypeError(f"{name} must be an int")
+                value = None if value is None else int(value)
+            elif kind == "category": value = self._category(value)
+            values.append(value)
+        return values
+
+    def append(self, event: Dict[str, Any]) -> None:
+        code = _TYPE_IDS.get(event.get("event_type"), _OTHER); row = -1
+        if code != _OTHER:
+            table = self._tables[code]
+            if len(event) == len(table.fields) + 1 and all(name in event for name in table.fields):
+                try: row = table.append(self._typed_values(table, event))
+                except (TypeError, ValueError): row = -1
+        if row < 0: code = _OTHER; row = len(self._other); self._other.append(dict(event))
+        if self._size == len(self._codes):
+            self._codes = np.concatenate((self._codes, np.empty(self._size, dtype=np.int8)))
+            self._rows = np.concatenate((self._rows, np.empty(self._size, dtype=np.int64)))
+        self._codes[self._size] = code; self._rows[self._size] = row; self._size += 1
+        if code != _OTHER:
+            self._resident_rows += 1 # Spilling only moves full chunks, so it is due when one was just frozen
+            if self.spill_threshold is not None and self._tables[code].size % self.chunk_size == 0 and self._resident_rows > self.spill_threshold: self.spill()
+
+    def extend(self, events: Iterable[Dict[str, Any]]) -> None:
+        for event in events: self.append(event)
+
+    def clear(self) -> None:
+        self._tables = [_EventTable(event_type, self.chunk_size) for event_type in EVENT_TYPES]
+        self._other = []; self._size = 0; self._resident_rows = 0
+        if self._temp_directory is not None: self._temp_directory.cleanup(); self._temp_directory = None
+
+    def spill(self) -> None:
+        """Moves every full chunk to disk; the open chunk of each event type stays in memory."""
+        directory = self.spill_directory
+        if directory is None:
+            if self._temp_directory is None: self._temp_directory = tempfile.TemporaryDirectory(prefix="trade_events_")
+            directory = self._temp_directory.name
+        else: os.makedirs(directory, exist_ok=True)
+        for table in self._tables: self._resident_rows -= table.spill(directory)
+
+    def _item(self, index: int) -> Dict[str, Any]:
+        code = int(self._codes[index]); row = int(self._rows[index])
+        if code == _OTHER: return dict(self._other[row])
+        table = self._tables[code]; event: Dict[str, Any] = {"event_type": table.event_type}
+        for name, kind, value in zip(table.fields, table.kinds, table.row(row)):
+            event[name] = (None if value < 0 else self._categories[value]) if kind == "category" else value
+        return event
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return [self._item(i) for i in range(*index.indices(self._size))]
+        if index < 0: index += self._size
+        if not 0 <= index < self._size: raise IndexError(f"TradeEventLog index {index} out of range.")
+        return self._item(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self._size): yield self._item(index)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Sequence, list)) and not isinstance(other, (str, bytes)): return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str: return f"TradeEventLog({self._size} events, {self._resident_rows} rows in memory)"
+
+    # Pickles (and deep-copies) as the list of events, so a spilled log does not refer to its spill files.
+    def __reduce__(self): return (type(self), (list(self), self.chunk_size, self.spill_threshold))
+
+    def counts_by_type(self) -> Dict[str, int]:
+        """Number of logged events per event type."""
+        counts = {table.event_type: table.size for table in self._tables if table.size}
+        for event in self._other: counts[event.get("event_type")] = counts.get(event.get("event_type"), 0) + 1
+        return counts
+
+    def column(self, event_type: str, field: str) -> np.ndarray:
+        """
+        One field of every schema-conforming ``event_type`` event, in log order: float64 (NaN for None), int64
+        (INT_NULL for None) or object (category and free-text fields; None stays None).
+        """
+        table = self._tables[_TYPE_IDS[event_type]]
+        values = table.column(field); kind = table.kinds[table.fields.index(field)]
+        if kind == "category": return np.array(self._categories + [None], dtype=object)[values]
+        return values
+
+    def closes_by_reason(self) -> Dict[str, int]:
+        """Number of POSITION_CLOSED events per ``reason_for_close``."""
+        codes = self._tables[_TYPE_IDS["POSITION_CLOSED"]].column("reason_for_close")
+        counts = np.bincount(codes + 1, minlength=len(self._categories) + 1)
+        return {None if code < 0 else self._categories[code]: int(counts[code + 1]) for code in np.flatnonzero(counts) - 1}
+
+    def pnl_by_magic_number(self) -> Dict[Optional[int], float]:
+        """Total ``realized_pnl`` of closed positions per ``magic_number`` (None for positions without one)."""
+        table = self._tables[_TYPE_IDS["POSITION_CLOSED"]]
+        magic_numbers, pnl = table.column("magic_number"), table.column("realized_pnl")
+        keys, inverse = np.unique(magic_numbers, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.nan_to_num(pnl), minlength=len(keys))
+        return {None if key == INT_NULL else int(key): float(total) for key, total in zip(keys, totals)}
+
+    def to_frame(self, event_type: Optional[str] = None) -> pd.DataFrame:
+        """
+        One event type as a typed frame (its schema's columns, ``magic_number`` as nullable Int64), or the whole log
+        in order with the union of all columns when ``event_type`` is None.
+        """
+        if event_type is not None:
+            table = self._tables[_TYPE_IDS[event_type]]; frame = pd.DataFrame({"event_type": pd.Series([event_type] * table.size, dtype=object)})
+            for name, kind in zip(table.fields, table.kinds):
+                values = self.column(event_type, name)
+                frame[name] = pd.arrays.IntegerArray(values, values == INT_NULL) if kind == "int" else values
+            return frame
+        frames = []
+        for code, table in enumerate(self._tables):
+            if not table.size: continue
+            frame = self.to_frame(table.event_type); frame.index = np.flatnonzero(self._codes[:self._size] == code); frames.append(frame)
+        if self._other: frames.append(pd.DataFrame(self._other, index=np.flatnonzero(self._codes[:self._size] == _OTHER)))
+        if not frames: return pd.DataFrame({"event_type": pd.Series([], dtype=object)})
+        return pd.concat(frames).sort_index().reset_index(drop=True)
+
+    def export(self, path: str, event_type: Optional[str] = None) -> str:
+        """Writes ``to_frame(event_type)`` to ``.parquet``, ``.arrow``/``.feather`` (both need pyarrow) or ``.csv``, chosen by the file extension."""
+        frame = self.to_frame(event_type)
+        if path.endswith((".parquet", ".arrow", ".feather")):
+            try:
+                if path.endswith(".parquet"): frame.to_parquet(path, index=False)
+                else: frame.to_feather(path)
+            except ImportError as e: raise ImportError(f"TradeEventLog.export: Parquet/Arrow export needs pyarrow ({e}). Use a .csv path instead.") from e
+        elif path.endswith(".csv"): frame.to_csv(path, index=False)
+        else: raise ValueError(f"TradeEventLog.export: unsupported file extension for {path} (use .parquet, .arrow, .feather or .csv).")
+        print(f"TradeEventLog: Exported {len(frame)} events to {path}.")
+        return path
@@ -0,0 +1,94 @@
+import contextlib
+import io
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.bar_store import SymbolBars
+from TradingAgents.tradingagents.forex_utils.forex_states import AccountInfo, Candlestick
+from TradingAgents.tradingagents.forex_utils.tick_store import SymbolTicks
+
+
+class MultiAccountBroker:
+    """
+    N isolated SimulatedBroker accounts over one shared market-data feed, e.g. one per paper-traded strategy.
+
+    Each account is a full SimulatedBroker (hand it to that strategy's graph as its broker): balances, positions,
+    pending orders and trade history are its own. What does not depend on the account is held once and shared: the
+    market-data snapshot, the bar/tick stores filled by ``load_test_data``/``load_tick_data``, the symbol registry and
+    the currency conversion cache, whose pair graph is built once per snapshot for all accounts.
+
+    Per bar, as in BacktestingEngine.run: ``on_bar`` advances every account in one pass (time, market data, pending
+    orders, SL/TP), the strategies then trade on their accounts, and ``check_for_margin_calls`` runs the margin checks.
+    An account without positions or orders only pays for taking the new snapshot.
+
+    ``seed`` makes the accounts' slippage reproducible: an account added without its own seed draws from
+    random.Random seeded with this seed and its name. Without a broker seed, the account's seed is drawn from the
+    global random module, so ``random.seed(...)`` before adding the accounts reproduces the run.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed
+        with contextlib.redirect_stdout(io.StringIO()): self._feed = SimulatedBroker() # Owns the shared stores; never trades
+        self.accounts: Dict[str, SimulatedBroker] = {}
+        self.current_market_data: Dict[str, Candlestick] = {}
+        self.current_simulated_time_unix: Optional[float] = None
+
+    def add_account(self, name: str, initial_capital: float = 10000.0, position_store: str = "dict", seed: Optional[int] = None, **settings: Any) -> SimulatedBroker:
+        """
+        Opens an account; ``settings`` are SimulatedBroker attributes to override (leverage, account_currency,
+        stop_out_level_pct, default_spread_pips, ...). Each account draws its slippage from its own random.Random(seed),
+        so one account's fills do not depend on how the others trade; without ``seed`` it is derived as described on
+        the class. The generator's state is part of the account's checkpoint. An account added mid-run starts at the
+        current bar.
+        """
+        if name in self.accounts: raise ValueError(f"MultiAccountBroker: account '{name}' already exists.")
+        account_seed: Union[int, str] = seed if seed is not None else (f"{self.seed}:{name}" if self.seed is not None else random.getrandbits(64))
+        account = SimulatedBroker(initial_capital=initial_capital, position_store=position_store, rng=random.Random(account_seed))
+        for setting, value in settings.items():
+            if not hasattr(account, setting) or setting.startswith("_"): raise ValueError(f"MultiAccountBroker: unknown account setting '{setting}'.")
+            setattr(account, setting, value)
+        feed = self._feed
+        account.symbol_registry = feed.symbol_registry; account._rates = feed._rates
+        account.test_data_store = feed.test_data_store; account.timeframe_data_store = feed.timeframe_data_store; account.tick_data_store = feed.tick_data_store
+        if self.current_simulated_time_unix is not None: account.update_current_time(self.current_simulated_time_unix)
+        if self.current_market_data: account.update_market_data(self.current_market_data)
+        self.accounts[name] = account
+        return account
+
+    def remove_account(self, name: str) -> SimulatedBroker: return self.accounts.pop(name)
+    def __getitem__(self, name: str) -> SimulatedBroker: return self.accounts[name]
+    def __iter__(self) -> Iterator[str]: return iter(self.accounts)
+    def __len__(self) -> int: return len(self.accounts)
+
+    # Data loaded once into the shared stores serves get_historical_data / tick replay of every account.
+    def load_test_data(self, symbol: str, data_sequence: Union[List[Dict[str, Any]], SymbolBars], timeframe: Optional[str] = None): self._feed.load_test_data(symbol, data_sequence, timeframe)
+    def load_tick_data(self, symbol: str, tick_data: Union[List[Dict], SymbolTicks]): self._feed.load_tick_data(symbol, tick_data)
+
+    def update_current_time(self, simulated_time_unix: float):
+        self.current_simulated_time_unix = simulated_time_unix
+        for account in self.accounts.values(): account.update_current_time(simulated_time_unix)
+
+    def update_market_data(self, market_data: Dict[str, Candlestick]):
+        self.current_market_data = market_data
+        for account in self.accounts.values(): account.update_market_data(market_data)
+
+    def on_bar(self, timestamp: float, market_data: Dict[str, Candlestick]):
+        """One bar for every account: time and snapshot, then pending-order fills and SL/TP closes per account."""
+        self.current_simulated_time_unix = timestamp; self.current_market_data = market_data
+        for account in self.accounts.values():
+            account.update_current_time(timestamp); account.update_market_data(market_data)
+            if account.pending_orders: account.process_pending_orders()
+            if account.open_positions: account.check_for_sl_tp_triggers()
+
+    def check_for_margin_calls(self):
+        for account in self.accounts.values():
+            if account.open_positions: account.check_for_margin_call()
+
+    def replay_ticks(self, tick_windows: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> int:
+        """Replays the ticks through every account with positions or pending orders; returns the total fills/closes."""
+        return sum(account.replay_ticks(tick_windows) for account in self.accounts.values() if account.open_positions or account.pending_orders)
+
+    def get_account_infos(self) -> Dict[str, Optional[AccountInfo]]: return {name: account.get_account_info() for name, account in self.accounts.items()}
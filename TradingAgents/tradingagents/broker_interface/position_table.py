@@ -0,0 +1,160 @@
+from collections.abc import Mapping, MutableMapping
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, Position
+
+# Numeric columns of the table; SL/TP use NaN for "not set".
+FLOAT_COLUMNS = ("volume", "entry_price", "current_price", "profit_loss", "stop_loss", "take_profit", "open_time")
+_SIDE_CODES = {OrderSide.BUY: 1, OrderSide.SELL: -1}
+_SIDES = {1: OrderSide.BUY, -1: OrderSide.SELL}
+
+
+class PositionTable(MutableMapping):
+    """
+    Struct-of-arrays store of open positions: side as int8 (+1 buy, -1 sell), symbol as an int32 id, volume, prices,
+    SL/TP and open time as float64 columns; ids, magic numbers and comments stay in Python lists.
+
+    It is a drop-in for SimulatedBroker's ``open_positions`` dict: ``table[position_id]`` returns the position as a
+    Position dict (a copy; write changes back with ``table[position_id] = position``), assignment adds or overwrites a
+    row and ``del`` frees it for reuse. ``revalue`` prices every position of a symbol in one vectorized expression.
+    At ~70 bytes per position in the columns it holds portfolio simulations with thousands of positions compactly.
+    """
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(capacity, 1)
+        self._columns: Dict[str, np.ndarray] = {name: np.full(capacity, np.nan) for name in FLOAT_COLUMNS}
+        self._side = np.zeros(capacity, dtype=np.int8)
+        self._symbol_id = np.full(capacity, -1, dtype=np.int32) # -1 marks a free row
+        self._position_ids: List[Optional[str]] = [None] * capacity
+        self._magic_numbers: List[Optional[int]] = [None] * capacity
+        self._comments: List[Optional[str]] = [None] * capacity
+        self._rows: Dict[str, int] = {} # position_id -> row, in insertion order
+        self._free_rows: List[int] = list(range(capacity - 1, -1, -1))
+        self._symbols: List[str] = []
+        self._symbol_ids: Dict[str, int] = {}
+
+    def _grow(self) -> None:
+        capacity = len(self._side); grown = capacity * 2
+        for name, column in self._columns.items():
+            self._columns[name] = np.concatenate((column, np.full(capacity, np.nan)))
+        self._side = np.concatenate((self._side, np.zeros(capacity, dtype=np.int8)))
+        self._symbol_id = np.concatenate((self._symbol_id, np.full(capacity, -1, dtype=np.int32)))
+        for values in (self._position_ids, self._magic_numbers, self._comments): values.extend([None] * capacity)
+        self._free_rows.extend(range(grown - 1, capacity - 1, -1))
+
+    def symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None: symbol_id = self._symbol_ids[symbol] = len(self._symbols); self._symbols.append(symbol)
+        return symbol_id
+
+    def __len__(self) -> int: return len(self._rows)
+    def __iter__(self) -> Iterator[str]: return iter(self._rows)
+    def __contains__(self, position_id: object) -> bool: return position_id in self._rows
+
+    def __setitem__(self, position_id: str, position: Position) -> None:
+        row = self._rows.get(position_id)
+        if row is None:
+            if not self._free_rows: self._grow()
+            row = self._free_rows.pop(); self._rows[position_id] = row
+        columns = self._columns
+        for name in FLOAT_COLUMNS:
+            value = position.get(name)
+            columns[name][row] = np.nan if value is None else value
+        self._side[row] = _SIDE_CODES[position['side']]
+        self._symbol_id[row] = self.symbol_id(position['symbol'])
+        self._position_ids[row] = position_id; self._magic_numbers[row] = position.get('magic_number'); self._comments[row] = position.get('comment')
+
+    def __getitem__(self, position_id: str) -> Position:
+        row = self._rows[position_id]; columns = self._columns
+        stop_loss, take_profit = float(columns["stop_loss"][row]), float(columns["take_profit"][row])
+        return Position(position_id=position_id, symbol=self._symbols[self._symbol_id[row]], side=_SIDES[int(self._side[row])],
+                        volume=float(columns["volume"][row]), entry_price=float(columns["entry_price"][row]), current_price=float(columns["current_price"][row]),
+                        profit_loss=float(columns["profit_loss"][row]), stop_loss=None if stop_loss != stop_loss else stop_loss,
+                        take_profit=None if take_profit != take_profit else take_profit, open_time=float(columns["open_time"][row]),
+                        magic_number=self._magic_numbers[row], comment=self._comments[row])
+
+    def __delitem__(self, position_id: str) -> None:
+        row = self._rows.pop(position_id)
+        self._symbol_id[row] = -1; self._position_ids[row] = None; self._magic_numbers[row] = None; self._comments[row] = None
+        self._free_rows.append(row)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (dict, MutableMapping)): return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self) -> str: return f"PositionTable({len(self)} positions, capacity {len(self._side)})"
+
+    def symbol_rows(self, symbol: str) -> np.ndarray:
+        """Rows of the open positions of ``symbol``."""
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None: return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self._symbol_id == symbol_id)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of a whole column ("side", "symbol_id" or one of FLOAT_COLUMNS); free rows hold stale values."""
+        view = self._side if name == "side" else self._symbol_id if name == "symbol_id" else self._columns[name]
+        view = view.view(); view.flags.writeable = False
+        return view
+
+    def revalue(self, symbol: str, buy_price: float, sell_price: float, pnl_per_price_unit: float) -> float:
+        """
+        Sets current_price/profit_loss of every position of ``symbol``: longs at ``buy_price`` (the bid they close on),
+        shorts at ``sell_price``, in account currency per 1.0 price move per lot. Returns their total P/L.
+        """
+        rows = self.symbol_rows(symbol)
+        if not len(rows): return 0.0
+        side = self._side[rows]; columns = self._columns
+        price = np.where(side > 0, buy_price, sell_price)
+        profit_loss = (price - columns["entry_price"][rows]) * side * pnl_per_price_unit * columns["volume"][rows]
+        columns["current_price"][rows] = price; columns["profit_loss"][rows] = profit_loss
+        return float(profit_loss.sum())
+
+    def profit_losses(self) -> np.ndarray:
+        """profit_loss of the open positions, in iteration (opening) order."""
+        rows = np.fromiter(self._rows.values(), dtype=np.intp, count=len(self._rows))
+        return self._columns["profit_loss"][rows]
+
+
+class CopyOnWritePositions(MutableMapping):
+    """
+    Open positions of a broker fork: reads fall through to the parent's position store and a position is copied into
+    the fork the first time it is read (the broker updates positions in place), so forking costs nothing up front and
+    only the positions a what-if touches are ever copied. Added and closed positions are tracked on the fork alone.
+
+    The parent store is read live: the view reflects the parent as of the fork only while the parent is left unchanged.
+    """
+
+    def __init__(self, base: Mapping):
+        self._base = base
+        self._copies: Dict[str, Position] = {} # position_id -> the fork's own copy (copied on read, or added)
+        self._added: Dict[str, None] = {} # Ids not in the parent, in insertion order
+        self._deleted: Set[str] = set() # Parent ids closed in the fork
+
+    def __len__(self) -> int: return len(self._base) - len(self._deleted) + len(self._added)
+    def __contains__(self, position_id: object) -> bool: return position_id in self._added or (position_id in self._base and position_id not in self._deleted)
+
+    def __iter__(self) -> Iterator[str]:
+        for position_id in self._base:
+            if position_id not in self._deleted: yield position_id
+        yield from self._added
+
+    def __getitem__(self, position_id: str) -> Position:
+        position = self._copies.get(position_id)
+        if position is None:
+            if position_id in self._deleted: raise KeyError(position_id)
+            position = self._copies[position_id] = Position(**self._base[position_id])
+        return position
+
+    def __setitem__(self, position_id: str, position: Position) -> None:
+        if position_id in self._base: self._deleted.discard(position_id)
+        else: self._added[position_id] = None
+        self._copies[position_id] = position
+
+    def __delitem__(self, position_id: str) -> None:
+        if position_id not in self: raise KeyError(position_id)
+        self._copies.pop(position_id, None); self._added.pop(position_id, None)
+        if position_id in self._base: self._deleted.add(position_id)
+
+    def __repr__(self) -> str: return f"CopyOnWritePositions({len(self)} positions, {len(self._copies)} copied)"
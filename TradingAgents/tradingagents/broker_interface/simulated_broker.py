@@ -1,25 +1,95 @@
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Sequence, Tuple, Union
+import numpy as np
 from TradingAgents.tradingagents.broker_interface.base import BrokerInterface
+from TradingAgents.tradingagents.broker_interface.event_log import TradeEventLog
+from TradingAgents.tradingagents.broker_interface.position_table import CopyOnWritePositions, PositionTable
+from TradingAgents.tradingagents.broker_interface.trigger_book import PendingOrderBook, TriggerBook
+from TradingAgents.tradingagents.forex_utils.bar_store import BarSequence, SymbolBars
+from TradingAgents.tradingagents.forex_utils.symbol_specs import SymbolRegistry, SymbolSpec
+from TradingAgents.tradingagents.forex_utils.tick_store import SymbolTicks
 from TradingAgents.tradingagents.forex_utils.forex_states import (
     Tick, Candlestick, AccountInfo, OrderResponse, Position,
     OrderType, OrderSide, TimeInForce
 )
+import copy
 import datetime
+import heapq
 import time
 import random
 import uuid
 
+class _SymbolExposure:
+    """
+    Aggregates of one symbol's open positions. Unrealized PnL is linear in the entry price and margin in the volume,
+    so per-side sums of volume and volume * entry price value all positions of the symbol at once.
+    """
+    __slots__ = ("num_positions", "buy_volume", "buy_volume_entry", "sell_volume", "sell_volume_entry",
+                 "valuation_key", "buy_price", "sell_price", "pnl_per_price_unit", "unrealized_pnl", "margin")
+
+    def __init__(self):
+        self.num_positions = 0
+        self.buy_volume = self.buy_volume_entry = self.sell_volume = self.sell_volume_entry = 0.0
+        self.valuation_key: Optional[Tuple] = None # Inputs of the last valuation; unchanged inputs skip the revaluation
+        self.buy_price: Optional[float] = None # Valuation prices (bid side for longs, ask side for shorts)
+        self.sell_price: Optional[float] = None
+        self.pnl_per_price_unit: Optional[float] = None # Account currency per 1.0 price move per lot
+        self.unrealized_pnl = 0.0
+        self.margin = 0.0
+
+    def add(self, side: OrderSide, volume: float, entry_price: float, sign: int = 1):
+        self.num_positions += sign
+        if side == OrderSide.BUY: self.buy_volume += sign * volume; self.buy_volume_entry += sign * volume * entry_price
+        else: self.sell_volume += sign * volume; self.sell_volume_entry += sign * volume * entry_price
+        self.valuation_key = None
+
+    def copy(self) -> "_SymbolExposure":
+        clone = _SymbolExposure.__new__(_SymbolExposure)
+        for name in self.__slots__: setattr(clone, name, getattr(self, name))
+        return clone
+
+
+class _ConversionCache:
+    """Conversion matrix of one market-data snapshot: its direct pair rates and the triangulated rows computed so far."""
+    __slots__ = ("market_data", "graph", "tables")
+
+    def __init__(self):
+        self.market_data: Optional[Dict[str, Candlestick]] = None # Snapshot the graph was built from (compared by identity)
+        self.graph: Dict[str, Dict[str, float]] = {} # currency -> directly quoted currency -> rate (see _build_conversion_matrix)
+        self.tables: Dict[str, Dict[str, Dict[str, float]]] = {} # account currency -> from -> to -> rate
+
+    def copy(self) -> "_ConversionCache":
+        clone = _ConversionCache(); clone.market_data = self.market_data; clone.graph = self.graph # The graph is never modified once built
+        clone.tables = {currency: dict(table) for currency, table in self.tables.items()}
+        return clone
+
+
+class _ForkedRandom:
+    """Random generator of a broker fork: continues from its parent's generator, whose state is copied on the first draw."""
+    __slots__ = ("_source", "_rng")
+
+    def __init__(self, source: Any): self._source = source; self._rng: Optional[random.Random] = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._rng is None: self._rng = random.Random(); self._rng.setstate(self._source.getstate())
+        return getattr(self._rng, name)
+
+
 class SimulatedBroker(BrokerInterface):
-    def __init__(self, initial_capital: float = 10000.0):
+    def __init__(self, initial_capital: float = 10000.0, position_store: str = "dict", rng: Optional[random.Random] = None):
+        # position_store: "dict" keeps each open position as a Position dict; "arrays" keeps them in a struct-of-arrays
+        # PositionTable (same mapping interface, positions read back as copies) for simulations with thousands of positions.
+        # rng: generator for slippage draws; None draws from the global random module.
+        if position_store not in ("dict", "arrays"): raise ValueError(f"SimulatedBroker: position_store must be 'dict' or 'arrays', got {position_store!r}.")
         self.initial_capital = initial_capital
         self.balance = initial_capital
         self.equity = initial_capital
         self._connected = True
         self.current_simulated_time_unix = time.time()
+        self.account_id = self._generate_unique_id()[:8] # Generated once, reported by every get_account_info call
 
-        self.open_positions: Dict[str, Position] = {}
-        self.pending_orders: Dict[str, Dict[str, Any]] = {}
-        self.trade_history: List[Dict] = []
+        self.open_positions: Union[Dict[str, Position], PositionTable] = PositionTable() if position_store == "arrays" else {}
+        self.pending_orders: PendingOrderBook = PendingOrderBook() # order_id -> order, indexed by trigger price and expiry
+        self.trade_history: TradeEventLog = TradeEventLog() # Columnar; reads back as the event dicts appended to it
 
         self.order_fill_logic: str = "CURRENT_BAR_CLOSE"
         self.base_slippage_pips: float = 0.2
@@ -35,7 +105,28 @@ class SimulatedBroker(BrokerInterface):
         self.account_currency = "USD"
         self.margin_call_warning_level_pct = 100.0
         self.stop_out_level_pct = 50.0
-        self.test_data_store: Dict[str, List[Dict]] = {}
+        # Stop-out liquidation: "sequential" closes the largest loss and re-checks the margin level after each close;
+        # "batch" picks the whole set of worst-first positions to close in one pass and updates the account once.
+        self.liquidation_mode: str = "sequential"
+        self.day_order_cutoff_hour_utc: int = 0 # DAY orders expire at the next HH:00 UTC after placement
+        # Bar history served by get_historical_data as read-only BarSequence windows over columnar SymbolBars.
+        self.test_data_store: Dict[str, BarSequence] = {} # symbol -> bars of the timeframe the backtest runs on
+        self.timeframe_data_store: Dict[Tuple[str, str], BarSequence] = {} # (symbol, timeframe) -> bars loaded for that timeframe
+        self.tick_data_store: Dict[str, SymbolTicks] = {}
+        self.symbol_registry = SymbolRegistry.default() # Contract specs, resolved once per symbol
+        # Currency conversion matrix of the current market-data snapshot, filled lazily row by row (see _conversion_row)
+        self._rates = _ConversionCache() # Shared by the accounts of a MultiAccountBroker
+        self._reported_missing_rates: set = set()
+        # Incremental account valuation: per-symbol exposures are revalued only when their positions or prices change;
+        # per-position profit_loss/current_price are filled in lazily when positions are read (see _refresh_position_valuations).
+        self._exposures: Dict[str, _SymbolExposure] = {}
+        self._changed_symbols: set = set()
+        self._valued_market_data: Optional[Dict[str, Candlestick]] = None
+        self._valued_account_settings: Optional[Tuple[str, int]] = None
+        self._unrealized_pnl_total = 0.0
+        self._positions_valued = True
+        self._trigger_book = TriggerBook() # SL/TP levels of the open positions, kept in sync by every open/modify/close
+        self._rng: Optional[Any] = rng # Slippage draws; None uses the global random module (a fork has its own)
 
         self.commission_per_lot: Dict[str, float] = {
             "EURUSD": 7.0, "GBPUSD": 7.0, "USDJPY": 7.0, "AUDUSD": 7.0, "USDCAD": 7.0, "XAUUSD": 7.0, "default": 7.0
@@ -43,7 +134,38 @@ class SimulatedBroker(BrokerInterface):
 
         print(f"SimulatedBroker initialized. Capital: {initial_capital}, Base Slippage: {self.base_slippage_pips} pips, Volume Slippage Factor: {self.volume_slippage_factor_pips_per_million} pips/million, Leverage: {self.leverage}:1, Account Currency: {self.account_currency}, Margin Warning: {self.margin_call_warning_level_pct}%, Stop Out: {self.stop_out_level_pct}%")
 
-    def load_test_data(self, symbol: str, data_sequence: List[Dict[str, Any]]):
+    def load_test_data(self, symbol: str, data_sequence: Union[List[Dict[str, Any]], SymbolBars], timeframe: Optional[str] = None):
+        """
+        Bar history for get_historical_data, as Candlestick dicts or a (possibly memory-mapped) SymbolBars table. With
+        ``timeframe`` the bars only serve requests for that timeframe; without it they serve every other request.
+        """
+        if isinstance(data_sequence, SymbolBars): bars = self._validate_symbol_bars(symbol, data_sequence)
+        else: bars = SymbolBars.from_candlesticks(symbol, self._validate_candlesticks(symbol, data_sequence))
+        if len(bars) > 1 and np.any(np.diff(bars.timestamp) < 0):
+            print(f"SimBroker WARNING: Bars for {symbol.upper()} are not in time order. Sorting them.")
+            bars = bars.take(np.argsort(bars.timestamp, kind="stable"))
+        if bars.symbol != symbol.upper(): bars = SymbolBars(symbol, bars.columns)
+        timeframe_label = f" ({timeframe.upper()})" if timeframe else ""
+        print(f"SimBroker: Loaded {len(bars)} (out of {len(data_sequence)} provided) bars of test data for {symbol.upper()}{timeframe_label} after validation.")
+        if timeframe: self.timeframe_data_store[(symbol.upper(), timeframe.upper())] = bars.rows()
+        else: self.test_data_store[symbol.upper()] = bars.rows()
+
+    def _validate_symbol_bars(self, symbol: str, bars: SymbolBars) -> SymbolBars:
+        # Vectorized counterpart of _validate_candlesticks; only copies the columns when something has to be dropped or fixed.
+        valid = bars.timestamp > 0
+        for field in ('open', 'high', 'low', 'close'): valid &= bars.columns[field] > 0
+        num_invalid = int(len(bars) - np.count_nonzero(valid))
+        if num_invalid:
+            print(f"SimBroker WARNING: {num_invalid} bar(s) for {symbol.upper()} have a non-positive/missing timestamp or OHLC value. Skipping them.")
+            bars = bars.take(valid)
+        if np.any(bars.bid_close <= 0) or np.any(bars.ask_close <= 0):
+            print(f"SimBroker WARNING: Bars for {symbol.upper()} have non-positive bid_close/ask_close values. Storing them as missing.")
+            bars = SymbolBars(bars.symbol, {**bars.columns, **{field: np.where(bars.columns[field] > 0, bars.columns[field], np.nan) for field in ('bid_close', 'ask_close')}})
+        num_crossed = int(np.count_nonzero(bars.bid_close > bars.ask_close))
+        if num_crossed: print(f"SimBroker WARNING: {num_crossed} bar(s) for {symbol.upper()} have bid_close > ask_close. Data might be suspect. Still loading.")
+        return bars
+
+    def _validate_candlesticks(self, symbol: str, data_sequence: List[Dict[str, Any]]) -> List[Candlestick]:
         validated_data_sequence: List[Candlestick] = []
         for idx, bar_data in enumerate(data_sequence):
             is_valid = True
@@ -87,88 +209,118 @@ class SimulatedBroker(BrokerInterface):
                 print(f"SimBroker WARNING: Bar {idx} for {symbol} has bid_close ({candlestick_entry['bid_close']}) > ask_close ({candlestick_entry['ask_close']}). Data might be suspect. Still loading.")
 
             validated_data_sequence.append(candlestick_entry)
-
-        print(f"SimBroker: Loaded {len(validated_data_sequence)} (out of {len(data_sequence)} provided) bars of test data for {symbol.upper()} after validation.")
-        self.test_data_store[symbol.upper()] = validated_data_sequence
-
-    def load_tick_data(self, symbol: str, tick_data: List[Dict]):
-        print(f"SimBroker: load_tick_data called for {symbol} with {len(tick_data)} ticks. Tick data loading not yet fully implemented.")
+        return validated_data_sequence
+
+    def load_tick_data(self, symbol: str, tick_data: Union[List[Dict], SymbolTicks]):
+        # tick_data: [{"timestamp", "bid", "ask", "volume"(optional)}, ...] or a (possibly memory-mapped) SymbolTicks.
+        ticks = tick_data if isinstance(tick_data, SymbolTicks) else SymbolTicks.from_ticks(symbol, tick_data)
+        valid = (ticks.timestamp > 0) & (ticks.bid > 0) & (ticks.ask > 0) # NaN compares False, so missing quotes are dropped too
+        num_invalid = int(len(ticks) - np.count_nonzero(valid))
+        if num_invalid:
+            print(f"SimBroker WARNING: {num_invalid} tick(s) for {symbol.upper()} have a non-positive/missing timestamp, bid or ask. Skipping them.")
+            ticks = ticks.take(valid)
+        num_crossed = int(np.count_nonzero(ticks.bid > ticks.ask))
+        if num_crossed: print(f"SimBroker WARNING: {num_crossed} tick(s) for {symbol.upper()} have bid > ask. Data might be suspect. Still loading.")
+        if len(ticks) > 1 and np.any(np.diff(ticks.timestamp) < 0):
+            print(f"SimBroker WARNING: Ticks for {symbol.upper()} are not in time order. Sorting them.")
+            ticks = ticks.take(np.argsort(ticks.timestamp, kind="stable"))
+        if ticks.symbol != symbol.upper(): ticks = SymbolTicks(symbol, ticks.columns)
+        print(f"SimBroker: Loaded {len(ticks)} (out of {len(tick_data)} provided) ticks for {symbol.upper()} after validation.")
+        self.tick_data_store[symbol.upper()] = ticks
 
     def _generate_unique_id(self) -> str:
         return str(uuid.uuid4())
 
-    def _get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
-        symbol_upper = symbol.upper()
-        contract_size_units = 100000.0
-        info = None
-        if len(symbol_upper) == 6 and symbol_upper.isalnum():
-            base = symbol_upper[:3]
-            quote = symbol_upper[3:]
-            if "JPY" == quote:
-                info = {"base_currency": base, "quote_currency": quote, "price_precision": 3, "point_size": 0.001, "pip_definition": 0.01, "contract_size_units": contract_size_units}
-            else:
-                info = {"base_currency": base, "quote_currency": quote, "price_precision": 5, "point_size": 0.00001, "pip_definition": 0.0001, "contract_size_units": contract_size_units}
-        elif symbol_upper in ["XAUUSD", "GOLD"]:
-            info = {"base_currency": "XAU", "quote_currency": "USD", "price_precision": 2, "point_size": 0.01, "pip_definition": 0.1, "contract_size_units": 100.0}
+    def load_symbol_specs(self, path: str):
+        """Adds/overrides contract specs (contract size, pip definition, precision, ...) from a JSON config file."""
+        self.symbol_registry.load(path)
 
-        if info: return info
-        else:
-            print(f"SimBroker._get_symbol_info: Symbol info not explicitly configured for '{symbol_upper}'. Attempting generic parsing or default.")
-            if len(symbol_upper) == 6 and symbol_upper.isalnum():
-                base = symbol_upper[:3]; quote = symbol_upper[3:]
-                return {"base_currency": base, "quote_currency": quote, "price_precision": 5, "point_size": 0.00001, "pip_definition": 0.0001, "contract_size_units": contract_size_units}
-            print(f"SimBroker._get_symbol_info: Could not determine info for '{symbol_upper}'. Returning None.")
-            return None
+    def _get_symbol_info(self, symbol: str) -> Optional[SymbolSpec]: return self.symbol_registry.get(symbol)
 
     def _get_point_size(self, symbol: str) -> float:
-        info = self._get_symbol_info(symbol)
-        return info["point_size"] if info else 0.00001
+        spec = self.symbol_registry.get(symbol)
+        return spec.point_size if spec is not None else 0.00001
 
     def _get_price_precision(self, symbol: str) -> int:
-        info = self._get_symbol_info(symbol)
-        return info["price_precision"] if info else 5
+        spec = self.symbol_registry.get(symbol)
+        return spec.price_precision if spec is not None else 5
 
     def _get_pip_value_for_sl_tp(self, symbol: str) -> float:
-        info = self._get_symbol_info(symbol)
-        return info["pip_definition"] if info and "pip_definition" in info else (0.01 if "JPY" in symbol.upper() else 0.0001)
+        spec = self.symbol_registry.get(symbol)
+        return spec.pip_definition if spec is not None else (0.01 if "JPY" in symbol.upper() else 0.0001)
+
+    def _get_contract_size(self, symbol: str) -> float:
+        spec = self.symbol_registry.get(symbol)
+        return spec.contract_size_units if spec is not None else 100000.0
+
+    def _build_conversion_matrix(self, market_data: Dict[str, Candlestick]) -> Dict[str, Dict[str, float]]:
+        """
+        Sparse currency x currency matrix of ``market_data``: the direct and inverse rate of every pair (from its close),
+        as currency -> currency -> rate. The indirect rates are triangulated row by row on first use (_conversion_row).
+        """
+        graph: Dict[str, Dict[str, float]] = {}
+        for symbol, bar in market_data.items():
+            spec = self.symbol_registry.get(symbol)
+            if spec is None or not bar: continue
+            try: close = float(bar.get('close'))
+            except (TypeError, ValueError): print(f"SimBroker._build_conversion_matrix: Could not convert close price '{bar.get('close')}' to float for {symbol}."); continue
+            if not close > 0: continue
+            graph.setdefault(spec.base_currency, {})[spec.quote_currency] = close
+            graph.setdefault(spec.quote_currency, {})[spec.base_currency] = 1.0 / close
+        return graph
+
+    def _conversion_row(self, from_currency: str) -> Dict[str, float]:
+        # Breadth-first over the pairs: every currency gets the rate of its shortest chain of pairs. The account
+        # currency is expanded first, so two-hop rates go through it as the former direct -> inverse -> via-account lookup did.
+        account_currency = self.account_currency.upper(); graph = self._rates.graph
+        row = {from_currency: 1.0}; frontier = [from_currency]
+        while frontier:
+            next_frontier: List[str] = []
+            for currency in frontier:
+                rate_to_currency = row[currency]
+                for neighbour, rate in graph.get(currency, {}).items():
+                    if neighbour in row: continue
+                    row[neighbour] = rate_to_currency * rate
+                    if neighbour == account_currency: next_frontier.insert(0, neighbour)
+                    else: next_frontier.append(neighbour)
+            frontier = next_frontier
+        return row
+
+    def _conversion_rates(self) -> Dict[str, Dict[str, float]]:
+        # Keyed on the identity of current_market_data: update_market_data, tick replay and checkpoint restore all
+        # assign a new dict, so the pair graph is rebuilt at most once per snapshot and only if a conversion is needed.
+        # Rows depend on the account currency (it is expanded first), so each account currency has its own table.
+        market_data = self.current_market_data; rates = self._rates
+        if rates.market_data is not market_data:
+            rates.graph = self._build_conversion_matrix(market_data); rates.tables = {}; rates.market_data = market_data
+        table = rates.tables.get(self.account_currency)
+        if table is None: table = rates.tables[self.account_currency] = {}
+        return table
 
     def _get_exchange_rate(self, from_currency: str, to_currency: str) -> Optional[float]:
-        from_curr = from_currency.upper(); to_curr = to_currency.upper()
-        if from_curr == to_curr: return 1.0
+        if from_currency == to_currency: return 1.0
         if not self.current_market_data:
-            print(f"SimBroker._get_exchange_rate: current_market_data is not populated. Cannot get rate for {from_curr}/{to_curr}.")
+            print(f"SimBroker._get_exchange_rate: current_market_data is not populated. Cannot get rate for {from_currency.upper()}/{to_currency.upper()}.")
             return None
-
-        def get_pair_close_price(symbol: str) -> Optional[float]:
-            symbol_upper = symbol.upper()
-            if symbol_upper in self.current_market_data and self.current_market_data[symbol_upper]:
-                close_price = self.current_market_data[symbol_upper].get('close')
-                if close_price is not None:
-                    try: return float(close_price)
-                    except ValueError: print(f"SimBroker._get_exchange_rate: Could not convert close_price '{close_price}' to float for {symbol_upper}."); return None
-            return None
-
-        direct_pair_symbol = f"{from_curr}{to_curr}"; rate = get_pair_close_price(direct_pair_symbol)
+        table = self._conversion_rates()
+        row = table.get(from_currency) # Fast path: spec currencies are already upper case
+        rate = row.get(to_currency) if row is not None else None
         if rate is not None: return rate
-        inverse_pair_symbol = f"{to_curr}{from_curr}"; inverse_rate = get_pair_close_price(inverse_pair_symbol)
-        if inverse_rate is not None:
-            if inverse_rate == 0: print(f"SimBroker._get_exchange_rate: Inverse rate for {inverse_pair_symbol} is zero, cannot divide."); return None
-            return 1.0 / inverse_rate
-        elif inverse_rate == 0: print(f"SimBroker._get_exchange_rate: Inverse rate for {inverse_pair_symbol} is zero (or data error), cannot divide.")
-
-        intermediary_curr = self.account_currency.upper()
-        if from_curr != intermediary_curr and to_curr != intermediary_curr:
-            from_curr_to_intermediary_rate = self._get_exchange_rate(from_curr, intermediary_curr)
-            to_curr_to_intermediary_rate = self._get_exchange_rate(to_curr, intermediary_curr)
-            if from_curr_to_intermediary_rate is not None and to_curr_to_intermediary_rate is not None:
-                if to_curr_to_intermediary_rate == 0: print(f"SimBroker._get_exchange_rate: Triangulation Path A failed for {from_curr}/{to_curr}. Divisor (TO/{intermediary_curr}) is zero.")
-                else: return from_curr_to_intermediary_rate / to_curr_to_intermediary_rate
-        print(f"SimBroker._get_exchange_rate: Exchange rate for {from_curr}/{to_curr} could not be determined..."); return None
+        from_curr = from_currency.upper(); to_curr = to_currency.upper()
+        if from_curr == to_curr: return 1.0
+        row = table.get(from_curr)
+        if row is None: row = table[from_curr] = table[from_currency] = self._conversion_row(from_curr)
+        rate = row.get(to_curr)
+        if rate is None: # No chain of pairs connects the two currencies in this snapshot
+            if (from_curr, to_curr) not in self._reported_missing_rates:
+                self._reported_missing_rates.add((from_curr, to_curr))
+                print(f"SimBroker._get_exchange_rate: Exchange rate for {from_curr}/{to_curr} could not be determined from the loaded pairs (reported once).")
+        return rate
 
     def calculate_pip_value_in_account_currency(self, symbol: str, volume_lots: float) -> Optional[float]:
-        symbol_info = self._get_symbol_info(symbol)
-        if not symbol_info: print(f"SimBroker.calculate_pip_value: Could not get symbol info for {symbol}."); return None
-        pip_definition_in_price_terms = symbol_info['pip_definition']; quote_currency = symbol_info['quote_currency']; contract_size = symbol_info['contract_size_units']
+        spec = self.symbol_registry.get(symbol)
+        if spec is None: print(f"SimBroker.calculate_pip_value: Could not get symbol info for {symbol}."); return None
+        pip_definition_in_price_terms = spec.pip_definition; quote_currency = spec.quote_currency; contract_size = spec.contract_size_units
         value_of_one_pip_in_quote_currency = pip_definition_in_price_terms * contract_size * volume_lots
         if quote_currency == self.account_currency: return value_of_one_pip_in_quote_currency
         else:
@@ -177,9 +329,9 @@ class SimulatedBroker(BrokerInterface):
             return value_of_one_pip_in_quote_currency * exchange_rate
 
     def calculate_pnl_in_account_currency(self, symbol: str, side: OrderSide, volume_lots: float, entry_price: float, close_price: float) -> Optional[float]:
-        symbol_info = self._get_symbol_info(symbol)
-        if not symbol_info: print(f"SimBroker.calculate_pnl: Could not get symbol info for {symbol}."); return None
-        pip_definition_val = symbol_info['pip_definition']
+        spec = self.symbol_registry.get(symbol)
+        if spec is None: print(f"SimBroker.calculate_pnl: Could not get symbol info for {symbol}."); return None
+        pip_definition_val = spec.pip_definition
         if pip_definition_val == 0: print(f"SimBroker.calculate_pnl: Pip definition for {symbol} is zero..."); return None
         price_difference = (close_price - entry_price) if side == OrderSide.BUY else (entry_price - close_price)
         pips_moved = price_difference / pip_definition_val
@@ -195,24 +347,23 @@ class SimulatedBroker(BrokerInterface):
             hist_bid: Optional[float] = float(hist_bid_val) if hist_bid_val is not None else None
             hist_ask: Optional[float] = float(hist_ask_val) if hist_ask_val is not None else None
             if hist_bid is not None and hist_ask is not None and hist_ask > hist_bid: return hist_ask - hist_bid
-        symbol_info = self._get_symbol_info(symbol_upper)
-        if not symbol_info: print(f"SimBroker._get_spread_in_price_terms: Could not get symbol info for {symbol_upper}..."); return 0.0
+        spec = self.symbol_registry.get(symbol_upper)
+        if spec is None: print(f"SimBroker._get_spread_in_price_terms: Could not get symbol info for {symbol_upper}..."); return 0.0
         configured_pips = self.default_spread_pips.get(symbol_upper, self.default_spread_pips.get("default", 1.0))
-        pip_definition_for_symbol = symbol_info['pip_definition']
-        return configured_pips * pip_definition_for_symbol
+        return configured_pips * spec.pip_definition
 
     def _calculate_commission(self, symbol: str, volume_lots: float) -> float:
         return self.commission_per_lot.get(symbol.upper(), self.commission_per_lot.get("default", 7.0)) * volume_lots
 
     def _calculate_margin_required(self, symbol: str, volume_lots: float, entry_price: float) -> float:
-        symbol_info = self._get_symbol_info(symbol)
-        contract_size = symbol_info['contract_size_units'] if symbol_info and 'contract_size_units' in symbol_info else 100000.0
+        spec = self.symbol_registry.get(symbol)
+        contract_size = spec.contract_size_units if spec is not None else 100000.0
 
         notional_value_in_quote_currency = volume_lots * contract_size * entry_price
-        base_currency = symbol_info['base_currency'] if symbol_info else ""
-        quote_currency = symbol_info['quote_currency'] if symbol_info else ""
+        base_currency = spec.base_currency if spec is not None else ""
+        quote_currency = spec.quote_currency if spec is not None else ""
 
-        if not symbol_info:
+        if spec is None:
             print(f"SimBroker._calculate_margin_required: Symbol info for {symbol} not found. Margin might be inaccurate.")
             return (volume_lots * contract_size * entry_price) / self.leverage
 
@@ -228,7 +379,48 @@ class SimulatedBroker(BrokerInterface):
         return margin_in_base_currency_units * exchange_rate_base_to_account
 
     def update_current_time(self, simulated_time_unix: float): self.current_simulated_time_unix = simulated_time_unix
+    # market_data values may be plain Candlestick dicts or read-only CandlestickView rows of a BarStore; both are only read here.
     def update_market_data(self, market_data: Dict[str, Candlestick]): self.current_market_data = market_data; self._update_equity_and_margin()
+    # trade_history is not part of the snapshot: CheckpointManager appends it incrementally.
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        self._refresh_position_valuations()
+        return {"account_id": self.account_id, "balance": self.balance, "equity": self.equity, "margin_used": self.margin_used, "current_simulated_time_unix": self.current_simulated_time_unix,
+                "open_positions": self.open_positions, "pending_orders": self.pending_orders,
+                "current_market_data": {symbol: dict(bar) for symbol, bar in self.current_market_data.items()},
+                "rng_state": self._rng.getstate() if self._rng is not None else None} # The global RNG is the engine's to save
+
+    def restore_checkpoint_state(self, state: Dict[str, Any], trade_history: List[Dict]):
+        self.account_id = state["account_id"]
+        self.balance, self.equity, self.margin_used = state["balance"], state["equity"], state["margin_used"]
+        self.current_simulated_time_unix = state["current_simulated_time_unix"]
+        self.open_positions = state["open_positions"]; self.pending_orders = PendingOrderBook(state["pending_orders"])
+        self.current_market_data = state["current_market_data"]
+        if state["rng_state"] is not None:
+            if self._rng is None: self._rng = random.Random()
+            self._rng.setstate(state["rng_state"])
+        if trade_history is not self.trade_history: self.trade_history.clear(); self.trade_history.extend(trade_history)
+        self._rebuild_exposures()
+        self._trigger_book.clear()
+        for position in self.open_positions.values(): self._trigger_book.add(position)
+
+    def fork(self) -> "SimulatedBroker":
+        """
+        Copy-on-write what-if view of this broker: place, modify or close orders and move prices on the fork to see the
+        resulting account, then discard it. Balances are copied, open positions are read through from this broker and
+        copied only when the fork touches them, and the pending-order and SL/TP books are copied at container level.
+        Market data, bar/tick stores and settings are shared, not copied; the fork's trade_history starts empty.
+        Slippage on the fork draws from its own generator continuing this broker's random state, so a fork does not
+        disturb this broker's draws. Use the fork before this broker changes again.
+        """
+        forked = copy.copy(self)
+        forked.open_positions = CopyOnWritePositions(self.open_positions)
+        forked.pending_orders = self.pending_orders.fork(); forked._trigger_book = self._trigger_book.fork()
+        forked._exposures = {symbol: exposure.copy() for symbol, exposure in self._exposures.items()}
+        forked._changed_symbols = set(self._changed_symbols); forked._reported_missing_rates = set(self._reported_missing_rates); forked._rates = self._rates.copy()
+        forked.trade_history = TradeEventLog()
+        forked._rng = _ForkedRandom(self._rng or random)
+        return forked
+
     def connect(self, credentials: Dict[str, Any]) -> bool: self._connected = True; return True
     def disconnect(self) -> None: self._connected = False
     def is_connected(self) -> bool: return self._connected
@@ -260,16 +452,22 @@ class SimulatedBroker(BrokerInterface):
             ask_price = round(bar_close_price + (spread_amount / 2.0), precision)
             return Tick(symbol=symbol_upper, timestamp=timestamp_to_use, bid=bid_price, ask=ask_price, last=bar_close_price, volume=current_volume)
 
-    def get_historical_data(self, symbol: str, timeframe_str: str, start_time_unix: float, end_time_unix: Optional[float] = None, count: Optional[int] = None) -> List[Dict]:
+    def get_historical_data(self, symbol: str, timeframe_str: str, start_time_unix: Optional[float], end_time_unix: Optional[float] = None, count: Optional[int] = None) -> Sequence[Candlestick]:
+            # Loaded history is returned as a read-only BarSequence (CandlestickView rows, no copies) found by binary search;
+            # start_time_unix may be None for a count-only fetch of the last ``count`` bars up to the current time.
             symbol_upper = symbol.upper()
             effective_end_time_unix = min(end_time_unix if end_time_unix is not None else self.current_simulated_time_unix, self.current_simulated_time_unix)
-            print(f"SimBroker: get_historical_data({symbol_upper}, TF:{timeframe_str}) requested range: {datetime.datetime.fromtimestamp(start_time_unix, tz=datetime.timezone.utc).isoformat()} to {datetime.datetime.fromtimestamp(effective_end_time_unix, tz=datetime.timezone.utc).isoformat()}. Current sim time: {datetime.datetime.fromtimestamp(self.current_simulated_time_unix, tz=datetime.timezone.utc).isoformat()}")
-            if symbol_upper in self.test_data_store:
-                all_bars_for_symbol = self.test_data_store[symbol_upper]
-                relevant_bars = [Candlestick(**bar) for bar in all_bars_for_symbol if bar['timestamp'] >= start_time_unix and bar['timestamp'] <= effective_end_time_unix]
-                if count is not None and len(relevant_bars) > count: relevant_bars = relevant_bars[-count:]
+            requested_start = datetime.datetime.fromtimestamp(start_time_unix, tz=datetime.timezone.utc).isoformat() if start_time_unix is not None else f"last {count} bars"
+            print(f"SimBroker: get_historical_data({symbol_upper}, TF:{timeframe_str}) requested range: {requested_start} to {datetime.datetime.fromtimestamp(effective_end_time_unix, tz=datetime.timezone.utc).isoformat()}. Current sim time: {datetime.datetime.fromtimestamp(self.current_simulated_time_unix, tz=datetime.timezone.utc).isoformat()}")
+            stored_bars = self.timeframe_data_store.get((symbol_upper, timeframe_str.upper()))
+            if stored_bars is None: stored_bars = self.test_data_store.get(symbol_upper)
+            if stored_bars is not None:
+                relevant_bars = stored_bars.window(start_time_unix, effective_end_time_unix, count)
                 print(f"SimBroker: Returning {len(relevant_bars)} bars from test_data_store for {symbol_upper}."); return relevant_bars
             else:
+                if start_time_unix is None:
+                    if count is None: return []
+                    start_time_unix = float('-inf')
                 print(f"SimBroker: No test_data_store for {symbol_upper}. Generating dummy historical data.")
                 dummy_bars_generated: List[Candlestick] = []; time_step_seconds = self._get_timeframe_seconds_approx(timeframe_str)
                 if count is not None: num_to_gen = count; current_bar_open_time_for_dummy = effective_end_time_unix - time_step_seconds
@@ -283,9 +481,9 @@ class SimulatedBroker(BrokerInterface):
                     if "JPY" in symbol_upper: base_price = 150.00 + (idx_from_oldest * 0.01)
                     elif "XAU" in symbol_upper: base_price = 2300.00 + (idx_from_oldest * 0.1)
                     precision = self._get_price_precision(symbol_upper); point = self._get_point_size(symbol_upper) * 10
-                    open_val = round(base_price + random.uniform(-point, point), precision); close_val = round(base_price + random.uniform(-point, point), precision)
-                    high_val = round(max(open_val, close_val) + random.uniform(0, point*2), precision); low_val = round(min(open_val, close_val) - random.uniform(0, point*2), precision)
-                    dummy_bars_generated.append(Candlestick(timestamp=bar_open_timestamp, open=open_val, high=high_val, low=low_val, close=close_val, volume=float(random.randint(500,2000) + idx_from_oldest)))
+                    open_val = round(base_price + (self._rng or random).uniform(-point, point), precision); close_val = round(base_price + (self._rng or random).uniform(-point, point), precision)
+                    high_val = round(max(open_val, close_val) + (self._rng or random).uniform(0, point*2), precision); low_val = round(min(open_val, close_val) - (self._rng or random).uniform(0, point*2), precision)
+                    dummy_bars_generated.append(Candlestick(timestamp=bar_open_timestamp, open=open_val, high=high_val, low=low_val, close=close_val, volume=float((self._rng or random).randint(500,2000) + idx_from_oldest)))
                 dummy_bars_generated.sort(key=lambda x: x['timestamp'])
                 final_dummy_bars = [b for b in dummy_bars_generated if b['timestamp'] >= start_time_unix and b['timestamp'] < effective_end_time_unix]
                 print(f"SimBroker: Generated and returning {len(final_dummy_bars)} dummy bars for {symbol_upper}."); return final_dummy_bars
@@ -307,7 +505,7 @@ class SimulatedBroker(BrokerInterface):
         if not self.is_connected(): return None
         free_margin = self.equity - self.margin_used
         margin_level = (self.equity / self.margin_used * 100) if self.margin_used > 0 else float('inf')
-        return AccountInfo(account_id=self._generate_unique_id()[:8], balance=round(self.balance, 2), equity=round(self.equity, 2), margin=round(self.margin_used, 2), free_margin=round(free_margin, 2), margin_level=round(margin_level, 2) if margin_level != float('inf') else float('inf'), currency=self.account_currency)
+        return AccountInfo(account_id=self.account_id, balance=round(self.balance, 2), equity=round(self.equity, 2), margin=round(self.margin_used, 2), free_margin=round(free_margin, 2), margin_level=round(margin_level, 2) if margin_level != float('inf') else float('inf'), currency=self.account_currency)
 
     def place_order(self, symbol: str, order_type: OrderType, side: OrderSide, volume: float, price: Optional[float] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None, time_in_force: TimeInForce = TimeInForce.GTC, magic_number: Optional[int] = 0, comment: Optional[str] = "") -> OrderResponse:
         order_id = self._generate_unique_id(); timestamp_unix = self.current_simulated_time_unix
@@ -328,14 +526,7 @@ class SimulatedBroker(BrokerInterface):
             else: return OrderResponse(order_id=order_id, status="REJECTED", error_message="Invalid order side.")
             if not market_open_for_trade: return OrderResponse(order_id=order_id, status="REJECTED", symbol=symbol, side=side, type=order_type, volume=volume, price=price, timestamp=timestamp_unix, error_message=f"Market closed or data issue for {symbol} (no valid fill base price).")
 
-            symbol_info = self._get_symbol_info(symbol)
-            contract_size = symbol_info['contract_size_units'] if symbol_info and 'contract_size_units' in symbol_info else 100000.0
-            volume_in_base_currency_units = volume * contract_size; volume_in_millions = volume_in_base_currency_units / 1_000_000.0
-            dynamic_slippage_pips = volume_in_millions * self.volume_slippage_factor_pips_per_million
-            total_slippage_pips = self.base_slippage_pips + dynamic_slippage_pips
-            final_slippage_pips = total_slippage_pips * random.uniform(0.8, 1.2); final_slippage_pips = max(0, final_slippage_pips)
-            pip_definition_val = self._get_pip_value_for_sl_tp(symbol)
-            slippage_amount_in_price_terms = final_slippage_pips * pip_definition_val
+            slippage_amount_in_price_terms = self._calculate_slippage_in_price_terms(symbol, volume)
 
             entry_price_final: float
             if side == OrderSide.BUY: entry_price_final = round(fill_price_base_for_slippage + slippage_amount_in_price_terms, price_precision)
@@ -348,26 +539,71 @@ class SimulatedBroker(BrokerInterface):
 
             commission_cost = self._calculate_commission(symbol, volume); position_id = self._generate_unique_id()
             new_position = Position(position_id=position_id, symbol=symbol, side=side, volume=volume, entry_price=entry_price_final, current_price=entry_price_final, profit_loss= -commission_cost, stop_loss=stop_loss, take_profit=take_profit, open_time=timestamp_unix, magic_number=magic_number, comment=comment)
-            self.open_positions[position_id] = new_position; self.balance -= commission_cost; self.margin_used += margin_for_this_trade
+            self.open_positions[position_id] = new_position; self.balance -= commission_cost; self._add_exposure(new_position); self._trigger_book.add(new_position)
             self._update_equity_and_margin()
             self.trade_history.append({"event_type": "MARKET_ORDER_FILLED", "timestamp": timestamp_unix, "order_id": order_id, "position_id": position_id, "symbol": symbol, "side": side.value, "volume": volume, "fill_price": entry_price_final, "sl": stop_loss, "tp": take_profit, "commission": commission_cost, "comment": comment})
             print(f"SimBroker: {side.value} {volume} {symbol} @ {entry_price_final} (spread/slip incl). PosID: {position_id}. Comm: {commission_cost:.2f}")
             return OrderResponse(order_id=order_id, status="FILLED", symbol=symbol, side=side, type=order_type, volume=volume, price=entry_price_final, timestamp=timestamp_unix, error_message=None, position_id=position_id)
         elif order_type in [OrderType.LIMIT, OrderType.STOP]:
             if price is None: return OrderResponse(order_id=order_id, status="REJECTED", error_message="Price required for pending orders.")
-            self.pending_orders[order_id] = {"order_id": order_id, "status": "PENDING", "symbol": symbol, "side": side, "type": order_type, "volume": volume, "price": price, "timestamp": timestamp_unix, "stop_loss": stop_loss, "take_profit": take_profit, "magic_number": magic_number, "comment": comment}
-            self.trade_history.append({"event_type": "PENDING_ORDER_PLACED", "timestamp": timestamp_unix, "order_id": order_id, "symbol": symbol, "side": side.value, "type": order_type.value, "volume": volume, "price": price, "sl": stop_loss, "tp": take_profit, "comment": comment})
-            print(f"SimBroker: Pending {side.value} {order_type.value} for {volume} {symbol} @ {price} SL:{stop_loss} TP:{take_profit} placed. OrderID: {order_id}")
+            expiry_time = self._day_order_expiry(timestamp_unix) if time_in_force == TimeInForce.DAY else None
+            order = {"order_id": order_id, "status": "PENDING", "symbol": symbol, "side": side, "type": order_type, "volume": volume, "price": price, "timestamp": timestamp_unix, "stop_loss": stop_loss, "take_profit": take_profit, "magic_number": magic_number, "comment": comment, "time_in_force": time_in_force, "expiry_time": expiry_time}
+            if time_in_force in (TimeInForce.IOC, TimeInForce.FOK): return self._fill_or_cancel(order)
+            self.pending_orders[order_id] = order
+            self.trade_history.append({"event_type": "PENDING_ORDER_PLACED", "timestamp": timestamp_unix, "order_id": order_id, "symbol": symbol, "side": side.value, "type": order_type.value, "volume": volume, "price": price, "sl": stop_loss, "tp": take_profit, "comment": comment, "time_in_force": time_in_force.value, "expiry_time": expiry_time})
+            print(f"SimBroker: Pending {side.value} {order_type.value} for {volume} {symbol} @ {price} SL:{stop_loss} TP:{take_profit} {time_in_force.value} placed. OrderID: {order_id}")
             return OrderResponse(order_id=order_id, status="PENDING", symbol=symbol, side=side, type=order_type, volume=volume, price=price, timestamp=timestamp_unix, error_message=None)
         return OrderResponse(order_id=order_id, status="REJECTED", error_message="Unsupported order type.")
 
+    def _day_order_expiry(self, timestamp_unix: float) -> float:
+        placed = datetime.datetime.fromtimestamp(timestamp_unix, tz=datetime.timezone.utc)
+        cutoff = placed.replace(hour=self.day_order_cutoff_hour_utc, minute=0, second=0, microsecond=0)
+        if cutoff <= placed: cutoff += datetime.timedelta(days=1)
+        return cutoff.timestamp()
+
+    def _fill_or_cancel(self, order: Dict[str, Any]) -> OrderResponse:
+        """IOC/FOK LIMIT/STOP orders execute in full against the current quote or are cancelled (there are no partial fills, so IOC and FOK coincide)."""
+        order_id, symbol, side, order_type, volume, price = order['order_id'], order['symbol'], order['side'], order['type'], order['volume'], order['price']
+        quote = self.get_current_price(symbol); is_buy = side == OrderSide.BUY
+        fill_price = None
+        if quote is not None:
+            market_price = quote['ask'] if is_buy else quote['bid']
+            if order_type == OrderType.LIMIT and (market_price <= price if is_buy else market_price >= price): fill_price = market_price
+            elif order_type == OrderType.STOP and (market_price >= price if is_buy else market_price <= price):
+                slippage = self._calculate_slippage_in_price_terms(symbol, volume)
+                fill_price = market_price + slippage if is_buy else market_price - slippage
+        response = OrderResponse(order_id=order_id, status="CANCELLED", symbol=symbol, side=side, type=order_type, volume=volume, price=price, timestamp=self.current_simulated_time_unix, error_message=None)
+        if fill_price is None:
+            self.trade_history.append({"event_type": "PENDING_ORDER_CANCELLED", "timestamp": self.current_simulated_time_unix, "order_id": order_id, "symbol": symbol, "side": side.value, "type": order_type.value, "volume": volume, "price": price, "reason": f"{order['time_in_force'].value} not immediately fillable"})
+            print(f"SimBroker: {order['time_in_force'].value} {side.value} {order_type.value} {volume} {symbol} @ {price} not immediately fillable. Cancelled. OrderID: {order_id}")
+            response['error_message'] = "Not immediately fillable."
+            return response
+        position_id = self._execute_pending_fill(order_id, order, round(fill_price, self._get_price_precision(symbol)), market_price)
+        if position_id is None: response.update(status="REJECTED", error_message="Insufficient free margin."); return response
+        response.update(status="FILLED", price=self.open_positions[position_id]['entry_price'], position_id=position_id)
+        return response
+
+    def _expire_pending_orders(self):
+        for order_id in self.pending_orders.expired(self.current_simulated_time_unix):
+            po = self.pending_orders.pop(order_id)
+            self.trade_history.append({"event_type": "PENDING_ORDER_EXPIRED", "timestamp": self.current_simulated_time_unix, "order_id": order_id, "symbol": po['symbol'], "side": po['side'].value, "type": po['type'].value, "volume": po['volume'], "price": po['price'], "expiry_time": po['expiry_time']})
+            print(f"SimBroker: Pending order {order_id} ({po['symbol']} {po['side'].value} {po['type'].value} @ {po['price']}) EXPIRED.")
+
     def process_pending_orders(self):
         if not self.current_market_data or not self.current_simulated_time_unix: return
+        self._expire_pending_orders()
+        # The order book returns only the orders whose trigger price lies inside the bar's range, in placement order.
+        triggered = []
+        for symbol in self.pending_orders.symbols():
+            bar = self.current_market_data.get(symbol)
+            if not bar: continue
+            bar_range = (bar['low'], bar['high']); triggered.extend(self.pending_orders.triggered(symbol, bar_range, bar_range))
+        if len(triggered) > 1: triggered.sort()
         orders_to_remove_after_processing = []
-        for order_id, po_details in list(self.pending_orders.items()):
+        for _, order_id in triggered:
+            po_details = self.pending_orders[order_id]
             symbol, bar, order_price, order_type, order_side, order_volume = po_details['symbol'], self.current_market_data.get(po_details['symbol']), po_details['price'], po_details['type'], po_details['side'], po_details['volume']
             if not bar: continue
-            sl_pos, tp_pos, magic_pos, comment_pos = po_details.get('stop_loss'), po_details.get('take_profit'), po_details.get('magic_number'), po_details.get('comment', f"Filled from pending {order_id}")
             fill_price_sim: Optional[float] = None; precision = self._get_price_precision(symbol)
             if order_type == OrderType.LIMIT:
                 if order_side == OrderSide.BUY and bar['low'] <= order_price: fill_price_sim = min(order_price, bar['open'])
@@ -378,17 +614,7 @@ class SimulatedBroker(BrokerInterface):
 
             if fill_price_sim is not None:
                 hist_bid_close: Optional[float] = bar.get('bid_close'); hist_ask_close: Optional[float] = bar.get('ask_close')
-                pip_definition_val = self._get_pip_value_for_sl_tp(symbol)
-                slippage_for_stop_order_price_terms = 0.0
-                if order_type == OrderType.STOP:
-                    symbol_info = self._get_symbol_info(symbol)
-                    contract_size = symbol_info['contract_size_units'] if symbol_info and 'contract_size_units' in symbol_info else 100000.0
-                    volume_in_base_currency_units = order_volume * contract_size
-                    volume_in_millions = volume_in_base_currency_units / 1_000_000.0
-                    dynamic_slippage_pips = volume_in_millions * self.volume_slippage_factor_pips_per_million
-                    total_slippage_pips = self.base_slippage_pips + dynamic_slippage_pips
-                    final_slippage_pips = total_slippage_pips * random.uniform(0.8, 1.2); final_slippage_pips = max(0, final_slippage_pips)
-                    slippage_for_stop_order_price_terms = final_slippage_pips * pip_definition_val
+                slippage_for_stop_order_price_terms = self._calculate_slippage_in_price_terms(symbol, order_volume) if order_type == OrderType.STOP else 0.0
 
                 base_price_for_execution: float; actual_fill_price: float
                 if order_side == OrderSide.BUY:
@@ -406,56 +632,101 @@ class SimulatedBroker(BrokerInterface):
 
                 actual_fill_price = round(actual_fill_price, precision)
                 print(f"SimBroker: Pending order {order_id} ({symbol} {order_side.value} {order_type.value} @ {order_price}) TRIGGERED. Fill Price Sim: {fill_price_sim:.{precision}f}. Base for Exec: {base_price_for_execution:.{precision}f}. Final Fill: {actual_fill_price:.{precision}f}")
-                ts_unix = self.current_simulated_time_unix
-                margin_req = self._calculate_margin_required(symbol, order_volume, actual_fill_price)
-                self._update_equity_and_margin()
-                free_margin = self.equity - self.margin_used
-                if free_margin < margin_req:
-                    print(f"SimBroker: Insufficient margin for pending {order_id}. Need: {margin_req:.2f}, Have: {free_margin:.2f}. Removed.")
-                    self.trade_history.append({"event_type": "PENDING_ORDER_FAIL_MARGIN", "timestamp": ts_unix, "order_id": order_id, "symbol": symbol, "side": order_side.value, "volume": order_volume, "trigger_price": fill_price_sim, "reason": "Insufficient margin"})
-                    orders_to_remove_after_processing.append(order_id); continue
-                commission = self._calculate_commission(symbol, order_volume); pos_id = self._generate_unique_id()
-                new_pos = Position(position_id=pos_id, symbol=symbol, side=order_side, volume=order_volume, entry_price=actual_fill_price, current_price=actual_fill_price, profit_loss= -commission, stop_loss=sl_pos, take_profit=tp_pos, open_time=ts_unix, magic_number=magic_pos, comment=comment_pos)
-                self.open_positions[pos_id] = new_pos; self.balance -= commission; self.margin_used += margin_req
-                self._update_equity_and_margin()
-                self.trade_history.append({"event_type": "PENDING_ORDER_FILLED", "timestamp": ts_unix, "original_order_id": order_id, "position_id": pos_id, "symbol": symbol, "side": order_side.value, "type": order_type.value, "volume": order_volume, "requested_price": order_price, "fill_price": actual_fill_price, "sl": sl_pos, "tp": tp_pos, "commission": commission, "comment": comment_pos})
-                print(f"SimBroker: Pending order {order_id} FILLED. New PosID: {pos_id} for {symbol} {order_side.value} {order_volume} @ {actual_fill_price}. Comm: {commission:.2f}")
+                self._execute_pending_fill(order_id, po_details, actual_fill_price, fill_price_sim)
                 orders_to_remove_after_processing.append(order_id)
         for oid in orders_to_remove_after_processing:
             if oid in self.pending_orders: del self.pending_orders[oid]
 
-    def _update_equity_and_margin(self):
-        current_total_unrealized_pnl = 0.0; current_total_margin_used = 0.0
-        for pos_id, pos in list(self.open_positions.items()): # pos is a Position (dict)
-            symbol_info = self._get_symbol_info(pos['symbol'])
-            if not symbol_info:
-                print(f"SimBroker._update_equity_and_margin: Missing symbol info for {pos['symbol']}, cannot update P/L accurately.")
-                current_total_unrealized_pnl += pos.get('profit_loss', 0.0)
-                current_total_margin_used += self._calculate_margin_required(pos['symbol'], pos['volume'], pos['entry_price'])
-                continue
-            current_bar = self.current_market_data.get(pos['symbol'])
-            if not current_bar:
-                current_total_unrealized_pnl += pos.get('profit_loss', 0.0)
-                current_total_margin_used += self._calculate_margin_required(pos['symbol'], pos['volume'], pos['entry_price'])
-                continue
-
-            market_close_price = current_bar['close']; spread_amount_for_symbol = self._get_spread_in_price_terms(pos['symbol']); price_precision = symbol_info['price_precision']
-            valuation_price: float
-            if pos['side'] == OrderSide.BUY: valuation_price = round(market_close_price - (spread_amount_for_symbol / 2), price_precision)
-            else: valuation_price = round(market_close_price + (spread_amount_for_symbol / 2), price_precision)
+    def _execute_pending_fill(self, order_id: str, po_details: Dict[str, Any], actual_fill_price: float, trigger_price: float) -> Optional[str]:
+        """Opens the position of a triggered pending order (margin permitting). The caller removes the order. Returns the position id."""
+        symbol, order_price, order_type, order_side, order_volume = po_details['symbol'], po_details['price'], po_details['type'], po_details['side'], po_details['volume']
+        sl_pos, tp_pos, magic_pos, comment_pos = po_details.get('stop_loss'), po_details.get('take_profit'), po_details.get('magic_number'), po_details.get('comment', f"Filled from pending {order_id}")
+        ts_unix = self.current_simulated_time_unix
+        margin_req = self._calculate_margin_required(symbol, order_volume, actual_fill_price)
+        self._update_equity_and_margin()
+        free_margin = self.equity - self.margin_used
+        if free_margin < margin_req:
+            print(f"SimBroker: Insufficient margin for pending {order_id}. Need: {margin_req:.2f}, Have: {free_margin:.2f}. Removed.")
+            self.trade_history.append({"event_type": "PENDING_ORDER_FAIL_MARGIN", "timestamp": ts_unix, "order_id": order_id, "symbol": symbol, "side": order_side.value, "volume": order_volume, "trigger_price": trigger_price, "reason": "Insufficient margin"})
+            return None
+        commission = self._calculate_commission(symbol, order_volume); pos_id = self._generate_unique_id()
+        new_pos = Position(position_id=pos_id, symbol=symbol, side=order_side, volume=order_volume, entry_price=actual_fill_price, current_price=actual_fill_price, profit_loss= -commission, stop_loss=sl_pos, take_profit=tp_pos, open_time=ts_unix, magic_number=magic_pos, comment=comment_pos)
+        self.open_positions[pos_id] = new_pos; self.balance -= commission; self._add_exposure(new_pos); self._trigger_book.add(new_pos)
+        self._update_equity_and_margin()
+        self.trade_history.append({"event_type": "PENDING_ORDER_FILLED", "timestamp": ts_unix, "original_order_id": order_id, "position_id": pos_id, "symbol": symbol, "side": order_side.value, "type": order_type.value, "volume": order_volume, "requested_price": order_price, "fill_price": actual_fill_price, "sl": sl_pos, "tp": tp_pos, "commission": commission, "comment": comment_pos})
+        print(f"SimBroker: Pending order {order_id} FILLED. New PosID: {pos_id} for {symbol} {order_side.value} {order_volume} @ {actual_fill_price}. Comm: {commission:.2f}")
+        return pos_id
+
+    def _add_exposure(self, position: Position, sign: int = 1):
+        symbol = position['symbol']; exposure = self._exposures.get(symbol)
+        if exposure is None: exposure = self._exposures[symbol] = _SymbolExposure()
+        exposure.add(position['side'], position['volume'], position['entry_price'], sign)
+        if exposure.num_positions == 0: del self._exposures[symbol] # Start the next position of the symbol from exact zero sums
+        self._changed_symbols.add(symbol)
+
+    def _rebuild_exposures(self):
+        self._exposures = {}; self._changed_symbols = set(); self._valued_market_data = None
+        for position in self.open_positions.values(): self._add_exposure(position)
+
+    def _value_exposure(self, symbol: str, exposure: _SymbolExposure):
+        spec = self.symbol_registry.get(symbol); current_bar = self.current_market_data.get(symbol)
+        total_volume = exposure.buy_volume + exposure.sell_volume
+        average_entry = (exposure.buy_volume_entry + exposure.sell_volume_entry) / total_volume if total_volume else 0.0
+        if spec is None or not current_bar:
+            # No price for the symbol in this snapshot: keep valuing at the last prices, as positions kept their last P/L.
+            if spec is None: print(f"SimBroker._update_equity_and_margin: Missing symbol info for {symbol}, cannot update P/L accurately.")
+            if exposure.pnl_per_price_unit is not None and exposure.buy_price is not None:
+                exposure.unrealized_pnl = exposure.pnl_per_price_unit * (exposure.buy_price * exposure.buy_volume - exposure.buy_volume_entry + exposure.sell_volume_entry - exposure.sell_price * exposure.sell_volume)
+            else: exposure.unrealized_pnl = sum(pos.get('profit_loss', 0.0) for pos in self.open_positions.values() if pos['symbol'] == symbol)
+            exposure.margin = self._calculate_margin_required(symbol, total_volume, average_entry); exposure.valuation_key = None
+            return
 
-            unrealized_pnl_for_pos = self.calculate_pnl_in_account_currency(pos['symbol'], pos['side'], pos['volume'], pos['entry_price'], valuation_price)
-            if unrealized_pnl_for_pos is not None:
-                self.open_positions[pos_id]['profit_loss'] = unrealized_pnl_for_pos
-                self.open_positions[pos_id]['current_price'] = valuation_price
-                current_total_unrealized_pnl += unrealized_pnl_for_pos
-            else:
-                print(f"SimBroker._update_equity_and_margin: PNL calculation failed for {pos['symbol']} pos {pos_id}. Using last known PNL.")
-                current_total_unrealized_pnl += pos.get('profit_loss', 0.0)
+        market_close_price = current_bar['close']; spread_amount_for_symbol = self._get_spread_in_price_terms(symbol); price_precision = spec.price_precision
+        buy_price = round(market_close_price - (spread_amount_for_symbol / 2), price_precision)
+        sell_price = round(market_close_price + (spread_amount_for_symbol / 2), price_precision)
+        pip_value = self.calculate_pip_value_in_account_currency(symbol, 1.0)
+        margin_rate = self._get_exchange_rate(spec.base_currency, self.account_currency)
+        key = (buy_price, sell_price, pip_value, margin_rate)
+        if key == exposure.valuation_key: return # Neither the positions nor anything they are valued with changed
+        exposure.valuation_key = key; exposure.buy_price = buy_price; exposure.sell_price = sell_price
+        if pip_value is not None and spec.pip_definition: exposure.pnl_per_price_unit = pip_value / spec.pip_definition
+        elif exposure.pnl_per_price_unit is None:
+            print(f"SimBroker._update_equity_and_margin: PNL calculation failed for {symbol}. Using last known PNL.")
+            exposure.unrealized_pnl = sum(pos.get('profit_loss', 0.0) for pos in self.open_positions.values() if pos['symbol'] == symbol)
+        if exposure.pnl_per_price_unit is not None:
+            exposure.unrealized_pnl = exposure.pnl_per_price_unit * (buy_price * exposure.buy_volume - exposure.buy_volume_entry + exposure.sell_volume_entry - sell_price * exposure.sell_volume)
+        exposure.margin = self._calculate_margin_required(symbol, total_volume, average_entry)
+        self._positions_valued = False
 
-            margin_for_pos = self._calculate_margin_required(pos['symbol'], pos['volume'], pos['entry_price'])
-            current_total_margin_used += margin_for_pos
-        self.equity = self.balance + current_total_unrealized_pnl; self.margin_used = current_total_margin_used
+    def _update_equity_and_margin(self):
+        # O(symbols whose positions or prices changed), not O(positions). A new market-data snapshot or account
+        # setting re-checks every symbol, but each is only revalued if its valuation inputs actually moved.
+        account_settings = (self.account_currency, self.leverage)
+        if self._valued_market_data is not self.current_market_data or self._valued_account_settings != account_settings:
+            symbols_to_value = list(self._exposures)
+            self._valued_market_data = self.current_market_data; self._valued_account_settings = account_settings
+        else: symbols_to_value = [symbol for symbol in self._changed_symbols if symbol in self._exposures]
+        if symbols_to_value or self._changed_symbols:
+            for symbol in symbols_to_value: self._value_exposure(symbol, self._exposures[symbol])
+            self._changed_symbols.clear()
+            self._unrealized_pnl_total = sum(exposure.unrealized_pnl for exposure in self._exposures.values())
+            self.margin_used = sum(exposure.margin for exposure in self._exposures.values())
+        self.equity = self.balance + self._unrealized_pnl_total
+
+    def _refresh_position_valuations(self):
+        """Writes current_price/profit_loss into each open Position; only needed (and only done) when they are read."""
+        self._update_equity_and_margin()
+        if self._positions_valued: return
+        if isinstance(self.open_positions, PositionTable):
+            for symbol, exposure in self._exposures.items():
+                if exposure.buy_price is not None and exposure.pnl_per_price_unit is not None: self.open_positions.revalue(symbol, exposure.buy_price, exposure.sell_price, exposure.pnl_per_price_unit)
+            self._positions_valued = True; return
+        for pos in self.open_positions.values():
+            exposure = self._exposures.get(pos['symbol'])
+            if exposure is None or exposure.buy_price is None or exposure.pnl_per_price_unit is None: continue
+            if pos['side'] == OrderSide.BUY: pos['current_price'] = exposure.buy_price; pos['profit_loss'] = (exposure.buy_price - pos['entry_price']) * exposure.pnl_per_price_unit * pos['volume']
+            else: pos['current_price'] = exposure.sell_price; pos['profit_loss'] = (pos['entry_price'] - exposure.sell_price) * exposure.pnl_per_price_unit * pos['volume']
+        self._positions_valued = True
 
     def modify_order(self, order_id: str, new_price: Optional[float] = None, new_stop_loss: Optional[float] = None, new_take_profit: Optional[float] = None) -> OrderResponse:
         ts = self.current_simulated_time_unix
@@ -463,16 +734,20 @@ class SimulatedBroker(BrokerInterface):
             pos = self.open_positions[order_id] # pos is a dict (Position)
             if new_stop_loss is not None: pos['stop_loss'] = new_stop_loss
             if new_take_profit is not None: pos['take_profit'] = new_take_profit
+            self.open_positions[order_id] = pos # Writes the change back when positions are stored in a PositionTable
+            self._trigger_book.update(pos)
             return OrderResponse(order_id=order_id, status="MODIFIED", symbol=pos['symbol'], side=pos['side'], type=OrderType.MARKET, volume=pos['volume'], price=pos['entry_price'], timestamp=ts, position_id=order_id)
         elif order_id in self.pending_orders:
             po = self.pending_orders[order_id]
             if new_price is not None: po['price'] = new_price
             if new_stop_loss is not None: po['stop_loss'] = new_stop_loss
             if new_take_profit is not None: po['take_profit'] = new_take_profit
+            if new_price is not None: self.pending_orders.reindex(order_id)
             return OrderResponse(order_id=order_id, status="MODIFIED_PENDING", symbol=po['symbol'], side=po['side'], type=po['type'], volume=po['volume'], price=po['price'], timestamp=ts)
         return OrderResponse(order_id=order_id, status="REJECTED", error_message="Order/Position not found.", timestamp=ts)
 
-    def _close_position_at_price(self, position_dict: Position, close_price: float, reason: str): # position_dict is a Position (dict)
+    # batch=True (margin-call batch liquidation) skips the per-close print and account update; the caller updates once.
+    def _close_position_at_price(self, position_dict: Position, close_price: float, reason: str, batch: bool = False): # position_dict is a Position (dict)
         current_position_id = position_dict['position_id']
         if current_position_id not in self.open_positions:
             print(f"SimBroker: Position {current_position_id} already actioned or does not exist. Cannot close for reason: {reason}.")
@@ -482,30 +757,98 @@ class SimulatedBroker(BrokerInterface):
             print(f"SimBroker: PNL calculation failed for closing pos {current_position_id} ({position_dict['symbol']}). Realized PNL recorded as 0.0. Position will still be closed.")
             realized_pnl = 0.0
         self.balance += realized_pnl
-        margin_freed = self._calculate_margin_required(position_dict['symbol'], position_dict['volume'], position_dict['entry_price'])
-        self.margin_used -= margin_freed
-        if self.margin_used < 0: self.margin_used = 0
+        self._add_exposure(position_dict, sign=-1); self._trigger_book.remove(current_position_id)
         open_time_log = position_dict.get('open_time', self.current_simulated_time_unix); comment_log = position_dict.get('comment', ""); magic_log = position_dict.get('magic_number', 0)
         self.trade_history.append({"event_type": "POSITION_CLOSED", "timestamp": self.current_simulated_time_unix, "position_id": current_position_id, "symbol": position_dict['symbol'], "side": position_dict['side'].value, "volume": position_dict['volume'], "entry_price": position_dict['entry_price'], "open_time": open_time_log, "close_price": close_price, "realized_pnl": realized_pnl, "reason_for_close": reason, "magic_number": magic_log, "comment": comment_log})
         del self.open_positions[current_position_id]
+        if batch: return
+        margin_freed = self._calculate_margin_required(position_dict['symbol'], position_dict['volume'], position_dict['entry_price'])
         print(f"SimBroker: Position {current_position_id} ({position_dict['symbol']} {position_dict['side'].value} {position_dict['volume']} lot(s)) CLOSED at {close_price} by {reason}. P/L: {realized_pnl:.2f}. Margin Freed: {margin_freed:.2f}")
         self._update_equity_and_margin()
 
     def check_for_sl_tp_triggers(self):
         if not self.current_market_data or not self.current_simulated_time_unix: return
-        positions_to_action = []
-        for pos_id, pos in list(self.open_positions.items()): # pos is a Position (dict)
-            if pos['symbol'] not in self.current_market_data: continue
-            bar = self.current_market_data[pos['symbol']]
-            trigger_price = None; reason = None
-            if pos['side'] == OrderSide.BUY:
-                if pos['stop_loss'] is not None and bar['low'] <= pos['stop_loss']: trigger_price, reason = pos['stop_loss'], "STOP_LOSS_HIT"
-                elif pos['take_profit'] is not None and bar['high'] >= pos['take_profit']: trigger_price, reason = pos['take_profit'], "TAKE_PROFIT_HIT"
-            elif pos['side'] == OrderSide.SELL:
-                if pos['stop_loss'] is not None and bar['high'] >= pos['stop_loss']: trigger_price, reason = pos['stop_loss'], "STOP_LOSS_HIT"
-                elif pos['take_profit'] is not None and bar['low'] <= pos['take_profit']: trigger_price, reason = pos['take_profit'], "TAKE_PROFIT_HIT"
-            if trigger_price is not None: positions_to_action.append({"position_to_close": pos, "close_price": trigger_price, "reason": reason})
-        for item in positions_to_action: self._close_position_at_price(item["position_to_close"], item["close_price"], item["reason"])
+        # The trigger book returns only the positions whose SL/TP lies inside the bar's range, in opening order.
+        hits = []
+        for symbol in self._trigger_book.symbols():
+            bar = self.current_market_data.get(symbol)
+            if bar is None: continue
+            bar_range = (bar['low'], bar['high']); hits.extend(self._trigger_book.triggered(symbol, bar_range, bar_range))
+        if len(hits) > 1: hits.sort()
+        for _, position_id, trigger_price, reason in hits: self._close_position_at_price(self.open_positions[position_id], trigger_price, reason)
+
+    # --- Tick replay: pending orders and SL/TP trigger on the actual bid/ask of each tick ---
+    def _tick_trigger_thresholds(self, symbol: str) -> Tuple[float, float, float, float]:
+        # Every tick trigger of the symbol is one of four comparisons, so the earliest trigger in a run of ticks is the
+        # first tick that crosses the loosest level of any group: (ask <= a, ask >= b, bid <= c, bid >= d).
+        ask_le, ask_ge, bid_le, bid_ge = self.pending_orders.extremes(symbol)
+        book_ask_le, book_ask_ge, book_bid_le, book_bid_ge = self._trigger_book.extremes(symbol)
+        return max(ask_le, book_ask_le), min(ask_ge, book_ask_ge), max(bid_le, book_bid_le), min(bid_ge, book_bid_ge)
+
+    def _first_tick_trigger(self, symbol: str, bid: np.ndarray, ask: np.ndarray, start: int) -> int:
+        """Index of the first tick >= start that fires any pending order or SL/TP of the symbol (len(bid) if none)."""
+        ask_le, ask_ge, bid_le, bid_ge = self._tick_trigger_thresholds(symbol)
+        first = len(bid)
+        for prices, level, below in ((ask, ask_le, True), (ask, ask_ge, False), (bid, bid_le, True), (bid, bid_ge, False)):
+            if not np.isfinite(level) or first <= start: continue
+            window = prices[start:first]
+            hits = window <= level if below else window >= level
+            k = int(hits.argmax())
+            if hits[k]: first = start + k
+        return first
+
+    def _process_tick(self, symbol: str, timestamp: float, bid: float, ask: float) -> int:
+        """Fills/closes everything the tick triggers: pending orders first, then SL/TP of positions open before the tick."""
+        mid = (bid + ask) / 2.0
+        self.update_current_time(timestamp)
+        self.current_market_data = {**self.current_market_data, symbol: Candlestick(timestamp=timestamp, open=mid, high=mid, low=mid, close=mid, volume=None, bid_close=bid, ask_close=ask)}
+        self._update_equity_and_margin()
+        precision = self._get_price_precision(symbol); num_events = 0
+        position_hits = self._trigger_book.triggered(symbol, (bid, bid), (ask, ask)) # Positions open before the tick; longs close on the bid, shorts on the ask
+        for _, order_id in self.pending_orders.triggered(symbol, (ask, ask), (bid, bid)): # Buys fill on the ask, sells on the bid
+            po = self.pending_orders[order_id]
+            price, is_buy = po['price'], po['side'] == OrderSide.BUY
+            if po['type'] == OrderType.LIMIT and (ask <= price if is_buy else bid >= price): fill_price = ask if is_buy else bid
+            elif po['type'] == OrderType.STOP and (ask >= price if is_buy else bid <= price):
+                slippage = self._calculate_slippage_in_price_terms(symbol, po['volume'])
+                fill_price = ask + slippage if is_buy else bid - slippage
+            else: continue
+            print(f"SimBroker: Pending order {order_id} ({symbol} {po['side'].value} {po['type'].value} @ {price}) TRIGGERED by tick bid {bid} / ask {ask}.")
+            self._execute_pending_fill(order_id, po, round(fill_price, precision), ask if is_buy else bid)
+            if order_id in self.pending_orders: del self.pending_orders[order_id]
+            num_events += 1
+        for _, position_id, _, reason in position_hits:
+            pos = self.open_positions[position_id]
+            self._close_position_at_price(pos, round(bid if pos['side'] == OrderSide.BUY else ask, precision), reason); num_events += 1
+        return num_events
+
+    def replay_ticks(self, tick_windows: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> int:
+        """
+        Replays one window of ticks per symbol ((timestamps, bids, asks) arrays) in global time order and executes every
+        pending-order fill and SL/TP close at the tick that triggers it; pending orders expire at their expiry_time in
+        between. Ticks without a trigger are skipped with vectorized scans, so only triggering ticks reach Python.
+        Returns the number of fills/closes.
+        """
+        cursors = {symbol.upper(): 0 for symbol in tick_windows}
+        windows = {symbol.upper(): arrays for symbol, arrays in tick_windows.items()}
+        num_events = 0
+        while True:
+            next_symbol, next_index, next_ts = None, -1, np.inf
+            for symbol, (timestamps, bids, asks) in windows.items():
+                k = self._first_tick_trigger(symbol, bids, asks, cursors[symbol])
+                if k < len(timestamps) and timestamps[k] < next_ts: next_symbol, next_index, next_ts = symbol, k, timestamps[k]
+            if next_symbol is None: return num_events
+            next_expiry = self.pending_orders.next_expiry()
+            if next_expiry is not None and next_expiry <= next_ts: # DAY orders expire before a later tick can fill them
+                self.update_current_time(max(next_expiry, self.current_simulated_time_unix)); self._expire_pending_orders(); continue
+            timestamps, bids, asks = windows[next_symbol]
+            num_events += self._process_tick(next_symbol, float(timestamps[next_index]), float(bids[next_index]), float(asks[next_index]))
+            cursors[next_symbol] = next_index + 1
+
+    def _calculate_slippage_in_price_terms(self, symbol: str, volume: float) -> float:
+        contract_size = self._get_contract_size(symbol)
+        total_slippage_pips = self.base_slippage_pips + (volume * contract_size / 1_000_000.0) * self.volume_slippage_factor_pips_per_million
+        return max(0, total_slippage_pips * (self._rng or random).uniform(0.8, 1.2)) * self._get_pip_value_for_sl_tp(symbol)
 
     def close_order(self, order_id: str, volume: Optional[float] = None, price: Optional[float] = None) -> OrderResponse:
         if order_id not in self.open_positions: return OrderResponse(order_id=order_id, status="REJECTED", error_message="Position not found.")
@@ -522,12 +865,43 @@ class SimulatedBroker(BrokerInterface):
         return OrderResponse(order_id=order_id, status="CLOSED", symbol=pos_to_close_dict['symbol'], side=pos_to_close_dict['side'], type=OrderType.MARKET, volume=pos_to_close_dict['volume'], price=close_price_to_use, timestamp=self.current_simulated_time_unix, position_id=order_id)
 
     def get_open_positions(self, symbol: Optional[str] = None) -> List[Position]:
-        self._update_equity_and_margin()
+        self._refresh_position_valuations()
         return [pos_data for pos_data in self.open_positions.values() if symbol is None or pos_data['symbol'] == symbol]
 
     def get_pending_orders(self, symbol: Optional[str] = None) -> List[OrderResponse]:
         return [OrderResponse(**order_data) for order_data in self.pending_orders.values() if symbol is None or order_data['symbol'] == symbol]
 
+    def _liquidation_heap(self) -> List[Tuple[float, int, str]]:
+        # (profit_loss, opening order, position_id): pops the largest loss first, the earliest opened on ties, as the
+        # former full scan did. Prices do not move during a liquidation, so the order holds for the whole stop-out.
+        if isinstance(self.open_positions, PositionTable): losses = zip(self.open_positions, self.open_positions.profit_losses().tolist())
+        else: losses = ((pos_id, pos_data.get('profit_loss', 0.0)) for pos_id, pos_data in self.open_positions.items())
+        heap = [(pnl, index, pos_id) for index, (pos_id, pnl) in enumerate(losses) if pnl == pnl] # NaN P/L has no place in the order
+        heapq.heapify(heap)
+        return heap
+
+    def _liquidation_price(self, position: Position) -> Optional[float]:
+        symbol = position['symbol']; bar = self.current_market_data.get(symbol)
+        if not bar: return None
+        spread_amount = self._get_spread_in_price_terms(symbol); price_precision = self._get_price_precision(symbol)
+        return round(bar['close'] - (spread_amount / 2), price_precision) if position['side'] == OrderSide.BUY else round(bar['close'] + (spread_amount / 2), price_precision)
+
+    def _select_batch_liquidations(self, heap: List[Tuple[float, int, str]]) -> List[Tuple[Position, float]]:
+        """
+        Pops, in one pass, the fewest worst-first positions whose closing restores the margin level above the stop-out
+        level, tracking equity (realized minus unrealized P/L of each close) and freed margin as it goes.
+        """
+        equity, margin_used = self.equity, self.margin_used; selected = []
+        while heap and margin_used > 0 and equity / margin_used * 100 <= self.stop_out_level_pct:
+            pnl, _, pos_id = heap[0]; position = self.open_positions[pos_id]
+            close_price = self._liquidation_price(position)
+            if close_price is None: break # Left to the sequential pass, which logs the liquidation error
+            heapq.heappop(heap)
+            realized_pnl = self.calculate_pnl_in_account_currency(position['symbol'], position['side'], position['volume'], position['entry_price'], close_price)
+            equity += (realized_pnl or 0.0) - pnl; margin_used -= self._calculate_margin_required(position['symbol'], position['volume'], position['entry_price'])
+            selected.append((position, close_price))
+        return selected
+
     def check_for_margin_call(self):
         if self.margin_used == 0: return
         margin_level_pct = (self.equity / self.margin_used) * 100 if self.margin_used > 0 else float('inf')
@@ -535,42 +909,37 @@ class SimulatedBroker(BrokerInterface):
         log_event_common = {"timestamp": timestamp_unix, "equity": self.equity, "margin_used": self.margin_used, "margin_level_pct": margin_level_pct}
 
         if margin_level_pct <= self.stop_out_level_pct:
+            if self.liquidation_mode not in ("sequential", "batch"): raise ValueError(f"SimBroker: liquidation_mode must be 'sequential' or 'batch', got {self.liquidation_mode!r}.")
             print(f"SimBroker: MARGIN CALL (STOP OUT)! Margin Level: {margin_level_pct:.2f}% <= Stop Out Level: {self.stop_out_level_pct:.2f}%. Force liquidating positions.")
             self.trade_history.append({**log_event_common, "event_type": "MARGIN_CALL_STOP_OUT_TRIGGERED"})
+            self._refresh_position_valuations() # Liquidation order reads each position's profit_loss
+            heap = self._liquidation_heap()
+            if self.liquidation_mode == "batch":
+                selected = self._select_batch_liquidations(heap); balance_before = self.balance
+                for position, close_price in selected: self._close_position_at_price(position, close_price, "MARGIN_CALL_LIQUIDATION", batch=True)
+                self._update_equity_and_margin()
+                if selected: print(f"SimBroker: Liquidated {len(selected)} position(s) in one batch due to margin call. Realized P/L: {self.balance - balance_before:.2f}")
+            # Sequential pass (and the batch mode's remainder, e.g. rounding drift or missing market data): one close at a time.
             while self.margin_used > 0 and ((self.equity / self.margin_used * 100) if self.margin_used > 0 else float('inf')) <= self.stop_out_level_pct:
                 if not self.open_positions: break
-                worst_pos_id = None; largest_loss = float('inf')
-                for pos_id, pos_data in self.open_positions.items(): # pos_data is a Position dict
-                    current_pos_pnl = pos_data.get('profit_loss', 0.0)
-                    if current_pos_pnl < largest_loss: largest_loss = current_pos_pnl; worst_pos_id = pos_id
-
-                if worst_pos_id:
+                while heap and heap[0][2] not in self.open_positions: heapq.heappop(heap)
+                if heap:
+                    largest_loss, _, worst_pos_id = heapq.heappop(heap)
                     position_dict_to_liquidate = self.open_positions[worst_pos_id] # Already a dict
                     symbol_to_liquidate = position_dict_to_liquidate['symbol']
                     print(f"SimBroker: Liquidating position {worst_pos_id} ({symbol_to_liquidate}) due to margin call. Current P/L: {largest_loss:.2f}")
-                    close_price_for_liquidation = None
-                    if symbol_to_liquidate in self.current_market_data and self.current_market_data[symbol_to_liquidate]:
-                        bar = self.current_market_data[symbol_to_liquidate]; spread_amount = self._get_spread_in_price_terms(symbol_to_liquidate); price_precision = self._get_price_precision(symbol_to_liquidate)
-                        if position_dict_to_liquidate['side'] == OrderSide.BUY: close_price_for_liquidation = round(bar['close'] - (spread_amount / 2), price_precision)
-                        else: close_price_for_liquidation = round(bar['close'] + (spread_amount / 2), price_precision)
-                        self._close_position_at_price(position_dict_to_liquidate, close_price_for_liquidation, "MARGIN_CALL_LIQUIDATION")
+                    close_price_for_liquidation = self._liquidation_price(position_dict_to_liquidate)
+                    if close_price_for_liquidation is not None: self._close_position_at_price(position_dict_to_liquidate, close_price_for_liquidation, "MARGIN_CALL_LIQUIDATION")
                     else:
                         print(f"SimBroker ERROR: Market data unavailable for {symbol_to_liquidate} to liquidate {worst_pos_id}! Position remains for now (potential issue).")
                         self.trade_history.append({"event_type": "MARGIN_CALL_LIQUIDATION_ERROR", "timestamp": timestamp_unix, "position_id": worst_pos_id, "reason": "Market data unavailable for liquidation price."}); break
                 else:
-                    if not self.open_positions: break
                     print("SimBroker: Margin call, but no clear 'worst loss' position or all profitable. Consider alternative liquidation order. Halting this cycle.")
-                    if self.open_positions:
-                        first_pos_id = list(self.open_positions.keys())[0]; position_dict_to_liquidate = self.open_positions[first_pos_id]
-                        print(f"SimBroker: Fallback liquidation of position {first_pos_id} due to margin call.")
-                        symbol_to_liquidate = position_dict_to_liquidate['symbol']
-                        if symbol_to_liquidate in self.current_market_data and self.current_market_data[symbol_to_liquidate]:
-                            bar = self.current_market_data[symbol_to_liquidate]; spread_amount = self._get_spread_in_price_terms(symbol_to_liquidate); price_precision = self._get_price_precision(symbol_to_liquidate)
-                            if position_dict_to_liquidate['side'] == OrderSide.BUY: close_price_for_liquidation = round(bar['close'] - (spread_amount / 2), price_precision)
-                            else: close_price_for_liquidation = round(bar['close'] + (spread_amount / 2), price_precision)
-                            self._close_position_at_price(position_dict_to_liquidate, close_price_for_liquidation, "MARGIN_CALL_LIQUIDATION_FALLBACK")
-                        else: print(f"SimBroker ERROR: Market data also unavailable for fallback liquidation {first_pos_id}. Halting liquidation cycle."); break
-                    else: break
+                    first_pos_id = next(iter(self.open_positions)); position_dict_to_liquidate = self.open_positions[first_pos_id]
+                    print(f"SimBroker: Fallback liquidation of position {first_pos_id} due to margin call.")
+                    close_price_for_liquidation = self._liquidation_price(position_dict_to_liquidate)
+                    if close_price_for_liquidation is not None: self._close_position_at_price(position_dict_to_liquidate, close_price_for_liquidation, "MARGIN_CALL_LIQUIDATION_FALLBACK")
+                    else: print(f"SimBroker ERROR: Market data also unavailable for fallback liquidation {first_pos_id}. Halting liquidation cycle."); break
                 if self.margin_used == 0: break
             current_margin_level_after_liquidation = (self.equity / self.margin_used * 100) if self.margin_used > 0 else float('inf')
             if current_margin_level_after_liquidation > self.stop_out_level_pct:
@@ -0,0 +1,99 @@
+import unittest
+import contextlib
+import io
+import time
+from unittest.mock import patch
+
+from TradingAgents.tradingagents.broker_interface import BrokerInterface, CachingBroker
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType
+
+T0 = 1_700_000_000.0
+
+def create_bars(num_bars: int, step: float = 60.0):
+    return [{"timestamp": T0 + i * step, "open": 1.1 + i * 1e-5, "high": 1.1002 + i * 1e-5, "low": 1.0998 + i * 1e-5, "close": 1.1001 + i * 1e-5,
+             "volume": 100.0, "bid_close": None, "ask_close": None} for i in range(num_bars)]
+
+class LiveLikeBroker(BrokerInterface):
+    """No simulated clock and MT5-style bars (datetime 'time', no unix 'timestamp')."""
+    def __init__(self): self.calls = []
+    def connect(self, credentials): return True
+    def disconnect(self): pass
+    def is_connected(self): return True
+    def get_account_info(self): return {"balance": 1.0}
+    def place_order(self, *args, **kwargs): self.calls.append("place_order"); return {"status": "FILLED"}
+    def close_order(self, order_id): self.calls.append("close_order"); return {"status": "CLOSED"}
+    def get_current_price(self, symbol): self.calls.append("tick"); return {"bid": 1.1, "ask": 1.1002}
+    def get_historical_data(self, symbol, timeframe_str, start_time_unix, end_time_unix=None, count=None):
+        self.calls.append("bars"); return [{"time": "2024-01-01T00:00:00+00:00", "close": 1.1}]
+
+class TestCachingBroker(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.sim = SimulatedBroker(); self.sim.load_test_data("EURUSD", create_bars(1000))
+        self.broker = CachingBroker(self.sim)
+
+    def _step(self, i: int):
+        bar = create_bars(i + 1)[-1]
+        self.sim.update_current_time(bar["timestamp"]); self.sim.update_market_data({"EURUSD": bar})
+
+    def test_overlapping_windows_share_one_fetch_per_step(self):
+        lookbacks = (30, 100, 200) # e.g. scalper, day and swing trader on the same timeframe
+        with contextlib.redirect_stdout(io.StringIO()), patch.object(SimulatedBroker, "get_historical_data", autospec=True, side_effect=SimulatedBroker.get_historical_data) as fetch:
+            for i in range(300, 310):
+                self._step(i); now = self.sim.current_simulated_time_unix
+                for bars in lookbacks:
+                    cached = self.broker.get_historical_data(symbol="EURUSD", timeframe_str="M1", start_time_unix=now - bars * 60, end_time_unix=now)
+                    direct = SimulatedBroker.get_historical_data(self.sim, "EURUSD", "M1", now - bars * 60, now)
+                    self.assertEqual(list(cached), list(direct))
+                tail = self.broker.get_historical_data("EURUSD", "M1", None, count=50)
+                self.assertEqual(list(tail), list(SimulatedBroker.get_historical_data(self.sim, "EURUSD", "M1", None, count=50)))
+        self.assertEqual(fetch.call_count, (3 + 9) + 10 * 4) # Cache misses plus the direct calls
+        self.assertEqual(self.broker.stats["bar_misses"], 3 + 9)
+        self.assertEqual(self.broker.stats["bar_hits"], 10 * 4 - 12)
+
+    def test_ticks_are_memoized_per_timestamp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self._step(10)
+            with patch.object(SimulatedBroker, "get_current_price", autospec=True, side_effect=SimulatedBroker.get_current_price) as price:
+                first = self.broker.get_current_price("EURUSD"); first["bid"] = 0.0
+                second = self.broker.get_current_price("eurusd")
+                self.assertEqual(price.call_count, 1); self.assertNotEqual(second["bid"], 0.0)
+                self._step(11); self.broker.get_current_price("EURUSD")
+                self.assertEqual(price.call_count, 2)
+        self.assertEqual(self.broker.cache_info()["tick_hits"], 1)
+
+    def test_orders_and_other_calls_pass_through(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self._step(10)
+            response = self.broker.place_order("EURUSD", OrderType.MARKET, OrderSide.BUY, 0.1)
+            self.broker.close_order(response["position_id"])
+        self.assertEqual(response["status"], "FILLED")
+        self.assertIsInstance(self.broker, BrokerInterface)
+        self.assertEqual(len(self.broker.trade_history), 2)
+        self.assertEqual(self.broker.get_account_info(), self.sim.get_account_info())
+
+    def test_without_a_clock_until_invalidated(self):
+        live = LiveLikeBroker(); broker = CachingBroker(live)
+        for _ in range(3):
+            broker.get_current_price("EURUSD"); broker.get_historical_data("EURUSD", "H1", 1.0, 2.0)
+        broker.get_historical_data("EURUSD", "H1", 0.0, 2.0) # Not sliceable without timestamps: its own fetch
+        self.assertEqual(live.calls, ["tick", "bars", "bars"])
+        broker.invalidate(); broker.get_current_price("EURUSD"); broker.close_order("1")
+        self.assertEqual(live.calls[-2:], ["tick", "close_order"])
+        expiring = CachingBroker(live, max_age_seconds=0.0); expiring.get_current_price("EURUSD"); time.sleep(0.001); expiring.get_current_price("EURUSD")
+        self.assertEqual(live.calls.count("tick"), 4)
+
+    def test_stats_are_updated_under_the_broker_lock(self):
+        # Fetches of different keys run concurrently (per-key locks), so the shared counters must take the broker lock
+        broker = CachingBroker(LiveLikeBroker()); updates = []
+        class LockCheckedStats(dict):
+            def __setitem__(self, name, value): updates.append(broker._lock.locked()); super().__setitem__(name, value)
+        broker.stats = LockCheckedStats(broker.stats)
+        for symbol in ("EURUSD", "EURUSD", "USDJPY"): broker.get_current_price(symbol); broker.get_historical_data(symbol, "H1", 1.0, 2.0)
+        self.assertEqual(updates, [True] * 6)
+        self.assertEqual(broker.cache_info()["tick_hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
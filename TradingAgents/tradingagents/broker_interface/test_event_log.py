@@ -0,0 +1,107 @@
+import unittest
+import contextlib
+import io
+import os
+import pickle
+import shutil
+import tempfile
+
+from TradingAgents.tradingagents.broker_interface.event_log import TradeEventLog
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType, TimeInForce
+
+try:
+    import pyarrow # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+def create_close_event(i: int, reason: str = "STOP_LOSS_HIT", magic_number=7, realized_pnl: float = 1.5):
+    return {"event_type": "POSITION_CLOSED", "timestamp": 1_700_000_000.0 + i, "position_id": f"p{i}", "symbol": "EURUSD", "side": "BUY", "volume": 0.1,
+            "entry_price": 1.1, "open_time": 1_699_999_000.0, "close_price": 1.1015, "realized_pnl": realized_pnl, "reason_for_close": reason, "magic_number": magic_number, "comment": ""}
+
+def run_broker(**log_options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker = SimulatedBroker(initial_capital=100_000.0); broker.trade_history = TradeEventLog(**log_options)
+        bar = {"timestamp": 1_700_000_000.0, "open": 1.1, "high": 1.101, "low": 1.099, "close": 1.1, "volume": 100.0, "bid_close": None, "ask_close": None}
+        broker.update_current_time(bar["timestamp"]); broker.update_market_data({"EURUSD": bar})
+        for i in range(30):
+            response = broker.place_order("EURUSD", OrderType.MARKET, OrderSide.BUY if i % 2 else OrderSide.SELL, 0.1, stop_loss=None, take_profit=None, comment=f"t{i}")
+            broker.close_order(response['position_id'])
+        broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.05, time_in_force=TimeInForce.IOC)
+        broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.05, stop_loss=1.04)
+    return broker
+
+class TestTradeEventLog(unittest.TestCase):
+
+    def test_reads_back_the_appended_events(self):
+        broker = run_broker()
+        events = list(broker.trade_history)
+        self.assertEqual(len(events), 62) # 30 fills + 30 closes, the cancelled IOC order, the resting limit order
+        self.assertEqual({event["event_type"] for event in events}, {"MARKET_ORDER_FILLED", "POSITION_CLOSED", "PENDING_ORDER_PLACED", "PENDING_ORDER_CANCELLED"})
+        self.assertEqual(broker.trade_history._other, []) # Every broker event fits its schema
+        self.assertEqual(events[-1]["sl"], 1.04); self.assertIsNone(events[-1]["tp"]); self.assertEqual(events[0]["comment"], "t0")
+        self.assertEqual(TradeEventLog(events), events)
+        self.assertEqual(broker.trade_history[-3:], events[-3:])
+        self.assertEqual(pickle.loads(pickle.dumps(broker.trade_history)), events)
+
+    def test_unschemad_events_are_kept_as_dicts(self):
+        events = [create_close_event(0), {"event_type": "CUSTOM", "note": "x"}, {**create_close_event(1), "extra": 1}, create_close_event(2, magic_number="m")]
+        log = TradeEventLog(events)
+        self.assertEqual(list(log), events)
+        self.assertEqual(len(log._other), 3)
+        self.assertEqual(log.counts_by_type(), {"POSITION_CLOSED": 3, "CUSTOM": 1})
+
+    def test_spills_full_chunks_and_reads_them_back(self):
+        events = [create_close_event(i, reason=("STOP_LOSS_HIT", "TAKE_PROFIT_HIT")[i % 2], magic_number=i % 3 or None) for i in range(100)]
+        spill_directory = tempfile.mkdtemp()
+        try:
+            log = TradeEventLog(events, chunk_size=8, spill_threshold=20, spill_directory=spill_directory)
+            self.assertLessEqual(log._resident_rows, 20)
+            self.assertEqual(len(os.listdir(spill_directory)), 12)
+            self.assertEqual(list(log), events)
+            self.assertEqual(log[37], events[37])
+            self.assertEqual(log.column("POSITION_CLOSED", "timestamp").tolist(), [event["timestamp"] for event in events])
+        finally: shutil.rmtree(spill_directory)
+
+    def test_query_helpers_match_list_scans(self):
+        events = [create_close_event(i, reason=("STOP_LOSS_HIT", "TAKE_PROFIT_HIT", "CLOSED_BY_REQUEST")[i % 3], magic_number=(7, 9, None)[i % 5 % 3], realized_pnl=i * 0.5 - 10) for i in range(50)]
+        log = TradeEventLog(events, chunk_size=16)
+        expected_reasons, expected_pnl = {}, {}
+        for event in events:
+            expected_reasons[event["reason_for_close"]] = expected_reasons.get(event["reason_for_close"], 0) + 1
+            expected_pnl[event["magic_number"]] = expected_pnl.get(event["magic_number"], 0.0) + event["realized_pnl"]
+        self.assertEqual(log.closes_by_reason(), expected_reasons)
+        pnl = log.pnl_by_magic_number()
+        self.assertEqual(set(pnl), set(expected_pnl))
+        for magic_number, total in expected_pnl.items(): self.assertAlmostEqual(pnl[magic_number], total, places=9)
+        self.assertEqual(TradeEventLog().closes_by_reason(), {})
+
+    def test_frames_and_csv_export(self):
+        broker = run_broker(chunk_size=4)
+        closes = broker.trade_history.to_frame("POSITION_CLOSED")
+        self.assertEqual(len(closes), 30); self.assertEqual(str(closes["magic_number"].dtype), "Int64")
+        frame = broker.trade_history.to_frame()
+        self.assertEqual(frame["event_type"].tolist(), [event["event_type"] for event in broker.trade_history])
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()): path = broker.trade_history.export(os.path.join(tmp_dir, "events.csv"), event_type="POSITION_CLOSED")
+            self.assertTrue(os.path.exists(path))
+            with self.assertRaises(ValueError): broker.trade_history.export(os.path.join(tmp_dir, "events.txt"))
+        finally: shutil.rmtree(tmp_dir)
+
+    @unittest.skipUnless(PYARROW_AVAILABLE, "pyarrow not installed")
+    def test_parquet_and_arrow_export(self):
+        import pandas as pd
+        broker = run_broker()
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                parquet_path = broker.trade_history.export(os.path.join(tmp_dir, "events.parquet"))
+                arrow_path = broker.trade_history.export(os.path.join(tmp_dir, "closes.arrow"), event_type="POSITION_CLOSED")
+            self.assertEqual(len(pd.read_parquet(parquet_path)), len(broker.trade_history))
+            self.assertEqual(pd.read_feather(arrow_path)["realized_pnl"].tolist(), broker.trade_history.column("POSITION_CLOSED", "realized_pnl").tolist())
+        finally: shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
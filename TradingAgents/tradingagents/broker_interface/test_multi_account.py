@@ -0,0 +1,111 @@
+import unittest
+import contextlib
+import io
+import random
+from typing import List
+from unittest.mock import patch
+
+from TradingAgents.tradingagents.broker_interface.multi_account import MultiAccountBroker
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType
+
+T0 = 1_700_000_000.0
+
+def create_bars(num_bars: int, seed: int = 1):
+    rng = random.Random(seed); prices = {"EURUSD": 1.1, "USDJPY": 150.0, "GBPUSD": 1.25}; bars = []
+    for step in range(num_bars):
+        snapshot = {}
+        for symbol in prices:
+            prices[symbol] *= 1 + rng.uniform(-0.002, 0.002); p = prices[symbol]
+            snapshot[symbol] = {"timestamp": T0 + step * 60, "open": p, "high": p * 1.001, "low": p * 0.999, "close": p, "volume": 100.0, "bid_close": None, "ask_close": None}
+        bars.append(snapshot)
+    return bars
+
+def trade(broker: SimulatedBroker, strategy_seed: int, step: int, snapshot):
+    # A deterministic per-account "strategy": its own RNG, so the same decisions in a shared or standalone run
+    rng = random.Random(strategy_seed * 100_003 + step)
+    if rng.random() < 0.3:
+        symbol = rng.choice(list(snapshot)); side = rng.choice([OrderSide.BUY, OrderSide.SELL]); p = snapshot[symbol]["close"]; sign = 1 if side == OrderSide.BUY else -1
+        if rng.random() < 0.7: broker.place_order(symbol, OrderType.MARKET, side, 0.5, stop_loss=p * (1 - sign * 0.002), take_profit=p * (1 + sign * 0.003))
+        else: broker.place_order(symbol, OrderType.LIMIT, side, 0.5, price=p * (1 - sign * 0.001))
+
+class TestMultiAccountBroker(unittest.TestCase):
+
+    def _settings(self):
+        return {"a": {}, "b": {"account_currency": "EUR", "leverage": 30}, "c": {"account_currency": "JPY"}}
+
+    def test_accounts_match_standalone_brokers(self):
+        # With slippage: each account draws from its own seeded RNG, as a standalone broker with the same seed does
+        bars = create_bars(300); settings = self._settings()
+        with contextlib.redirect_stdout(io.StringIO()):
+            multi = MultiAccountBroker()
+            for seed, (name, options) in enumerate(settings.items()): multi.add_account(name, initial_capital=50_000.0, seed=seed, **options)
+            standalone = {}
+            for seed, (name, options) in enumerate(settings.items()):
+                broker = standalone[name] = SimulatedBroker(initial_capital=50_000.0, rng=random.Random(seed))
+                for setting, value in options.items(): setattr(broker, setting, value)
+            for step, snapshot in enumerate(bars):
+                multi.on_bar(snapshot["EURUSD"]["timestamp"], snapshot)
+                for seed, name in enumerate(settings): trade(multi[name], seed, step, snapshot)
+                multi.check_for_margin_calls()
+                for seed, (name, broker) in enumerate(standalone.items()):
+                    broker.update_current_time(snapshot["EURUSD"]["timestamp"]); broker.update_market_data(snapshot)
+                    broker.process_pending_orders(); broker.check_for_sl_tp_triggers()
+                    trade(broker, seed, step, snapshot); broker.check_for_margin_call()
+        strip = lambda info: {k: v for k, v in info.items() if k != "account_id"}
+        for name, broker in standalone.items():
+            self.assertEqual(strip(multi[name].get_account_info()), strip(broker.get_account_info()))
+            self.assertEqual(len(multi[name].trade_history), len(broker.trade_history))
+        self.assertGreater(min(len(account.trade_history) for account in multi.accounts.values()), 30)
+        self.assertEqual(len({info["balance"] for info in multi.get_account_infos().values()}), 3) # Isolated accounts
+
+    def test_unseeded_accounts_are_reproducible_and_checkpoint_their_rng(self):
+        def draws(multi: MultiAccountBroker) -> List[float]:
+            for name in "ab": multi.add_account(name)
+            return [multi[name]._rng.random() for name in "ab"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(draws(MultiAccountBroker(seed=3)), draws(MultiAccountBroker(seed=3)))
+            random.seed(11); first = draws(MultiAccountBroker())
+            random.seed(11); self.assertEqual(draws(MultiAccountBroker()), first)
+            self.assertNotEqual(first[0], first[1])
+
+            account = MultiAccountBroker(seed=3).add_account("a"); state = account.get_checkpoint_state()
+            expected = [account._rng.random() for _ in range(3)]
+            restored = MultiAccountBroker().add_account("a"); restored.restore_checkpoint_state(state, [])
+        self.assertEqual([restored._rng.random() for _ in range(3)], expected)
+
+    def test_shares_feed_state_across_accounts(self):
+        bars = create_bars(20)
+        with contextlib.redirect_stdout(io.StringIO()):
+            multi = MultiAccountBroker()
+            multi.load_test_data("EURUSD", [snapshot["EURUSD"] for snapshot in bars])
+            for name in "abcd": multi.add_account(name, account_currency="EUR")
+            multi["a"].place_order("EURUSD", OrderType.MARKET, OrderSide.BUY, 0.1) # Rejected: no market data yet
+            with patch.object(SimulatedBroker, "_build_conversion_matrix", autospec=True, side_effect=SimulatedBroker._build_conversion_matrix) as build:
+                for name in "abcd":
+                    multi.on_bar(T0, bars[0]); multi[name].place_order("USDJPY", OrderType.MARKET, OrderSide.BUY, 0.1)
+                multi.on_bar(T0 + 60, bars[1])
+        self.assertEqual(build.call_count, 2) # One pair graph per snapshot for all accounts
+        self.assertIs(multi["b"].test_data_store, multi["c"].test_data_store)
+        self.assertEqual(len(multi["d"].get_historical_data("EURUSD", "M1", T0, T0 + 600)), 2) # Up to the current bar only
+        self.assertEqual([len(multi[name].open_positions) for name in "abcd"], [1, 1, 1, 1])
+
+    def test_add_account_validation_and_mid_run_start(self):
+        bars = create_bars(2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            multi = MultiAccountBroker(); multi.add_account("a")
+            multi.on_bar(T0, bars[0])
+            late = multi.add_account("late", initial_capital=1_000.0)
+            with self.assertRaises(ValueError): multi.add_account("a")
+            with self.assertRaises(ValueError): multi.add_account("x", levrage=50)
+            response = late.place_order("EURUSD", OrderType.MARKET, OrderSide.SELL, 0.01)
+        self.assertEqual(response["status"], "FILLED")
+        self.assertIs(late.current_market_data, bars[0])
+        self.assertEqual(list(multi), ["a", "late"])
+        with patch.object(late, "update_current_time", wraps=late.update_current_time) as update_time, contextlib.redirect_stdout(io.StringIO()):
+            multi.on_bar(T0 + 60, bars[1]); multi.update_current_time(T0 + 90)
+        self.assertEqual([call.args[0] for call in update_time.call_args_list], [T0 + 60, T0 + 90])
+        self.assertIs(multi.remove_account("late"), late); self.assertEqual(len(multi), 1)
+
+if __name__ == '__main__':
+    unittest.main()
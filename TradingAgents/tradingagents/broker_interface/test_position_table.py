@@ -0,0 +1,102 @@
+import unittest
+import contextlib
+import io
+import pickle
+import random
+
+from TradingAgents.tradingagents.broker_interface.position_table import CopyOnWritePositions, PositionTable
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType, Position
+
+def create_position(position_id: str, symbol: str = "EURUSD", side: OrderSide = OrderSide.BUY, volume: float = 0.1, entry_price: float = 1.1, stop_loss=None, take_profit=None) -> Position:
+    return Position(position_id=position_id, symbol=symbol, side=side, volume=volume, entry_price=entry_price, current_price=entry_price, profit_loss=-0.7,
+                    stop_loss=stop_loss, take_profit=take_profit, open_time=1_700_000_000.0, magic_number=7, comment="test")
+
+class TestPositionTable(unittest.TestCase):
+
+    def test_round_trip_grow_and_reuse_rows(self):
+        table = PositionTable(capacity=2)
+        positions = [create_position(f"p{i}", side=OrderSide.BUY if i % 2 else OrderSide.SELL, stop_loss=1.0 if i % 3 else None) for i in range(5)]
+        for position in positions: table[position['position_id']] = position
+        self.assertEqual(len(table), 5)
+        self.assertEqual(list(table), [p['position_id'] for p in positions])
+        self.assertEqual(table["p3"], positions[3])
+        self.assertIsNone(table["p0"]["stop_loss"])
+        del table["p1"]
+        table["p5"] = create_position("p5", symbol="USDJPY", entry_price=150.0)
+        self.assertEqual(len(table._side), 8) # The freed row was reused, no further growth
+        self.assertEqual(table["p5"]["symbol"], "USDJPY")
+        self.assertNotIn("p1", table)
+        self.assertEqual(pickle.loads(pickle.dumps(table)), table)
+
+    def test_revalue_matches_per_position_formula(self):
+        table = PositionTable(); rng = random.Random(1)
+        positions = [create_position(f"p{i}", side=rng.choice([OrderSide.BUY, OrderSide.SELL]), volume=rng.choice([0.01, 0.5, 2.0]), entry_price=1.1 + rng.uniform(-0.01, 0.01)) for i in range(50)]
+        for position in positions: table[position['position_id']] = position
+        table["jpy"] = create_position("jpy", symbol="USDJPY", entry_price=150.0)
+        total = table.revalue("EURUSD", 1.1001, 1.1003, 1000.0)
+        expected_total = 0.0
+        for position in positions:
+            price = 1.1001 if position['side'] == OrderSide.BUY else 1.1003
+            expected = (price - position['entry_price']) * (1 if position['side'] == OrderSide.BUY else -1) * 1000.0 * position['volume']
+            self.assertEqual(table[position['position_id']]['current_price'], price)
+            self.assertAlmostEqual(table[position['position_id']]['profit_loss'], expected, places=9)
+            expected_total += expected
+        self.assertAlmostEqual(total, expected_total, places=9)
+        self.assertEqual(table["jpy"]["profit_loss"], -0.7) # Other symbols untouched
+
+class TestCopyOnWritePositions(unittest.TestCase):
+
+    def test_changes_stay_in_the_view(self):
+        for base in ({f"p{i}": create_position(f"p{i}") for i in range(4)}, PositionTable()):
+            if isinstance(base, PositionTable):
+                for i in range(4): base[f"p{i}"] = create_position(f"p{i}")
+            expected = {position_id: dict(base[position_id]) for position_id in base}
+            view = CopyOnWritePositions(base)
+            view["p1"]["stop_loss"] = 1.05; del view["p2"]; view["p9"] = create_position("p9")
+            self.assertEqual(list(view), ["p0", "p1", "p3", "p9"])
+            self.assertEqual(len(view), 4); self.assertNotIn("p2", view)
+            self.assertEqual(view["p1"]["stop_loss"], 1.05)
+            self.assertEqual({position_id: dict(base[position_id]) for position_id in base}, expected)
+            with self.assertRaises(KeyError): view["p2"]
+            del view["p9"]; view["p2"] = create_position("p2", volume=3.0)
+            self.assertEqual((len(view), view["p2"]["volume"], base["p2"]["volume"]), (4, 3.0, 0.1))
+
+class TestSimulatedBrokerArrayPositions(unittest.TestCase):
+
+    def _run(self, position_store: str):
+        random.seed(3); rng = random.Random(3); prices = {"EURUSD": 1.1, "USDJPY": 150.0}
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=50_000.0, position_store=position_store); broker.account_currency = "EUR"
+            snapshots = []
+            for step in range(150):
+                bars = {}
+                for symbol in prices:
+                    prices[symbol] *= 1 + rng.uniform(-0.003, 0.003); p = prices[symbol]
+                    bars[symbol] = {"timestamp": 1_700_000_000.0 + step * 3600, "open": p, "high": p * 1.002, "low": p * 0.998, "close": p, "volume": 100.0, "bid_close": None, "ask_close": None}
+                broker.update_current_time(1_700_000_000.0 + step * 3600); broker.update_market_data(bars)
+                broker.check_for_sl_tp_triggers(); broker.check_for_margin_call()
+                action = rng.random(); ids = list(broker.open_positions)
+                if action < 0.5:
+                    symbol = rng.choice(list(prices)); side = rng.choice([OrderSide.BUY, OrderSide.SELL]); sign = 1 if side == OrderSide.BUY else -1
+                    broker.place_order(symbol, OrderType.MARKET, side, rng.choice([0.1, 1.0]), stop_loss=prices[symbol] * (1 - sign * 0.004), take_profit=prices[symbol] * (1 + sign * rng.uniform(0.002, 0.01)))
+                elif action < 0.7 and ids: broker.close_order(rng.choice(ids))
+                elif ids: broker.modify_order(rng.choice(ids), new_stop_loss=prices[rng.choice(list(prices))] * rng.uniform(0.99, 1.01))
+                snapshots.append((broker.get_account_info(), [{k: v for k, v in pos.items() if k != 'position_id'} for pos in broker.get_open_positions()]))
+        history = [{k: v for k, v in event.items() if k not in ("position_id", "order_id")} for event in broker.trade_history]
+        return broker, snapshots, history
+
+    def test_matches_dict_store(self):
+        dict_broker, dict_snapshots, dict_history = self._run("dict")
+        array_broker, array_snapshots, array_history = self._run("arrays")
+        self.assertIsInstance(array_broker.open_positions, PositionTable)
+        self.assertEqual([(info['equity'], info['margin'], positions) for info, positions in array_snapshots], [(info['equity'], info['margin'], positions) for info, positions in dict_snapshots])
+        self.assertEqual(array_history, dict_history)
+        self.assertGreater(sum(event['event_type'] == "POSITION_CLOSED" for event in dict_history), 10)
+
+    def test_rejects_unknown_store(self):
+        with self.assertRaises(ValueError):
+            SimulatedBroker(position_store="columns")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,17 @@
 import unittest
+import contextlib
+import io
 from unittest.mock import patch # MODIFIED: Import patch correctly
 import time
+import pickle
 import random
 from typing import List, Dict, Any, Optional
 
+import numpy as np
+
 from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
-from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick, OrderType, OrderSide, Tick as PriceTick # Renamed Tick to PriceTick for this test context if needed, or ensure Tick is used if that was the final name. Assuming Tick is the final one.
+from TradingAgents.tradingagents.forex_utils.bar_store import SymbolBars
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick, OrderType, OrderSide, TimeInForce, Tick as PriceTick # Renamed Tick to PriceTick for this test context if needed, or ensure Tick is used if that was the final name. Assuming Tick is the final one.
 
 # Helper to create a basic Candlestick dictionary
 def create_candlestick(timestamp: float, o: float, h: float, l: float, c: float, vol: Optional[float] = 100, bid_c: Optional[float] = None, ask_c: Optional[float] = None) -> Candlestick:
@@ -268,6 +274,455 @@ class TestSimulatedBrokerSlippageAndHistoricalData(unittest.TestCase):
         self.assertAlmostEqual(filled_order_event['fill_price'], expected_fill_price, places=5) # Changed to expected_fill_price
 
 
+class TestSimulatedBrokerTickReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = SimulatedBroker(initial_capital=10000.0)
+        self.symbol = "EURUSD"
+        self.t0 = 1_700_000_000.0
+        # Mid walks 1.10000 -> 1.09900 -> 1.10100; spread 0.2 pips
+        mids = np.concatenate((np.linspace(1.10000, 1.09900, 11), np.linspace(1.09920, 1.10100, 10)))
+        self.ts = self.t0 + np.arange(len(mids), dtype=np.float64)
+        self.bid = np.round(mids - 0.00001, 5); self.ask = np.round(mids + 0.00001, 5)
+        self.broker.update_current_time(self.t0)
+        self.broker.update_market_data({self.symbol: create_candlestick(self.t0, 1.1, 1.1, 1.1, 1.1, bid_c=1.09999, ask_c=1.10001)})
+
+    def test_load_tick_data_validates_and_sorts(self):
+        ticks = [{"timestamp": self.t0 + 2, "bid": 1.1001, "ask": 1.1002}, {"timestamp": self.t0 + 1, "bid": 1.1000, "ask": 1.1001, "volume": 3.0},
+                 {"timestamp": self.t0 + 3, "bid": 0.0, "ask": 1.1001}, {"timestamp": self.t0 + 4, "bid": None, "ask": 1.1001}]
+        self.broker.load_tick_data("eurusd", ticks)
+        stored = self.broker.tick_data_store["EURUSD"]
+        self.assertEqual(len(stored), 2)
+        self.assertEqual(stored.timestamp.tolist(), [self.t0 + 1, self.t0 + 2])
+        self.assertEqual(stored.volume[0], 3.0)
+
+    def test_stop_loss_triggers_on_first_bid_through_level(self):
+        self.broker.place_order(self.symbol, OrderType.MARKET, OrderSide.BUY, 0.1, stop_loss=1.09950)
+        events = self.broker.replay_ticks({self.symbol: (self.ts, self.bid, self.ask)})
+        self.assertEqual(events, 1)
+        closed = next(e for e in self.broker.trade_history if e["event_type"] == "POSITION_CLOSED")
+        first_hit = int(np.argmax(self.bid <= 1.09950))
+        self.assertEqual(closed["timestamp"], self.ts[first_hit])
+        self.assertEqual(closed["close_price"], self.bid[first_hit]) # Actual bid, not the SL level
+        self.assertEqual(closed["reason_for_close"], "STOP_LOSS_HIT")
+
+    def test_pending_fill_then_take_profit_in_same_window(self):
+        self.broker.pending_orders["buy_limit"] = {"order_id": "buy_limit", "status": "PENDING", "symbol": self.symbol, "side": OrderSide.BUY, "type": OrderType.LIMIT,
+                                                  "volume": 0.1, "price": 1.09920, "timestamp": self.t0, "stop_loss": None, "take_profit": 1.10050}
+        events = self.broker.replay_ticks({self.symbol: (self.ts, self.bid, self.ask)})
+        self.assertEqual(events, 2)
+        filled = next(e for e in self.broker.trade_history if e["event_type"] == "PENDING_ORDER_FILLED")
+        fill_index = int(np.argmax(self.ask <= 1.09920))
+        self.assertEqual(filled["fill_price"], self.ask[fill_index])
+        closed = next(e for e in self.broker.trade_history if e["event_type"] == "POSITION_CLOSED")
+        self.assertEqual(closed["timestamp"], self.ts[int(np.argmax(self.bid >= 1.10050))])
+        self.assertEqual(closed["reason_for_close"], "TAKE_PROFIT_HIT")
+        self.assertEqual(self.broker.open_positions, {})
+
+    def test_day_order_expires_before_later_tick(self):
+        self.broker.pending_orders["buy_limit"] = {"order_id": "buy_limit", "status": "PENDING", "symbol": self.symbol, "side": OrderSide.BUY, "type": OrderType.LIMIT,
+                                                  "volume": 0.1, "price": 1.09920, "timestamp": self.t0, "stop_loss": None, "take_profit": None, "expiry_time": self.t0 + 5}
+        self.assertEqual(self.broker.replay_ticks({self.symbol: (self.ts, self.bid, self.ask)}), 0)
+        self.assertEqual(self.broker.pending_orders, {})
+        self.assertEqual(self.broker.trade_history[-1]["event_type"], "PENDING_ORDER_EXPIRED")
+        self.assertEqual(self.broker.current_simulated_time_unix, self.t0 + 5)
+
+    def test_stop_order_slippage_on_tick(self):
+        self.broker.base_slippage_pips = 1.0; self.broker.volume_slippage_factor_pips_per_million = 0.0
+        self.broker.place_order(self.symbol, OrderType.STOP, OrderSide.SELL, 0.1, price=1.09940)
+        with patch('random.uniform', return_value=1.0):
+            self.broker.replay_ticks({self.symbol: (self.ts, self.bid, self.ask)})
+        filled = next(e for e in self.broker.trade_history if e["event_type"] == "PENDING_ORDER_FILLED")
+        trigger_index = int(np.argmax(self.bid <= 1.09940))
+        self.assertAlmostEqual(filled["fill_price"], round(self.bid[trigger_index] - 0.0001, 5))
+
+
+class TestSimulatedBrokerConversionMatrix(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()): self.broker = SimulatedBroker(initial_capital=10000.0)
+        self.prices = {"EURUSD": 1.10, "USDJPY": 150.0, "GBPUSD": 1.25, "USDCHF": 0.90, "NZDCHF": 0.55}
+        self.broker.update_market_data({sym: create_candlestick(1_700_000_000.0, p, p, p, p) for sym, p in self.prices.items()})
+
+    def test_direct_inverse_and_triangulated_rates(self):
+        p = self.prices
+        self.assertAlmostEqual(self.broker._get_exchange_rate("EUR", "USD"), p["EURUSD"])
+        self.assertAlmostEqual(self.broker._get_exchange_rate("JPY", "USD"), 1 / p["USDJPY"])
+        self.assertAlmostEqual(self.broker._get_exchange_rate("EUR", "JPY"), p["EURUSD"] * p["USDJPY"]) # Via the account currency
+        self.assertAlmostEqual(self.broker._get_exchange_rate("NZD", "GBP"), p["NZDCHF"] / p["USDCHF"] / p["GBPUSD"]) # NZD -> CHF -> USD -> GBP
+
+    def test_matrix_built_once_per_snapshot(self):
+        with patch.object(self.broker, "_build_conversion_matrix", wraps=self.broker._build_conversion_matrix) as build:
+            for _ in range(5): self.broker._get_exchange_rate("EUR", "JPY"); self.broker.calculate_pip_value_in_account_currency("EURJPY", 1.0)
+            self.assertEqual(build.call_count, 1) # Built lazily on the first conversion, then reused
+            self.broker.current_market_data = {**self.broker.current_market_data, "EURUSD": create_candlestick(1_700_003_600.0, 1.2, 1.2, 1.2, 1.2)}
+            self.assertAlmostEqual(self.broker._get_exchange_rate("EUR", "USD"), 1.2) # New snapshot, new rates
+            self.broker._get_exchange_rate("EUR", "JPY")
+            self.assertEqual(build.call_count, 2)
+
+    def test_rows_triangulated_on_first_use(self):
+        with patch.object(self.broker, "_conversion_row", wraps=self.broker._conversion_row) as row:
+            for _ in range(3): self.broker._get_exchange_rate("NZD", "GBP"); self.broker._get_exchange_rate("NZD", "JPY")
+            self.assertEqual([call.args[0] for call in row.call_args_list], ["NZD"]) # One row per source currency, not the full matrix
+        self.assertAlmostEqual(self.broker._get_exchange_rate("NZD", "JPY"), self.prices["NZDCHF"] / self.prices["USDCHF"] * self.prices["USDJPY"])
+
+    def test_non_usd_account_margin(self):
+        self.broker.account_currency = "EUR"; self.broker.current_market_data = dict(self.broker.current_market_data)
+        margin = self.broker._calculate_margin_required("GBPUSD", 1.0, self.prices["GBPUSD"])
+        self.assertAlmostEqual(margin, 100000 / self.broker.leverage * self.prices["GBPUSD"] / self.prices["EURUSD"])
+
+    def test_missing_rate_reported_once(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertIsNone(self.broker._get_exchange_rate("SEK", "USD")); self.assertIsNone(self.broker._get_exchange_rate("SEK", "USD"))
+        self.assertEqual(output.getvalue().count("SEK/USD"), 1)
+
+class TestSimulatedBrokerIncrementalAccounting(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()): self.broker = SimulatedBroker(initial_capital=100000.0)
+        self.broker.account_currency = "EUR"
+        self.prices = {"EURUSD": 1.10, "USDJPY": 150.0, "GBPUSD": 1.25, "EURJPY": 165.0}
+
+    def _snapshot(self, rng: random.Random):
+        for symbol in self.prices:
+            if rng.random() < 0.7: self.prices[symbol] *= 1 + rng.uniform(-0.002, 0.002)
+        return {symbol: create_candlestick(1_700_000_000.0, p, p * 1.001, p * 0.999, p, bid_c=p * 0.99999, ask_c=p * 1.00001) for symbol, p in self.prices.items()}
+
+    def _full_recompute(self):
+        # Reference: the former per-position loop
+        unrealized = 0.0; margin = 0.0
+        for pos in self.broker.open_positions.values():
+            bar = self.broker.current_market_data[pos['symbol']]; spread = self.broker._get_spread_in_price_terms(pos['symbol']); precision = self.broker._get_price_precision(pos['symbol'])
+            price = round(bar['close'] - spread / 2, precision) if pos['side'] == OrderSide.BUY else round(bar['close'] + spread / 2, precision)
+            unrealized += self.broker.calculate_pnl_in_account_currency(pos['symbol'], pos['side'], pos['volume'], pos['entry_price'], price)
+            margin += self.broker._calculate_margin_required(pos['symbol'], pos['volume'], pos['entry_price'])
+        return self.broker.balance + unrealized, margin
+
+    def test_matches_full_recomputation(self):
+        rng = random.Random(3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for step in range(200):
+                self.broker.update_market_data(self._snapshot(rng))
+                action = rng.random()
+                if action < 0.4: self.broker.place_order(rng.choice(list(self.prices)), OrderType.MARKET, rng.choice([OrderSide.BUY, OrderSide.SELL]), rng.choice([0.01, 0.1, 0.5]))
+                elif action < 0.6 and self.broker.open_positions: self.broker.close_order(rng.choice(list(self.broker.open_positions)))
+                equity, margin = self._full_recompute()
+                self.assertAlmostEqual(self.broker.equity, equity, places=6)
+                self.assertAlmostEqual(self.broker.margin_used, margin, places=6)
+        self.assertGreater(len(self.broker.open_positions), 5)
+        for pos in self.broker.get_open_positions(): # Lazily materialized per-position valuations
+            bar = self.broker.current_market_data[pos['symbol']]; spread = self.broker._get_spread_in_price_terms(pos['symbol'])
+            expected_price = round(bar['close'] - spread / 2, 3 if pos['symbol'].endswith("JPY") else 5) if pos['side'] == OrderSide.BUY else round(bar['close'] + spread / 2, 3 if pos['symbol'].endswith("JPY") else 5)
+            self.assertEqual(pos['current_price'], expected_price)
+            self.assertAlmostEqual(pos['profit_loss'], self.broker.calculate_pnl_in_account_currency(pos['symbol'], pos['side'], pos['volume'], pos['entry_price'], expected_price), places=6)
+
+    def test_only_changed_symbols_are_revalued(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.broker.update_market_data(self._snapshot(random.Random(1)))
+            for symbol in ("GBPUSD", "USDJPY"): self.broker.place_order(symbol, OrderType.MARKET, OrderSide.BUY, 0.1)
+            with patch.object(self.broker, "_value_exposure", wraps=self.broker._value_exposure) as value:
+                self.broker.get_account_info(); self.broker.get_open_positions(); self.broker._update_equity_and_margin()
+                self.assertEqual(value.call_count, 0) # Read-only queries do not revalue
+            with patch.object(self.broker, "_calculate_margin_required", wraps=self.broker._calculate_margin_required) as margin:
+                bars = dict(self.broker.current_market_data); p = self.prices["GBPUSD"] * 1.001
+                bars["GBPUSD"] = create_candlestick(1_700_003_600.0, p, p, p, p, bid_c=p * 0.99999, ask_c=p * 1.00001)
+                self.broker.update_market_data(bars)
+                self.assertEqual([call.args[0] for call in margin.call_args_list], ["GBPUSD"]) # USDJPY's inputs did not move
+        self.assertAlmostEqual(self.broker.equity, self._full_recompute()[0], places=6)
+
+class TestSimulatedBrokerTriggerBook(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()): self.broker = SimulatedBroker(initial_capital=10_000_000.0)
+        self.broker.update_current_time(1_700_000_000.0)
+        self.broker.update_market_data({"EURUSD": create_candlestick(1_700_000_000.0, 1.1, 1.1, 1.1, 1.1), "USDJPY": create_candlestick(1_700_000_000.0, 150.0, 150.0, 150.0, 150.0)})
+
+    def _expected_hits(self):
+        # Reference: the former scan of every open position against the bar's low/high
+        expected = []
+        for pos_id, pos in self.broker.open_positions.items():
+            bar = self.broker.current_market_data[pos['symbol']]; sl, tp = pos['stop_loss'], pos['take_profit']
+            if pos['side'] == OrderSide.BUY:
+                if sl is not None and bar['low'] <= sl: expected.append((pos_id, sl, "STOP_LOSS_HIT"))
+                elif tp is not None and bar['high'] >= tp: expected.append((pos_id, tp, "TAKE_PROFIT_HIT"))
+            else:
+                if sl is not None and bar['high'] >= sl: expected.append((pos_id, sl, "STOP_LOSS_HIT"))
+                elif tp is not None and bar['low'] <= tp: expected.append((pos_id, tp, "TAKE_PROFIT_HIT"))
+        return expected
+
+    def test_matches_full_scan(self):
+        rng = random.Random(7); prices = {"EURUSD": 1.1, "USDJPY": 150.0}; num_closed = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for step in range(300):
+                for _ in range(3):
+                    symbol = rng.choice(list(prices)); side = rng.choice([OrderSide.BUY, OrderSide.SELL]); p = prices[symbol]; sign = 1 if side == OrderSide.BUY else -1
+                    sl = p * (1 - sign * rng.uniform(0.0005, 0.01)) if rng.random() < 0.8 else None
+                    tp = p * (1 + sign * rng.uniform(0.0005, 0.01)) if rng.random() < 0.8 else None
+                    self.broker.place_order(symbol, OrderType.MARKET, side, 0.01, stop_loss=sl, take_profit=tp)
+                if self.broker.open_positions and rng.random() < 0.5: # Move a level, sometimes onto another position's level
+                    pos = self.broker.open_positions[rng.choice(list(self.broker.open_positions))]; others = list(self.broker.open_positions.values())
+                    self.broker.modify_order(pos['position_id'], new_stop_loss=rng.choice(others)['stop_loss'] if pos['side'] == OrderSide.BUY else None, new_take_profit=pos['entry_price'] * rng.uniform(0.99, 1.01))
+                bars = {}
+                for symbol in prices:
+                    prices[symbol] *= 1 + rng.uniform(-0.003, 0.003); p = prices[symbol]
+                    bars[symbol] = create_candlestick(1_700_000_000.0 + step, p, p * (1 + rng.uniform(0, 0.004)), p * (1 - rng.uniform(0, 0.004)), p)
+                self.broker.update_market_data(bars)
+                expected = self._expected_hits(); history_start = len(self.broker.trade_history)
+                self.broker.check_for_sl_tp_triggers()
+                closed = [(event['position_id'], event['close_price'], event['reason_for_close']) for event in self.broker.trade_history[history_start:]]
+                self.assertEqual(closed, expected)
+                self.assertEqual(self._expected_hits(), [])
+                num_closed += len(closed)
+        self.assertGreater(num_closed, 100)
+        self.assertGreater(len(self.broker.open_positions), 50)
+
+    def test_modify_order_moves_levels(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            position_id = self.broker.place_order("EURUSD", OrderType.MARKET, OrderSide.BUY, 0.1, stop_loss=1.09, take_profit=1.12)["position_id"]
+            self.broker.modify_order(position_id, new_stop_loss=1.05, new_take_profit=1.2)
+            self.broker.update_market_data({"EURUSD": create_candlestick(1_700_000_060.0, 1.1, 1.15, 1.06, 1.1)}) # Through both former levels
+            self.broker.check_for_sl_tp_triggers()
+            self.assertIn(position_id, self.broker.open_positions)
+            self.broker.update_market_data({"EURUSD": create_candlestick(1_700_000_120.0, 1.1, 1.1, 1.049, 1.06)})
+            self.broker.check_for_sl_tp_triggers()
+        self.assertNotIn(position_id, self.broker.open_positions)
+        self.assertEqual((self.broker.trade_history[-1]['close_price'], self.broker.trade_history[-1]['reason_for_close']), (1.05, "STOP_LOSS_HIT"))
+        self.assertEqual(len(self.broker._trigger_book), 0)
+
+
+class TestSimulatedBrokerMarginCall(unittest.TestCase):
+
+    def _broker(self, num_positions: int, position_store: str = "dict", liquidation_mode: str = "sequential") -> SimulatedBroker:
+        # ~80% longs opened around 1.10, then a bar at 1.07 takes the margin level well below the stop-out level
+        random.seed(11); rng = random.Random(11)
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=num_positions * 55.0, position_store=position_store); broker.liquidation_mode = liquidation_mode
+            for i in range(num_positions):
+                p = 1.1 + rng.uniform(-0.005, 0.005)
+                broker.update_current_time(1_700_000_000.0 + i); broker.update_market_data({"EURUSD": create_candlestick(1_700_000_000.0 + i, p, p, p, p)})
+                broker.place_order("EURUSD", OrderType.MARKET, OrderSide.BUY if rng.random() < 0.8 else OrderSide.SELL, rng.choice([0.01, 0.02, 0.05]))
+            broker.update_current_time(1_700_100_000.0); broker.update_market_data({"EURUSD": create_candlestick(1_700_100_000.0, 1.07, 1.07, 1.07, 1.07)})
+        return broker
+
+    def _closed_ids(self, broker: SimulatedBroker, history_start: int) -> List[str]:
+        return [event['position_id'] for event in broker.trade_history[history_start:] if event['event_type'] == "POSITION_CLOSED"]
+
+    def test_liquidation_order_matches_full_scan(self):
+        broker = self._broker(300); history_start = len(broker.trade_history)
+        self.assertLess(broker.equity / broker.margin_used * 100, broker.stop_out_level_pct)
+        # Reference: the former loop, a full scan for the largest loss before every close
+        reference = []; equity, margin_used = broker.equity, broker.margin_used
+        broker._refresh_position_valuations(); positions = {pos_id: dict(pos) for pos_id, pos in broker.open_positions.items()}
+        while equity / margin_used * 100 <= broker.stop_out_level_pct:
+            worst_id = None; largest_loss = float('inf')
+            for pos_id, pos in positions.items():
+                if pos['profit_loss'] < largest_loss: largest_loss = pos['profit_loss']; worst_id = pos_id
+            pos = positions.pop(worst_id); reference.append(worst_id)
+            equity += broker.calculate_pnl_in_account_currency("EURUSD", pos['side'], pos['volume'], pos['entry_price'], round(1.07 - broker._get_spread_in_price_terms("EURUSD") / 2, 5) if pos['side'] == OrderSide.BUY else round(1.07 + broker._get_spread_in_price_terms("EURUSD") / 2, 5)) - pos['profit_loss']
+            margin_used -= broker._calculate_margin_required("EURUSD", pos['volume'], pos['entry_price'])
+        with contextlib.redirect_stdout(io.StringIO()): broker.check_for_margin_call()
+        self.assertEqual(self._closed_ids(broker, history_start), reference)
+        self.assertGreater(len(reference), 20)
+        self.assertGreater(broker.equity / broker.margin_used * 100, broker.stop_out_level_pct)
+        self.assertEqual(broker.trade_history[-1]['event_type'], "MARGIN_CALL_RESOLVED")
+
+    def test_batch_mode_and_array_store_match_sequential(self):
+        results = []
+        for position_store, liquidation_mode in (("dict", "sequential"), ("dict", "batch"), ("arrays", "sequential"), ("arrays", "batch")):
+            broker = self._broker(300, position_store, liquidation_mode); history_start = len(broker.trade_history)
+            with contextlib.redirect_stdout(io.StringIO()): broker.check_for_margin_call()
+            results.append((len(self._closed_ids(broker, history_start)), round(broker.balance, 6), round(broker.equity, 6), round(broker.margin_used, 6), broker.trade_history[-1]['event_type']))
+        self.assertEqual(results, [results[0]] * 4)
+
+    def test_large_stop_out_orders_positions_once(self):
+        # The liquidation order is one heap built from a single valuation pass, not a full scan per close; the batch
+        # mode also revalues the account once for all its closes. (Timings: run_benchmarks.py, broker.stop_out.)
+        for liquidation_mode in ("sequential", "batch"):
+            broker = self._broker(2000, liquidation_mode=liquidation_mode); history_start = len(broker.trade_history)
+            with patch.object(broker, "_liquidation_heap", wraps=broker._liquidation_heap) as build_heap, \
+                 patch.object(broker, "_refresh_position_valuations", wraps=broker._refresh_position_valuations) as refresh, \
+                 patch.object(broker, "_update_equity_and_margin", wraps=broker._update_equity_and_margin) as revalue, \
+                 contextlib.redirect_stdout(io.StringIO()):
+                broker.check_for_margin_call()
+            num_closed = len(self._closed_ids(broker, history_start))
+            self.assertGreater(num_closed, 100)
+            self.assertEqual((build_heap.call_count, refresh.call_count), (1, 1))
+            self.assertEqual(revalue.call_count, 1 + (1 if liquidation_mode == "batch" else num_closed)) # The valuation pass, then per close or per batch
+            self.assertGreater(broker.equity / broker.margin_used * 100, broker.stop_out_level_pct)
+
+    def test_rejects_unknown_liquidation_mode(self):
+        broker = self._broker(50, liquidation_mode="all")
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(ValueError): broker.check_for_margin_call()
+
+class TestSimulatedBrokerFork(unittest.TestCase):
+
+    def _broker(self, position_store: str = "dict") -> SimulatedBroker:
+        random.seed(5); rng = random.Random(5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            broker = SimulatedBroker(initial_capital=100_000.0, position_store=position_store); broker.update_current_time(1_700_000_000.0)
+            broker.update_market_data({"EURUSD": create_candlestick(1_700_000_000.0, 1.1, 1.1, 1.1, 1.1), "USDJPY": create_candlestick(1_700_000_000.0, 150.0, 150.0, 150.0, 150.0)})
+            for _ in range(200):
+                symbol = rng.choice(["EURUSD", "USDJPY"]); p = 1.1 if symbol == "EURUSD" else 150.0
+                broker.place_order(symbol, OrderType.MARKET, rng.choice([OrderSide.BUY, OrderSide.SELL]), 0.1, stop_loss=p * rng.uniform(0.95, 0.99), take_profit=None)
+            broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.09)
+        return broker
+
+    def _what_if(self, broker: SimulatedBroker) -> None:
+        first_id = next(iter(broker.open_positions)); pending_id = next(iter(broker.pending_orders))
+        broker.place_order("EURUSD", OrderType.MARKET, OrderSide.BUY, 2.0, stop_loss=1.095)
+        broker.close_order(first_id); broker.modify_order(pending_id, new_price=1.101)
+        broker.update_current_time(1_700_000_060.0)
+        broker.update_market_data({"EURUSD": create_candlestick(1_700_000_060.0, 1.1, 1.102, 1.094, 1.096), "USDJPY": create_candlestick(1_700_000_060.0, 150.0, 150.0, 150.0, 150.0)})
+        broker.process_pending_orders(); broker.check_for_sl_tp_triggers()
+
+    def _state(self, broker: SimulatedBroker):
+        return ({k: v for k, v in broker.get_account_info().items() if k != 'account_id'}, sorted((pos['symbol'], pos['side'].value, pos['volume'], pos['entry_price'], pos['stop_loss'], pos['profit_loss']) for pos in broker.get_open_positions()),
+                [(order['symbol'], order['price']) for order in broker.pending_orders.values()])
+
+    def test_fork_leaves_the_broker_untouched_and_matches_direct_application(self):
+        for position_store in ("dict", "arrays"):
+            broker = self._broker(position_store); before = self._state(broker); history_length = len(broker.trade_history); random_state = random.getstate()
+            with contextlib.redirect_stdout(io.StringIO()):
+                forked = broker.fork(); self._what_if(forked)
+            self.assertEqual(self._state(broker), before)
+            self.assertEqual(len(broker.trade_history), history_length)
+            self.assertEqual(random.getstate(), random_state)
+            self.assertEqual(len(broker._trigger_book), 200)
+            direct = self._broker(position_store) # Same seed: same positions and ids order, and the same slippage draws
+            with contextlib.redirect_stdout(io.StringIO()): self._what_if(direct)
+            self.assertEqual(self._state(forked), self._state(direct))
+            self.assertEqual([event['event_type'] for event in forked.trade_history], [event['event_type'] for event in direct.trade_history[history_length:]])
+            self.assertGreater(sum(event['event_type'] == "POSITION_CLOSED" for event in forked.trade_history), 5)
+
+    def test_fork_copies_only_what_it_touches(self):
+        broker = self._broker()
+        with contextlib.redirect_stdout(io.StringIO()):
+            forked = broker.fork()
+            forked.place_order("EURUSD", OrderType.MARKET, OrderSide.SELL, 1.0)
+        self.assertEqual(len(forked.open_positions), 201)
+        self.assertEqual(len(forked.open_positions._copies), 1) # Just the new position; equity came from the copied exposures
+        self.assertLess(forked.get_account_info()['margin'] - broker.get_account_info()['margin'], 1200.0)
+        self.assertGreater(forked.get_account_info()['margin'], broker.get_account_info()['margin'])
+
+class TestSimulatedBrokerPendingOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()): self.broker = SimulatedBroker(initial_capital=10_000_000.0)
+        self.t0 = 1_700_000_000.0 # 2023-11-14 22:13:20 UTC
+        self.broker.update_current_time(self.t0)
+        self.broker.update_market_data({"EURUSD": create_candlestick(self.t0, 1.1, 1.1, 1.1, 1.1), "USDJPY": create_candlestick(self.t0, 150.0, 150.0, 150.0, 150.0)})
+
+    def _expected_triggers(self):
+        # Reference: the former scan of every pending order against the bar's low/high
+        expected = []
+        for order_id, po in self.broker.pending_orders.items():
+            bar = self.broker.current_market_data[po['symbol']]; price = po['price']; is_buy = po['side'] == OrderSide.BUY
+            if po['type'] == OrderType.LIMIT and (bar['low'] <= price if is_buy else bar['high'] >= price): expected.append(order_id)
+            elif po['type'] == OrderType.STOP and (bar['high'] >= price if is_buy else bar['low'] <= price): expected.append(order_id)
+        return expected
+
+    def test_matches_full_scan(self):
+        rng = random.Random(11); prices = {"EURUSD": 1.1, "USDJPY": 150.0}; num_filled = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for step in range(300):
+                for _ in range(3):
+                    symbol = rng.choice(list(prices)); side = rng.choice([OrderSide.BUY, OrderSide.SELL]); order_type = rng.choice([OrderType.LIMIT, OrderType.STOP])
+                    self.broker.place_order(symbol, order_type, side, 0.01, price=prices[symbol] * (1 + rng.uniform(-0.01, 0.01)))
+                if self.broker.pending_orders and rng.random() < 0.5:
+                    order_id = rng.choice(list(self.broker.pending_orders)); po = self.broker.pending_orders[order_id]
+                    self.broker.modify_order(order_id, new_price=po['price'] * (1 + rng.uniform(-0.01, 0.01)))
+                bars = {}
+                for symbol in prices:
+                    prices[symbol] *= 1 + rng.uniform(-0.003, 0.003); p = prices[symbol]
+                    bars[symbol] = create_candlestick(self.t0 + step, p, p * (1 + rng.uniform(0, 0.004)), p * (1 - rng.uniform(0, 0.004)), p)
+                self.broker.update_market_data(bars)
+                expected = self._expected_triggers(); history_start = len(self.broker.trade_history)
+                self.broker.process_pending_orders()
+                filled = [event['original_order_id'] for event in self.broker.trade_history[history_start:] if event['event_type'] == "PENDING_ORDER_FILLED"]
+                self.assertEqual(filled, expected)
+                self.assertEqual(self._expected_triggers(), [])
+                num_filled += len(filled)
+        self.assertGreater(num_filled, 100)
+        self.assertGreater(len(self.broker.pending_orders), 50)
+
+    def test_day_order_expires_at_cutoff(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            day_id = self.broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.09, time_in_force=TimeInForce.DAY)["order_id"]
+            gtc_id = self.broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.08)["order_id"]
+            self.assertEqual(self.broker.pending_orders[day_id]["expiry_time"], 1_700_006_400.0) # Next 00:00 UTC
+            self.broker.update_current_time(1_700_006_399.0); self.broker.process_pending_orders()
+            self.assertIn(day_id, self.broker.pending_orders)
+            self.broker.update_current_time(1_700_006_400.0)
+            self.broker.update_market_data({"EURUSD": create_candlestick(1_700_006_400.0, 1.1, 1.1, 1.085, 1.09)}) # Would fill the DAY order
+            self.broker.process_pending_orders()
+        self.assertEqual(list(self.broker.pending_orders), [gtc_id])
+        self.assertEqual([e["order_id"] for e in self.broker.trade_history if e["event_type"] == "PENDING_ORDER_EXPIRED"], [day_id])
+        self.assertEqual(self.broker.open_positions, {})
+
+    def test_ioc_and_fok_fill_now_or_cancel(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            filled = self.broker.place_order("EURUSD", OrderType.LIMIT, OrderSide.BUY, 0.1, price=1.1002, time_in_force=TimeInForce.IOC) # Ask 1.1001 is inside the limit
+            cancelled = self.broker.place_order("EURUSD", OrderType.STOP, OrderSide.BUY, 0.1, price=1.1050, time_in_force=TimeInForce.FOK)
+        self.assertEqual((filled["status"], filled["price"]), ("FILLED", 1.1001))
+        self.assertIn(filled["position_id"], self.broker.open_positions)
+        self.assertEqual(cancelled["status"], "CANCELLED")
+        self.assertEqual(self.broker.pending_orders, {})
+        self.assertEqual(self.broker.trade_history[-1]["event_type"], "PENDING_ORDER_CANCELLED")
+
+    def test_book_survives_pickle_and_direct_assignment(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            order_id = self.broker.place_order("EURUSD", OrderType.STOP, OrderSide.SELL, 0.1, price=1.095, time_in_force=TimeInForce.DAY)["order_id"]
+        book = pickle.loads(pickle.dumps(self.broker.pending_orders))
+        self.assertEqual(book, self.broker.pending_orders)
+        self.assertEqual(book.triggered("EURUSD", (1.09, 1.1), (1.09, 1.1)), [(0, order_id)])
+        self.assertEqual(book.next_expiry(), 1_700_006_400.0)
+        book[order_id] = {**book[order_id], "price": 1.08} # Re-assignment re-indexes
+        self.assertEqual(book.triggered("EURUSD", (1.09, 1.1), (1.09, 1.1)), [])
+        del book[order_id]
+        self.assertEqual((book.symbols(), book.next_expiry()), ({}.keys(), None))
+
+class TestSimulatedBrokerHistoricalData(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()): self.broker = SimulatedBroker(initial_capital=10000.0)
+        self.t0 = 1_700_000_000.0
+        self.h1 = [create_candlestick(self.t0 + i * 3600, 1.1, 1.101, 1.099, 1.1 + i * 1e-5) for i in range(500)]
+        self.h4 = [create_candlestick(self.t0 + i * 4 * 3600, 1.2, 1.201, 1.199, 1.2 + i * 1e-5) for i in range(125)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.broker.load_test_data("EURUSD", self.h1)
+            self.broker.load_test_data("EURUSD", self.h4, timeframe="H4")
+
+    def _fetch(self, *args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()): return self.broker.get_historical_data(*args, **kwargs)
+
+    def test_matches_former_filter(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            now = self.t0 + rng.uniform(-3600, 520 * 3600); start = now - rng.uniform(0, 100 * 3600); end = now + rng.uniform(-3600, 3600) if rng.random() < 0.5 else None
+            count = rng.choice([None, 1, 10, 50])
+            self.broker.update_current_time(now)
+            effective_end = min(end if end is not None else now, now)
+            expected = [bar for bar in self.h1 if start <= bar['timestamp'] <= effective_end]
+            if count is not None and len(expected) > count: expected = expected[-count:]
+            self.assertEqual(self._fetch("EURUSD", "H1", start, end, count=count), expected)
+
+    def test_count_only_fetch_and_timeframes(self):
+        self.broker.update_current_time(self.t0 + 100 * 3600)
+        self.assertEqual(self._fetch("EURUSD", "H1", None, count=3), self.h1[98:101])
+        self.assertEqual(self._fetch("EURUSD", "h4", None, count=3), self.h4[23:26]) # H4 bars loaded for that timeframe
+        self.assertEqual(self._fetch("EURUSD", "D1", self.t0, count=2), self.h1[99:101]) # Other timeframes fall back to the default bars
+        bars = self._fetch("EURUSD", "H1", self.t0)
+        self.assertTrue(np.shares_memory(bars.bars.close, self.broker.test_data_store["EURUSD"].bars.close)) # Zero-copy
+
+    def test_load_symbol_bars_validates_and_sorts(self):
+        raw = SymbolBars.from_candlesticks("GBPUSD", [create_candlestick(self.t0 + 7200, 1.3, 1.3, 1.3, 1.3), create_candlestick(self.t0 + 3600, 1.2, 1.2, 1.2, 1.2, bid_c=-1.0),
+                                                       create_candlestick(self.t0, 0.0, 1.3, 1.3, 1.3)])
+        with contextlib.redirect_stdout(io.StringIO()): self.broker.load_test_data("gbpusd", raw)
+        stored = self.broker.test_data_store["GBPUSD"]
+        self.assertEqual([bar['timestamp'] for bar in stored], [self.t0 + 3600, self.t0 + 7200])
+        self.assertIsNone(stored[0]['bid_close'])
+
 if __name__ == '__main__':
     # Adjust sys.path if running the script directly and TradingAgents is not in PYTHONPATH
     import os
@@ -0,0 +1,246 @@
+import bisect
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+
+from TradingAgents.tradingagents.forex_utils.forex_states import OrderSide, OrderType, Position
+
+# Ladder slots per symbol. Longs stop out / take profit on the way down / up, shorts the other way round, so each
+# ladder fires on one end of the price range: "low" ladders for every level >= low, "high" ladders for every level <= high.
+BUY_STOP_LOSS, BUY_TAKE_PROFIT, SELL_STOP_LOSS, SELL_TAKE_PROFIT = range(4)
+_LOW_LADDERS = (BUY_STOP_LOSS, SELL_TAKE_PROFIT)
+
+Entry = Tuple[float, int, str] # (level, sequence, id); the sequence keeps ties and results in opening/placement order
+
+
+def _range_hits(ladder: List[Entry], fires_at_low: bool, low: float, high: float) -> List[Entry]:
+    if fires_at_low: return ladder[bisect.bisect_left(ladder, (low,)):] # Levels >= low
+    return ladder[:bisect.bisect_right(ladder, (high, float('inf')))] # Levels <= high
+
+
+def _remove_entry(ladder: List[Entry], entry: Entry) -> None:
+    index = bisect.bisect_left(ladder, entry)
+    if index < len(ladder) and ladder[index] == entry: del ladder[index]
+
+
+class TriggerBook:
+    """
+    Stop-loss / take-profit levels of open positions in sorted per-symbol, per-side ladders.
+
+    ``triggered`` answers "which positions does this price range hit" with two bisections per ladder, so a bar costs
+    O(log n + hits) instead of a scan of every open position. Positions are added when opened, re-indexed by
+    ``update`` when their levels are modified and removed when closed.
+    """
+
+    def __init__(self):
+        self._ladders: Dict[str, Tuple[List[Entry], List[Entry], List[Entry], List[Entry]]] = {}
+        self._entries: Dict[str, Tuple[str, Optional[Entry], Optional[Entry], int, int, int]] = {} # position_id -> (symbol, sl entry, tp entry, sl slot, tp slot, sequence)
+        self._next_sequence = 0
+
+    def __len__(self) -> int: return len(self._entries)
+    def __contains__(self, position_id: object) -> bool: return position_id in self._entries
+
+    def symbols(self): return self._ladders.keys() # Symbols with at least one level
+    def clear(self) -> None: self._ladders.clear(); self._entries.clear(); self._next_sequence = 0
+
+    def fork(self) -> "TriggerBook":
+        """Independent copy; the ladders are copied list by list (entries are immutable tuples) rather than rebuilt."""
+        forked = TriggerBook()
+        forked._ladders = {symbol: tuple(ladder.copy() for ladder in ladders) for symbol, ladders in self._ladders.items()}
+        forked._entries = self._entries.copy(); forked._next_sequence = self._next_sequence
+        return forked
+
+    def add(self, position: Position, sequence: Optional[int] = None) -> None:
+        position_id, symbol = position['position_id'], position['symbol']
+        if position_id in self._entries: self.remove(position_id)
+        if sequence is None: sequence = self._next_sequence; self._next_sequence += 1
+        is_buy = position['side'] == OrderSide.BUY
+        sl_slot, tp_slot = (BUY_STOP_LOSS, BUY_TAKE_PROFIT) if is_buy else (SELL_STOP_LOSS, SELL_TAKE_PROFIT)
+        sl, tp = position.get('stop_loss'), position.get('take_profit')
+        sl_entry = (float(sl), sequence, position_id) if sl is not None else None
+        tp_entry = (float(tp), sequence, position_id) if tp is not None else None
+        if sl_entry or tp_entry:
+            ladders = self._ladders.get(symbol)
+            if ladders is None: ladders = self._ladders[symbol] = ([], [], [], [])
+            if sl_entry: bisect.insort(ladders[sl_slot], sl_entry)
+            if tp_entry: bisect.insort(ladders[tp_slot], tp_entry)
+        self._entries[position_id] = (symbol, sl_entry, tp_entry, sl_slot, tp_slot, sequence)
+
+    def update(self, position: Position) -> None:
+        """Re-indexes a position after its stop_loss/take_profit changed, keeping its place in the opening order."""
+        entry = self._entries.get(position['position_id'])
+        self.add(position, sequence=entry[5] if entry else None)
+
+    def remove(self, position_id: str) -> None:
+        entry = self._entries.pop(position_id, None)
+        if entry is None: return
+        symbol, sl_entry, tp_entry, sl_slot, tp_slot, _ = entry
+        ladders = self._ladders.get(symbol)
+        if ladders is None: return
+        for slot, level_entry in ((sl_slot, sl_entry), (tp_slot, tp_entry)):
+            if level_entry is not None: _remove_entry(ladders[slot], level_entry)
+        if not any(ladders): del self._ladders[symbol]
+
+    def triggered(self, symbol: str, buy_range: Tuple[float, float], sell_range: Tuple[float, float]) -> List[Tuple[int, str, float, str]]:
+        """
+        (sequence, position_id, level, reason) of every position of ``symbol`` hit by the (low, high) price range its
+        side closes on, in opening order. A stop loss wins over a take profit hit in the same range.
+        """
+        ladders = self._ladders.get(symbol)
+        if ladders is None: return []
+        buy_sl, buy_tp, sell_sl, sell_tp = ladders
+        if not ((buy_sl and buy_sl[-1][0] >= buy_range[0]) or (buy_tp and buy_tp[0][0] <= buy_range[1]) # Common case: nothing fires
+                or (sell_sl and sell_sl[0][0] <= sell_range[1]) or (sell_tp and sell_tp[-1][0] >= sell_range[0])): return []
+        hits: Dict[str, Tuple[int, float, str]] = {}
+        for slot, price_range in ((BUY_STOP_LOSS, buy_range), (SELL_STOP_LOSS, sell_range)):
+            for level, sequence, position_id in _range_hits(ladders[slot], slot in _LOW_LADDERS, *price_range): hits[position_id] = (sequence, level, "STOP_LOSS_HIT")
+        for slot, price_range in ((BUY_TAKE_PROFIT, buy_range), (SELL_TAKE_PROFIT, sell_range)):
+            for level, sequence, position_id in _range_hits(ladders[slot], slot in _LOW_LADDERS, *price_range):
+                if position_id not in hits: hits[position_id] = (sequence, level, "TAKE_PROFIT_HIT")
+        return sorted((sequence, position_id, level, reason) for position_id, (sequence, level, reason) in hits.items())
+
+    def extremes(self, symbol: str) -> Tuple[float, float, float, float]:
+        """
+        Loosest level per trigger direction as (ask <= a, ask >= b, bid <= c, bid >= d) thresholds: longs close on the
+        bid, shorts on the ask. Directions without levels are +-inf.
+        """
+        ask_le, ask_ge, bid_le, bid_ge = float('-inf'), float('inf'), float('-inf'), float('inf')
+        ladders = self._ladders.get(symbol)
+        if ladders is None: return ask_le, ask_ge, bid_le, bid_ge
+        if ladders[BUY_STOP_LOSS]: bid_le = ladders[BUY_STOP_LOSS][-1][0]
+        if ladders[BUY_TAKE_PROFIT]: bid_ge = ladders[BUY_TAKE_PROFIT][0][0]
+        if ladders[SELL_STOP_LOSS]: ask_ge = ladders[SELL_STOP_LOSS][0][0]
+        if ladders[SELL_TAKE_PROFIT]: ask_le = ladders[SELL_TAKE_PROFIT][-1][0]
+        return ask_le, ask_ge, bid_le, bid_ge
+
+
+# Pending-order ladder slots per symbol. Buy limits and sell stops fire when price comes down to them (levels >= low),
+# sell limits and buy stops when it comes up (levels <= high).
+BUY_LIMIT, SELL_LIMIT, BUY_STOP, SELL_STOP = range(4)
+_ORDER_LOW_LADDERS = (BUY_LIMIT, SELL_STOP)
+_ORDER_SLOTS = {(OrderType.LIMIT, OrderSide.BUY): BUY_LIMIT, (OrderType.LIMIT, OrderSide.SELL): SELL_LIMIT,
+                (OrderType.STOP, OrderSide.BUY): BUY_STOP, (OrderType.STOP, OrderSide.SELL): SELL_STOP}
+
+
+class PendingOrderBook(dict):
+    """
+    order_id -> pending order dict, indexed by trigger price in per-symbol buy-limit / sell-limit / buy-stop / sell-stop
+    ladders and by ``expiry_time`` in a heap.
+
+    Indexing happens in ``__setitem__`` / ``__delitem__``, so ``pending_orders[order_id] = {...}`` and ``del`` keep the
+    book consistent; after changing the price or expiry of an order in place, call ``reindex``. Iteration order is
+    placement order, as for a plain dict, and ``triggered`` returns orders in that order too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._ladders: Dict[str, Tuple[List[Entry], List[Entry], List[Entry], List[Entry]]] = {}
+        self._entries: Dict[str, Tuple[str, Optional[int], Optional[Entry], Optional[float], int]] = {} # order_id -> (symbol, slot, ladder entry, expiry, sequence)
+        self._expiries: List[Tuple[float, int, str]] = [] # Heap of (expiry_time, sequence, order_id); stale entries are skipped on pop
+        self._next_sequence = 0
+        self.update(*args, **kwargs)
+
+    def __reduce__(self): return (PendingOrderBook, (dict(self),))
+
+    def __setitem__(self, order_id: str, order: Dict[str, Any]) -> None:
+        entry = self._entries.get(order_id)
+        if entry is not None: self._unindex(order_id) # Re-assignment keeps the dict position, so it keeps the sequence too
+        super().__setitem__(order_id, order)
+        self._index(order_id, order, entry[4] if entry is not None else None)
+
+    def __delitem__(self, order_id: str) -> None: super().__delitem__(order_id); self._unindex(order_id)
+
+    def pop(self, order_id: str, *default):
+        if order_id in self: self._unindex(order_id)
+        return super().pop(order_id, *default)
+
+    def popitem(self):
+        order_id, order = super().popitem(); self._unindex(order_id)
+        return order_id, order
+
+    def setdefault(self, order_id: str, default: Optional[Dict[str, Any]] = None):
+        if order_id not in self: self[order_id] = default
+        return self[order_id]
+
+    def update(self, *args, **kwargs) -> None:
+        for order_id, order in dict(*args, **kwargs).items(): self[order_id] = order
+
+    def __ior__(self, other): self.update(other); return self
+    def copy(self) -> "PendingOrderBook": return PendingOrderBook(self)
+
+    def fork(self) -> "PendingOrderBook":
+        """
+        Independent copy for a broker fork: each order dict is copied (modify_order edits orders in place) and the
+        indexes are copied rather than rebuilt, so sequences, and with them fill order, match the original book.
+        """
+        forked = PendingOrderBook()
+        dict.update(forked, ((order_id, dict(order)) for order_id, order in self.items()))
+        forked._ladders = {symbol: tuple(ladder.copy() for ladder in ladders) for symbol, ladders in self._ladders.items()}
+        forked._entries = self._entries.copy(); forked._expiries = self._expiries.copy(); forked._next_sequence = self._next_sequence
+        return forked
+
+    def clear(self) -> None:
+        super().clear(); self._ladders.clear(); self._entries.clear(); self._expiries.clear(); self._next_sequence = 0
+
+    def reindex(self, order_id: str) -> None: self[order_id] = self[order_id]
+
+    def _index(self, order_id: str, order: Dict[str, Any], sequence: Optional[int]) -> None:
+        if sequence is None: sequence = self._next_sequence; self._next_sequence += 1
+        symbol, slot, entry = order.get('symbol'), _ORDER_SLOTS.get((order.get('type'), order.get('side'))), None
+        if slot is not None and order.get('price') is not None:
+            entry = (float(order['price']), sequence, order_id)
+            ladders = self._ladders.get(symbol)
+            if ladders is None: ladders = self._ladders[symbol] = ([], [], [], [])
+            bisect.insort(ladders[slot], entry)
+        expiry = order.get('expiry_time')
+        if expiry is not None: heapq.heappush(self._expiries, (float(expiry), sequence, order_id))
+        self._entries[order_id] = (symbol, slot, entry, float(expiry) if expiry is not None else None, sequence)
+
+    def _unindex(self, order_id: str) -> None:
+        symbol, slot, entry, _, _ = self._entries.pop(order_id)
+        if entry is None: return
+        ladders = self._ladders[symbol]; _remove_entry(ladders[slot], entry)
+        if not any(ladders): del self._ladders[symbol]
+
+    def symbols(self): return self._ladders.keys() # Symbols with at least one priced LIMIT/STOP order
+
+    def triggered(self, symbol: str, buy_range: Tuple[float, float], sell_range: Tuple[float, float]) -> List[Tuple[int, str]]:
+        """(sequence, order_id) of the orders of ``symbol`` hit by the (low, high) price range of their side, in placement order."""
+        ladders = self._ladders.get(symbol)
+        if ladders is None: return []
+        buy_limit, sell_limit, buy_stop, sell_stop = ladders
+        if not ((buy_limit and buy_limit[-1][0] >= buy_range[0]) or (sell_stop and sell_stop[-1][0] >= sell_range[0]) # Common case: nothing fires
+                or (sell_limit and sell_limit[0][0] <= sell_range[1]) or (buy_stop and buy_stop[0][0] <= buy_range[1])): return []
+        hits = []
+        for slot, price_range in ((BUY_LIMIT, buy_range), (SELL_LIMIT, sell_range), (BUY_STOP, buy_range), (SELL_STOP, sell_range)):
+            hits.extend(_range_hits(ladders[slot], slot in _ORDER_LOW_LADDERS, *price_range))
+        return sorted((sequence, order_id) for _, sequence, order_id in hits)
+
+    def extremes(self, symbol: str) -> Tuple[float, float, float, float]:
+        """Loosest trigger price per direction as (ask <= a, ask >= b, bid <= c, bid >= d): buys fill on the ask, sells on the bid."""
+        ask_le, ask_ge, bid_le, bid_ge = float('-inf'), float('inf'), float('-inf'), float('inf')
+        ladders = self._ladders.get(symbol)
+        if ladders is None: return ask_le, ask_ge, bid_le, bid_ge
+        if ladders[BUY_LIMIT]: ask_le = ladders[BUY_LIMIT][-1][0]
+        if ladders[BUY_STOP]: ask_ge = ladders[BUY_STOP][0][0]
+        if ladders[SELL_STOP]: bid_le = ladders[SELL_STOP][-1][0]
+        if ladders[SELL_LIMIT]: bid_ge = ladders[SELL_LIMIT][0][0]
+        return ask_le, ask_ge, bid_le, bid_ge
+
+    def _drop_stale_expiries(self) -> None:
+        expiries = self._expiries
+        while expiries:
+            expiry, sequence, order_id = expiries[0]; entry = self._entries.get(order_id)
+            if entry is not None and entry[3] == expiry and entry[4] == sequence: return
+            heapq.heappop(expiries)
+
+    def next_expiry(self) -> Optional[float]:
+        self._drop_stale_expiries()
+        return self._expiries[0][0] if self._expiries else None
+
+    def expired(self, now: float) -> List[str]:
+        """Ids of the orders whose expiry_time is <= now, earliest first. They stay in the book until deleted."""
+        expired_ids = []
+        self._drop_stale_expiries()
+        while self._expiries and self._expiries[0][0] <= now:
+            expired_ids.append(heapq.heappop(self._expiries)[2]); self._drop_stale_expiries()
+        return list(dict.fromkeys(expired_ids)) # A reindex with an unchanged expiry leaves a duplicate heap entry
@@ -1,10 +1,9 @@
 from typing import Dict, Any, Optional
 from tradingagents.forex_utils.forex_states import ForexSubAgentTask, ForexTradeProposal
 from tradingagents.broker_interface.base import BrokerInterface # Import the ABC
+from tradingagents.forex_utils.indicators import IndicatorEngine, SHARED_INDICATOR_ENGINE, round_or_none
 import datetime
 import traceback # For printing tracebacks
-import pandas as pd
-import pandas_ta as ta
 
 class SwingTraderAgent:
     def __init__(self,
@@ -22,11 +21,13 @@ class SwingTraderAgent:
                  macd_slow: int = 26,
                  macd_signal: int = 9,
                  stop_loss_pips: int = 150, # Wider SL for swing trades
-                 take_profit_pips: int = 300 # Wider TP for swing trades
+                 take_profit_pips: int = 300, # Wider TP for swing trades
+                 indicator_engine: Optional[IndicatorEngine] = None # Defaults to the engine shared by all agents
                 ):
         self.broker = broker
         self.agent_id = agent_id
         self.publisher = publisher
+        self.indicator_engine = indicator_engine if indicator_engine is not None else SHARED_INDICATOR_ENGINE
 
         # Strategy Parameters
         self.timeframe = timeframe
@@ -136,52 +137,29 @@ class SwingTraderAgent:
         # Check if historical_data is not None and has enough data for the longest EMA
         if historical_data and len(historical_data) >= self.ema_long_period:
             try:
-                print(f"{self.agent_id}: Converting fetched data to DataFrame for TA...")
-                df = pd.DataFrame(historical_data)
-                # Ensure 'timestamp' column exists before using it
-                if 'timestamp' not in df.columns:
-                    raise ValueError("DataFrame created from historical_data is missing 'timestamp' column.")
-
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s', utc=True)
-                df.set_index('timestamp', inplace=True)
-
-                # Ensure required OHLC columns exist
-                required_ohlc = ['open', 'high', 'low', 'close']
-                if not all(col in df.columns for col in required_ohlc):
-                    raise ValueError(f"DataFrame is missing one or more required OHLC columns: {required_ohlc}")
-
-                print(f"{self.agent_id}: Calculating TA indicators for Swing Trading (EMAs: {self.ema_short_period}/{self.ema_long_period}, RSI: {self.rsi_period})...")
-                df.ta.rsi(length=self.rsi_period, append=True, col_names=(f'RSI_{self.rsi_period}',))
-                df.ta.ema(length=self.ema_short_period, append=True, col_names=(f'EMA_{self.ema_short_period}',))
-                df.ta.ema(length=self.ema_long_period, append=True, col_names=(f'EMA_{self.ema_long_period}',))
-                df.ta.macd(fast=self.macd_fast, slow=self.macd_slow, signal=self.macd_signal, append=True,
-                           col_names=(f'MACD_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}',
-                                      f'MACDH_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}',
-                                      f'MACDS_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}'))
-
-                if not df.empty and not df.iloc[-1].empty:
-                    last_row = df.iloc[-1]
-                    rsi_col_name = f'RSI_{self.rsi_period}'
-                    ema_s_col_name = f'EMA_{self.ema_short_period}'
-                    ema_l_col_name = f'EMA_{self.ema_long_period}'
-                    macd_line_col_name = f'MACD_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}'
-                    macd_signal_col_name = f'MACDS_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}' # Corrected key for MACD Signal
-                    macd_hist_col_name = f'MACDH_{self.macd_fast}_{self.macd_slow}_{self.macd_signal}'
-
-
-                    latest_indicators = {
-                        rsi_col_name: round(last_row[rsi_col_name], 2) if rsi_col_name in last_row and pd.notna(last_row[rsi_col_name]) else None,
-                        ema_s_col_name: round(last_row[ema_s_col_name], 5) if ema_s_col_name in last_row and pd.notna(last_row[ema_s_col_name]) else None,
-                        ema_l_col_name: round(last_row[ema_l_col_name], 5) if ema_l_col_name in last_row and pd.notna(last_row[ema_l_col_name]) else None,
-                        'MACD_line': round(last_row[macd_line_col_name], 5) if macd_line_col_name in last_row and pd.notna(last_row[macd_line_col_name]) else None,
-                        'MACD_signal_line': round(last_row[macd_signal_col_name], 5) if macd_signal_col_name in last_row and pd.notna(last_row[macd_signal_col_name]) else None, # Corrected key name for proposal
-                        'MACD_histogram': round(last_row[macd_hist_col_name], 5) if macd_hist_col_name in last_row and pd.notna(last_row[macd_hist_col_name]) else None, # Corrected key name for proposal
-                    }
-                    ta_message = f"TA calculated for Swing. Latest RSI: {latest_indicators.get(rsi_col_name)}"
-                    print(f"{self.agent_id}: {ta_message}")
-                else:
-                    ta_message = "DataFrame was empty or last row was empty after TA calculation attempts."
-                    print(f"{self.agent_id}: {ta_message}")
+                # Streaming states from the shared indicator engine: only the bars new since its last update are processed
+                engine = self.indicator_engine
+                rsi_state = engine.rsi(currency_pair, self.timeframe, self.rsi_period)
+                ema_s_state = engine.ema(currency_pair, self.timeframe, self.ema_short_period)
+                ema_l_state = engine.ema(currency_pair, self.timeframe, self.ema_long_period)
+                macd_state = engine.macd(currency_pair, self.timeframe, self.macd_fast, self.macd_slow, self.macd_signal)
+                new_bars = engine.update(currency_pair, self.timeframe, historical_data)
+                print(f"{self.agent_id}: TA indicators for Swing Trading (EMAs: {self.ema_short_period}/{self.ema_long_period}, RSI: {self.rsi_period}) updated with {new_bars} new bars.")
+
+                rsi_col_name = f'RSI_{self.rsi_period}'
+                ema_s_col_name = f'EMA_{self.ema_short_period}'
+                ema_l_col_name = f'EMA_{self.ema_long_period}'
+
+                latest_indicators = {
+                    rsi_col_name: round_or_none(rsi_state.value, 2),
+                    ema_s_col_name: round_or_none(ema_s_state.value, 5),
+                    ema_l_col_name: round_or_none(ema_l_state.value, 5),
+                    'MACD_line': round_or_none(macd_state.macd, 5),
+                    'MACD_signal_line': round_or_none(macd_state.signal_line, 5),
+                    'MACD_histogram': round_or_none(macd_state.histogram, 5),
+                }
+                ta_message = f"TA calculated for Swing. Latest RSI: {latest_indicators.get(rsi_col_name)}"
+                print(f"{self.agent_id}: {ta_message}")
 
             except Exception as e:
                 print(f"{self.agent_id}: Error during TA calculation for {currency_pair}: {e}")
@@ -0,0 +1,115 @@
+import copy
+import datetime
+import math
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Proposal signals priced off the live tick (entry, SL and TP), so a result carrying one is never reused
+ACTIONABLE_SIGNALS = ("BUY", "SELL")
+# Timeframes without a fixed bar length: their window key is read from the bars themselves
+IRREGULAR_TIMEFRAMES = ("MN1",)
+
+
+class AgentScheduler:
+    """
+    Timeframe-aware evaluation of sub-agents: an agent is re-run only when a new bar has closed on its ``timeframe``,
+    otherwise its last result is handed back.
+
+    An agent's proposal is a function of the bars it fetches on its timeframe, so a PositionTraderAgent on W1 bars in an
+    H1 backtest gives the same answer for ~120 steps in a row. The window the agent is about to fetch
+    (``num_bars_to_fetch`` bars of ``timeframe`` back from the decision time, as the forex sub-agents request it) is
+    keyed by bar-open arithmetic, as the (first, last) index of the bars it covers on the timeframe's grid, and the
+    cached result is reused while that key is unchanged. As the window start is inclusive, a window also changes one
+    main bar after a new bar opened, when its oldest bar drops out, so a scheduled agent runs about twice per bar of its
+    timeframe. Agents without ``num_bars_to_fetch`` are keyed on the newest bar only.
+
+    The grid's phase is read once per (symbol, timeframe) from the broker's newest bar (W1 bars open on a Sunday or
+    Monday, not on the epoch's Thursday); after that no bars are fetched to decide on a reuse. The grid key is only used
+    when the broker serves real bars of the agent's timeframe: a live broker, or a SimulatedBroker loaded with
+    ``load_test_data(..., timeframe="W1")``. A SimulatedBroker whose one series answers every timeframe (as in
+    BacktestingEngine) and MN1 bars, which have no fixed length, are keyed on the fetched window (bar count, oldest and
+    newest bar), so an agent fed finer bars is re-run whenever they change.
+
+    Results are only cached when every proposal in them is a non-actionable one (HOLD etc.): BUY/SELL proposals carry
+    entry, SL and TP priced off the current tick, so they are re-evaluated at each step. A reused result is a deep copy
+    with its proposals' ``timestamp`` and ``proposal_id`` restamped with the current UTC time, as the sub-agents stamp
+    the proposals they evaluate. Agents that read the
+    tick for every decision (e.g. the scalper's spread filter) should not be scheduled at all.
+    """
+
+    def __init__(self, broker: Any):
+        self.broker = broker
+        self.stats: Dict[str, int] = {"runs": 0, "reuses": 0}
+        self._results: Dict[Tuple[str, str], Tuple[Hashable, Dict[str, Any]]] = {} # (agent_id, symbol) -> (bar key, result)
+        self._grid_phases: Dict[Tuple[str, str], float] = {} # (symbol, timeframe) -> bar open time modulo the bar length
+        self._lock = threading.Lock() # The graph runs the sub-agent branches concurrently
+
+    def window_key(self, agent: Any, symbol: str, decision_time_unix: float) -> Optional[Hashable]:
+        """Key of the window ``agent`` fetches at ``decision_time_unix`` (see the class docstring); None when the broker has no bars."""
+        timeframe = agent.timeframe; num_bars = getattr(agent, "num_bars_to_fetch", None)
+        timeframe_seconds = getattr(agent, "_get_timeframe_seconds_approx", None) or getattr(self.broker, "_get_timeframe_seconds_approx", None)
+        timeframe_store = getattr(self.broker, "timeframe_data_store", None) # SimulatedBroker: bars loaded per timeframe
+        on_grid = timeframe_store is None or (symbol.upper(), timeframe.upper()) in timeframe_store
+        if timeframe_seconds is None or timeframe.upper() in IRREGULAR_TIMEFRAMES or not on_grid: return self._fetched_window_key(symbol, timeframe, num_bars, timeframe_seconds, decision_time_unix)
+        bar_seconds = timeframe_seconds(timeframe)
+        phase = self._grid_phase(symbol, timeframe, bar_seconds, decision_time_unix)
+        if phase is None: return None
+        last = math.floor((decision_time_unix - phase) / bar_seconds) # Bars open at phase + k * bar_seconds, the window's ends are inclusive
+        if num_bars is None: return (last,)
+        return (math.ceil((decision_time_unix - num_bars * bar_seconds - phase) / bar_seconds), last)
+
+    def _grid_phase(self, symbol: str, timeframe: str, bar_seconds: float, decision_time_unix: float) -> Optional[float]:
+        grid = (symbol.upper(), timeframe.upper())
+        phase = self._grid_phases.get(grid)
+        if phase is None:
+            bars = self.broker.get_historical_data(symbol, timeframe, None, decision_time_unix, count=1)
+            if not bars: return None
+            bar = bars[len(bars) - 1]
+            phase = self._grid_phases[grid] = bar.get('timestamp', bar.get('time')) % bar_seconds # 'time' for MT5Broker bars
+        return phase
+
+    def _fetched_window_key(self, symbol: str, timeframe: str, num_bars: Optional[int], timeframe_seconds: Optional[Callable[[str], float]], decision_time_unix: float) -> Optional[Hashable]:
+        if num_bars is not None and timeframe_seconds is not None:
+            bars = self.broker.get_historical_data(symbol, timeframe, decision_time_unix - num_bars * timeframe_seconds(timeframe), decision_time_unix)
+        else: bars = self.broker.get_historical_data(symbol, timeframe, None, decision_time_unix, count=1)
+        if not bars: return None
+        first, last = bars[0], bars[len(bars) - 1]
+        return (len(bars), first.get('timestamp', first.get('time')), last.get('timestamp', last.get('time'))) # 'time' for MT5Broker bars
+
+    def run(self, agent: Any, symbol: str, decision_time_unix: float, evaluate: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """``evaluate()`` if the agent's window has changed since its cached result, else that result."""
+        bar_key = self.window_key(agent, symbol, decision_time_unix) if getattr(agent, "timeframe", None) else None
+        key = (getattr(agent, "agent_id", type(agent).__name__), symbol.upper())
+        with self._lock:
+            cached = self._results.get(key)
+            if bar_key is not None and cached is not None and cached[0] == bar_key:
+                self.stats["reuses"] += 1; return self._restamped(cached[1])
+        result = evaluate()
+        with self._lock:
+            self.stats["runs"] += 1
+            if bar_key is not None and self._reusable(result): self._results[key] = (bar_key, copy.deepcopy(result))
+            else: self._results.pop(key, None)
+        return result
+
+    @staticmethod
+    def _reusable(result: Dict[str, Any]) -> bool:
+        proposals = [value for name, value in result.items() if name.endswith("_proposal")]
+        return bool(proposals) and all(isinstance(proposal, dict) and proposal.get("signal") not in ACTIONABLE_SIGNALS for proposal in proposals)
+
+    @staticmethod
+    def _restamped(result: Dict[str, Any]) -> Dict[str, Any]:
+        # A copy the caller may change, issued now: the sub-agents stamp proposal ids as prop_<agent>_<pair>_<time>
+        result = copy.deepcopy(result)
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        for name, proposal in result.items():
+            if not name.endswith("_proposal") or not isinstance(proposal, dict): continue
+            proposal_id, stamp = proposal.get("proposal_id"), str(proposal.get("timestamp")).replace(':', '-')
+            if isinstance(proposal_id, str):
+                prefix = proposal_id[:-len(stamp)].rstrip('_') if "timestamp" in proposal and proposal_id.endswith(stamp) else proposal_id
+                proposal["proposal_id"] = f"{prefix}_{timestamp.replace(':', '-')}"
+            if "timestamp" in proposal: proposal["timestamp"] = timestamp
+        return result
+
+    def clear(self):
+        """Forgets the cached results and bar grids, e.g. before a new run over the same timestamps with different data."""
+        with self._lock: self._results.clear(); self._grid_phases.clear()
@@ -0,0 +1,235 @@
+import json
+import os
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick
+
+# Column order of the store. Every column is a float64 array; optional fields use NaN for "missing".
+BAR_FIELDS = ("timestamp", "open", "high", "low", "close", "volume", "bid_close", "ask_close")
+OPTIONAL_BAR_FIELDS = frozenset(("volume", "bid_close", "ask_close"))
+_MANIFEST_FILE = "manifest.json"
+
+
+class CandlestickView(Mapping):
+    """
+    Read-only, dict-like view of one row of a SymbolBars table.
+
+    Behaves like a Candlestick TypedDict for readers (``bar['close']``, ``bar.get('bid_close')``,
+    ``dict(bar)``) without allocating a dict per bar. Missing optional values read back as None.
+    """
+    __slots__ = ("_bars", "_index")
+
+    def __init__(self, bars: "SymbolBars", index: int):
+        self._bars = bars
+        self._index = index
+
+    def __getitem__(self, key: str) -> Optional[float]:
+        if key not in self._bars.columns: raise KeyError(key)
+        value = float(self._bars.columns[key][self._index])
+        if value != value and key in OPTIONAL_BAR_FIELDS: return None # NaN -> None
+        return value
+
+    def __iter__(self) -> Iterator[str]: return iter(BAR_FIELDS)
+    def __len__(self) -> int: return len(BAR_FIELDS)
+    def __repr__(self) -> str: return f"CandlestickView({self._bars.symbol}[{self._index}], {self.to_dict()})"
+
+    @property
+    def index(self) -> int: return self._index
+
+    def to_dict(self) -> Candlestick:
+        return Candlestick(**{key: self[key] for key in BAR_FIELDS})
+
+
+class SymbolBars:
+    """
+    Columnar bar table for a single symbol: one float64 NumPy array per field in BAR_FIELDS.
+
+    Arrays may be memory-mapped (see BarStore.load), so they are treated as read-only.
+    """
+    __slots__ = ("symbol", "columns", "timestamp", "open", "high", "low", "close", "volume", "bid_close", "ask_close")
+
+    def __init__(self, symbol: str, columns: Dict[str, np.ndarray]):
+        missing = [field for field in BAR_FIELDS if field not in columns]
+        if missing: raise ValueError(f"SymbolBars for {symbol}: missing columns {missing}.")
+        lengths = {len(columns[field]) for field in BAR_FIELDS}
+        if len(lengths) > 1: raise ValueError(f"SymbolBars for {symbol}: columns have different lengths {sorted(lengths)}.")
+        self.symbol = symbol.upper()
+        self.columns = {field: columns[field] for field in BAR_FIELDS}
+        for field in BAR_FIELDS: setattr(self, field, self.columns[field])
+
+    @classmethod
+    def from_candlesticks(cls, symbol: str, bars: List[Candlestick]) -> "SymbolBars":
+        columns: Dict[str, np.ndarray] = {}
+        for field in BAR_FIELDS:
+            if field in OPTIONAL_BAR_FIELDS:
+                values = [bar.get(field) for bar in bars]
+                columns[field] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                columns[field] = np.array([bar[field] for bar in bars], dtype=np.float64)
+        return cls(symbol, columns)
+
+    def __len__(self) -> int: return len(self.timestamp)
+
+    def bar(self, index: int) -> CandlestickView:
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError(f"Bar index {index} out of range for {self.symbol} ({len(self)} bars).")
+        return CandlestickView(self, index)
+
+    def to_candlesticks(self) -> List[Candlestick]:
+        return [self.bar(i).to_dict() for i in range(len(self))]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> "BarSequence": return BarSequence(self, start, stop)
+
+    def window(self, start_time_unix: Optional[float] = None, end_time_unix: Optional[float] = None, count: Optional[int] = None) -> "BarSequence":
+        """Rows with start_time_unix <= timestamp <= end_time_unix (either bound optional), at most the last ``count``."""
+        return self.rows().window(start_time_unix, end_time_unix, count)
+
+    def take(self, indexer) -> "SymbolBars":
+        """Rows selected by a boolean mask or index array (a copy)."""
+        return SymbolBars(self.symbol, {field: np.asarray(column)[indexer] for field, column in self.columns.items()})
+
+    def slice(self, start: int, end: Optional[int] = None) -> "SymbolBars":
+        """Zero-copy row range [start, end) (NumPy views, also over memory-mapped columns)."""
+        return SymbolBars(self.symbol, {field: column[start:end] for field, column in self.columns.items()})
+
+    def time_slice(self, start_time_unix: float, end_time_unix: Optional[float] = None) -> "SymbolBars":
+        """Zero-copy rows with start_time_unix <= timestamp < end_time_unix."""
+        start = int(np.searchsorted(self.timestamp, start_time_unix, side="left"))
+        end = int(np.searchsorted(self.timestamp, end_time_unix, side="left")) if end_time_unix is not None else None
+        return self.slice(start, end)
+
+
+class BarSequence(Sequence):
+    """
+    Read-only, list-like window of rows [start, stop) of a SymbolBars table. Items are CandlestickView rows and slices
+    are BarSequences over the same arrays, so neither indexing nor slicing copies bar data. Time windows are two
+    binary searches on the timestamp column.
+    """
+    __slots__ = ("_bars", "_start", "_stop")
+
+    def __init__(self, bars: SymbolBars, start: int = 0, stop: Optional[int] = None):
+        self._bars = bars
+        self._start = start
+        self._stop = len(bars) if stop is None else max(start, stop)
+
+    def __len__(self) -> int: return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1: return [self[i] for i in range(start, stop, step)]
+            return BarSequence(self._bars, self._start + start, self._start + stop)
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self): raise IndexError(f"BarSequence index {index} out of range ({len(self)} bars).")
+        return CandlestickView(self._bars, self._start + index)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Sequence, list)) and not isinstance(other, (str, bytes)): return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str: return f"BarSequence({self._bars.symbol}[{self._start}:{self._stop}])"
+
+    @property
+    def symbol(self) -> str: return self._bars.symbol
+
+    @property
+    def bars(self) -> SymbolBars:
+        """The window as a SymbolBars table of zero-copy column views."""
+        return self._bars.slice(self._start, self._stop)
+
+    def to_candlesticks(self) -> List[Candlestick]: return [CandlestickView(self._bars, i).to_dict() for i in range(self._start, self._stop)]
+
+    def window(self, start_time_unix: Optional[float] = None, end_time_unix: Optional[float] = None, count: Optional[int] = None) -> "BarSequence":
+        """Rows with start_time_unix <= timestamp <= end_time_unix (either bound optional), at most the last ``count``."""
+        timestamps = self._bars.timestamp[self._start:self._stop]
+        stop = int(np.searchsorted(timestamps, end_time_unix, side="right")) if end_time_unix is not None else len(timestamps)
+        start = int(np.searchsorted(timestamps, start_time_unix, side="left")) if start_time_unix is not None else 0
+        if count is not None: start = max(start, stop - count)
+        return BarSequence(self._bars, self._start + start, self._start + stop)
+
+
+class BarStore:
+    """
+    Symbol -> SymbolBars container used by BacktestingEngine and SimulatedBroker.
+
+    Build it from the legacy ``Dict[str, List[Candlestick]]`` with ``from_candlesticks``, or persist it with
+    ``save`` and reopen it memory-mapped with ``load`` so large histories are paged in from disk on demand.
+    """
+
+    def __init__(self, symbol_bars: Optional[Dict[str, SymbolBars]] = None):
+        self._symbols: Dict[str, SymbolBars] = {}
+        for symbol, bars in (symbol_bars or {}).items(): self._symbols[symbol.upper()] = bars
+
+    @classmethod
+    def from_candlesticks(cls, data: Dict[str, List[Candlestick]]) -> "BarStore":
+        return cls({symbol.upper(): SymbolBars.from_candlesticks(symbol, bars) for symbol, bars in data.items()})
+
+    def __getitem__(self, symbol: str) -> SymbolBars: return self._symbols[symbol.upper()]
+    def __contains__(self, symbol: object) -> bool: return isinstance(symbol, str) and symbol.upper() in self._symbols
+    def __iter__(self) -> Iterator[str]: return iter(self._symbols)
+    def __len__(self) -> int: return len(self._symbols)
+    def keys(self): return self._symbols.keys()
+    def items(self): return self._symbols.items()
+    def values(self): return self._symbols.values()
+
+    def add(self, bars: SymbolBars) -> None: self._symbols[bars.symbol] = bars
+
+    def time_slice(self, start_time_unix: float, end_time_unix: Optional[float] = None) -> "BarStore":
+        return BarStore({symbol: bars.time_slice(start_time_unix, end_time_unix) for symbol, bars in self._symbols.items()})
+
+    def save(self, directory: str) -> None:
+        """Writes one .npy file per symbol/column plus a manifest, suitable for BarStore.load(mmap=True)."""
+        os.makedirs(directory, exist_ok=True)
+        manifest = {"fields": list(BAR_FIELDS), "symbols": {}}
+        for symbol, bars in self._symbols.items():
+            for field in BAR_FIELDS:
+                np.save(os.path.join(directory, f"{symbol}.{field}.npy"), np.ascontiguousarray(bars.columns[field], dtype=np.float64))
+            manifest["symbols"][symbol] = {"num_bars": len(bars)}
+        with open(os.path.join(directory, _MANIFEST_FILE), "w") as f: json.dump(manifest, f, indent=2)
+        print(f"BarStore: Saved {len(self._symbols)} symbol(s) to {directory}.")
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "BarStore":
+        with open(os.path.join(directory, _MANIFEST_FILE)) as f: manifest = json.load(f)
+        mmap_mode = "r" if mmap else None
+        store = cls()
+        for symbol in manifest["symbols"]:
+            columns = {field: np.load(os.path.join(directory, f"{symbol}.{field}.npy"), mmap_mode=mmap_mode) for field in BAR_FIELDS}
+            store.add(SymbolBars(symbol, columns))
+        return store
+
+
+class AlignedTimeline:
+    """
+    Merged event timeline over every symbol of a BarStore with a precomputed as-of index.
+
+    ``timestamps`` is the sorted union of all bar timestamps. For each symbol, ``asof_index[symbol][step]`` is the
+    index of that symbol's latest bar with timestamp <= ``timestamps[step]`` (-1 before its first bar), so a
+    backtest step can fetch the current bar of every symbol in O(1) even when the series have gaps.
+    """
+
+    def __init__(self, store: BarStore):
+        for symbol, bars in store.items():
+            if len(bars) > 1 and np.any(np.diff(bars.timestamp) < 0):
+                raise ValueError(f"AlignedTimeline: timestamps for {symbol} are not sorted in ascending order.")
+        non_empty = [bars.timestamp for bars in store.values() if len(bars)]
+        self.timestamps: np.ndarray = np.unique(np.concatenate(non_empty)) if non_empty else np.empty(0, dtype=np.float64)
+        self.asof_index: Dict[str, np.ndarray] = {}
+        self.symbol_steps: Dict[str, np.ndarray] = {} # Timeline step of each bar of the symbol
+        for symbol, bars in store.items():
+            self.asof_index[symbol] = np.searchsorted(bars.timestamp, self.timestamps, side="right").astype(np.int64) - 1
+            self.symbol_steps[symbol] = np.searchsorted(self.timestamps, bars.timestamp, side="left").astype(np.int64)
+
+    def __len__(self) -> int: return len(self.timestamps)
+
+    def latest_index(self, symbol: str, step: int) -> int:
+        return int(self.asof_index[symbol.upper()][step])
+
+
+def as_bar_store(data_source: Union[BarStore, Dict[str, List[Candlestick]]]) -> BarStore:
+    """Accepts either a BarStore or the legacy symbol -> list-of-Candlestick dict."""
+    if isinstance(data_source, BarStore): return data_source
+    return BarStore.from_candlesticks(data_source)
@@ -0,0 +1,310 @@
+import math
+import operator
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .forex_states import Candlestick # Relative: the agents import this module from the TradingAgents/ root
+
+# Streaming versions of the pandas_ta indicators the forex sub-agents use. Each state object consumes one bar in O(1)
+# and reproduces pandas_ta's defaults (without TA-Lib) over the same bar series: EMA seeded with the SMA of its first
+# ``length`` values, RSI/ATR smoothed with pandas_ta's ``rma`` (``ewm(alpha=1/length, min_periods=length)``, i.e. the
+# adjusted form of Wilder's smoothing), population-std Bollinger bands. ``value`` is None during warm-up, where
+# pandas_ta returns NaN.
+
+
+# Per state class: (slot names, getter of all their values, indices of the slots holding a deque or a nested state)
+_STATE_LAYOUTS: Dict[type, Tuple[Tuple[str, ...], Any, Tuple[int, ...]]] = {}
+
+def _state_layout(state: Any) -> Tuple[Tuple[str, ...], Any, Tuple[int, ...]]:
+    layout = _STATE_LAYOUTS.get(type(state))
+    if layout is None:
+        names = tuple(name for base in type(state).__mro__ for name in getattr(base, "__slots__", ()) if name != "_before_last")
+        nested = tuple(i for i, name in enumerate(names) if isinstance(getattr(state, name), (deque, _RMA, StreamingIndicator)))
+        layout = _STATE_LAYOUTS[type(state)] = (names, operator.attrgetter(*names), nested)
+    return layout
+
+def _save_state(state: Any) -> Tuple:
+    """Values of a slotted state object, its nested states and windows included, as a tuple (much cheaper than deepcopy)."""
+    names, get_values, nested = _state_layout(state)
+    values = get_values(state)
+    if not nested: return values
+    values = list(values)
+    for i in nested: values[i] = tuple(values[i]) if isinstance(values[i], deque) else _save_state(values[i])
+    return tuple(values)
+
+def _load_state(state: Any, saved: Tuple):
+    names, _, nested = _state_layout(state)
+    for i, (name, value) in enumerate(zip(names, saved)):
+        if i in nested:
+            current = getattr(state, name)
+            if isinstance(current, deque): current.clear(); current.extend(value)
+            else: _load_state(current, value)
+        else: setattr(state, name, value)
+
+
+class _RMA:
+    """pandas_ta ``rma``: adjusted exponential mean with alpha = 1/length, valid once ``length`` values were seen."""
+    __slots__ = ("length", "_decay", "_numerator", "_denominator", "_count", "value")
+
+    def __init__(self, length: int):
+        self.length = length; self._decay = 1.0 - 1.0 / length
+        self._numerator = 0.0; self._denominator = 0.0; self._count = 0; self.value: Optional[float] = None
+
+    def update(self, x: float) -> Optional[float]:
+        self._numerator = x + self._decay * self._numerator; self._denominator = 1.0 + self._decay * self._denominator; self._count += 1
+        if self._count >= self.length: self.value = self._numerator / self._denominator
+        return self.value
+
+
+class StreamingIndicator(ABC):
+    """Base of the streaming state objects: ``push(bar)`` consumes a Candlestick, ``last_timestamp`` is the last one consumed."""
+    __slots__ = ("last_timestamp", "bars_seen", "_last_bar", "_before_last")
+
+    def __init__(self):
+        self.last_timestamp: Optional[float] = None
+        self.bars_seen = 0
+        self._last_bar: Optional[Tuple[float, float, float]] = None # (high, low, close) of the last bar consumed
+        self._before_last: Optional[Tuple] = None # State before that bar (_save_state), when it was pushed as revisable
+
+    def push(self, bar: Candlestick, revisable: bool = False):
+        """Consumes ``bar``; with ``revisable`` the state before it is kept, so ``rewind`` can take the bar back."""
+        self._before_last = _save_state(self) if revisable else None
+        self._consume(bar); self.last_timestamp = bar['timestamp']; self.bars_seen += 1
+        self._last_bar = (bar['high'], bar['low'], bar['close'])
+
+    def is_last_bar(self, bar: Candlestick) -> bool:
+        """True if ``bar`` is the last bar consumed, with the same timestamp and high/low/close."""
+        return bar['timestamp'] == self.last_timestamp and (bar['high'], bar['low'], bar['close']) == self._last_bar
+
+    def rewind(self) -> bool:
+        """Back to the state before the last bar consumed; False if that bar was not pushed as revisable."""
+        state = self._before_last
+        if state is None: return False
+        _load_state(self, state)
+        self._before_last = None
+        return True
+
+    def reset(self):
+        """Back to the warm-up state (same parameters)."""
+        self.__init__(*self.params())
+
+    @abstractmethod
+    def params(self) -> Tuple:
+        """Constructor arguments, used by ``reset``."""
+        pass
+
+    @abstractmethod
+    def _consume(self, bar: Candlestick):
+        pass
+
+    @abstractmethod
+    def latest(self) -> Dict[str, Optional[float]]:
+        """Current values by output name, None during warm-up."""
+        pass
+
+
+class StreamingEMA(StreamingIndicator):
+    __slots__ = ("length", "_alpha", "_seed_sum", "_count", "value")
+
+    def __init__(self, length: int):
+        super().__init__()
+        if length < 1: raise ValueError(f"StreamingEMA: length must be >= 1, got {length}.")
+        self.length = length; self._alpha = 2.0 / (length + 1)
+        self._seed_sum = 0.0; self._count = 0; self.value: Optional[float] = None
+
+    def params(self) -> Tuple: return (self.length,)
+    def _consume(self, bar: Candlestick): self.update(bar['close'])
+    def latest(self) -> Dict[str, Optional[float]]: return {"ema": self.value}
+
+    def update(self, x: float) -> Optional[float]:
+        self._count += 1
+        if self._count < self.length: self._seed_sum += x
+        elif self._count == self.length: self.value = (self._seed_sum + x) / self.length
+        else: self.value += self._alpha * (x - self.value)
+        return self.value
+
+
+class StreamingRSI(StreamingIndicator):
+    __slots__ = ("length", "_gains", "_losses", "_previous_close", "value")
+
+    def __init__(self, length: int = 14):
+        super().__init__()
+        if length < 1: raise ValueError(f"StreamingRSI: length must be >= 1, got {length}.")
+        self.length = length; self._gains = _RMA(length); self._losses = _RMA(length)
+        self._previous_close: Optional[float] = None; self.value: Optional[float] = None
+
+    def params(self) -> Tuple: return (self.length,)
+    def _consume(self, bar: Candlestick): self.update(bar['close'])
+    def latest(self) -> Dict[str, Optional[float]]: return {"rsi": self.value}
+
+    def update(self, close: float) -> Optional[float]:
+        previous = self._previous_close; self._previous_close = close
+        if previous is None: return None # No change before the second close
+        change = close - previous
+        gain = self._gains.update(change if change > 0 else 0.0); loss = self._losses.update(-change if change < 0 else 0.0)
+        if gain is not None:
+            total = gain + loss
+            self.value = 100.0 * gain / total if total else None # pandas_ta yields NaN (0/0) on a flat window
+        return self.value
+
+
+class StreamingMACD(StreamingIndicator):
+    __slots__ = ("fast", "slow", "signal", "_fast_ema", "_slow_ema", "_signal_ema", "macd", "signal_line", "histogram")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__()
+        if slow < fast: fast, slow = slow, fast # As pandas_ta
+        self.fast = fast; self.slow = slow; self.signal = signal
+        self._fast_ema = StreamingEMA(fast); self._slow_ema = StreamingEMA(slow); self._signal_ema = StreamingEMA(signal)
+        self.macd: Optional[float] = None; self.signal_line: Optional[float] = None; self.histogram: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]: return self.macd
+
+    def params(self) -> Tuple: return (self.fast, self.slow, self.signal)
+    def _consume(self, bar: Candlestick): self.update(bar['close'])
+    def latest(self) -> Dict[str, Optional[float]]: return {"macd": self.macd, "signal": self.signal_line, "histogram": self.histogram}
+
+    def update(self, close: float) -> Optional[float]:
+        fast = self._fast_ema.update(close); slow = self._slow_ema.update(close)
+        if fast is None or slow is None: return None
+        self.macd = fast - slow
+        self.signal_line = self._signal_ema.update(self.macd) # Seeded from the first valid MACD values
+        if self.signal_line is not None: self.histogram = self.macd - self.signal_line
+        return self.macd
+
+
+class StreamingATR(StreamingIndicator):
+    __slots__ = ("length", "_true_range", "_previous_close", "value")
+
+    def __init__(self, length: int = 14):
+        super().__init__()
+        if length < 1: raise ValueError(f"StreamingATR: length must be >= 1, got {length}.")
+        self.length = length; self._true_range = _RMA(length)
+        self._previous_close: Optional[float] = None; self.value: Optional[float] = None
+
+    def params(self) -> Tuple: return (self.length,)
+    def _consume(self, bar: Candlestick): self.update(bar['high'], bar['low'], bar['close'])
+    def latest(self) -> Dict[str, Optional[float]]: return {"atr": self.value}
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        previous = self._previous_close; self._previous_close = close
+        if previous is None: return None # True range needs the previous close
+        self.value = self._true_range.update(max(high - low, abs(high - previous), abs(previous - low)))
+        return self.value
+
+
+class StreamingBollinger(StreamingIndicator):
+    __slots__ = ("length", "std", "ddof", "_window", "_offset", "_sum", "_sum_squares", "lower", "mid", "upper", "bandwidth", "percent")
+
+    def __init__(self, length: int = 5, std: float = 2.0, ddof: int = 0):
+        super().__init__()
+        if length <= ddof: raise ValueError(f"StreamingBollinger: length must be > ddof, got {length}.")
+        self.length = length; self.std = float(std); self.ddof = ddof
+        # Running sums over the window, of values shifted by the first close to keep the variance well conditioned
+        self._window: deque = deque(); self._offset: Optional[float] = None; self._sum = 0.0; self._sum_squares = 0.0
+        self.lower: Optional[float] = None; self.mid: Optional[float] = None; self.upper: Optional[float] = None
+        self.bandwidth: Optional[float] = None; self.percent: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]: return self.mid
+
+    def params(self) -> Tuple: return (self.length, self.std, self.ddof)
+    def _consume(self, bar: Candlestick): self.update(bar['close'])
+    def latest(self) -> Dict[str, Optional[float]]: return {"lower": self.lower, "mid": self.mid, "upper": self.upper, "bandwidth": self.bandwidth, "percent": self.percent}
+
+    def update(self, close: float) -> Optional[float]:
+        if self._offset is None: self._offset = close
+        x = close - self._offset; window = self._window
+        window.append(x); self._sum += x; self._sum_squares += x * x
+        if len(window) > self.length:
+            dropped = window.popleft(); self._sum -= dropped; self._sum_squares -= dropped * dropped
+        if len(window) < self.length: return None
+        n = self.length; mean = self._sum / n
+        deviation = self.std * math.sqrt(max(self._sum_squares - n * mean * mean, 0.0) / (n - self.ddof))
+        self.mid = mean + self._offset; self.lower = self.mid - deviation; self.upper = self.mid + deviation
+        width = self.upper - self.lower
+        self.bandwidth = 100.0 * width / self.mid if self.mid else None
+        self.percent = (close - self.lower) / width if width else None
+        return self.mid
+
+
+class IndicatorEngine:
+    """
+    Streaming indicator states keyed by (symbol, timeframe, indicator params), shared by the agents that use them.
+
+    Agents ask for the states they read (``engine.rsi("EURUSD", "H1", 14)`` creates it on first use), call
+    ``update(symbol, timeframe, bars)`` with the bars they fetched and read ``.value``/``latest()``. Each state
+    consumes only the bars newer than its ``last_timestamp``, so with overlapping fetch windows every bar is processed
+    once per state instead of re-running pandas_ta over the whole window per call, and a state added later (another
+    agent, another period) warms up from the window it is first given.
+
+    A state whose last bar is not inside the given window (a gap longer than the window, or time moved backwards for
+    a new run) is reset and rebuilt from the window, which gives the same values a pandas_ta run over that window
+    would. A bar is consumed once by timestamp, except for the last bar of each window, which may still be forming (a
+    live fetch): the state from before it is kept, and when a later window brings that bar back with another
+    high/low/close, it is re-applied in place of the version consumed earlier.
+    """
+
+    def __init__(self):
+        self._streams: Dict[Tuple[str, str], Dict[Tuple, StreamingIndicator]] = {}
+        self._lock = threading.Lock() # Agents may run concurrently over the same (symbol, timeframe)
+
+    def __getstate__(self) -> Dict[str, Any]: return {"_streams": self._streams} # Picklable and deep-copyable: the lock is recreated
+    def __setstate__(self, state: Dict[str, Any]): self._streams = state["_streams"]; self._lock = threading.Lock()
+
+    def _stream(self, cls: type, symbol: str, timeframe: str, *params: Any) -> Any:
+        key = (cls.__name__,) + params
+        with self._lock:
+            group = self._streams.setdefault((symbol.upper(), timeframe.upper()), {}); stream = group.get(key)
+            if stream is None: stream = group[key] = cls(*params)
+        return stream
+
+    def ema(self, symbol: str, timeframe: str, length: int) -> StreamingEMA: return self._stream(StreamingEMA, symbol, timeframe, length)
+    def rsi(self, symbol: str, timeframe: str, length: int = 14) -> StreamingRSI: return self._stream(StreamingRSI, symbol, timeframe, length)
+    def macd(self, symbol: str, timeframe: str, fast: int = 12, slow: int = 26, signal: int = 9) -> StreamingMACD: return self._stream(StreamingMACD, symbol, timeframe, fast, slow, signal)
+    def atr(self, symbol: str, timeframe: str, length: int = 14) -> StreamingATR: return self._stream(StreamingATR, symbol, timeframe, length)
+    def bollinger(self, symbol: str, timeframe: str, length: int = 5, std: float = 2.0, ddof: int = 0) -> StreamingBollinger: return self._stream(StreamingBollinger, symbol, timeframe, length, float(std), ddof)
+
+    def update(self, symbol: str, timeframe: str, bars: Sequence[Candlestick]) -> int:
+        """Feeds the new bars of ``bars`` (oldest first) to every state of (symbol, timeframe); returns the most bars any state consumed."""
+        group = self._streams.get((symbol.upper(), timeframe.upper()))
+        n = len(bars)
+        if not group or not n: return 0
+        first_timestamp = bars[0]['timestamp']; last_timestamp = bars[n - 1]['timestamp']; consumed = 0
+        with self._lock:
+            for stream in group.values():
+                seen = stream.last_timestamp
+                if stream.is_last_bar(bars[n - 1]): continue # Nothing new
+                if seen is None or seen < first_timestamp or seen > last_timestamp:
+                    if seen is not None: stream.reset()
+                    start = 0
+                else:
+                    start = n
+                    while start > 0 and bars[start - 1]['timestamp'] > seen: start -= 1
+                    if start > 0 and bars[start - 1]['timestamp'] == seen and not stream.is_last_bar(bars[start - 1]): # Was still forming
+                        start -= 1
+                        if not stream.rewind(): stream.reset(); start = 0
+                for i in range(start, n): stream.push(bars[i], revisable=i == n - 1)
+                consumed = max(consumed, n - start)
+        return consumed
+
+    def streams(self, symbol: str, timeframe: str) -> Dict[Tuple, StreamingIndicator]:
+        return dict(self._streams.get((symbol.upper(), timeframe.upper()), {}))
+
+    def clear(self, symbol: Optional[str] = None, timeframe: Optional[str] = None):
+        """Drops the states of one symbol/timeframe (either may be None for all)."""
+        with self._lock:
+            for key in [key for key in self._streams if (symbol is None or key[0] == symbol.upper()) and (timeframe is None or key[1] == timeframe.upper())]:
+                del self._streams[key]
+
+
+# Process-wide engine the forex sub-agents share unless one is passed in
+SHARED_INDICATOR_ENGINE = IndicatorEngine()
+
+
+def round_or_none(value: Optional[float], digits: int) -> Optional[float]:
+    """Rounds an indicator reading for a proposal; warm-up readings stay None."""
+    return round(value, digits) if value is not None else None
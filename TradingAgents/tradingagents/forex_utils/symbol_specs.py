@@ -0,0 +1,121 @@
+import json
+from typing import Any, Dict, Iterator, Optional
+
+SPEC_FIELDS = ("symbol", "base_currency", "quote_currency", "price_precision", "point_size", "pip_definition", "contract_size_units")
+
+# Contract specifications of the usual retail FX/CFD instruments: standard lot of 100,000 base units, 5-digit
+# quotes (3-digit for JPY quotes), metals per troy ounce. Anything else is derived from the symbol name on first use
+# (see derive_symbol_spec) or configured with SymbolRegistry.from_file / SimulatedBroker.load_symbol_specs.
+DEFAULT_SYMBOL_SPECS: Dict[str, Dict[str, Any]] = {
+    "XAUUSD": {"base_currency": "XAU", "quote_currency": "USD", "price_precision": 2, "point_size": 0.01, "pip_definition": 0.1, "contract_size_units": 100.0},
+    "GOLD": {"base_currency": "XAU", "quote_currency": "USD", "price_precision": 2, "point_size": 0.01, "pip_definition": 0.1, "contract_size_units": 100.0},
+    "XAGUSD": {"base_currency": "XAG", "quote_currency": "USD", "price_precision": 3, "point_size": 0.001, "pip_definition": 0.01, "contract_size_units": 5000.0},
+    "SILVER": {"base_currency": "XAG", "quote_currency": "USD", "price_precision": 3, "point_size": 0.001, "pip_definition": 0.01, "contract_size_units": 5000.0},
+}
+for _symbol in ("EURUSD", "GBPUSD", "AUDUSD", "NZDUSD", "USDCAD", "USDCHF", "EURGBP", "EURCHF", "EURAUD", "EURCAD", "GBPCHF", "AUDCAD", "AUDNZD"):
+    DEFAULT_SYMBOL_SPECS[_symbol] = {"base_currency": _symbol[:3], "quote_currency": _symbol[3:], "price_precision": 5, "point_size": 0.00001, "pip_definition": 0.0001, "contract_size_units": 100000.0}
+for _symbol in ("USDJPY", "EURJPY", "GBPJPY", "AUDJPY", "NZDJPY", "CADJPY", "CHFJPY"):
+    DEFAULT_SYMBOL_SPECS[_symbol] = {"base_currency": _symbol[:3], "quote_currency": _symbol[3:], "price_precision": 3, "point_size": 0.001, "pip_definition": 0.01, "contract_size_units": 100000.0}
+
+
+class SymbolSpec:
+    """
+    Immutable contract specification of one symbol. Attribute access is the fast path; it also reads like the
+    former ``_get_symbol_info`` dicts (``spec["pip_definition"]``, ``"pip_definition" in spec``, ``spec.get(...)``).
+    """
+    __slots__ = SPEC_FIELDS
+
+    def __init__(self, symbol: str, base_currency: str, quote_currency: str, price_precision: int, point_size: float, pip_definition: float, contract_size_units: float):
+        for field, value in zip(SPEC_FIELDS, (symbol.upper(), base_currency.upper(), quote_currency.upper(), int(price_precision), float(point_size), float(pip_definition), float(contract_size_units))):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name: str, value: Any): raise AttributeError(f"SymbolSpec is immutable (tried to set {name}).")
+    def __delattr__(self, name: str): raise AttributeError(f"SymbolSpec is immutable (tried to delete {name}).")
+    def __reduce__(self): return (SymbolSpec, tuple(getattr(self, field) for field in SPEC_FIELDS))
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in SPEC_FIELDS: raise KeyError(key)
+        return getattr(self, key)
+    def __contains__(self, key: object) -> bool: return key in SPEC_FIELDS
+    def __iter__(self) -> Iterator[str]: return iter(SPEC_FIELDS)
+    def __len__(self) -> int: return len(SPEC_FIELDS)
+    def get(self, key: str, default: Any = None) -> Any: return getattr(self, key) if key in SPEC_FIELDS else default
+    def keys(self): return SPEC_FIELDS
+    def to_dict(self) -> Dict[str, Any]: return {field: getattr(self, field) for field in SPEC_FIELDS}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SymbolSpec): return all(getattr(self, f) == getattr(other, f) for f in SPEC_FIELDS)
+        if isinstance(other, dict): return self.to_dict() == other
+        return NotImplemented
+    def __hash__(self) -> int: return hash(tuple(getattr(self, field) for field in SPEC_FIELDS))
+    def __repr__(self) -> str: return f"SymbolSpec({', '.join(f'{f}={getattr(self, f)!r}' for f in SPEC_FIELDS)})"
+
+
+def derive_symbol_spec(symbol: str) -> Optional[SymbolSpec]:
+    """Spec of a six-letter FX pair from its name (standard lot, JPY quotes at 3 digits); None for anything else."""
+    symbol_upper = symbol.upper()
+    if len(symbol_upper) != 6 or not symbol_upper.isalnum(): return None
+    base, quote = symbol_upper[:3], symbol_upper[3:]
+    if quote == "JPY": return SymbolSpec(symbol_upper, base, quote, 3, 0.001, 0.01, 100000.0)
+    return SymbolSpec(symbol_upper, base, quote, 5, 0.00001, 0.0001, 100000.0)
+
+
+class SymbolRegistry:
+    """
+    Symbol -> SymbolSpec lookup. Each symbol is resolved once (configured spec, else derived from the name) and cached
+    under the name it was asked for, so the broker hot paths are a single dict lookup. Unknown symbols are cached as
+    None and reported once.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, Dict[str, Any]]] = None):
+        self._configured: Dict[str, SymbolSpec] = {}
+        self._cache: Dict[str, Optional[SymbolSpec]] = {}
+        if specs: self.update(specs)
+
+    @classmethod
+    def default(cls) -> "SymbolRegistry": return cls(DEFAULT_SYMBOL_SPECS)
+
+    @classmethod
+    def from_file(cls, path: str, include_defaults: bool = True) -> "SymbolRegistry":
+        registry = cls.default() if include_defaults else cls()
+        registry.load(path)
+        return registry
+
+    def load(self, path: str) -> None:
+        """Adds/overrides specs from a JSON file: {"EURUSD": {"contract_size_units": 100000, ...}, ...}."""
+        with open(path) as f: specs = json.load(f)
+        self.update(specs)
+        print(f"SymbolRegistry: Loaded {len(specs)} symbol spec(s) from {path}.")
+
+    def update(self, specs: Dict[str, Dict[str, Any]]) -> None:
+        # Fields missing from an entry fall back to the spec derived from the symbol name.
+        for symbol, fields in specs.items():
+            symbol_upper = symbol.upper()
+            base = self._configured.get(symbol_upper) or derive_symbol_spec(symbol_upper)
+            values = {**(base.to_dict() if base else {}), **fields, "symbol": symbol_upper}
+            missing = [field for field in SPEC_FIELDS if field not in values]
+            if missing: raise ValueError(f"SymbolRegistry: spec for {symbol_upper} is missing {missing}.")
+            self._configured[symbol_upper] = SymbolSpec(**{field: values[field] for field in SPEC_FIELDS})
+        self._cache.clear()
+
+    def add(self, spec: SymbolSpec) -> None: self._configured[spec.symbol] = spec; self._cache.clear()
+
+    def get(self, symbol: str) -> Optional[SymbolSpec]:
+        try: return self._cache[symbol]
+        except KeyError: pass
+        symbol_upper = symbol.upper()
+        spec = self._configured.get(symbol_upper) or derive_symbol_spec(symbol_upper)
+        if spec is None: print(f"SymbolRegistry: No spec configured or derivable for '{symbol_upper}'.")
+        self._cache[symbol] = spec; self._cache[symbol_upper] = spec
+        return spec
+
+    def __getitem__(self, symbol: str) -> SymbolSpec:
+        spec = self.get(symbol)
+        if spec is None: raise KeyError(symbol)
+        return spec
+
+    def __contains__(self, symbol: object) -> bool: return isinstance(symbol, str) and self.get(symbol) is not None
+    def configured_symbols(self): return self._configured.keys()
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f: json.dump({symbol: {k: v for k, v in spec.to_dict().items() if k != "symbol"} for symbol, spec in self._configured.items()}, f, indent=2)
@@ -0,0 +1,111 @@
+import unittest
+import contextlib
+import io
+import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.forex_utils.agent_scheduler import AgentScheduler
+
+T0 = 1_700_006_400.0 # A UTC midnight
+HOUR, DAY = 3600.0, 86400.0
+
+def create_bars(num_bars: int, step: float):
+    return [{"timestamp": T0 + i * step, "open": 1.1 + 1e-4 * (i % 7), "high": 1.102 + 1e-4 * (i % 7), "low": 1.098, "close": 1.1 + 1e-4 * ((i * 3) % 7),
+             "volume": 100.0, "bid_close": None, "ask_close": None} for i in range(num_bars)]
+
+class WindowAgent:
+    """Deterministic stand-in for a sub-agent: its proposal is a function of the bars it fetches on its timeframe."""
+    def __init__(self, broker, timeframe: str = "D1", num_bars: int = 5, actionable: bool = False):
+        self.broker = broker; self.timeframe = timeframe; self.num_bars_to_fetch = num_bars; self.actionable = actionable
+        self.agent_id = f"WindowAgent_{timeframe}"; self.calls = 0
+
+    def _get_timeframe_seconds_approx(self, timeframe_str: str) -> int: return {"H1": 3600, "H4": 4 * 3600, "D1": 86400}[timeframe_str]
+
+    def process_task(self, symbol: str, now: float):
+        self.calls += 1
+        bars = self.broker.get_historical_data(symbol, self.timeframe, now - self.num_bars_to_fetch * self._get_timeframe_seconds_approx(self.timeframe), now)
+        closes = [bar["close"] for bar in bars]
+        signal = ("BUY" if closes[-1] > closes[0] else "SELL") if self.actionable else ("HOLD_UP" if closes and closes[-1] > closes[0] else "HOLD")
+        return {"window_proposal": {"signal": signal, "entry_price": None, "supporting_data": {"num_bars": len(bars), "last_close": closes[-1] if closes else None}}}
+
+class TestAgentScheduler(unittest.TestCase):
+
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.broker = SimulatedBroker()
+            self.broker.load_test_data("EURUSD", create_bars(24 * 20, HOUR))
+            self.broker.load_test_data("EURUSD", create_bars(20, DAY), timeframe="D1")
+
+    def _run(self, agent, scheduler, hours: range):
+        results = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in hours:
+                now = T0 + i * HOUR; self.broker.update_current_time(now)
+                evaluate = lambda: agent.process_task("EURUSD", now)
+                results.append(scheduler.run(agent, "EURUSD", now, evaluate) if scheduler is not None else evaluate())
+        return results
+
+    def test_reruns_once_per_closed_bar_with_identical_results(self):
+        hours = range(24 * 5, 24 * 15)
+        direct = self._run(WindowAgent(self.broker), None, hours)
+        agent = WindowAgent(self.broker); scheduler = AgentScheduler(self.broker)
+        scheduled = self._run(agent, scheduler, hours)
+        self.assertEqual(scheduled, direct)
+        self.assertEqual(agent.calls, 2 * 10) # When a D1 bar closes and when the oldest one drops out, not every H1 step
+        self.assertEqual(scheduler.stats, {"runs": 20, "reuses": len(hours) - 20})
+
+    def test_actionable_and_unscheduled_timeframes_always_run(self):
+        hours = range(24 * 5, 24 * 7)
+        actionable = WindowAgent(self.broker, actionable=True); self._run(actionable, AgentScheduler(self.broker), hours)
+        self.assertEqual(actionable.calls, len(hours)) # BUY/SELL entries follow the tick
+        direct = self._run(WindowAgent(self.broker, timeframe="H4"), None, hours)
+        shared = WindowAgent(self.broker, timeframe="H4"); scheduled = self._run(shared, AgentScheduler(self.broker), hours)
+        self.assertEqual(shared.calls, len(hours)) # No H4 bars loaded: the H1 series serves it and changes every step
+        self.assertEqual(scheduled, direct)
+        scheduler = AgentScheduler(self.broker)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(3): scheduler.run(SimpleNamespace(agent_id="no_timeframe"), "EURUSD", T0 + i * HOUR, lambda: {"p_proposal": {"signal": "HOLD"}})
+        self.assertEqual(scheduler.stats["reuses"], 0)
+
+    def test_agents_without_a_lookback_are_keyed_on_the_newest_bar(self):
+        agent = SimpleNamespace(agent_id="tail", timeframe="D1"); scheduler = AgentScheduler(self.broker)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(24 * 5, 24 * 8): self.broker.update_current_time(T0 + i * HOUR); scheduler.run(agent, "EURUSD", T0 + i * HOUR, lambda: {"p_proposal": {"signal": "HOLD"}})
+        self.assertEqual(scheduler.stats["runs"], 3)
+
+    def test_clear_and_time_moving_backwards(self):
+        agent = WindowAgent(self.broker); scheduler = AgentScheduler(self.broker)
+        self._run(agent, scheduler, range(24 * 5, 24 * 6)); self._run(agent, scheduler, range(24 * 3, 24 * 4)) # A new run from an earlier bar
+        self.assertEqual(agent.calls, 4) # Days 0-5 then 1-5, then days -2-3 and -1-3 of the grid (the bars start at day 0)
+        scheduler.clear(); self._run(agent, scheduler, range(24 * 3 + 5, 24 * 3 + 7))
+        self.assertEqual(agent.calls, 5)
+
+    def test_reuses_fetch_no_bars(self):
+        agent = WindowAgent(self.broker); scheduler = AgentScheduler(self.broker)
+        self._run(agent, scheduler, range(24 * 5, 24 * 5 + 2))
+        with patch.object(self.broker, "get_historical_data", wraps=self.broker.get_historical_data) as fetch:
+            self._run(agent, scheduler, range(24 * 5 + 2, 24 * 6))
+        self.assertEqual(agent.calls, 2); self.assertEqual(fetch.call_count, 0) # The grid phase was read once, on the first step
+
+    def test_reused_proposals_are_restamped_copies(self):
+        def evaluate(now: float):
+            timestamp = datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc).isoformat()
+            return {"p_proposal": {"proposal_id": f"prop_pos_EURUSD_{timestamp.replace(':', '-')}", "timestamp": timestamp, "signal": "HOLD", "supporting_data": {"notes": []}}}
+        agent = SimpleNamespace(agent_id="stamped", timeframe="D1", num_bars_to_fetch=5); scheduler = AgentScheduler(self.broker)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = scheduler.run(agent, "EURUSD", T0 + 5 * DAY + 2 * HOUR, lambda: evaluate(T0 + 5 * DAY + 2 * HOUR))
+            first["p_proposal"]["supporting_data"]["notes"].append("changed by the caller")
+            reused = scheduler.run(agent, "EURUSD", T0 + 5 * DAY + 3 * HOUR, lambda: self.fail("window unchanged, the agent should not run"))
+        stamp = reused["p_proposal"]["timestamp"] # Wall-clock UTC, as the sub-agents stamp the proposals they evaluate
+        self.assertLess(abs(datetime.datetime.fromisoformat(stamp) - datetime.datetime.now(datetime.timezone.utc)), datetime.timedelta(minutes=1))
+        self.assertEqual(reused["p_proposal"]["proposal_id"], f"prop_pos_EURUSD_{stamp.replace(':', '-')}")
+        self.assertEqual({**reused["p_proposal"], "proposal_id": None, "timestamp": None}, {**first["p_proposal"], "proposal_id": None, "timestamp": None, "supporting_data": {"notes": []}})
+        reused["p_proposal"]["supporting_data"]["notes"].append("changed again")
+        with contextlib.redirect_stdout(io.StringIO()): again = scheduler.run(agent, "EURUSD", T0 + 5 * DAY + 4 * HOUR, lambda: self.fail("window unchanged"))
+        self.assertEqual(again["p_proposal"]["supporting_data"]["notes"], [])
+        self.assertEqual(again["p_proposal"]["proposal_id"], f"prop_pos_EURUSD_{again['p_proposal']['timestamp'].replace(':', '-')}")
+
+if __name__ == '__main__':
+    unittest.main()
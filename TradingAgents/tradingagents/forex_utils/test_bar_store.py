@@ -0,0 +1,101 @@
+import unittest
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from TradingAgents.tradingagents.forex_utils.bar_store import AlignedTimeline, BarSequence, BarStore, SymbolBars, CandlestickView, as_bar_store
+from TradingAgents.tradingagents.forex_utils.forex_states import Candlestick
+
+def create_candlestick(timestamp: float, c: float, bid_c: Optional[float] = None, ask_c: Optional[float] = None, vol: Optional[float] = 100) -> Candlestick:
+    return {"timestamp": timestamp, "open": c, "high": c + 0.0005, "low": c - 0.0005, "close": c, "volume": vol, "bid_close": bid_c, "ask_close": ask_c}
+
+class TestBarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.eurusd = [create_candlestick(1_700_000_000 + i * 3600, 1.1 + i * 0.001, bid_c=1.1 + i * 0.001 - 0.0001, ask_c=1.1 + i * 0.001 + 0.0001) for i in range(5)]
+        self.usdjpy = [create_candlestick(1_700_000_000 + i * 3600, 150.0 + i * 0.1, vol=None) for i in range(3)]
+        self.store = BarStore.from_candlesticks({"eurusd": self.eurusd, "USDJPY": self.usdjpy})
+
+    def test_from_candlesticks_builds_columns(self):
+        self.assertIn("EURUSD", self.store) # Keys are upper-cased
+        bars = self.store["EURUSD"]
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(bars.close.dtype, np.float64)
+        self.assertAlmostEqual(float(bars.close[2]), self.eurusd[2]["close"])
+
+    def test_view_reads_like_candlestick_dict(self):
+        view = self.store["EURUSD"].bar(1)
+        self.assertIsInstance(view, CandlestickView)
+        self.assertEqual(view, self.eurusd[1])
+        self.assertEqual(view["close"], self.eurusd[1]["close"])
+        self.assertEqual(view.to_dict(), self.eurusd[1])
+        with self.assertRaises(KeyError):
+            view["not_a_field"]
+
+    def test_missing_optional_fields_read_back_as_none(self):
+        view = self.store["USDJPY"].bar(-1)
+        self.assertIsNone(view["bid_close"])
+        self.assertIsNone(view.get("ask_close"))
+        self.assertIsNone(view["volume"])
+        with self.assertRaises(IndexError):
+            self.store["USDJPY"].bar(3)
+
+    def test_save_and_load_memory_mapped(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            self.store.save(tmp_dir)
+            loaded = BarStore.load(tmp_dir, mmap=True)
+            self.assertEqual(sorted(loaded.keys()), ["EURUSD", "USDJPY"])
+            self.assertIsInstance(loaded["EURUSD"].close, np.memmap)
+            self.assertEqual(loaded["EURUSD"].to_candlesticks(), self.eurusd)
+            self.assertEqual(loaded["USDJPY"].bar(0), self.usdjpy[0])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_mismatched_column_lengths_rejected(self):
+        columns = {field: np.zeros(3) for field in ("timestamp", "open", "high", "low", "close", "volume", "bid_close", "ask_close")}
+        columns["close"] = np.zeros(2)
+        with self.assertRaises(ValueError):
+            SymbolBars("EURUSD", columns)
+
+    def test_as_bar_store_passthrough(self):
+        self.assertIs(as_bar_store(self.store), self.store)
+        self.assertIsInstance(as_bar_store({"EURUSD": self.eurusd}), BarStore)
+
+    def test_window_is_a_zero_copy_sequence(self):
+        bars = self.store["EURUSD"]; t0 = 1_700_000_000
+        window = bars.window(t0 + 3600, t0 + 3 * 3600) # Both bounds inclusive
+        self.assertIsInstance(window, BarSequence)
+        self.assertEqual(window, self.eurusd[1:4])
+        self.assertEqual(window[1:], self.eurusd[2:4])
+        self.assertEqual(window[-1]["timestamp"], t0 + 3 * 3600)
+        self.assertTrue(np.shares_memory(window.bars.close, bars.close))
+        self.assertEqual(bars.window(end_time_unix=t0 + 3 * 3600, count=2), self.eurusd[2:4]) # Count-only fetch
+        self.assertEqual(bars.window(t0 + 2 * 3600, count=10), self.eurusd[2:])
+        self.assertEqual(len(bars.window(t0 + 10 * 3600)), 0)
+        with self.assertRaises(IndexError):
+            window[3]
+
+class TestAlignedTimeline(unittest.TestCase):
+
+    def test_asof_index_handles_gaps_and_late_starts(self):
+        t0 = 1_700_000_000
+        main = [create_candlestick(t0 + i * 60, 1.1) for i in range(5)]
+        cross = [create_candlestick(t0 + 60, 150.0), create_candlestick(t0 + 150, 150.1), create_candlestick(t0 + 240, 150.2)]
+        timeline = AlignedTimeline(BarStore.from_candlesticks({"EURUSD": main, "USDJPY": cross}))
+
+        # Union of both series: t0, +60, +120, +150, +180, +240
+        self.assertEqual(timeline.timestamps.tolist(), [t0, t0 + 60, t0 + 120, t0 + 150, t0 + 180, t0 + 240])
+        self.assertEqual(timeline.symbol_steps["EURUSD"].tolist(), [0, 1, 2, 4, 5])
+        self.assertEqual(timeline.asof_index["USDJPY"].tolist(), [-1, 0, 0, 1, 1, 2])
+        self.assertEqual(timeline.latest_index("usdjpy", 4), 1)
+
+    def test_unsorted_series_rejected(self):
+        bars = [create_candlestick(200, 1.1), create_candlestick(100, 1.1)]
+        with self.assertRaises(ValueError):
+            AlignedTimeline(BarStore.from_candlesticks({"EURUSD": bars}))
+
+if __name__ == '__main__':
+    unittest.main()
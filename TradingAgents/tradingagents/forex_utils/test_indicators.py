@@ -0,0 +1,172 @@
+import unittest
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+from TradingAgents.tradingagents.forex_utils.bar_store import SymbolBars
+from TradingAgents.tradingagents.forex_utils.indicators import IndicatorEngine, StreamingATR, StreamingBollinger, StreamingEMA, StreamingMACD, StreamingRSI
+
+try:
+    import pandas_ta # noqa: F401
+    PANDAS_TA_AVAILABLE = True
+except ImportError:
+    PANDAS_TA_AVAILABLE = False
+
+T0 = 1_700_000_000.0
+
+def create_bars(num_bars: int, seed: int = 1, start: float = T0, step: float = 3600.0):
+    rng = random.Random(seed); price = 1.1; bars = []
+    for i in range(num_bars):
+        open_price = price; price *= 1 + rng.gauss(0, 0.002)
+        high = max(open_price, price) * (1 + rng.uniform(0, 0.001)); low = min(open_price, price) * (1 - rng.uniform(0, 0.001))
+        bars.append({"timestamp": start + i * step, "open": open_price, "high": high, "low": low, "close": price, "volume": 100.0, "bid_close": None, "ask_close": None})
+    return bars
+
+# pandas_ta's formulas (no TA-Lib) restated in pandas, so the streaming states are checked even without pandas_ta
+def reference_ema(close: pd.Series, length: int) -> pd.Series:
+    close = close.copy(); seed = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan; close.iloc[length - 1] = seed
+    return close.ewm(span=length, adjust=False).mean()
+
+def reference_rma(series: pd.Series, length: int) -> pd.Series: return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+def reference_rsi(close: pd.Series, length: int) -> pd.Series:
+    change = close.diff(); gains = change.clip(lower=0); losses = (-change).clip(lower=0)
+    gains[change.isna()] = np.nan; losses[change.isna()] = np.nan
+    gain, loss = reference_rma(gains, length), reference_rma(losses, length)
+    return 100 * gain / (gain + loss)
+
+def reference_macd(close: pd.Series, fast: int, slow: int, signal: int):
+    macd = reference_ema(close, fast) - reference_ema(close, slow)
+    signal_line = reference_ema(macd.loc[macd.first_valid_index():], signal).reindex(close.index)
+    return macd, signal_line, macd - signal_line
+
+def reference_atr(frame: pd.DataFrame, length: int) -> pd.Series:
+    previous = frame["close"].shift(1)
+    true_range = pd.concat([frame["high"] - frame["low"], frame["high"] - previous, previous - frame["low"]], axis=1).abs().max(axis=1)
+    true_range.iloc[0] = np.nan
+    return reference_rma(true_range, length)
+
+def reference_bollinger(close: pd.Series, length: int, std: float):
+    mid = close.rolling(length).mean(); deviation = std * close.rolling(length).std(ddof=0)
+    return mid - deviation, mid, mid + deviation
+
+def stream(indicator, bars, attribute: str = "value"):
+    values = []
+    for bar in bars: indicator.push(bar); values.append(getattr(indicator, attribute))
+    return values
+
+class TestStreamingIndicators(unittest.TestCase):
+
+    def assertSeriesEqual(self, streamed, expected: pd.Series, places: int = 10):
+        self.assertEqual(len(streamed), len(expected))
+        for i, (value, reference) in enumerate(zip(streamed, expected.tolist())):
+            if reference is None or math.isnan(reference): self.assertIsNone(value, f"index {i}")
+            else: self.assertAlmostEqual(value, reference, places=places, msg=f"index {i}")
+
+    def setUp(self):
+        self.bars = create_bars(400); self.frame = pd.DataFrame(self.bars)
+
+    def test_ema_rsi_atr_match_reference(self):
+        close = self.frame["close"]
+        for length in (1, 5, 26):
+            self.assertSeriesEqual(stream(StreamingEMA(length), self.bars), reference_ema(close, length))
+        for length in (2, 7, 14):
+            self.assertSeriesEqual(stream(StreamingRSI(length), self.bars), reference_rsi(close, length), places=8)
+            self.assertSeriesEqual(stream(StreamingATR(length), self.bars), reference_atr(self.frame, length))
+
+    def test_macd_and_bollinger_match_reference(self):
+        close = self.frame["close"]
+        macd = StreamingMACD(12, 26, 9); lines, signals, histograms = [], [], []
+        for bar in self.bars:
+            macd.push(bar); lines.append(macd.macd); signals.append(macd.signal_line); histograms.append(macd.histogram)
+        for streamed, expected in zip((lines, signals, histograms), reference_macd(close, 12, 26, 9)): self.assertSeriesEqual(streamed, expected)
+        bands = StreamingBollinger(20, 2.0); lowers, mids, uppers = [], [], []
+        for bar in self.bars:
+            bands.push(bar); lowers.append(bands.lower); mids.append(bands.mid); uppers.append(bands.upper)
+        for streamed, expected in zip((lowers, mids, uppers), reference_bollinger(close, 20, 2.0)): self.assertSeriesEqual(streamed, expected)
+
+    def test_flat_prices_leave_rsi_undefined(self):
+        rsi = StreamingRSI(3)
+        for i in range(6): rsi.update(1.1)
+        self.assertIsNone(rsi.value)
+        with self.assertRaises(ValueError): StreamingEMA(0)
+
+    @unittest.skipUnless(PANDAS_TA_AVAILABLE, "pandas_ta not installed")
+    def test_parity_with_pandas_ta(self):
+        frame = self.frame.copy()
+        self.assertSeriesEqual(stream(StreamingRSI(14), self.bars), frame.ta.rsi(length=14, talib=False), places=8)
+        self.assertSeriesEqual(stream(StreamingEMA(12), self.bars), frame.ta.ema(length=12, talib=False))
+        self.assertSeriesEqual(stream(StreamingATR(14), self.bars), frame.ta.atr(length=14, talib=False))
+        macd_frame = frame.ta.macd(fast=12, slow=26, signal=9, talib=False)
+        macd = StreamingMACD(12, 26, 9)
+        self.assertSeriesEqual(stream(macd, self.bars, "macd"), macd_frame.iloc[:, 0])
+        self.assertAlmostEqual(macd.histogram, macd_frame.iloc[-1, 1], places=10); self.assertAlmostEqual(macd.signal_line, macd_frame.iloc[-1, 2], places=10)
+        bands = frame.ta.bbands(length=20, std=2.0)
+        self.assertSeriesEqual(stream(StreamingBollinger(20, 2.0), self.bars, "mid"), bands.iloc[:, 1])
+        self.assertSeriesEqual(stream(StreamingBollinger(20, 2.0), self.bars, "upper"), bands.iloc[:, 2])
+
+class TestIndicatorEngine(unittest.TestCase):
+
+    def test_sliding_windows_consume_each_bar_once(self):
+        bars = create_bars(300); engine = IndicatorEngine()
+        rsi = engine.rsi("eurusd", "H1", 14); macd = engine.macd("EURUSD", "h1", 12, 26, 9)
+        self.assertIs(engine.rsi("EURUSD", "H1", 14), rsi) # Same key, same state
+        consumed = [engine.update("EURUSD", "H1", bars[max(0, end - 100):end]) for end in range(1, len(bars) + 1)]
+        self.assertEqual(consumed, [1] * len(bars))
+        self.assertEqual(rsi.bars_seen, len(bars))
+        expected = reference_rsi(pd.DataFrame(bars)["close"], 14).iloc[-1]
+        self.assertAlmostEqual(rsi.value, expected, places=8)
+        self.assertAlmostEqual(macd.signal_line, reference_macd(pd.DataFrame(bars)["close"], 12, 26, 9)[1].iloc[-1], places=10)
+        self.assertEqual(engine.update("EURUSD", "H1", bars[-50:]), 0) # Nothing new
+
+    def test_late_state_warms_up_from_its_window(self):
+        bars = create_bars(200); engine = IndicatorEngine()
+        early = engine.ema("EURUSD", "H1", 10)
+        engine.update("EURUSD", "H1", bars[:150])
+        late = engine.ema("EURUSD", "H1", 20); engine.update("EURUSD", "H1", bars[100:200])
+        self.assertEqual((early.bars_seen, late.bars_seen), (200, 100))
+        self.assertAlmostEqual(late.value, reference_ema(pd.DataFrame(bars[100:])["close"], 20).iloc[-1], places=12)
+        self.assertAlmostEqual(early.value, reference_ema(pd.DataFrame(bars)["close"], 10).iloc[-1], places=12)
+
+    def test_gaps_and_rewinds_rebuild_from_the_window(self):
+        bars = create_bars(300); engine = IndicatorEngine(); atr = engine.atr("EURUSD", "H1", 14)
+        engine.update("EURUSD", "H1", bars[:100])
+        engine.update("EURUSD", "H1", bars[150:250]) # Gap longer than the window
+        self.assertEqual(atr.bars_seen, 100)
+        self.assertAlmostEqual(atr.value, reference_atr(pd.DataFrame(bars[150:250]), 14).iloc[-1], places=12)
+        engine.update("EURUSD", "H1", bars[:50]) # A new run starting earlier
+        self.assertEqual((atr.bars_seen, atr.last_timestamp), (50, bars[49]["timestamp"]))
+
+    def test_forming_last_bar_is_revised_when_sent_again(self):
+        bars = create_bars(120); engine = IndicatorEngine()
+        states = [engine.rsi("EURUSD", "H1", 14), engine.macd("EURUSD", "H1", 12, 26, 9), engine.atr("EURUSD", "H1", 14), engine.bollinger("EURUSD", "H1", 20)]
+        forming = [dict(bar) for bar in bars[:100]]; forming[-1].update(close=forming[-1]["open"] * 1.01, high=forming[-1]["open"] * 1.012) # Live fetch mid-bar
+        engine.update("EURUSD", "H1", forming)
+        self.assertEqual(engine.update("EURUSD", "H1", bars[20:100]), 1) # Same timestamp, final values: re-applied
+        self.assertEqual(engine.update("EURUSD", "H1", bars[20:100]), 0)
+        engine.update("EURUSD", "H1", forming[:99] + [dict(forming[99], close=bars[99]["close"] * 0.99)]) # Forming again, then closed inside a later window
+        self.assertEqual(engine.update("EURUSD", "H1", bars[50:120]), 21)
+        reference = IndicatorEngine()
+        expected = [reference.rsi("EURUSD", "H1", 14), reference.macd("EURUSD", "H1", 12, 26, 9), reference.atr("EURUSD", "H1", 14), reference.bollinger("EURUSD", "H1", 20)]
+        reference.update("EURUSD", "H1", bars[:120])
+        for state, expected_state in zip(states, expected):
+            self.assertEqual(state.bars_seen, 120)
+            for name, value in expected_state.latest().items(): self.assertAlmostEqual(state.latest()[name], value, places=10, msg=f"{type(state).__name__}.{name}")
+
+    def test_keys_are_isolated_and_accept_bar_stores(self):
+        engine = IndicatorEngine(); h1, m15 = create_bars(60), create_bars(60, seed=2, step=900.0)
+        engine.bollinger("EURUSD", "H1", 20); engine.bollinger("EURUSD", "H1", 20, std=2.5); engine.bollinger("EURUSD", "M15", 20)
+        engine.update("EURUSD", "H1", SymbolBars.from_candlesticks("EURUSD", h1).window(None, h1[-1]["timestamp"], 60)); engine.update("EURUSD", "M15", m15)
+        h1_streams = engine.streams("EURUSD", "H1"); self.assertEqual(len(h1_streams), 2)
+        lower, mid, upper = (series.iloc[-1] for series in reference_bollinger(pd.DataFrame(h1)["close"], 20, 2.5))
+        self.assertAlmostEqual(engine.bollinger("EURUSD", "H1", 20, std=2.5).upper, upper, places=12)
+        self.assertNotAlmostEqual(engine.bollinger("EURUSD", "M15", 20).mid, mid, places=6)
+        self.assertEqual(engine.update("GBPUSD", "H1", h1), 0) # No states for that key
+        engine.clear(timeframe="H1"); self.assertEqual(engine.streams("EURUSD", "H1"), {})
+        self.assertEqual(len(engine.streams("EURUSD", "M15")), 1)
+
+if __name__ == '__main__':
+    unittest.main()
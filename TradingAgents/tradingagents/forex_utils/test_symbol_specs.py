@@ -0,0 +1,70 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import pickle
+import tempfile
+
+from TradingAgents.tradingagents.forex_utils.symbol_specs import SymbolRegistry, SymbolSpec, derive_symbol_spec
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+
+class TestSymbolSpec(unittest.TestCase):
+
+    def test_immutable_and_dict_like(self):
+        spec = SymbolSpec("eurusd", "eur", "usd", 5, 0.00001, 0.0001, 100000)
+        self.assertEqual(spec.symbol, "EURUSD")
+        self.assertEqual(spec["pip_definition"], 0.0001)
+        self.assertIn("contract_size_units", spec)
+        self.assertEqual(spec.get("missing", 1), 1)
+        with self.assertRaises(KeyError): spec["missing"]
+        with self.assertRaises(AttributeError): spec.pip_definition = 0.01
+        with self.assertRaises(AttributeError): spec.extra = 1 # Slotted: no per-instance dict
+        self.assertEqual(pickle.loads(pickle.dumps(spec)), spec)
+
+    def test_derived_specs(self):
+        self.assertEqual(derive_symbol_spec("USDJPY").price_precision, 3)
+        self.assertEqual(derive_symbol_spec("EURNOK").pip_definition, 0.0001)
+        self.assertIsNone(derive_symbol_spec("US500"))
+
+class TestSymbolRegistry(unittest.TestCase):
+
+    def test_lookups_are_cached(self):
+        registry = SymbolRegistry.default()
+        spec = registry.get("eurusd")
+        self.assertIs(registry.get("EURUSD"), spec)
+        self.assertIs(registry.get("eurusd"), spec)
+        self.assertEqual(registry["XAUUSD"].contract_size_units, 100.0)
+
+    def test_unknown_symbol_is_reported_once(self):
+        registry = SymbolRegistry.default(); output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertIsNone(registry.get("US500")); self.assertIsNone(registry.get("US500"))
+        self.assertEqual(output.getvalue().count("US500"), 1)
+        self.assertNotIn("US500", registry)
+
+    def test_load_from_file_overrides_and_fills_missing_fields(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "specs.json")
+            with open(path, "w") as f:
+                json.dump({"EURUSD": {"contract_size_units": 10000}, "US500": {"base_currency": "USD", "quote_currency": "USD", "price_precision": 1,
+                                                                              "point_size": 0.1, "pip_definition": 1.0, "contract_size_units": 1}}, f)
+            registry = SymbolRegistry.default()
+            self.assertEqual(registry.get("EURUSD").contract_size_units, 100000.0)
+            with contextlib.redirect_stdout(io.StringIO()): registry.load(path)
+            eurusd = registry.get("EURUSD") # Cache is invalidated by the reload
+            self.assertEqual((eurusd.contract_size_units, eurusd.pip_definition, eurusd.price_precision), (10000.0, 0.0001, 5))
+            self.assertEqual(registry.get("US500").pip_definition, 1.0)
+
+            saved_path = os.path.join(tmp_dir, "saved.json"); registry.save(saved_path)
+            with contextlib.redirect_stdout(io.StringIO()): reloaded = SymbolRegistry.from_file(saved_path, include_defaults=False)
+            self.assertEqual(reloaded.get("US500"), registry.get("US500"))
+
+    def test_broker_uses_configured_contract_size(self):
+        with contextlib.redirect_stdout(io.StringIO()): broker = SimulatedBroker()
+        self.assertEqual(broker._calculate_margin_required("XAUUSD", 1.0, 2000.0), 100 * 2000.0 / broker.leverage) # 100 oz, quoted in USD
+        self.assertEqual(broker._get_price_precision("XAUUSD"), 2)
+        self.assertEqual(broker._get_symbol_info("usdjpy")["pip_definition"], 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
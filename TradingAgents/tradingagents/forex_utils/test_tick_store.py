@@ -0,0 +1,37 @@
+import unittest
+import shutil
+import tempfile
+
+import numpy as np
+
+from TradingAgents.tradingagents.forex_utils.tick_store import SymbolTicks, TickStore
+
+class TestTickStore(unittest.TestCase):
+
+    def setUp(self):
+        t0 = 1_700_000_040.0 # Start of a minute
+        self.ticks = SymbolTicks.from_arrays("eurusd", timestamp=[t0, t0 + 10, t0 + 25, t0 + 70, t0 + 200],
+                                             bid=[1.1000, 1.1004, 1.0998, 1.1010, 1.1020], ask=[1.1002, 1.1006, 1.1000, 1.1012, 1.1022])
+
+    def test_to_bars_aggregates_by_bucket_stamped_at_close(self):
+        bars = self.ticks.to_bars(60)
+        self.assertEqual(bars.symbol, "EURUSD")
+        self.assertEqual(bars.timestamp.tolist(), [1_700_000_040.0 + 60, 1_700_000_040.0 + 120, 1_700_000_040.0 + 240]) # Empty minutes produce no bar
+        self.assertAlmostEqual(bars.open[0], 1.1001); self.assertAlmostEqual(bars.high[0], 1.1005)
+        self.assertAlmostEqual(bars.low[0], 1.0999); self.assertAlmostEqual(bars.close[0], 1.0999)
+        self.assertEqual(bars.bid_close[0], 1.0998); self.assertEqual(bars.ask_close[0], 1.1000)
+        self.assertEqual(bars.volume.tolist(), [3.0, 1.0, 1.0]) # Tick counts when the ticks carry no volume
+
+    def test_save_and_load_memory_mapped(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            TickStore({"EURUSD": self.ticks}).save(tmp_dir)
+            loaded = TickStore.load(tmp_dir, mmap=True)
+            self.assertIsInstance(loaded["eurusd"].bid, np.memmap)
+            self.assertEqual(loaded["EURUSD"].ask.tolist(), self.ticks.ask.tolist())
+            self.assertEqual(len(loaded.to_bar_store(60)["EURUSD"]), 3)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
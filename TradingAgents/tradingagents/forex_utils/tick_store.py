@@ -0,0 +1,102 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from TradingAgents.tradingagents.forex_utils.bar_store import BarStore, SymbolBars
+
+# Every column is a float64 array; volume is optional (NaN for "missing").
+TICK_FIELDS = ("timestamp", "bid", "ask", "volume")
+_MANIFEST_FILE = "manifest.json"
+
+
+class SymbolTicks:
+    """
+    Columnar bid/ask tick table for a single symbol, sorted by timestamp.
+
+    Arrays may be memory-mapped (see TickStore.load), so multi-GB tick files are paged in on demand.
+    """
+    __slots__ = ("symbol", "columns", "timestamp", "bid", "ask", "volume")
+
+    def __init__(self, symbol: str, columns: Dict[str, np.ndarray]):
+        missing = [field for field in TICK_FIELDS if field not in columns]
+        if missing: raise ValueError(f"SymbolTicks for {symbol}: missing columns {missing}.")
+        lengths = {len(columns[field]) for field in TICK_FIELDS}
+        if len(lengths) > 1: raise ValueError(f"SymbolTicks for {symbol}: columns have different lengths {sorted(lengths)}.")
+        self.symbol = symbol.upper()
+        self.columns = {field: columns[field] for field in TICK_FIELDS}
+        for field in TICK_FIELDS: setattr(self, field, self.columns[field])
+
+    @classmethod
+    def from_ticks(cls, symbol: str, ticks: List[Dict]) -> "SymbolTicks":
+        columns = {field: np.array([np.nan if tick.get(field) is None else tick[field] for tick in ticks], dtype=np.float64) for field in TICK_FIELDS}
+        return cls(symbol, columns)
+
+    @classmethod
+    def from_arrays(cls, symbol: str, timestamp: np.ndarray, bid: np.ndarray, ask: np.ndarray, volume: Optional[np.ndarray] = None) -> "SymbolTicks":
+        timestamp = np.asarray(timestamp, dtype=np.float64)
+        volume = np.full(len(timestamp), np.nan) if volume is None else np.asarray(volume, dtype=np.float64)
+        return cls(symbol, {"timestamp": timestamp, "bid": np.asarray(bid, dtype=np.float64), "ask": np.asarray(ask, dtype=np.float64), "volume": volume})
+
+    def __len__(self) -> int: return len(self.timestamp)
+
+    def take(self, rows: np.ndarray) -> "SymbolTicks":
+        """Copy of the selected rows (boolean mask or index array)."""
+        return SymbolTicks(self.symbol, {field: np.asarray(column[rows]) for field, column in self.columns.items()})
+
+    def to_bars(self, timeframe_seconds: int) -> SymbolBars:
+        """
+        Aggregates the ticks into mid-price OHLC bars of ``timeframe_seconds``. Each bar is stamped with its close time
+        (bucket start + timeframe), i.e. the moment it is complete; bid_close/ask_close are the bucket's last quote.
+        Volume is the summed tick volume, or the tick count when the ticks carry no volume.
+        """
+        if len(self) == 0: return SymbolBars(self.symbol, {field: np.empty(0) for field in ("timestamp", "open", "high", "low", "close", "volume", "bid_close", "ask_close")})
+        bucket = np.floor(np.asarray(self.timestamp) / timeframe_seconds).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1)); ends = np.append(starts[1:], len(bucket)) - 1
+        bid = np.asarray(self.bid); ask = np.asarray(self.ask); mid = (bid + ask) / 2.0
+        volume = np.asarray(self.volume)
+        bar_volume = np.add.reduceat(np.nan_to_num(volume), starts) if not np.all(np.isnan(volume)) else np.diff(np.append(starts, len(bucket))).astype(np.float64)
+        return SymbolBars(self.symbol, {"timestamp": ((bucket[starts] + 1) * timeframe_seconds).astype(np.float64), "open": mid[starts],
+                                        "high": np.maximum.reduceat(mid, starts), "low": np.minimum.reduceat(mid, starts), "close": mid[ends],
+                                        "volume": bar_volume, "bid_close": bid[ends], "ask_close": ask[ends]})
+
+
+class TickStore:
+    """Symbol -> SymbolTicks container, persisted like BarStore (one .npy per symbol/column plus a manifest)."""
+
+    def __init__(self, symbol_ticks: Optional[Dict[str, SymbolTicks]] = None):
+        self._symbols: Dict[str, SymbolTicks] = {}
+        for symbol, ticks in (symbol_ticks or {}).items(): self._symbols[symbol.upper()] = ticks
+
+    def __getitem__(self, symbol: str) -> SymbolTicks: return self._symbols[symbol.upper()]
+    def __contains__(self, symbol: object) -> bool: return isinstance(symbol, str) and symbol.upper() in self._symbols
+    def __iter__(self) -> Iterator[str]: return iter(self._symbols)
+    def __len__(self) -> int: return len(self._symbols)
+    def keys(self): return self._symbols.keys()
+    def items(self): return self._symbols.items()
+    def values(self): return self._symbols.values()
+
+    def add(self, ticks: SymbolTicks) -> None: self._symbols[ticks.symbol] = ticks
+
+    def to_bar_store(self, timeframe_seconds: int) -> BarStore:
+        return BarStore({symbol: ticks.to_bars(timeframe_seconds) for symbol, ticks in self._symbols.items()})
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        manifest = {"fields": list(TICK_FIELDS), "symbols": {}}
+        for symbol, ticks in self._symbols.items():
+            for field in TICK_FIELDS:
+                np.save(os.path.join(directory, f"{symbol}.{field}.npy"), np.ascontiguousarray(ticks.columns[field], dtype=np.float64))
+            manifest["symbols"][symbol] = {"num_ticks": len(ticks)}
+        with open(os.path.join(directory, _MANIFEST_FILE), "w") as f: json.dump(manifest, f, indent=2)
+        print(f"TickStore: Saved {len(self._symbols)} symbol(s) to {directory}.")
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "TickStore":
+        with open(os.path.join(directory, _MANIFEST_FILE)) as f: manifest = json.load(f)
+        mmap_mode = "r" if mmap else None
+        store = cls()
+        for symbol in manifest["symbols"]:
+            store.add(SymbolTicks(symbol, {field: np.load(os.path.join(directory, f"{symbol}.{field}.npy"), mmap_mode=mmap_mode) for field in TICK_FIELDS}))
+        return store
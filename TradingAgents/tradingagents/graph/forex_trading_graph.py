@@ -1,9 +1,10 @@
-from typing import Dict, List, TypedDict, Any, Optional # Corrected import for Optional
+from typing import Annotated, Dict, List, TypedDict, Any, Optional # Corrected import for Optional
 import operator # For StateGraph update operations
 
 from langgraph.graph import StateGraph, END
 
 from tradingagents.broker_interface.base import BrokerInterface
+from tradingagents.broker_interface.caching_broker import CachingBroker
 # Import our new agents and states
 from tradingagents.forex_master.forex_master_agent import ForexMasterAgent
 from tradingagents.forex_agents import ( # Updated import style
@@ -13,6 +14,7 @@ from tradingagents.forex_agents import ( # Updated import style
     PositionTraderAgent
 )
 from tradingagents.forex_meta.trade_meta_agent import ForexMetaAgent
+from tradingagents.forex_utils.agent_scheduler import AgentScheduler
 from tradingagents.forex_utils.forex_states import (
     ForexSubAgentTask,
     ForexTradeProposal,
@@ -21,6 +23,12 @@ from tradingagents.forex_utils.forex_states import (
 )
 import datetime # For default timestamp
 
+def _merge_error_messages(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """Reducer for error_message: the parallel sub-agent branches may each report one in the same step."""
+    if not update: return current
+    if not current or current in update: return update
+    return current if update in current else f"{current}; {update}"
+
 # Define the State for our Forex graph
 class ForexGraphState(TypedDict):
     currency_pair: str
@@ -46,13 +54,37 @@ class ForexGraphState(TypedDict):
     forex_final_decision: Optional[ForexFinalDecision]
 
     # To track errors or issues if any node fails
-    error_message: Optional[str]
+    error_message: Annotated[Optional[str], _merge_error_messages]
 
 
 class ForexTradingGraph:
-    def __init__(self, broker: BrokerInterface): # Added broker argument
+    """
+    Master agent -> the four sub-agents as parallel branches -> master aggregation (joins all four) -> meta agent.
+
+    ``execution`` chooses how the branches run:
+      - "thread" (default): concurrently on LangGraph's thread pool; suits the I/O-bound broker calls, so a live
+        step takes about as long as the slowest agent instead of the sum of all four.
+      - "sequential": one branch at a time (max_concurrency=1), e.g. for debugging or deterministic logs.
+    ``max_workers`` caps the concurrent branches (default: all four at once). There is no process mode: a worker
+    would need the broker's per-bar state (clock, market data, positions) on every call, and the agents' CPU work is
+    small since their indicators are streamed (IndicatorEngine).
+
+    With ``schedule_agents`` the day, swing and position traders are re-run only when the bars they fetch on their
+    timeframe have changed (a bar closed or dropped out of the lookback) and otherwise return their previous HOLD
+    proposal (see AgentScheduler); the scalper, whose spread filter reads the live tick, runs every time. This pays
+    off in backtests where bars are loaded per timeframe.
+    """
+    EXECUTION_MODES = ("thread", "sequential")
+
+    def __init__(self, broker: BrokerInterface, cache_market_data: bool = False, execution: str = "thread", max_workers: Optional[int] = None,
+                 schedule_agents: bool = False): # Added broker argument
         print("Initializing ForexTradingGraph...")
-        self.broker = broker # Store the broker
+        if execution not in self.EXECUTION_MODES: raise ValueError(f"ForexTradingGraph: execution must be one of {self.EXECUTION_MODES}, got '{execution}'.")
+        self.execution = execution
+        self.max_workers = max_workers
+        # With cache_market_data the agents share one tick/window fetch per invocation through a CachingBroker
+        self.broker = CachingBroker(broker) if cache_market_data and not isinstance(broker, CachingBroker) else broker
+        self.agent_scheduler = AgentScheduler(self.broker) if schedule_agents else None
         self.master_agent = ForexMasterAgent()
         # Pass broker to agents that need it
         self.scalper_agent = ScalperAgent(broker=self.broker)
@@ -88,13 +120,14 @@ class ForexTradingGraph:
         # Define Edges
         builder.set_entry_point("master_initial_processing")
 
-        builder.add_edge("master_initial_processing", "scalper_processing")
-        builder.add_edge("scalper_processing", "day_trader_processing")
-        builder.add_edge("day_trader_processing", "swing_trader_processing")
-        builder.add_edge("swing_trader_processing", "position_trader_processing") # PositionTrader after Swing
+        # Fan-out: the sub-agents are independent, so they run as parallel branches of the same step.
+        # Each writes its own *_proposal key; error_message has a reducer for concurrent writes.
+        sub_agent_nodes = ["scalper_processing", "day_trader_processing", "swing_trader_processing", "position_trader_processing"]
+        for node in sub_agent_nodes:
+            builder.add_edge("master_initial_processing", node)
 
-        # After all relevant sub-agents have run, go to master_aggregation_wrapper
-        builder.add_edge("position_trader_processing", "master_aggregation_wrapper") # From PositionTrader
+        # Join: master_aggregation_wrapper runs once, after all sub-agent branches have finished
+        builder.add_edge(sub_agent_nodes, "master_aggregation_wrapper")
 
         builder.add_edge("master_aggregation_wrapper", "meta_agent_evaluation")
 
@@ -118,11 +151,11 @@ class ForexTradingGraph:
             # It returns a dict like {"day_trader_proposal": ...}
             # This will be merged into the main graph state by LangGraph
             # Pass along the whole state as agents might need other info like current_simulated_time
-            return self.day_trader_agent.process_task({"current_day_trader_task": day_task, **state})
+            return self._run_sub_agent(self.day_trader_agent, {"current_day_trader_task": day_task, **state}, scheduled=True)
         else:
             print("ForexTradingGraph: No Day Trader task found.")
             # Ensure the key is part of the output so StateGraph can merge it.
-            return {"day_trader_proposal": None, "error_message": state.get("error_message")}
+            return {"day_trader_proposal": None}
 
 
     def _run_swing_trader(self, state: ForexGraphState) -> Dict[str, Any]:
@@ -134,10 +167,10 @@ class ForexTradingGraph:
                 break
 
         if swing_task:
-            return self.swing_trader_agent.process_task({"current_swing_trader_task": swing_task, **state})
+            return self._run_sub_agent(self.swing_trader_agent, {"current_swing_trader_task": swing_task, **state}, scheduled=True)
         else:
             print("ForexTradingGraph: No Swing Trader task found.")
-            return {"swing_trader_proposal": None, "error_message": state.get("error_message")}
+            return {"swing_trader_proposal": None}
 
     def _run_scalper(self, state: ForexGraphState) -> Dict[str, Any]:
         print("ForexTradingGraph: Running Scalper...")
@@ -148,11 +181,32 @@ class ForexTradingGraph:
                 break
 
         if scalper_task:
-            return self.scalper_agent.process_task({"current_scalper_task": scalper_task, **state})
+            return self._run_sub_agent(self.scalper_agent, {"current_scalper_task": scalper_task, **state})
         else:
             print("ForexTradingGraph: No Scalper task found.")
             return {"scalper_proposal": None}
 
+    def _run_position_trader(self, state: ForexGraphState) -> Dict[str, Any]:
+        print("ForexTradingGraph: Running Position Trader...")
+        position_task = None
+        for task in state.get("sub_agent_tasks", []):
+            if "task_pos_" in task.get("task_id", ""): # Or "task_position_"
+                position_task = task
+                break
+
+        if position_task:
+            return self._run_sub_agent(self.position_trader_agent, {"current_position_trader_task": position_task, **state}, scheduled=True)
+        else:
+            print("ForexTradingGraph: No Position Trader task found.")
+            return {"position_trader_proposal": None}
+
+    def _run_sub_agent(self, agent: Any, agent_state: Dict[str, Any], scheduled: bool = False) -> Dict[str, Any]:
+        current_time_iso = agent_state.get("current_simulated_time")
+        if scheduled and self.agent_scheduler is not None and current_time_iso:
+            decision_time_unix = datetime.datetime.fromisoformat(current_time_iso.replace('Z', '+00:00')).timestamp()
+            return self.agent_scheduler.run(agent, agent_state["currency_pair"], decision_time_unix, lambda: agent.process_task(agent_state))
+        return agent.process_task(agent_state)
+
     def _run_master_aggregation_wrapper(self, state: ForexGraphState) -> Dict[str, Any]:
         print("ForexTradingGraph: Master Aggregation Wrapper collecting proposals...")
         proposals: List[ForexTradeProposal] = []
@@ -175,6 +229,7 @@ class ForexTradingGraph:
 
     def invoke_graph(self, currency_pair: str, simulated_time_iso: str) -> Optional[ForexFinalDecision]:
         print(f"ForexTradingGraph: Invoking graph for {currency_pair} at {simulated_time_iso}")
+        if isinstance(self.broker, CachingBroker): self.broker.invalidate() # Fresh market data per invocation (live brokers have no simulated clock)
         initial_state = ForexGraphState(
             currency_pair=currency_pair,
             current_simulated_time=simulated_time_iso,
@@ -194,7 +249,8 @@ class ForexTradingGraph:
         # Even if Optional, they should be explicitly None if not set.
         # The above initialization handles this correctly for Optional fields.
 
-        final_state_dict = self.graph.invoke(initial_state) # LangGraph returns a dict
+        max_concurrency = 1 if self.execution == "sequential" else self.max_workers
+        final_state_dict = self.graph.invoke(initial_state, config={"max_concurrency": max_concurrency} if max_concurrency else None) # LangGraph returns a dict
 
         # Convert dict back to TypedDict for type safety, though it's mostly for static analysis
         # final_state: ForexGraphState = final_state_dict
@@ -234,17 +290,3 @@ if __name__ == '__main__':
             print(f"{key}: {value}")
     else:
         print("\n--- No decision or error in graph (forex_trading_graph.py direct run) ---")
-
-def _run_position_trader(self, state: ForexGraphState) -> Dict[str, Any]:
-    print("ForexTradingGraph: Running Position Trader...")
-    position_task = None
-    for task in state.get("sub_agent_tasks", []):
-        if "task_pos_" in task.get("task_id", ""): # Or "task_position_"
-            position_task = task
-            break
-
-    if position_task:
-        return self.position_trader_agent.process_task({"current_position_trader_task": position_task, **state})
-    else:
-        print("ForexTradingGraph: No Position Trader task found.")
-        return {"position_trader_proposal": None}
@@ -0,0 +1,79 @@
+import unittest
+import contextlib
+import io
+import threading
+from unittest.mock import patch
+
+from TradingAgents.tradingagents.broker_interface.simulated_broker import SimulatedBroker
+from TradingAgents.tradingagents.graph.forex_trading_graph import ForexTradingGraph, _merge_error_messages # Needs TradingAgents/ on sys.path (conftest.py)
+
+SUB_AGENTS = {"scalper_agent": "scalper_proposal", "day_trader_agent": "day_trader_proposal",
+              "swing_trader_agent": "swing_trader_proposal", "position_trader_agent": "position_trader_proposal"}
+
+class ConcurrencyTracker:
+    def __init__(self): self._lock = threading.Lock(); self.active = 0; self.max_active = 0
+
+    @contextlib.contextmanager
+    def running(self):
+        with self._lock: self.active += 1; self.max_active = max(self.max_active, self.active)
+        try: yield
+        finally:
+            with self._lock: self.active -= 1
+
+class FakeSubAgent:
+    """Stand-in for a sub-agent: returns a HOLD proposal (or an error) under its key, optionally meeting the others at a barrier."""
+    def __init__(self, proposal_key: str, tracker: ConcurrencyTracker, barrier: threading.Barrier = None, error: str = None):
+        self.proposal_key = proposal_key; self.tracker = tracker; self.barrier = barrier; self.error = error
+
+    def process_task(self, state):
+        with self.tracker.running():
+            if self.barrier is not None: self.barrier.wait() # Passes only if all four branches run at the same time
+            if self.error is not None: return {self.proposal_key: None, "error_message": self.error}
+            return {self.proposal_key: {"proposal_id": f"prop_{self.proposal_key}", "source_agent_type": self.proposal_key, "currency_pair": state["currency_pair"],
+                                        "timestamp": state["current_simulated_time"], "signal": "HOLD", "entry_price": None, "entry_price_range_upper": None,
+                                        "entry_price_range_lower": None, "stop_loss": None, "take_profit": None, "take_profit_2": None, "confidence_score": 0.5,
+                                        "rationale": "fake", "sub_agent_risk_level": "Low", "supporting_data": None}}
+
+class TestForexTradingGraph(unittest.TestCase):
+
+    def _graph(self, tracker: ConcurrencyTracker, barrier: threading.Barrier = None, errors: dict = None, **options) -> ForexTradingGraph:
+        with contextlib.redirect_stdout(io.StringIO()): graph = ForexTradingGraph(broker=SimulatedBroker(), **options)
+        for attribute, proposal_key in SUB_AGENTS.items():
+            setattr(graph, attribute, FakeSubAgent(proposal_key, tracker, barrier, (errors or {}).get(attribute)))
+        return graph
+
+    def test_error_message_reducer(self):
+        self.assertIsNone(_merge_error_messages(None, None))
+        self.assertEqual(_merge_error_messages(None, "scalper failed"), "scalper failed")
+        self.assertEqual(_merge_error_messages("scalper failed", None), "scalper failed")
+        self.assertEqual(_merge_error_messages("scalper failed", "day failed"), "scalper failed; day failed")
+        self.assertEqual(_merge_error_messages("scalper failed; day failed", "day failed"), "scalper failed; day failed") # Already included
+        self.assertEqual(_merge_error_messages("scalper failed", "scalper failed; day failed"), "scalper failed; day failed")
+
+    def test_branches_run_in_parallel_and_join_once(self):
+        tracker = ConcurrencyTracker(); graph = self._graph(tracker, barrier=threading.Barrier(len(SUB_AGENTS), timeout=10))
+        with patch.object(graph.master_agent, "aggregation_node", wraps=graph.master_agent.aggregation_node) as aggregate, contextlib.redirect_stdout(io.StringIO()):
+            decision = graph.invoke_graph("EURUSD", "2024-01-02T10:00:00+00:00")
+        self.assertEqual(tracker.max_active, len(SUB_AGENTS))
+        self.assertEqual(aggregate.call_count, 1) # The join waits for every branch
+        self.assertEqual(sorted(p["proposal_id"] for p in aggregate.call_args.args[0]["proposals_from_sub_agents"]), sorted(f"prop_{key}" for key in SUB_AGENTS.values()))
+        self.assertEqual(decision["action"], "STAND_ASIDE")
+
+    def test_sequential_mode_runs_one_branch_at_a_time(self):
+        tracker = ConcurrencyTracker(); graph = self._graph(tracker, execution="sequential")
+        with patch.object(graph.master_agent, "aggregation_node", wraps=graph.master_agent.aggregation_node) as aggregate, contextlib.redirect_stdout(io.StringIO()):
+            graph.invoke_graph("EURUSD", "2024-01-02T10:00:00+00:00")
+        self.assertEqual(tracker.max_active, 1)
+        self.assertEqual(len(aggregate.call_args.args[0]["proposals_from_sub_agents"]), len(SUB_AGENTS))
+        with self.assertRaises(ValueError), contextlib.redirect_stdout(io.StringIO()): ForexTradingGraph(broker=SimulatedBroker(), execution="process")
+
+    def test_errors_of_parallel_branches_are_merged(self):
+        graph = self._graph(ConcurrencyTracker(), errors={"scalper_agent": "scalper failed", "day_trader_agent": "day failed"})
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output): decision = graph.invoke_graph("EURUSD", "2024-01-02T10:00:00+00:00")
+        self.assertIsNone(decision)
+        error_line = next(line for line in output.getvalue().splitlines() if line.startswith("Graph execution error:"))
+        self.assertIn("scalper failed", error_line); self.assertIn("day failed", error_line)
+
+if __name__ == '__main__':
+    unittest.main()